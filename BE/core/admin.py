@@ -1,6 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Wallet, BlockchainTransaction
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from .models import User, Wallet, BlockchainTransaction, ChainIntent, SigningKey, RequestProfile
 
 
 class UserAdmin(BaseUserAdmin):
@@ -14,7 +18,7 @@ class UserAdmin(BaseUserAdmin):
 
     # Add custom fields to fieldsets (edit page)
     fieldsets = BaseUserAdmin.fieldsets + (
-        ("Wallet Info", {"fields": ("wallet_address", "private_key")}),
+        ("Wallet Info", {"fields": ("wallet_address",)}),
         ("Verification & Score", {"fields": ("kyc_verified", "kyc_verified_at", "credit_score")}),
         ("Roles", {"fields": ("is_borrower", "is_lender")}),
     )
@@ -30,15 +34,95 @@ class UserAdmin(BaseUserAdmin):
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
     list_display = ("user", "address", "is_default", "created_at")
+    list_select_related = ("user",)
     list_filter = ("is_default", "created_at")
     search_fields = ("address", "user__username")
 
 
 @admin.register(BlockchainTransaction)
 class BlockchainTransactionAdmin(admin.ModelAdmin):
-    list_display = ("tx_hash", "status", "from_address", "to_address", "value", "block_number", "created_at")
+    list_display = (
+        "tx_hash", "status", "from_address", "to_address", "value", "block_number", "created_at", "finalized_at"
+    )
     list_filter = ("status", "created_at")
     search_fields = ("tx_hash", "from_address", "to_address")
+    readonly_fields = ("created_at", "finalized_at")
+
+    # Confirmed and failed transactions are append-only
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None and obj.status in BlockchainTransaction.FINAL_STATUSES:
+            return [field.name for field in obj._meta.fields]
+        return super().get_readonly_fields(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        if obj is not None and obj.status in BlockchainTransaction.FINAL_STATUSES:
+            return False
+        return super().has_delete_permission(request, obj)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+
+@admin.register(ChainIntent)
+class ChainIntentAdmin(admin.ModelAdmin):
+    list_display = ("kind", "target_id", "status", "attempts", "tx_hash", "created_at", "completed_at")
+    list_filter = ("kind", "status", "created_at")
+    search_fields = ("tx_hash",)
+    readonly_fields = ("created_at", "updated_at")
+
+
+@admin.register(SigningKey)
+class SigningKeyAdmin(admin.ModelAdmin):
+    # The key itself is never shown; set it with `manage.py set_signing_key`
+    list_display = ("user", "created_at", "updated_at")
+    list_select_related = ("user",)
+    search_fields = ("user__username",)
+    fields = ("user", "created_at", "updated_at")
+    readonly_fields = ("user", "created_at", "updated_at")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at", "method", "path", "status_code", "duration_ms",
+        "sql_count", "sql_ms", "cache_calls", "rpc_calls", "rpc_ms", "trigger", "download_link",
+    )
+    list_filter = ("trigger", "method", "status_code", "created_at")
+    search_fields = ("path", "view_name", "user__username")
+    exclude = ("folded_stacks",)
+    readonly_fields = (
+        "method", "path", "view_name", "status_code", "user", "trigger", "duration_ms", "cpu_samples",
+        "sql_count", "sql_ms", "cache_calls", "cache_ms", "rpc_calls", "rpc_ms", "details",
+        "created_at", "download_link",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        return [
+            path("<int:profile_id>/download/", self.admin_site.admin_view(self.download_view),
+                 name="core_requestprofile_download"),
+        ] + super().get_urls()
+
+    @admin.display(description="Stacks")
+    def download_link(self, obj):
+        url = reverse("admin:core_requestprofile_download", args=[obj.pk])
+        return format_html('<a href="{}">folded</a>', url)
+
+    def download_view(self, request, profile_id):
+        profile = get_object_or_404(RequestProfile, pk=profile_id)
+        if not self.has_view_permission(request, profile):
+            return HttpResponse(status=403)
+        # Feed to flamegraph.pl or open in speedscope
+        response = HttpResponse(profile.folded_stacks, content_type="text/plain; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="profile-{profile.pk}.folded"'
+        return response
 
 
 # Register the custom User admin
@@ -0,0 +1,117 @@
+"""Async versions of read-heavy API endpoints, for the ASGI deployment.
+
+DRF views are synchronous, so under ASGI each request to one holds a
+thread for its whole duration, including time spent waiting on the
+database. The views built here are plain Django ``async def`` views on the
+async ORM. A request that waits on a query gives the event loop back to
+other requests, so one worker can hold many concurrent polling clients.
+
+Each async view serves the same URL and returns the same JSON as the DRF
+action it replaces. The DRF serializers are reused, with relations
+selected up front so serializing does no I/O. Authentication uses DRF's
+configured classes and pagination follows ``PageNumberPagination``.
+Non-GET methods are handed to the DRF view.
+
+The async routes are installed when ``ASYNC_READ_VIEWS`` is on, which
+``credlend/asgi.py`` does by default. WSGI deployments keep the DRF views.
+"""
+import functools
+import math
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def json_response(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def _authentication_error(request, detail, status):
+    """The response DRF's exception handler gives for a failed or missing authentication"""
+    response = json_response(detail if isinstance(detail, (list, dict)) else {'detail': detail}, status=status)
+    authenticators = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    if status == 401 and authenticators:
+        response['WWW-Authenticate'] = authenticators[0]().authenticate_header(request)
+    return response
+
+
+def _authenticate(request):
+    """Run DRF's authentication classes; returns ``(user, authenticator)`` or None"""
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        authenticator = authentication_class()
+        result = authenticator.authenticate(request)
+        if result is not None:
+            return result[0], authenticator
+    return None
+
+
+def async_read_view(fallback=None):
+    """Decorate an ``async def view(request, ...)`` that needs an authenticated user.
+
+    ``fallback`` is the DRF view that answers every method other than GET.
+    """
+    def decorator(view):
+        # Like DRF's views: JWT requests carry no CSRF token
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                if fallback is not None:
+                    return await sync_to_async(fallback)(request, *args, **kwargs)
+                return json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+            try:
+                # Cache reads and, on a miss, a user query
+                result = await sync_to_async(_authenticate)(request)
+            except APIException as e:
+                return _authentication_error(request, e.detail, e.status_code)
+            if result is None:
+                return _authentication_error(request, 'Authentication credentials were not provided.', 401)
+            request.user = result[0]
+
+            try:
+                return await view(request, *args, **kwargs)
+            except Http404 as e:
+                return json_response({'detail': str(e) or 'Not found.'}, status=404)
+        return wrapper
+    return decorator
+
+
+async def serialize_list(queryset, serializer_class, request):
+    return serializer_class([obj async for obj in queryset], many=True, context={'request': request}).data
+
+
+async def paginated_response(queryset, serializer_class, request):
+    """A page of ``queryset`` in the ``PageNumberPagination`` format"""
+    page_size = api_settings.PAGE_SIZE
+    count = await queryset.acount()
+    pages = max(1, math.ceil(count / page_size))
+    try:
+        number = int(request.GET.get('page', 1))
+    except ValueError:
+        number = 0
+    if number < 1 or number > pages:
+        return json_response({'detail': 'Invalid page.'}, status=404)
+
+    offset = (number - 1) * page_size
+    url = request.build_absolute_uri()
+    if number < pages:
+        next_url = replace_query_param(url, 'page', number + 1)
+    else:
+        next_url = None
+    if number == 1:
+        previous_url = None
+    elif number == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', number - 1)
+    return json_response({
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': await serialize_list(queryset[offset:offset + page_size], serializer_class, request),
+    })
@@ -0,0 +1,93 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+# Fields needed for authentication and permission checks. Anything else is
+# deferred and loaded from the database only if a view reads it.
+CACHED_USER_FIELDS = (
+    'id', 'username', 'wallet_address', 'is_active', 'is_staff', 'is_superuser',
+    'is_borrower', 'is_lender', 'kyc_verified',
+)
+
+
+def _version_key(user_id):
+    return f'auth:user:{user_id}:version'
+
+
+def _new_version():
+    # A version key can be evicted; seeding from the clock means a recreated
+    # key never repeats a version that entries may still be stored under
+    return time.time_ns()
+
+
+def _user_version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), _new_version(), None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def invalidate_cached_user(user_id):
+    """Bump the user's version so every cached entry for them is ignored"""
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.add(_version_key(user_id), _new_version(), None)
+
+
+def cache_is_shared():
+    """Whether every process sees the same cache, so an invalidation reaches them all"""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that resolves ``request.user`` from the cache.
+
+    Entries are keyed by user id, the user's cache version and the token's
+    identifying claims, and hold only ``CACHED_USER_FIELDS``. On a hit the
+    user is rebuilt as a ``User`` instance with the remaining fields
+    deferred, so ORM filters and permission checks work without a query.
+    ``User.save`` bumps the version, which invalidates every entry for that
+    user at once.
+
+    Only a cache shared by every process is used: with a per-process one,
+    such as the ``LocMemCache`` fallback, a save in one worker would not
+    reach the others, so users are loaded from the database as usual.
+    """
+
+    def get_user(self, validated_token):
+        if not cache_is_shared():
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            return super().get_user(validated_token)
+
+        claims = f"{validated_token.get('jti', '')}:{validated_token.get('iat', '')}"
+        digest = hashlib.sha1(claims.encode()).hexdigest()[:16]
+        key = f'auth:user:{user_id}:v{_user_version(user_id)}:{digest}'
+
+        # from_db() expects values in the model's concrete field order
+        field_names = [
+            field.attname for field in self.user_model._meta.concrete_fields
+            if field.attname in CACHED_USER_FIELDS
+        ]
+        values = cache.get(key)
+        if values is not None:
+            return self.user_model.from_db(DEFAULT_DB_ALIAS, field_names, values)
+
+        # Raises AuthenticationFailed for unknown or inactive users
+        user = super().get_user(validated_token)
+        timeout = getattr(settings, 'AUTH_USER_CACHE_TTL', 300)
+        expires_in = int(validated_token.get('exp', 0) - time.time())
+        if expires_in > 0:
+            timeout = min(timeout, expires_in)
+        cache.set(key, [getattr(user, field) for field in field_names], timeout)
+        return user
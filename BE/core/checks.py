@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from .authentication import cache_is_shared
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """The RPC rate limits and the JWT user cache need a cache every process shares"""
+    if cache_is_shared():
+        return []
+    return [Warning(
+        "The default cache is per process, so each worker, Celery process and the listener gets its own "
+        "Solana RPC rate-limit budget, and JWT users are not cached.",
+        hint="Set REDIS_CACHE_URL (or configure another shared cache) in production.",
+        obj=settings.CACHES['default']['BACKEND'],
+        id='core.W001',
+    )]
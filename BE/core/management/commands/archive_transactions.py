@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from ... import tx_history
+
+class Command(BaseCommand):
+    help = 'Archive blockchain transaction months older than TRANSACTION_HOT_MONTHS to columnar files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='List the months that would be archived')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            months = tx_history.archivable_months()
+            self.stdout.write(f"{len(months)} months to archive: {', '.join(f'{m:%Y-%m}' for m in months) or '-'}")
+            return
+
+        try:
+            report = tx_history.archive_old_months()
+        except tx_history.ArchiveError as e:
+            raise CommandError(f"Verification failed, the month stays in the database: {e}")
+        for name in report['partitions_created']:
+            self.stdout.write(f"Created partition {name}")
+        for month, count in report['archived'].items():
+            self.stdout.write(f"Archived {count} transactions of {month}")
+        for month in report['skipped']:
+            self.stdout.write(self.style.WARNING(f"Skipped {month}: transactions still pending"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(report['archived'])} months archived to {tx_history.archive_dir()}"
+        ))
@@ -0,0 +1,137 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, NoReverseMatch
+from django.utils import timezone
+from rest_framework.permissions import IsAdminUser
+from rest_framework_simplejwt.tokens import AccessToken
+import json
+import subprocess
+import time
+from ...models import User
+
+class Command(BaseCommand):
+    help = 'Measure latency percentiles and queries per request for every router endpoint; writes JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='synthetic-0',
+                            help='User to call the API as (see seed_synthetic); admin endpoints need staff')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--only', default=None, help='Only endpoints whose name contains this text')
+        parser.add_argument('--output', default='bench_api.json')
+        parser.add_argument('--compare', default=None, help='Earlier results JSON to print p95 deltas against')
+
+    def handle(self, *args, **options):
+        from credlend.urls import router
+
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} not found; run seed_synthetic first")
+
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        results = {}
+        for prefix, viewset, basename in router.registry:
+            if any(permission is IsAdminUser for permission in viewset.permission_classes) and not user.is_staff:
+                self.stderr.write(f"Skipping {prefix}: needs a staff user")
+                continue
+            for name, url in self.endpoints(client, viewset, basename):
+                if options['only'] and options['only'] not in name:
+                    continue
+                results[name] = self.measure(client, url, options['iterations'], options['warmup'])
+                stats = results[name]
+                self.stdout.write(
+                    f"{name:<45} {stats['status']}  p50 {stats['p50_ms']:8.2f} ms  "
+                    f"p95 {stats['p95_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms  "
+                    f"{stats['queries_per_request']:6.1f} queries"
+                )
+
+        report = {
+            'commit': self.git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'user': user.username,
+            'iterations': options['iterations'],
+            'endpoints': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} endpoint results to {options['output']}"))
+
+        if options['compare']:
+            self.compare(options['compare'], report)
+
+    def endpoints(self, client, viewset, basename):
+        """(name, url) for the list route, the detail route and every GET extra action"""
+        try:
+            list_url = reverse(f'{basename}-list')
+        except NoReverseMatch:
+            return
+        yield f'{basename}-list', list_url
+
+        # Use the first object the user can see for detail routes
+        response = client.get(list_url)
+        body = response.json() if response.status_code == 200 else {}
+        rows = body.get('results', []) if isinstance(body, dict) else body
+        pk = rows[0].get('id') if rows else None
+        if pk is not None:
+            yield f'{basename}-detail', reverse(f'{basename}-detail', args=[pk])
+
+        for action in viewset.get_extra_actions():
+            if 'get' not in action.mapping:
+                continue
+            route = f'{basename}-{action.url_name}'
+            if action.detail:
+                if pk is not None:
+                    yield route, reverse(route, args=[pk])
+            else:
+                yield route, reverse(route)
+
+    def measure(self, client, url, iterations, warmup):
+        for _ in range(warmup):
+            client.get(url)
+        durations, queries, status = [], 0, None
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                durations.append(time.perf_counter() - started)
+            queries += len(captured.captured_queries)
+            status = response.status_code
+        durations.sort()
+
+        def percentile(fraction):
+            return round(durations[min(len(durations) - 1, int(len(durations) * fraction))] * 1000, 3)
+
+        return {
+            'url': url,
+            'status': status,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'mean_ms': round(sum(durations) / len(durations) * 1000, 3),
+            'queries_per_request': queries / iterations,
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def compare(self, path, report):
+        with open(path) as f:
+            previous = json.load(f)
+        self.stdout.write(f"Against {path} (commit {previous.get('commit')}):")
+        for name, stats in report['endpoints'].items():
+            before = previous.get('endpoints', {}).get(name)
+            if not before:
+                continue
+            delta = stats['p95_ms'] - before['p95_ms']
+            change = delta / before['p95_ms'] * 100 if before['p95_ms'] else 0
+            queries = stats['queries_per_request'] - before['queries_per_request']
+            self.stdout.write(f"{name:<45} p95 {delta:+8.2f} ms ({change:+5.1f}%)  queries {queries:+5.1f}")
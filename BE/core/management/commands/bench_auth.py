@@ -0,0 +1,81 @@
+from django.apps.registry import Apps
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from fernet_fields import EncryptedCharField
+from rest_framework.test import APIRequestFactory
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+import base58
+import time
+import uuid
+from ...models import User
+
+LEGACY_TABLE = 'bench_auth_legacy_users'
+
+
+def legacy_user_model():
+    """``User`` as it was before the signing key moved to ``signing_keys``: the same columns plus ``private_key``"""
+    attrs = {field.name: field.clone() for field in User._meta.concrete_fields}
+    attrs.update({
+        'private_key': EncryptedCharField(max_length=255, null=True, blank=True),
+        'is_authenticated': True,
+        '__module__': __name__,
+        # A registry of its own keeps the throwaway model out of the project's
+        'Meta': type('Meta', (), {'app_label': 'core', 'db_table': LEGACY_TABLE, 'apps': Apps()}),
+    })
+    return type('LegacyUser', (models.Model,), attrs)
+
+
+class Command(BaseCommand):
+    help = 'Measure per-request JWT authentication cost with the signing key on the users row and without it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        iterations = options['requests']
+        name = f'bench-auth-{uuid.uuid4().hex[:12]}'
+        user = User.objects.create(username=name, wallet_address=name)
+        LegacyUser = legacy_user_model()
+        try:
+            with connection.schema_editor() as schema_editor:
+                schema_editor.create_model(LegacyUser)
+            try:
+                LegacyUser.objects.create(
+                    **{field.attname: getattr(user, field.attname) for field in User._meta.concrete_fields},
+                    private_key=base58.b58encode(bytes(range(64))).decode(),
+                )
+                results = self.measure(user, LegacyUser, iterations)
+            finally:
+                with connection.schema_editor() as schema_editor:
+                    schema_editor.delete_model(LegacyUser)
+        finally:
+            user.delete()
+
+        for label, micros in results.items():
+            self.stdout.write(f"{label:<40} {micros:8.1f} us/request")
+        before, after = results.values()
+        self.stdout.write(f"saves {before - after:.1f} us/request ({(before - after) / before * 100:.0f}%)")
+
+    def measure(self, user, legacy_model, iterations):
+        token = str(AccessToken.for_user(user))
+        factory = APIRequestFactory()
+        # The legacy table holds the same id, so one token serves both
+        before = JWTAuthentication()
+        before.user_model = legacy_model
+        after = JWTAuthentication()
+
+        results = {}
+        for label, authenticator in (('before (users row + key decrypt)', before),
+                                     ('after (users row without key)', after)):
+            def authenticate():
+                request = Request(factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+                return authenticator.authenticate(request)
+
+            authenticate()  # warm up connections
+            started = time.perf_counter()
+            for _ in range(iterations):
+                authenticate()
+            results[label] = (time.perf_counter() - started) / iterations * 1e6
+        return results
@@ -0,0 +1,124 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+import asyncio
+import json
+import time
+import httpx
+from lenders.models import LenderPool
+from ...models import User
+
+# The endpoints dashboards poll, served by async views under ASGI
+POLLED_PATHS = (
+    '/loans/',
+    '/repayments/upcoming/',
+    '/repayments/overdue/',
+    '/lender-deposits/',
+    '/lender-pools/{pool_id}/stats/',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Poll the dashboard read endpoints from many concurrent clients and compare servers. '
+        'Start the deployments first, e.g. "gunicorn credlend.wsgi -w 4 -b :8000" and '
+        '"uvicorn credlend.asgi:application --workers 4 --port 8001"; writes JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', default=[],
+                            help='name=base_url to poll, e.g. wsgi=http://127.0.0.1:8000; repeatable')
+        parser.add_argument('--clients', default='50,200',
+                            help='Comma separated concurrent client counts to run against every target')
+        parser.add_argument('--duration', type=float, default=20.0, help='Seconds per run')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds each client waits between polls of all endpoints')
+        parser.add_argument('--timeout', type=float, default=10.0)
+        parser.add_argument('--output', default='bench_polling.json')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target'] or ['wsgi=http://127.0.0.1:8000', 'asgi=http://127.0.0.1:8001']:
+            name, _, url = target.partition('=')
+            if not url:
+                raise CommandError(f"--target must be name=base_url, got {target}")
+            targets.append((name, url.rstrip('/')))
+        client_counts = [int(count) for count in options['clients'].split(',')]
+
+        users = list(User.objects.filter(username__startswith='synthetic-').order_by('id')[:max(client_counts)])
+        if not users:
+            raise CommandError('No synthetic users found; run seed_synthetic first')
+        pool = LenderPool.objects.filter(is_active=True).order_by('id').first()
+        if pool is None:
+            raise CommandError('No active lender pool found; run seed_synthetic first')
+        paths = [path.format(pool_id=pool.id) for path in POLLED_PATHS]
+        # Clients cycle through the users so responses are not all cached for one
+        tokens = [f'Bearer {AccessToken.for_user(user)}' for user in users]
+
+        runs = []
+        for clients in client_counts:
+            for name, url in targets:
+                stats = asyncio.run(self.run(url, paths, tokens, clients, options))
+                stats.update({'target': name, 'url': url, 'clients': clients})
+                runs.append(stats)
+                self.stdout.write(
+                    f"{name:<8} {clients:5d} clients  {stats['requests_per_second']:8.1f} req/s  "
+                    f"p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+                    f"p99 {stats['p99_ms']:8.2f} ms  {stats['errors']} errors"
+                )
+
+        report = {
+            'timestamp': timezone.now().isoformat(),
+            'duration': options['duration'],
+            'interval': options['interval'],
+            'paths': paths,
+            'runs': runs,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(runs)} runs to {options['output']}"))
+
+    async def run(self, base_url, paths, tokens, clients, options):
+        durations, errors = [], []
+        deadline = time.perf_counter() + options['duration']
+        limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+        async with httpx.AsyncClient(base_url=base_url, timeout=options['timeout'], limits=limits) as http:
+            async def poller(index):
+                headers = {'Authorization': tokens[index % len(tokens)]}
+                # Spread the first polls over one interval, like clients joining over time
+                await asyncio.sleep(options['interval'] * index / clients)
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    for path in paths:
+                        request_started = time.perf_counter()
+                        try:
+                            response = await http.get(path, headers=headers)
+                        except httpx.HTTPError as e:
+                            errors.append(type(e).__name__)
+                            continue
+                        durations.append(time.perf_counter() - request_started)
+                        if response.status_code >= 400:
+                            errors.append(response.status_code)
+                    await asyncio.sleep(max(0.0, options['interval'] - (time.perf_counter() - started)))
+
+            started = time.perf_counter()
+            await asyncio.gather(*(poller(index) for index in range(clients)))
+            elapsed = time.perf_counter() - started
+
+        durations.sort()
+
+        def percentile(fraction):
+            if not durations:
+                return 0.0
+            return round(durations[min(len(durations) - 1, int(len(durations) * fraction))] * 1000, 3)
+
+        return {
+            'requests': len(durations),
+            'requests_per_second': round(len(durations) / elapsed, 1),
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'errors': len(errors),
+            'error_kinds': sorted({str(error) for error in errors}),
+        }
@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+from concurrent.futures import ThreadPoolExecutor
+import time
+from ...utils.mock_rpc import MockRPCServer
+from ...utils.rpc_provider import SolanaRPCProvider
+
+class Command(BaseCommand):
+    help = 'Run RPC routing and hedging against local mock endpoints with injected latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--latencies', default='0.02,0.06,0.15',
+                            help='Comma-separated base latency in seconds for each mock endpoint')
+        parser.add_argument('--jitter', type=float, default=0.03)
+        parser.add_argument('--tail-rate', type=float, default=0.05,
+                            help='Fraction of requests to the fastest endpoint that stall')
+        parser.add_argument('--tail-latency', type=float, default=0.5)
+        parser.add_argument('--fail-endpoint', type=int, default=None,
+                            help='Index of an endpoint that fails every request')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--method', default='getBalance')
+
+    def handle(self, *args, **options):
+        latencies = [float(value) for value in options['latencies'].split(',')]
+        servers = [MockRPCServer(latency=latency, jitter=options['jitter'], seed=index)
+                   for index, latency in enumerate(latencies)]
+        if options['fail_endpoint'] is not None:
+            servers[options['fail_endpoint']].error_rate = 1.0
+
+        # Occasional stalls on the fastest node are what hedging is for
+        fastest = min(servers, key=lambda server: server.latency)
+        fastest.tail_rate, fastest.tail_latency = options['tail_rate'], options['tail_latency']
+        for server in servers:
+            server.start()
+
+        # Generous limits so only routing is measured
+        provider = SolanaRPCProvider(
+            endpoints=[server.url for server in servers],
+            rate_limits={'read': (10000, 10000), 'send': (10000, 10000), 'heavy': (10000, 10000)},
+        )
+        params = ('11111111111111111111111111111111', {'commitment': 'confirmed'})
+        if options['method'] == 'getSignatureStatuses':
+            params = (['1' * 64],)
+
+        def call(_):
+            started = time.perf_counter()
+            try:
+                provider.make_request(options['method'], *params)
+                ok = True
+            except Exception:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                results = list(pool.map(call, range(options['requests'])))
+        finally:
+            for server in servers:
+                server.stop()
+
+        durations = sorted(duration for duration, _ in results)
+        failures = sum(1 for _, ok in results if not ok)
+
+        def percentile(fraction):
+            return durations[min(len(durations) - 1, int(len(durations) * fraction))] * 1000
+
+        stats = provider.endpoint_stats()
+        for server, endpoint in zip(servers, stats['endpoints']):
+            self.stdout.write(
+                f"{endpoint['url']:<28} base {server.latency * 1000:6.0f} ms  "
+                f"served {server.requests:5d}  errors {endpoint['errors']:4d}  "
+                f"p50 {endpoint['p50_ms']} ms  p95 {endpoint['p95_ms']} ms  "
+                f"{'healthy' if endpoint['healthy'] else 'cooling down'}"
+            )
+        self.stdout.write(f"Hedged requests: {stats['hedges']} ({stats['hedge_wins']} won by the hedge)")
+        self.stdout.write(
+            f"Client latency: p50 {percentile(0.5):.1f} ms  p95 {percentile(0.95):.1f} ms  "
+            f"p99 {percentile(0.99):.1f} ms  failures {failures}/{len(results)}"
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+import logging
+import time
+from ...outbox import dispatch_batch
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Drain the on-chain outbox: submit pending intents in concurrent batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent submissions per batch')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Process a single batch and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                processed = dispatch_batch(options['batch_size'], options['workers'])
+            except Exception as e:
+                logger.error(f"Error dispatching chain intents: {e}")
+                processed = 0
+
+            if options['once']:
+                self.stdout.write(f"Processed {processed} intents")
+                return
+            # Keep draining while there is a backlog, otherwise poll
+            if processed < options['batch_size']:
+                time.sleep(options['interval'])
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+import asyncio
+import json
+import time
+from ...utils.mock_rpc import (
+    PROFILES, MockChain, MockRPCServer, MockWebsocketServer,
+    load_event_script, synthetic_event_script,
+)
+
+class Command(BaseCommand):
+    help = 'Run a local mock Solana JSON-RPC and websocket endpoint for offline benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8899)
+        parser.add_argument('--ws-port', type=int, default=None,
+                            help='Websocket port (defaults to --port + 1, as solana-test-validator does)')
+        parser.add_argument('--profile', choices=sorted(PROFILES), default='local')
+        parser.add_argument('--latency', type=float, default=None, help='Base latency in seconds')
+        parser.add_argument('--jitter', type=float, default=None)
+        parser.add_argument('--tail-rate', type=float, default=None)
+        parser.add_argument('--tail-latency', type=float, default=None)
+        parser.add_argument('--error-rate', type=float, default=None)
+        parser.add_argument('--max-rps', type=int, default=None)
+        parser.add_argument('--slot-seconds', type=float, default=None)
+        parser.add_argument('--seed', type=int, default=0, help='Seed for latency, failures and synthetic events')
+        parser.add_argument('--program-id', default=None)
+        parser.add_argument('--script', default=None,
+                            help='JSON or JSON-lines file of Anchor events to emit as program logs')
+        parser.add_argument('--events', type=int, default=0,
+                            help='Emit this many synthetic loan events instead of a script')
+        parser.add_argument('--events-per-second', type=float, default=10)
+        parser.add_argument('--duration', type=float, default=None,
+                            help='Stop after this many seconds (runs until interrupted otherwise)')
+
+    def handle(self, *args, **options):
+        overrides = {key: options[key] for key in (
+            'latency', 'jitter', 'tail_rate', 'tail_latency', 'error_rate', 'max_rps', 'slot_seconds',
+        )}
+        profile = dict(PROFILES[options['profile']])
+        profile.update({key: value for key, value in overrides.items() if value is not None})
+
+        chain = MockChain(slot_seconds=profile['slot_seconds'])
+        if options['program_id']:
+            chain.program_id = options['program_id']
+        try:
+            http = MockRPCServer(options['host'], options['port'], profile=options['profile'],
+                                 chain=chain, seed=options['seed'], **overrides)
+        except OSError as e:
+            raise CommandError(f"Cannot listen on {options['host']}:{options['port']}: {e}")
+
+        if options['script']:
+            steps = load_event_script(options['script'])
+        elif options['events']:
+            steps = synthetic_event_script(options['events'], options['events_per_second'], seed=options['seed'])
+        else:
+            steps = []
+
+        ws_port = options['ws_port'] if options['ws_port'] is not None else options['port'] + 1
+        try:
+            asyncio.run(self.serve(http, chain, options['host'], ws_port, steps, options['duration']))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            http.stop()
+            self.stdout.write(json.dumps(http.stats(), indent=2))
+
+    async def serve(self, http, chain, host, ws_port, steps, duration):
+        try:
+            ws = await MockWebsocketServer(chain, host, ws_port).start()
+        except OSError as e:
+            raise CommandError(f"Cannot listen on {host}:{ws_port}: {e}")
+        http.start()
+        self.stdout.write(f"Mock Solana RPC on {http.url} and {ws.url} (program {chain.program_id})")
+        self.stdout.write(f"Point the app at it with SOLANA_RPC_URL={http.url} SOLANA_WS_URL={ws.url}")
+
+        started = time.monotonic()
+        try:
+            if steps:
+                self.stdout.write("Waiting for a logsSubscribe client before emitting events")
+                await ws.wait_for_subscriber()
+                started = time.monotonic()
+                emitted = await ws.emit_script(steps)
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"Emitted {emitted} program events in {elapsed:.1f}s "
+                                  f"({emitted / elapsed if elapsed else 0:.1f}/s), "
+                                  f"{ws.notifications} notifications sent")
+            if duration is not None:
+                await asyncio.sleep(max(0, duration - (time.monotonic() - started)))
+            else:
+                await asyncio.Event().wait()
+        finally:
+            await ws.stop()
@@ -0,0 +1,202 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+import random
+import time
+import base58
+from ...models import User, Wallet
+from kyc.models import KYCVerification
+from lenders.models import LenderPool, LenderDeposit, PoolAllocation
+from loans.models import LoanProduct, LoanApplication, Loan, Repayment
+from loans.scheduler import schedule_repayments
+
+BATCH_SIZE = 1000
+
+class Command(BaseCommand):
+    help = 'Generate N synthetic users with wallets, loans, repayments, pools and deposits using bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', '-n', type=int, default=1000, help='Scale: number of users')
+        parser.add_argument('--installments', type=int, default=6, help='Repayments per loan')
+        parser.add_argument('--prefix', default='synthetic', help='Username and name prefix of generated rows')
+        parser.add_argument('--password', default='synthetic-pass')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--flush', action='store_true', help='Delete rows from a previous run with this prefix first')
+
+    def handle(self, *args, **options):
+        n = options['users']
+        prefix = options['prefix']
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        timings = {}
+
+        def address():
+            return base58.b58encode(bytes(rng.getrandbits(8) for _ in range(32))).decode()
+
+        def timed(name, func):
+            started = time.perf_counter()
+            rows = func()
+            timings[name] = (len(rows), time.perf_counter() - started)
+            return rows
+
+        if options['flush']:
+            self.flush(prefix)
+
+        with transaction.atomic():
+            # Hash once; every synthetic user shares the password
+            password = make_password(options['password'])
+            users = timed('users', lambda: User.objects.bulk_create([
+                User(
+                    username=f'{prefix}-{i}', email=f'{prefix}-{i}@example.com', password=password,
+                    wallet_address=address(), is_borrower=i % 3 != 2, is_lender=i % 3 != 1,
+                    kyc_verified=i % 4 != 3, kyc_verified_at=now if i % 4 != 3 else None,
+                    credit_score=rng.randrange(450, 850),
+                    # User 0 is a borrower, a lender and staff so benchmarks can reach every endpoint
+                    is_staff=i == 0,
+                )
+                for i in range(n)
+            ], batch_size=BATCH_SIZE))
+
+            timed('wallets', lambda: Wallet.objects.bulk_create([
+                Wallet(user=user, address=user.wallet_address if extra == 0 else address(), is_default=extra == 0)
+                for user in users for extra in range(1 + (user.pk % 2))
+            ], batch_size=BATCH_SIZE))
+
+            kyc_statuses = ['approved', 'approved', 'pending', 'in_review', 'rejected']
+            timed('kyc verifications', lambda: KYCVerification.objects.bulk_create([
+                KYCVerification(
+                    user=user, status=rng.choice(kyc_statuses),
+                    provider_reference=f'{prefix}-kyc-{user.pk}',
+                    completed_at=now if user.kyc_verified else None,
+                )
+                for user in users
+            ], batch_size=BATCH_SIZE))
+
+            products = timed('products', lambda: LoanProduct.objects.bulk_create([
+                LoanProduct(
+                    name=f'{prefix} product {i}', loan_type=['personal', 'business', 'mortgage'][i % 3],
+                    description='Synthetic loan product', min_amount=Decimal('100'),
+                    max_amount=Decimal(rng.choice([5000, 20000, 100000])),
+                    min_duration=30, max_duration=365, interest_rate=Decimal(rng.randrange(300, 1800)) / 100,
+                    collateral_required=i % 2 == 0, collateral_type='crypto' if i % 2 == 0 else None,
+                    ltv_ratio=Decimal('60.00') if i % 2 == 0 else None,
+                )
+                for i in range(max(5, n // 200))
+            ]))
+
+            borrowers = [user for user in users if user.is_borrower]
+            statuses = ['approved'] * 5 + ['submitted', 'under_review', 'rejected', 'draft', 'canceled']
+            applications = timed('applications', lambda: LoanApplication.objects.bulk_create([
+                LoanApplication(
+                    user=borrower, loan_product=product, amount=amount,
+                    duration_days=rng.randrange(product.min_duration, product.max_duration + 1),
+                    purpose='Synthetic application', status=status,
+                    approved_at=now if status == 'approved' else None,
+                    contract_address=address() if status == 'approved' else None,
+                    rejection_reason='Synthetic rejection' if status == 'rejected' else None,
+                )
+                for borrower in borrowers for _ in range(2)
+                for product in [rng.choice(products)]
+                for amount in [Decimal(rng.randrange(int(product.min_amount), int(product.max_amount)))]
+                for status in [rng.choice(statuses)]
+            ], batch_size=BATCH_SIZE))
+
+            loan_statuses = ['active'] * 6 + ['repaid'] * 3 + ['defaulted']
+            approved = [application for application in applications if application.status == 'approved']
+            loans = timed('loans', lambda: Loan.objects.bulk_create([
+                Loan(
+                    application=application, principal=application.amount,
+                    interest_rate=application.loan_product.interest_rate,
+                    total_due=(application.amount * (1 + application.loan_product.interest_rate / 100)).quantize(Decimal('0.01')),
+                    start_date=start, due_date=start + timedelta(days=application.duration_days),
+                    status=status, collateral_address=address(),
+                    collateral_value=application.amount * Decimal('1.5'),
+                )
+                for application in approved
+                for start in [now - timedelta(days=rng.randrange(0, application.duration_days))]
+                for status in [rng.choice(loan_statuses)]
+            ], batch_size=BATCH_SIZE))
+
+            installments = options['installments']
+
+            def build_repayments():
+                rows = []
+                for loan in loans:
+                    amount = (loan.total_due / installments).quantize(Decimal('0.01'))
+                    step = (loan.due_date - loan.start_date) / installments
+                    for k in range(1, installments + 1):
+                        due_date = loan.start_date + step * k
+                        paid = loan.status == 'repaid' or (due_date < now and rng.random() < 0.85)
+                        rows.append(Repayment(
+                            loan=loan, amount=amount, due_date=due_date,
+                            paid_at=min(due_date, now) if paid else None,
+                            tx_hash=f'{prefix}-tx-{loan.pk}-{k}' if paid else None,
+                            is_late=not paid and due_date < now,
+                        ))
+                return Repayment.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+            repayments = timed('repayments', build_repayments)
+
+            def schedule_unpaid():
+                unpaid = [repayment for repayment in repayments if repayment.paid_at is None]
+                # bulk_create skips Repayment.save, so put them on the time wheel here
+                schedule_repayments(unpaid)
+                return unpaid
+
+            timed('repayment events', schedule_unpaid)
+
+            pools = timed('pools', lambda: LenderPool.objects.bulk_create([
+                LenderPool(
+                    name=f'{prefix} pool {i}', pool_type='stablecoin' if i % 3 else 'native',
+                    description='Synthetic lender pool', token_address=address(),
+                    apy=Decimal(rng.randrange(200, 1500)) / 100, min_deposit=Decimal('10'),
+                    lock_period_days=rng.choice([0, 30, 90]),
+                )
+                for i in range(max(3, n // 500))
+            ]))
+
+            lenders = [user for user in users if user.is_lender]
+            deposits = timed('deposits', lambda: LenderDeposit.objects.bulk_create([
+                LenderDeposit(
+                    user=lender, pool=pool, amount=amount, shares=amount,
+                    deposit_tx_hash=f'{prefix}-deposit-{lender.pk}-{k}',
+                    unlocked_at=now + timedelta(days=pool.lock_period_days),
+                    withdrawn=rng.random() < 0.1,
+                )
+                for lender in lenders for k in range(2)
+                for pool in [rng.choice(pools)]
+                for amount in [Decimal(rng.randrange(100, 50000))]
+            ], batch_size=BATCH_SIZE))
+
+            allocations = timed('allocations', lambda: PoolAllocation.objects.bulk_create([
+                PoolAllocation(pool=rng.choice(pools), loan=loan, amount=loan.principal,
+                               allocation_tx_hash=f'{prefix}-allocation-{loan.pk}')
+                for loan in loans
+            ], batch_size=BATCH_SIZE))
+
+            # Keep pool totals consistent with what was deposited and lent out
+            for pool in pools:
+                total = sum((d.amount for d in deposits if d.pool_id == pool.pk and not d.withdrawn), Decimal('0'))
+                lent = sum((a.amount for a in allocations if a.pool_id == pool.pk), Decimal('0'))
+                LenderPool.objects.filter(pk=pool.pk).update(
+                    total_liquidity=total, available_liquidity=max(total - lent, Decimal('0'))
+                )
+
+        total_rows = sum(rows for rows, _ in timings.values())
+        total_seconds = sum(seconds for _, seconds in timings.values())
+        for name, (rows, seconds) in timings.items():
+            self.stdout.write(f"{name:<20} {rows:8d} rows  {seconds:7.2f}s  {rows / seconds if seconds else 0:10.0f} rows/s")
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {total_rows} rows in {total_seconds:.2f}s; log in as {users[0].username} / {options['password']}"
+        ))
+
+    def flush(self, prefix):
+        # Users cascade to wallets, KYC, applications, loans, repayments and deposits
+        with transaction.atomic():
+            PoolAllocation.objects.filter(allocation_tx_hash__startswith=f'{prefix}-').delete()
+            User.objects.filter(username__startswith=f'{prefix}-').delete()
+            LenderPool.objects.filter(name__startswith=f'{prefix} pool ').delete()
+            LoanProduct.objects.filter(name__startswith=f'{prefix} product ').delete()
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from getpass import getpass
+from ...models import User
+from ...utils.key_store import store_signing_key
+
+class Command(BaseCommand):
+    help = "Store a user's base58-encoded transaction signing key in the key store"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} not found")
+
+        # Read from the terminal so the key never lands in shell history
+        private_key = getpass('Signing key (base58): ').strip()
+        if not private_key:
+            raise CommandError('No key given')
+        store_signing_key(user.id, private_key)
+        self.stdout.write(self.style.SUCCESS(f"Signing key stored for {user.username}"))
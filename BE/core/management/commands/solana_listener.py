@@ -4,18 +4,27 @@ from solana.rpc.commitment import Confirmed
 import asyncio
 import json
 import logging
+import time
+from django.conf import settings
+from ...utils.anchor_events import events_from_logs
+from ...utils.metrics import LISTENER_EVENTS, LISTENER_LAG_SLOTS, LISTENER_LAST_EVENT
 from ...utils.solana_client import solana_client
 
 logger = logging.getLogger(__name__)
 
+# How often to ask the RPC node for the head slot when measuring lag
+HEAD_SLOT_INTERVAL = 5
+
 class Command(BaseCommand):
     help = 'Listen to Solana blockchain events'
 
     def handle(self, *args, **options):
+        self.head_slot = None
+        self.head_checked_at = 0.0
         asyncio.run(self.listen_to_events())
 
     async def listen_to_events(self):
-        ws_url = solana_client.client._provider.endpoint_uri.replace('https', 'wss')
+        ws_url = settings.SOLANA_WS_URL or solana_client.client._provider.endpoint_uri.replace('http', 'ws', 1)
         
         async with connect(ws_url) as websocket:
             # Subscribe to program logs for your program
@@ -28,33 +37,50 @@ class Command(BaseCommand):
                 if response[0].get('result'):
                     log = response[0]['result']['value']['logs']
                     self.process_logs(log)
+                    await self.record_lag(response[0]['result'].get('context', {}).get('slot'))
+
+    async def record_lag(self, slot):
+        """Export how far behind the chain head the last handled notification was"""
+        LISTENER_LAST_EVENT.set(time.time())
+        if slot is None:
+            return
+        if time.monotonic() - self.head_checked_at >= HEAD_SLOT_INTERVAL:
+            try:
+                response = await asyncio.to_thread(
+                    solana_client.client._provider.make_request, 'getSlot', {'commitment': 'confirmed'}
+                )
+                self.head_slot = response['result']
+            except Exception as e:
+                logger.error(f"Error fetching head slot: {e}")
+            self.head_checked_at = time.monotonic()
+        if self.head_slot is not None:
+            LISTENER_LAG_SLOTS.set(max(0, self.head_slot - slot))
 
     def process_logs(self, logs):
         """Process Solana program logs"""
-        # Parse logs to detect loan-related events
-        # This would be specific to your program's log format
-        for log in logs:
-            if 'LoanCreated' in log:
-                self.handle_loan_created(log)
-            elif 'RepaymentMade' in log:
-                self.handle_repayment_made(log)
-            elif 'CollateralLiquidated' in log:
-                self.handle_collateral_liquidated(log)
-
-    def handle_loan_created(self, log):
-        """Handle LoanCreated event"""
-        # Parse log to extract loan details
+        # The program emits Anchor events as "Program data: <base64>" lines
+        handlers = {
+            'LoanRequestedEvent': self.handle_loan_created,
+            'LoanRepaidEvent': self.handle_repayment_made,
+            'LoanLiquidatedEvent': self.handle_collateral_liquidated,
+        }
+        for name, event in events_from_logs(logs):
+            LISTENER_EVENTS.inc(event=name)
+            handler = handlers.get(name)
+            if handler:
+                handler(event)
+
+    def handle_loan_created(self, event):
+        """Handle LoanRequestedEvent"""
         # Update database accordingly
         pass
 
-    def handle_repayment_made(self, log):
-        """Handle RepaymentMade event"""
-        # Parse log to extract repayment details
+    def handle_repayment_made(self, event):
+        """Handle LoanRepaidEvent"""
         # Update database accordingly
         pass
 
-    def handle_collateral_liquidated(self, log):
-        """Handle CollateralLiquidated event"""
-        # Parse log to extract liquidation details
+    def handle_collateral_liquidated(self, event):
+        """Handle LoanLiquidatedEvent"""
         # Update database accordingly
-        pass
\ No newline at end of file
+        pass
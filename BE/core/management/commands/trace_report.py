@@ -0,0 +1,129 @@
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import json
+
+
+class SpanNode:
+    def __init__(self, record):
+        self.record = record
+        self.name = record['name']
+        self.start = record['start']
+        self.end = record['start'] + record['duration_ms'] / 1000
+        self.children = []
+
+    @property
+    def effective_end(self):
+        # Work handed off by this span (a queued task, an outbox submission) can outlive it
+        return max([self.end] + [child.effective_end for child in self.children])
+
+
+class Command(BaseCommand):
+    help = 'Summarise exported spans: the slowest traces, their span trees and critical paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None, help='Span file (defaults to TRACING_EXPORT_PATH)')
+        parser.add_argument('--trace', default=None, help='Show one trace by id')
+        parser.add_argument('--slowest', type=int, default=10, help='Number of slowest traces to list')
+        parser.add_argument('--name', default=None, help='Only traces whose root span name contains this text')
+        parser.add_argument('--tree', action='store_true', help='Print the span tree of every listed trace')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.TRACING_EXPORT_PATH
+        try:
+            traces = self.load(path)
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+        if options['trace']:
+            roots = traces.get(options['trace'])
+            if not roots:
+                raise CommandError(f"Trace {options['trace']} not found in {path}")
+            self.show(options['trace'], roots, tree=True)
+            return
+
+        ranked = []
+        for trace_id, roots in traces.items():
+            if options['name'] and not any(options['name'] in root.name for root in roots):
+                continue
+            start = min(root.start for root in roots)
+            end = max(root.effective_end for root in roots)
+            ranked.append((end - start, trace_id, roots))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        self.stdout.write(f"{len(ranked)} traces in {path}")
+
+        totals = defaultdict(float)
+        for _, trace_id, roots in ranked[:options['slowest']]:
+            for node, contribution in self.show(trace_id, roots, tree=options['tree']):
+                totals[node.name] += contribution
+        if totals:
+            self.stdout.write('\nCritical-path time by span name across these traces:')
+            for name, ms in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:15]:
+                self.stdout.write(f"  {ms:10.1f} ms  {name}")
+
+    def load(self, path):
+        """{trace id: [root SpanNode, ...]}; spans whose parent is not in the file count as roots"""
+        nodes = {}
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                nodes[record['span_id']] = SpanNode(record)
+
+        traces = defaultdict(list)
+        for node in nodes.values():
+            parent = nodes.get(node.record['parent_id'])
+            if parent is not None:
+                parent.children.append(node)
+            else:
+                traces[node.record['trace_id']].append(node)
+        return traces
+
+    def critical_path(self, node):
+        """[(node, ms on the critical path)] for the subtree under ``node``.
+
+        Walks back from the end of the subtree, each time taking the child
+        that finished last before the cursor; whatever no child covers is the
+        node's own time.
+        """
+        path, cursor, covered = [], node.effective_end, 0.0
+        for child in sorted(node.children, key=lambda child: child.effective_end, reverse=True):
+            if child.effective_end <= cursor + 1e-6:
+                path.extend(self.critical_path(child))
+                covered += child.effective_end - child.start
+                cursor = child.start
+        own = max(0.0, (node.effective_end - node.start) - covered)
+        return [(node, own * 1000)] + path
+
+    def show(self, trace_id, roots, tree=False):
+        start = min(root.start for root in roots)
+        end = max(root.effective_end for root in roots)
+        names = ', '.join(root.name for root in roots)
+        self.stdout.write(f"\n{trace_id}  {(end - start) * 1000:9.1f} ms  {names}")
+
+        path = []
+        for root in sorted(roots, key=lambda root: root.start):
+            path.extend(self.critical_path(root))
+        on_path = {id(node) for node, _ in path}
+
+        if tree:
+            for root in sorted(roots, key=lambda root: root.start):
+                self.print_tree(root, start, on_path)
+        self.stdout.write('  critical path:')
+        for node, contribution in sorted(path, key=lambda item: item[0].start):
+            if contribution >= 0.05:
+                self.stdout.write(f"    {contribution:9.1f} ms  {node.name}")
+        return path
+
+    def print_tree(self, node, trace_start, on_path, depth=0):
+        record = node.record
+        marker = '*' if id(node) in on_path else ' '
+        status = '' if record['status'] == 'ok' else f"  [{record['status']}]"
+        self.stdout.write(
+            f"  {marker} +{(node.start - trace_start) * 1000:8.1f} ms {record['duration_ms']:9.1f} ms  "
+            f"{'  ' * depth}{node.name}{status}"
+        )
+        for child in sorted(node.children, key=lambda child: child.start):
+            self.print_tree(child, trace_start, on_path, depth + 1)
@@ -0,0 +1,213 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+import contextvars
+import logging
+import random
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.backends.signals import connection_created
+from .utils import metrics, tracing
+from .utils.profiling import RequestProfiler, instrument_cache_backend
+
+logger = logging.getLogger(__name__)
+
+# Queries of the current request. Under ASGI the ORM runs on a worker thread
+# and not on the request's, and context variables follow the request there.
+_request_queries = contextvars.ContextVar('request_queries', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class AsyncCapableMiddleware:
+    """Base for middleware that runs natively under both WSGI and ASGI.
+
+    Django calls ``__call__`` in a WSGI deployment and ``__acall__`` in an
+    ASGI one. Sync-only middleware would move every ASGI request onto a
+    thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process(request)
+
+    def process(self, request):
+        raise NotImplementedError
+
+    async def __acall__(self, request):
+        raise NotImplementedError
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """Record latency and database queries per route for ``/metrics``"""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        connection_created.connect(_install_query_counter)
+        for connection in connections.all(initialized_only=True):
+            _install_query_counter(connection)
+
+    def process(self, request):
+        token = _request_queries.set([0])
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            queries = _request_queries.get()[0]
+            _request_queries.reset(token)
+        self._record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        token = _request_queries.set([0])
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            queries = _request_queries.get()[0]
+            _request_queries.reset(token)
+        self._record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    def _record(self, request, response, elapsed, queries):
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unmatched'
+        metrics.REQUEST_LATENCY.observe(elapsed, route=route, method=request.method, status=response.status_code)
+        metrics.REQUEST_QUERIES.observe(queries, route=route)
+        if queries:
+            metrics.DB_QUERIES.inc(queries, route=route)
+
+
+class TracingMiddleware(AsyncCapableMiddleware):
+    """Start a trace for each request, or continue the caller's from its ``traceparent`` header.
+
+    The trace id is returned in ``X-Trace-Id`` so a slow response can be
+    looked up with ``manage.py trace_report --trace <id>``.
+    """
+
+    def _span(self, request):
+        return tracing.span(
+            f'{request.method} {request.path}', parent=request.META.get('HTTP_TRACEPARENT'), root=True,
+            method=request.method, path=request.path,
+        )
+
+    def process(self, request):
+        with self._span(request) as request_span:
+            response = self.get_response(request)
+            self._finish(request, response, request_span)
+        return self._tag(response, request_span)
+
+    async def __acall__(self, request):
+        with self._span(request) as request_span:
+            response = await self.get_response(request)
+            self._finish(request, response, request_span)
+        return self._tag(response, request_span)
+
+    def _finish(self, request, response, request_span):
+        match = getattr(request, 'resolver_match', None)
+        request_span.set('route', match.view_name if match else 'unmatched')
+        request_span.set('status', response.status_code)
+        if response.status_code >= 500:
+            request_span.status = 'error'
+
+    def _tag(self, response, request_span):
+        if request_span.trace_id:
+            response['X-Trace-Id'] = request_span.trace_id
+        return response
+
+
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """Profile single requests on demand and store them as ``RequestProfile`` rows.
+
+    A staff user can ask for a profile by sending ``X-Profile: 1``. The
+    response then carries ``X-Profile-Id``, and the stacks can be downloaded
+    from the admin. ``PROFILING_SAMPLE_RATE`` also profiles a fraction of
+    staff requests. A profile keeps the request's path with its query string
+    and its SQL, so requests of other users are never profiled, sampled or
+    not. Requests that are not profiled pay one header lookup and, when
+    sampling is on, one random draw.
+
+    Stack sampling follows the request's thread, and an ASGI request has
+    none of its own, so requests are only profiled under WSGI.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.interval = getattr(settings, 'PROFILING_INTERVAL_MS', 5) / 1000
+        instrument_cache_backend(type(caches['default']))
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process(self, request):
+        if request.META.get('HTTP_X_PROFILE'):
+            trigger = 'header'
+        elif self.sample_rate and random.random() < self.sample_rate:
+            trigger = 'sample'
+        else:
+            return self.get_response(request)
+        user = self._staff_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        with RequestProfiler(interval=self.interval) as profiler:
+            response = self.get_response(request)
+
+        try:
+            profile = self._save(request, response, profiler, trigger, user)
+        except Exception as e:
+            logger.error(f"Error saving request profile for {request.path}: {e}")
+            return response
+        if trigger == 'header':
+            response['X-Profile-Id'] = str(profile.id)
+        return response
+
+    def _staff_user(self, request):
+        """The requesting user if they are staff, else None"""
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            # JWT users are authenticated here because DRF would otherwise
+            # only do it inside the view, leaving request.user anonymous
+            from rest_framework.exceptions import APIException
+            from .authentication import CachedJWTAuthentication
+
+            try:
+                result = CachedJWTAuthentication().authenticate(request)
+            except APIException:
+                return None
+            user = result[0] if result else None
+        return user if user is not None and user.is_staff else None
+
+    def _save(self, request, response, profiler, trigger, user):
+        from .models import RequestProfile
+
+        match = getattr(request, 'resolver_match', None)
+        return RequestProfile.objects.create(
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            view_name=match.view_name if match else None,
+            status_code=response.status_code,
+            user_id=user.pk,
+            trigger=trigger,
+            folded_stacks=profiler.folded_stacks(),
+            **profiler.summary(),
+        )
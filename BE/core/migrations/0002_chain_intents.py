@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChainIntent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('repayment', 'Repayment'), ('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('liquidation', 'Liquidation')], max_length=50)),
+                ('target_id', models.BigIntegerField()),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('submitted', 'Submitted'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('tx_hash', models.CharField(blank=True, max_length=255, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='chain_intents', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'chain_intents',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='chain_inten_status_435e24_idx'), models.Index(fields=['kind', 'target_id'], name='chain_inten_kind_c29808_idx')],
+            },
+        ),
+    ]
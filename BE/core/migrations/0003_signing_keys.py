@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:44
+
+import django.db.models.deletion
+import fernet_fields.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_private_keys(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    SigningKey = apps.get_model('core', 'SigningKey')
+    for user in User.objects.exclude(private_key__isnull=True).iterator():
+        if user.private_key:
+            SigningKey.objects.create(user=user, encrypted_key=user.private_key)
+
+
+def restore_private_keys(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    SigningKey = apps.get_model('core', 'SigningKey')
+    for signing_key in SigningKey.objects.iterator():
+        User.objects.filter(pk=signing_key.user_id).update(private_key=signing_key.encrypted_key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_chain_intents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SigningKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('encrypted_key', fernet_fields.fields.EncryptedCharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='signing_key', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'signing_keys',
+            },
+        ),
+        migrations.RunPython(move_private_keys, restore_private_keys),
+        migrations.RemoveField(
+            model_name='user',
+            name='private_key',
+        ),
+    ]
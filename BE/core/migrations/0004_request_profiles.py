@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_signing_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=2048)),
+                ('view_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('status_code', models.IntegerField()),
+                ('trigger', models.CharField(choices=[('header', 'Header'), ('sample', 'Sampled')], max_length=10)),
+                ('duration_ms', models.FloatField()),
+                ('cpu_samples', models.IntegerField(default=0)),
+                ('sql_count', models.IntegerField(default=0)),
+                ('sql_ms', models.FloatField(default=0)),
+                ('cache_calls', models.IntegerField(default=0)),
+                ('cache_ms', models.FloatField(default=0)),
+                ('rpc_calls', models.IntegerField(default=0)),
+                ('rpc_ms', models.FloatField(default=0)),
+                ('details', models.JSONField(default=dict)),
+                ('folded_stacks', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'request_profiles',
+                'indexes': [models.Index(fields=['created_at'], name='request_pro_created_48467a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_request_profiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chainintent',
+            name='traceparent',
+            field=models.CharField(blank=True, max_length=55, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_chain_intent_traceparent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chainintent',
+            name='kind',
+            field=models.CharField(choices=[('repayment', 'Repayment'), ('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('liquidation', 'Liquidation'), ('kyc_attestation', 'KYC Attestation')], max_length=50),
+        ),
+    ]
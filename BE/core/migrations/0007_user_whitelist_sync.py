@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0006_chain_intent_kyc_attestation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='whitelist_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='whitelisted_on_chain',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='chainintent',
+            name='kind',
+            field=models.CharField(choices=[('repayment', 'Repayment'), ('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('liquidation', 'Liquidation'), ('kyc_attestation', 'KYC Attestation'), ('whitelist_sync', 'Whitelist Sync')], max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(models.Q(('kyc_verified', True), ('whitelisted_on_chain', False)), models.Q(('kyc_verified', False), ('whitelisted_on_chain', True)), _connector='OR'), fields=['id'], name='users_whitelist_drift_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_user_email_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chainintent',
+            name='kind',
+            field=models.CharField(choices=[('repayment', 'Repayment'), ('repayment_batch', 'Repayment Batch'), ('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('liquidation', 'Liquidation'), ('kyc_attestation', 'KYC Attestation'), ('whitelist_sync', 'Whitelist Sync')], max_length=50),
+        ),
+    ]
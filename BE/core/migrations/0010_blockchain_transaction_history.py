@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:42
+
+from django.db import migrations, models
+
+
+def backfill_finalized_at(apps, schema_editor):
+    BlockchainTransaction = apps.get_model('core', 'BlockchainTransaction')
+    # A final row's last update was its status change
+    BlockchainTransaction.objects.filter(status__in=('confirmed', 'failed')).update(
+        finalized_at=models.F('updated_at'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_chain_intent_repayment_batch'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='blockchaintransaction',
+            name='blockchain__from_ad_5c42fe_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='blockchaintransaction',
+            name='blockchain__status_946598_idx',
+        ),
+        migrations.AddField(
+            model_name='blockchaintransaction',
+            name='finalized_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_finalized_at, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='blockchaintransaction',
+            name='updated_at',
+        ),
+        migrations.AlterField(
+            model_name='blockchaintransaction',
+            name='tx_hash',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='blockchaintransaction',
+            index=models.Index(fields=['from_address', 'created_at'], name='blockchain__from_ad_4bbd5a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blockchaintransaction',
+            index=models.Index(fields=['to_address', 'created_at'], name='blockchain__to_addr_3c9267_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blockchaintransaction',
+            index=models.Index(fields=['created_at'], name='blockchain__created_35199d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blockchaintransaction',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at'], name='blockchain_tx_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,111 @@
+"""Rebuild blockchain_transactions as a table partitioned by month on PostgreSQL.
+
+A partitioned table's primary key and unique constraints must include the
+partition key, so the key becomes (id, created_at) and tx_hash is no longer
+unique in the database. Django still treats id as the primary key, which
+the identity sequence keeps unique. Other databases keep the plain table
+and are a no-op here; core.tx_history archives them by deleting rows.
+"""
+from datetime import datetime, timezone
+from django.db import migrations
+
+TABLE = 'blockchain_transactions'
+PARTITIONS_AHEAD = 2
+
+COLUMNS = """
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    tx_hash varchar(255) NOT NULL,
+    status varchar(50) NOT NULL,
+    block_number bigint NULL,
+    from_address varchar(255) NOT NULL,
+    to_address varchar(255) NULL,
+    value numeric(36, 18) NULL,
+    gas_used bigint NULL,
+    created_at timestamp with time zone NOT NULL,
+    finalized_at timestamp with time zone NULL
+"""
+COLUMN_NAMES = 'id, tx_hash, status, block_number, from_address, to_address, value, gas_used, created_at, finalized_at'
+
+# The indexes of BlockchainTransaction.Meta, created on the parent and
+# inherited by every partition
+INDEXES = [
+    f'CREATE INDEX "blockchain__tx_hash_a4c925_idx" ON "{TABLE}" ("tx_hash")',
+    f'CREATE INDEX "blockchain__from_ad_4bbd5a_idx" ON "{TABLE}" ("from_address", "created_at")',
+    f'CREATE INDEX "blockchain__to_addr_3c9267_idx" ON "{TABLE}" ("to_address", "created_at")',
+    f'CREATE INDEX "blockchain__created_35199d_idx" ON "{TABLE}" ("created_at")',
+    f'CREATE INDEX "blockchain_tx_pending_idx" ON "{TABLE}" ("created_at") WHERE "status" = \'pending\'',
+]
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _copy_into_new_table(schema_editor, create_sql, after_create=()):
+    schema_editor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{TABLE}_old"')
+    # Free the primary key and sequence names for the new table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'", [f'{TABLE}_old']
+        )
+        constraints = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [f'{TABLE}_old'])
+        sequence = cursor.fetchone()[0]
+    for name in constraints:
+        schema_editor.execute(f'ALTER TABLE "{TABLE}_old" RENAME CONSTRAINT "{name}" TO "{TABLE}_old_pkey"')
+    if sequence:
+        schema_editor.execute(f'ALTER SEQUENCE {sequence} RENAME TO "{TABLE}_old_id_seq"')
+    schema_editor.execute(create_sql)
+    for sql in after_create:
+        schema_editor.execute(sql)
+    schema_editor.execute(f'INSERT INTO "{TABLE}" ({COLUMN_NAMES}) SELECT {COLUMN_NAMES} FROM "{TABLE}_old"')
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('\"{TABLE}\"', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM \"{TABLE}\""
+    )
+    schema_editor.execute(f'DROP TABLE "{TABLE}_old"')
+    for sql in INDEXES:
+        schema_editor.execute(sql)
+
+
+def partition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(created_at) FROM "{TABLE}"')
+        oldest = cursor.fetchone()[0]
+
+    current = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month = current
+    if oldest is not None:
+        month = min(current, oldest.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0))
+    partitions = []
+    while month <= _add_months(current, PARTITIONS_AHEAD):
+        partitions.append(
+            f'CREATE TABLE "{TABLE}_p{month:%Y%m}" PARTITION OF "{TABLE}" '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        month = _add_months(month, 1)
+
+    _copy_into_new_table(
+        schema_editor,
+        f'CREATE TABLE "{TABLE}" ({COLUMNS}, PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)',
+        partitions,
+    )
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    _copy_into_new_table(schema_editor, f'CREATE TABLE "{TABLE}" ({COLUMNS}, PRIMARY KEY (id))')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_blockchain_transaction_history'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_partition_blockchain_transactions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chainintent',
+            name='last_valid_block_height',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chainintent',
+            name='signed_transaction',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='chainintent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('confirming', 'Confirming'), ('submitted', 'Submitted'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,47 @@
+"""Give the partitioned blockchain_transactions a DEFAULT partition on PostgreSQL.
+
+Without it, an insert dated in a month that has no partition (the daily
+task stopped, or a month already archived) fails. core.tx_history moves
+such rows into their month's partition when it next creates partitions.
+"""
+from django.db import migrations
+
+TABLE = 'blockchain_transactions'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def _is_partitioned(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def add_default_partition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql' or not _is_partitioned(schema_editor.connection):
+        return
+    schema_editor.execute(f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+
+
+def remove_default_partition(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql' or not _is_partitioned(schema_editor.connection):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}")')
+        if cursor.fetchone()[0]:
+            raise RuntimeError(
+                f'{DEFAULT_PARTITION} holds rows; run manage.py archive_transactions to move them into monthly '
+                f'partitions first'
+            )
+    schema_editor.execute(f'DROP TABLE "{DEFAULT_PARTITION}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_chain_intent_confirmation'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_default_partition, remove_default_partition),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from fernet_fields import EncryptedCharField, EncryptedTextField 
 
@@ -7,24 +8,58 @@ from fernet_fields import EncryptedCharField, EncryptedTextField
 
 class User(AbstractUser):
     wallet_address = models.CharField(max_length=255, unique=True)
-    private_key = EncryptedCharField(max_length=255, null=True, blank=True)
     is_borrower = models.BooleanField(default=False)
     is_lender = models.BooleanField(default=False)
     kyc_verified = models.BooleanField(default=False)
     kyc_verified_at = models.DateTimeField(null=True, blank=True)
     credit_score = models.IntegerField(null=True, blank=True)
+    # Whitelist state last recorded for wallet_address on chain; kyc.whitelist
+    # syncs users where this differs from kyc_verified
+    whitelisted_on_chain = models.BooleanField(default=False)
+    whitelist_synced_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'users'
+        indexes = [
+            # Admin searches match email by prefix
+            models.Index(fields=['email']),
+            models.Index(
+                fields=['id'],
+                condition=models.Q(kyc_verified=True, whitelisted_on_chain=False) |
+                models.Q(kyc_verified=False, whitelisted_on_chain=True),
+                name='users_whitelist_drift_idx',
+            ),
+        ]
 
     def save(self, *args, **kwargs):
-        # Ensure private key is encrypted before saving
-        if self.private_key:
-            # The encryption is handled automatically by django-cryptography
-            pass
         super().save(*args, **kwargs)
+        # Drop cached copies used by CachedJWTAuthentication
+        from .authentication import invalidate_cached_user
+        invalidate_cached_user(self.pk)
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        from .authentication import invalidate_cached_user
+        invalidate_cached_user(user_id)
+        return result
+
+class SigningKey(models.Model):
+    """A user's transaction signing key, kept off the ``users`` row.
+
+    Authentication loads ``User`` on every request; keeping the encrypted key
+    in its own table means it is only read and decrypted on the signing path.
+    Access goes through ``core.utils.key_store``.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='signing_key')
+    encrypted_key = EncryptedCharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'signing_keys'
 
 class Wallet(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='wallets')
@@ -36,7 +71,18 @@ class Wallet(models.Model):
         db_table = 'wallets'
 
 class BlockchainTransaction(models.Model):
-    tx_hash = models.CharField(max_length=255, unique=True)
+    """Transaction history; append-only once a row is confirmed or failed.
+
+    A row changes once, from pending to its final status (see
+    ``core.tx_history.finalize``); saving a final row raises. On PostgreSQL
+    the table is partitioned by month of ``created_at`` and old months are
+    moved to columnar archive files, so the hot table stays a few months deep.
+    """
+    FINAL_STATUSES = ('confirmed', 'failed')
+
+    # Unique per month partition only on PostgreSQL, so uniqueness is left to
+    # core.tx_history.record_pending
+    tx_hash = models.CharField(max_length=255)
     status = models.CharField(max_length=50, choices=[
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
@@ -48,12 +94,109 @@ class BlockchainTransaction(models.Model):
     value = models.DecimalField(max_digits=36, decimal_places=18, null=True, blank=True)
     gas_used = models.BigIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    finalized_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         db_table = 'blockchain_transactions'
         indexes = [
             models.Index(fields=['tx_hash']),
-            models.Index(fields=['from_address']),
-            models.Index(fields=['status']),
-        ]
\ No newline at end of file
+            models.Index(fields=['from_address', 'created_at']),
+            models.Index(fields=['to_address', 'created_at']),
+            models.Index(fields=['created_at']),
+            # Pending rows are few; the archive job checks a month has none left
+            models.Index(
+                fields=['created_at'], condition=models.Q(status='pending'),
+                name='blockchain_tx_pending_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded_status = getattr(self, '_loaded_status', None)
+        if loaded_status in self.FINAL_STATUSES:
+            raise ValueError(f"Transaction {self.tx_hash} is {loaded_status} and can no longer change")
+        if self.status in self.FINAL_STATUSES and self.finalized_at is None:
+            self.finalized_at = timezone.now()
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
+
+class ChainIntent(models.Model):
+    """Outbox row for an on-chain submission, committed with the DB change that needs it"""
+    KIND_CHOICES = (
+        ('repayment', 'Repayment'),
+        ('repayment_batch', 'Repayment Batch'),
+        ('deposit', 'Deposit'),
+        ('withdrawal', 'Withdrawal'),
+        ('liquidation', 'Liquidation'),
+        ('kyc_attestation', 'KYC Attestation'),
+        ('whitelist_sync', 'Whitelist Sync'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('confirming', 'Confirming'),
+        ('submitted', 'Submitted'),
+        ('failed', 'Failed'),
+    )
+    OPEN_STATUSES = ('pending', 'processing', 'confirming')
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    target_id = models.BigIntegerField()  # id of the repayment/deposit/loan the intent acts on
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='chain_intents')
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    tx_hash = models.CharField(max_length=255, null=True, blank=True)
+    # The signed transaction behind tx_hash, re-sent as is until its blockhash expires
+    signed_transaction = models.TextField(null=True, blank=True)
+    last_valid_block_height = models.BigIntegerField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    traceparent = models.CharField(max_length=55, null=True, blank=True)  # trace of the request that enqueued it
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'chain_intents'
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+            models.Index(fields=['kind', 'target_id']),
+        ]
+
+class RequestProfile(models.Model):
+    """One profiled request: timings plus sampled stacks in folded (flamegraph) format"""
+    TRIGGER_CHOICES = (
+        ('header', 'Header'),
+        ('sample', 'Sampled'),
+    )
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    view_name = models.CharField(max_length=255, null=True, blank=True)
+    status_code = models.IntegerField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='request_profiles')
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+    duration_ms = models.FloatField()
+    cpu_samples = models.IntegerField(default=0)
+    sql_count = models.IntegerField(default=0)
+    sql_ms = models.FloatField(default=0)
+    cache_calls = models.IntegerField(default=0)
+    cache_ms = models.FloatField(default=0)
+    rpc_calls = models.IntegerField(default=0)
+    rpc_ms = models.FloatField(default=0)
+    details = models.JSONField(default=dict)  # slowest queries, RPC methods, sampling interval
+    folded_stacks = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'request_profiles'
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
@@ -0,0 +1,295 @@
+"""Transactional outbox for on-chain submissions.
+
+Views and tasks never talk to Solana directly. Inside the same database
+transaction as their own writes they call ``enqueue_intent``, which stores a
+``ChainIntent`` row, and return straight away. The dispatcher
+(``manage.py dispatch_chain_intents`` or the ``dispatch_chain_intents`` task)
+claims pending intents in batches, submits them concurrently and writes the
+results back through the handler registered for the intent's kind.
+
+A sent transaction is not booked until it is confirmed. ``sign_and_send``
+stores the signed transaction and the last block height its blockhash is
+valid for before sending, and the intent waits in ``confirming``. Each poll
+looks the signature up: once it is confirmed the handler's ``complete``
+runs, and an on-chain error fails the intent. While it is unknown and the
+chain has not passed that height, the same transaction is sent again, so
+it can land at most once. Only after the height has passed is the intent
+retried with a newly signed transaction.
+
+Each signed transaction is also recorded pending in the transaction
+history (``core.tx_history``) and finalized with the intent's outcome:
+confirmed, failed on chain, or failed once it expired without landing.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+import base58
+import base64
+import logging
+
+from . import tx_history
+from .models import ChainIntent
+from .utils.tracing import current_traceparent, span
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+LEASE_SECONDS = 120
+RETRY_BACKOFF_SECONDS = 15
+CONFIRM_POLL_SECONDS = 2
+CONFIRMED_STATUSES = ('confirmed', 'finalized')
+
+# Outcomes of one dispatch of an intent
+CONFIRMED = 'confirmed'  # landed without error at CONFIRMED_STATUSES
+SENT = 'sent'  # sent, or re-sent, and not confirmed yet
+EXPIRED = 'expired'  # never landed and can no longer; a new transaction may be built
+FAILED = 'failed'  # landed with an error
+ERROR = 'error'  # the attempt raised
+
+_handlers = {}
+
+
+class IntentHandler:
+    """Base class for outbox handlers.
+
+    ``submit`` runs on a dispatcher thread outside any database transaction
+    and returns the transaction signature. ``complete`` and ``fail`` run
+    inside the transaction that records the outcome on the intent;
+    ``complete`` only once the transaction is confirmed, unless ``confirm``
+    is False because ``submit`` returns no real signature.
+    """
+    kind = None
+    confirm = True
+
+    def submit(self, intent):
+        raise NotImplementedError
+
+    def complete(self, intent):
+        pass
+
+    def fail(self, intent):
+        pass
+
+
+def register_handler(handler_class):
+    """Class decorator registering a handler for its ``kind``"""
+    _handlers[handler_class.kind] = handler_class()
+    return handler_class
+
+
+def get_handler(kind):
+    return _handlers[kind]
+
+
+def enqueue_intent(kind, target_id, user=None, payload=None):
+    """Record an on-chain submission to be made once the caller's transaction commits.
+
+    Must be called inside the caller's ``transaction.atomic()`` block so the
+    intent and the caller's own writes commit or roll back together.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"No outbox handler registered for '{kind}'")
+    return ChainIntent.objects.create(
+        kind=kind,
+        target_id=target_id,
+        user=user,
+        payload=payload or {},
+        traceparent=current_traceparent(),
+    )
+
+
+def has_open_intent(kind, target_id):
+    return ChainIntent.objects.filter(
+        kind=kind, target_id=target_id, status__in=ChainIntent.OPEN_STATUSES
+    ).exists()
+
+
+def sign_and_send(intent, client, txn, *signers, recent_blockhash=None, last_valid_block_height=None):
+    """Sign ``txn``, persist it on the intent, then send it.
+
+    The signature, the signed transaction and the blockhash's last valid
+    block height are stored before the transaction leaves the process, so
+    if the dispatcher dies mid-send the next run can look the signature up
+    and re-send the same transaction instead of paying twice.
+    """
+    if recent_blockhash is None:
+        from .utils.solana_client import solana_client
+        recent_blockhash, last_valid_block_height = solana_client.blockhash_provider.latest()
+    txn.recent_blockhash = recent_blockhash
+    txn.sign(*signers)
+    signature = base58.b58encode(txn.signature()).decode()
+    wire = txn.serialize()
+    intent.tx_hash = signature
+    intent.signed_transaction = base64.b64encode(wire).decode()
+    intent.last_valid_block_height = last_valid_block_height
+    with transaction.atomic():
+        ChainIntent.objects.filter(pk=intent.pk).update(
+            tx_hash=intent.tx_hash,
+            signed_transaction=intent.signed_transaction,
+            last_valid_block_height=intent.last_valid_block_height,
+            updated_at=timezone.now(),
+        )
+        tx_history.record_pending(signature, str(txn.signatures[0].pubkey))
+
+    result = client.send_raw_transaction(wire)
+    if not result or 'result' not in result:
+        error_msg = result.get('error', {}).get('message', 'Transaction failed') if result else 'Transaction failed'
+        raise RuntimeError(error_msg)
+    return result['result']
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        intents = list(
+            ChainIntent.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status__in=('pending', 'confirming'), available_at__lte=now) |
+                Q(status='processing', lease_expires_at__lt=now)
+            )
+            .order_by('id')[:batch_size]
+        )
+        if intents:
+            ChainIntent.objects.filter(pk__in=[intent.pk for intent in intents]).update(
+                status='processing',
+                lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+                # Waiting for a confirmation is not a new attempt
+                attempts=Case(When(status='confirming', then=F('attempts')), default=F('attempts') + 1),
+                updated_at=now,
+            )
+    return intents
+
+
+def _signature_status(client, signature):
+    # Searching the history finds a signature that has left the recent status cache
+    result = client.get_signature_statuses([signature], search_transaction_history=True)
+    statuses = (result or {}).get('result', {}).get('value') or [None]
+    return statuses[0]
+
+
+def _check_sent(intent, solana_client):
+    """Outcome of the transaction an earlier attempt signed and sent"""
+    provider = solana_client.blockhash_provider
+    if intent.last_valid_block_height is None:
+        # Signed with a blockhash no newer than the current one, so it cannot outlive it
+        intent.last_valid_block_height = provider.latest()[1]
+        ChainIntent.objects.filter(pk=intent.pk).update(last_valid_block_height=intent.last_valid_block_height)
+    # The height is read before the status: a transaction not found after the
+    # chain passed its last valid height can no longer land
+    expired = provider.block_height() > intent.last_valid_block_height
+
+    status = _signature_status(solana_client.client, intent.tx_hash)
+    if status is not None:
+        if status.get('err') is not None:
+            return FAILED, f"Transaction failed on chain: {status['err']}"
+        if status.get('confirmationStatus') in CONFIRMED_STATUSES:
+            return CONFIRMED, None
+        return SENT, None
+    if expired:
+        return EXPIRED, f"Transaction {intent.tx_hash} expired without landing"
+    if intent.signed_transaction:
+        try:
+            solana_client.client.send_raw_transaction(base64.b64decode(intent.signed_transaction))
+        except Exception as e:
+            # Already processed, or the node still rejects it; the next poll decides
+            logger.warning(f"Error re-sending {intent.kind} intent {intent.id}: {e}")
+    return SENT, None
+
+
+def _submit(intent, parent=None):
+    """Dispatch one intent; returns ``(outcome, tx_hash, error)``"""
+    from .utils.solana_client import solana_client
+
+    # Continue the trace of the request that enqueued the intent, so its
+    # submission shows up under that request
+    with span(
+        f'outbox.submit {intent.kind}', parent=intent.traceparent or parent, root=True,
+        intent_id=intent.id, attempt=intent.attempts,
+    ) as submit_span:
+        try:
+            handler = get_handler(intent.kind)
+            # A previous attempt that timed out or lost its lease may already have landed
+            if intent.tx_hash and handler.confirm:
+                outcome, error = _check_sent(intent, solana_client)
+            else:
+                outcome, error = (SENT if handler.confirm else CONFIRMED), None
+                intent.tx_hash = handler.submit(intent)
+            submit_span.set('outcome', outcome)
+            return outcome, intent.tx_hash, error
+        except Exception as e:
+            logger.error(f"Error submitting {intent.kind} intent {intent.id}: {e}")
+            submit_span.status = 'error'
+            submit_span.set('error', str(e)[:500])
+            return ERROR, None, str(e)
+        finally:
+            connection.close()
+
+
+def _record_result(intent, outcome, tx_hash, error):
+    with span(f'outbox.record {intent.kind}', parent=intent.traceparent, intent_id=intent.id, outcome=outcome):
+        handler = get_handler(intent.kind)
+        now = timezone.now()
+        with transaction.atomic():
+            intent = ChainIntent.objects.select_for_update().get(pk=intent.pk)
+            if tx_hash:
+                intent.tx_hash = tx_hash
+            if handler.confirm and outcome in (CONFIRMED, FAILED, EXPIRED):
+                tx_history.finalize(intent.tx_hash, 'confirmed' if outcome == CONFIRMED else 'failed')
+            if outcome == EXPIRED:
+                intent.tx_hash = intent.signed_transaction = intent.last_valid_block_height = None
+
+            if outcome == CONFIRMED:
+                intent.status = 'submitted'
+                intent.signed_transaction = None
+                intent.error = None
+                intent.completed_at = now
+                handler.complete(intent)
+            elif outcome == FAILED:
+                intent.status = 'failed'
+                intent.error = error
+                intent.completed_at = now
+                handler.fail(intent)
+            elif outcome == SENT or (intent.tx_hash and handler.confirm):
+                # Once a transaction is signed only the chain decides: it lands or expires
+                intent.status = 'confirming'
+                intent.error = error
+                delay = CONFIRM_POLL_SECONDS if outcome == SENT else RETRY_BACKOFF_SECONDS
+                intent.available_at = now + timedelta(seconds=delay)
+            elif intent.attempts < MAX_ATTEMPTS:
+                intent.status = 'pending'
+                intent.error = error
+                intent.available_at = now + timedelta(seconds=RETRY_BACKOFF_SECONDS * intent.attempts)
+            else:
+                intent.status = 'failed'
+                intent.error = error
+                intent.completed_at = now
+                handler.fail(intent)
+            intent.lease_expires_at = None
+            intent.save()
+
+
+def dispatch_batch(batch_size=50, max_workers=8):
+    """Claim up to ``batch_size`` intents, submit them concurrently and record results.
+
+    Returns the number of intents processed.
+    """
+    close_old_connections()
+    intents = _claim_batch(batch_size)
+    if not intents:
+        return 0
+
+    with span('outbox.dispatch_batch', root=True, intents=len(intents)):
+        # Executor threads do not inherit the context; hand them the batch's span explicitly
+        submit = partial(_submit, parent=current_traceparent())
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(submit, intents))
+
+        for intent, (outcome, tx_hash, error) in zip(intents, results):
+            try:
+                _record_result(intent, outcome, tx_hash, error)
+            except Exception as e:
+                logger.error(f"Error recording result for intent {intent.id}: {e}")
+    return len(intents)
@@ -0,0 +1,14 @@
+from rest_framework import serializers
+from .models import ChainIntent
+
+class ChainIntentSerializer(serializers.ModelSerializer):
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = ChainIntent
+        fields = [
+            'id', 'kind', 'kind_display', 'target_id', 'status', 'status_display',
+            'tx_hash', 'error', 'attempts', 'completed_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
@@ -1,3 +1,690 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+import io
+import json
+import os
+import tempfile
+import time
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from solana.keypair import Keypair
+from solana.publickey import PublicKey
+from solana.rpc.api import Client
+from solana.system_program import TransferParams, transfer
+from solana.transaction import Transaction
+
+from lenders.models import LenderDeposit, LenderPool
+from . import tx_history
+from .authentication import CachedJWTAuthentication, _version_key
+from .models import BlockchainTransaction, ChainIntent, RequestProfile, User
+from .outbox import IntentHandler, dispatch_batch, enqueue_intent, register_handler, sign_and_send
+from .utils import columnar, metrics, profiling, tracing
+from .utils.admin import EstimatedCountPaginator, LargeTableAdmin, _prefix_upper_bound
+from .utils.blockhash import SECONDS_PER_BLOCK, BlockhashProvider
+from .utils.mock_rpc import MockChain, MockRPCServer
+from .utils.rate_limit import RateLimiterStats, TokenBucket
+from .utils.rpc_provider import SolanaRPCProvider
+from .utils.rpc_router import Endpoint, EndpointRouter
+from .utils.solana_client import solana_client
+
+PAYER = Keypair.from_seed(bytes(range(32)))
+
+
+@register_handler
+class TransferIntentHandler(IntentHandler):
+    """Sends ``target_id`` lamports from ``PAYER``; records which intents completed or failed"""
+    kind = 'test_transfer'
+    completed = []
+    failed = []
+
+    def submit(self, intent):
+        txn = Transaction()
+        txn.add(transfer(TransferParams(
+            from_pubkey=PAYER.public_key, to_pubkey=PublicKey(2), lamports=intent.target_id,
+        )))
+        return sign_and_send(intent, solana_client.client, txn, PAYER)
+
+    def complete(self, intent):
+        self.completed.append((intent.id, intent.tx_hash))
+
+    def fail(self, intent):
+        self.failed.append(intent.id)
+
+
+class ManualChain(MockChain):
+    """A chain whose height only moves when told to; sends can be dropped or made to fail"""
+
+    def __init__(self):
+        super().__init__(slot_seconds=0)
+        self.height = self.BASE_SLOT
+        self.drop = False
+        self.error = None
+        self.sent = []
+
+    def slot(self):
+        return self.height
+
+    def land(self, signature, logs=None, err=None):
+        self.sent.append(signature)
+        if self.drop:
+            return self.height
+        return super().land(signature, logs, err or self.error)
+
+
+@mock.patch('core.outbox.CONFIRM_POLL_SECONDS', 0)
+@mock.patch('core.outbox.RETRY_BACKOFF_SECONDS', 0)
+class OutboxConfirmationTests(TransactionTestCase):
+    def setUp(self):
+        self.chain = ManualChain()
+        self.server = MockRPCServer(chain=self.chain)
+        self.server.start()
+        client = Client(self.server.url)
+        client._provider = SolanaRPCProvider(self.server.url, endpoints=[self.server.url])
+        # Refreshed by hand, so the block height the outbox sees is the one the test set
+        provider = BlockhashProvider(client, refresh_interval=3600)
+        patcher = mock.patch.multiple(solana_client, client=client, blockhash_provider=provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(provider.stop)
+        self.addCleanup(self.server.stop)
+        TransferIntentHandler.completed.clear()
+        TransferIntentHandler.failed.clear()
+
+    def advance(self, blocks):
+        self.chain.height += blocks
+        solana_client.blockhash_provider.refresh()
+
+    def dispatch(self, intent):
+        dispatch_batch(max_workers=1)
+        intent.refresh_from_db()
+        return intent
+
+    def history(self):
+        return dict(BlockchainTransaction.objects.values_list('tx_hash', 'status'))
+
+    def test_completes_only_once_confirmed(self):
+        intent = self.dispatch(enqueue_intent('test_transfer', 1000))
+        self.assertEqual(intent.status, 'confirming')
+        self.assertEqual(TransferIntentHandler.completed, [])
+        self.assertEqual(self.history(), {intent.tx_hash: 'pending'})
+        self.assertEqual(BlockchainTransaction.objects.get().from_address, str(PAYER.public_key))
+
+        # Processed in the current slot, confirmed once another passes
+        intent = self.dispatch(intent)
+        self.assertEqual(intent.status, 'confirming')
+        self.advance(1)
+        intent = self.dispatch(intent)
+        self.assertEqual(intent.status, 'submitted')
+        self.assertEqual(TransferIntentHandler.completed, [(intent.id, self.chain.sent[0])])
+        self.assertEqual(self.history(), {intent.tx_hash: 'confirmed'})
+
+    def test_resends_the_same_transaction_until_it_expires(self):
+        self.chain.drop = True
+        intent = self.dispatch(enqueue_intent('test_transfer', 1000))
+        signature = intent.tx_hash
+        self.advance(10)
+        intent = self.dispatch(intent)
+        self.assertEqual(intent.status, 'confirming')
+        self.assertEqual(self.chain.sent, [signature, signature])
+
+        self.chain.drop = False
+        self.dispatch(intent)
+        self.advance(1)
+        intent = self.dispatch(intent)
+        self.assertEqual(intent.status, 'submitted')
+        self.assertEqual(set(self.chain.sent), {signature})
+        self.assertEqual(TransferIntentHandler.completed, [(intent.id, signature)])
+        self.assertEqual(intent.attempts, 1)
+
+    def test_signs_a_new_transaction_once_the_blockhash_expired(self):
+        self.chain.drop = True
+        intent = self.dispatch(enqueue_intent('test_transfer', 1000))
+        expired = intent.tx_hash
+        self.advance(intent.last_valid_block_height - self.chain.height + 1)
+        intent = self.dispatch(intent)
+        self.assertEqual(intent.status, 'pending')
+        self.assertIsNone(intent.tx_hash)
+        self.assertEqual(self.chain.sent, [expired])
+
+        self.chain.drop = False
+        intent = self.dispatch(intent)
+        self.assertNotEqual(intent.tx_hash, expired)
+        self.advance(1)
+        intent = self.dispatch(intent)
+        self.assertEqual(intent.status, 'submitted')
+        self.assertEqual(intent.attempts, 2)
+        self.assertEqual(TransferIntentHandler.completed, [(intent.id, self.chain.sent[-1])])
+        self.assertEqual(self.history(), {expired: 'failed', intent.tx_hash: 'confirmed'})
+
+    def test_fails_a_transaction_that_landed_with_an_error(self):
+        self.chain.error = {'InstructionError': [0, {'Custom': 1}]}
+        intent = self.dispatch(enqueue_intent('test_transfer', 1000))
+        intent = self.dispatch(intent)
+        self.assertEqual(intent.status, 'failed')
+        self.assertIn('InstructionError', intent.error)
+        self.assertEqual(TransferIntentHandler.completed, [])
+        self.assertEqual(TransferIntentHandler.failed, [intent.id])
+        self.assertEqual(self.history(), {intent.tx_hash: 'failed'})
+
+
+class FakeBlockhashRPC:
+    """Answers the provider's two RPC calls from a block height the test sets"""
+
+    def __init__(self):
+        self.height = 1000
+        self.calls = 0
+
+    def make_request(self, method, params):
+        self.calls += 1
+        if method == 'getLatestBlockhash':
+            return {'result': {'value': {'blockhash': f'hash-{self.height}', 'lastValidBlockHeight': self.height + 150}}}
+        return {'result': self.height}
+
+
+class BlockhashProviderTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.enterContext(mock.patch('core.utils.blockhash.time.monotonic', side_effect=lambda: self.now))
+        self.rpc = FakeBlockhashRPC()
+        self.provider = BlockhashProvider(mock.Mock(_provider=self.rpc), refresh_interval=3600)
+        self.addCleanup(self.provider.stop)
+
+    def test_serves_from_memory_and_counts_saved_calls(self):
+        self.assertEqual(self.provider.latest(), ('hash-1000', 1150))
+        for _ in range(5):
+            self.assertEqual(self.provider.get(), 'hash-1000')
+        self.assertEqual((self.provider.rpc_fetches, self.rpc.calls), (1, 2))
+        self.assertEqual(self.provider.saved_per_minute(), 5)
+        self.assertEqual(self.provider.stats()['saved_calls_last_minute'], 5)
+
+        self.now += 20
+        self.provider.get()
+        self.now += 41
+        # The first five were served more than a minute ago
+        self.assertEqual(self.provider.saved_per_minute(), 1)
+
+    def test_refreshes_before_the_blockhash_expires(self):
+        self.provider.get()
+        # 70 blocks later 80 remain, more than the 75-block margin
+        self.now += 70 * SECONDS_PER_BLOCK
+        self.rpc.height += 70
+        self.assertEqual(self.provider.get(), 'hash-1000')
+        self.assertEqual(self.provider.stats()['remaining_blocks'], 80)
+
+        # Ten more and the refresher has not run: the next call fetches inline
+        self.now += 10 * SECONDS_PER_BLOCK
+        self.rpc.height += 10
+        self.assertEqual(self.provider.latest(), ('hash-1080', 1230))
+        self.assertEqual((self.provider.rpc_fetches, self.provider.block_height()), (2, 1080))
+
+    def test_block_height_is_the_observed_one(self):
+        self.assertEqual(self.provider.block_height(), 1000)
+        self.now += 100 * SECONDS_PER_BLOCK
+        # It never runs ahead of what the chain reported
+        self.assertEqual(self.provider.block_height(), 1000)
+        self.provider.refresh()
+        self.assertEqual(self.provider.block_height(), 1000)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='borrower', wallet_address='wallet')
+        self.token = AccessToken.for_user(self.user)
+        self.authentication = CachedJWTAuthentication()
+
+    def shared_cache(self):
+        # A file-based cache is shared by every process on the host, like Redis
+        return override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': self.enterContext(tempfile.TemporaryDirectory()),
+        }})
+
+    def test_per_process_cache_is_not_used(self):
+        self.authentication.get_user(self.token)
+        # Changed without save(), as another process's invalidation would not reach this one
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.assertTrue(self.authentication.get_user(self.token).is_staff)
+
+    def test_shared_cache_serves_until_saved(self):
+        with self.shared_cache():
+            self.authentication.get_user(self.token)
+            User.objects.filter(pk=self.user.pk).update(is_staff=True)
+            with self.assertNumQueries(0):
+                self.assertFalse(self.authentication.get_user(self.token).is_staff)
+            self.user.refresh_from_db()
+            self.user.save()
+            self.assertTrue(self.authentication.get_user(self.token).is_staff)
+
+    def test_evicted_version_is_not_reused(self):
+        with self.shared_cache():
+            self.authentication.get_user(self.token)
+            first = cache.get(_version_key(self.user.pk))
+            self.user.is_staff = True
+            self.user.save()
+            cache.delete(_version_key(self.user.pk))
+            self.assertTrue(self.authentication.get_user(self.token).is_staff)
+            self.assertGreater(cache.get(_version_key(self.user.pk)), first + 1)
+
+
+class TokenBucketTests(TestCase):
+    def test_counts_tokens_across_bucket_instances(self):
+        # Two instances stand in for two processes sharing the cache
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': self.enterContext(tempfile.TemporaryDirectory()),
+        }}):
+            first, second = TokenBucket('test', rate=1, capacity=3), TokenBucket('test', rate=1, capacity=3)
+            with mock.patch('core.utils.rate_limit.time.time', return_value=3000.5):
+                waits = [first.try_take(), second.try_take(), first.try_take(), second.try_take()]
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertAlmostEqual(waits[3], 2.5)
+
+    def test_throttling_is_exported(self):
+        RateLimiterStats().record('heavy', 0.25)
+        exposition = metrics.render()
+        self.assertIn('credlend_solana_rpc_throttled_total{rpc_class="heavy"}', exposition)
+        self.assertIn('credlend_solana_rpc_rate_limit_wait_seconds_total{rpc_class="heavy"}', exposition)
+
+
+class EndpointRouterTests(SimpleTestCase):
+    def servers(self, *latencies):
+        servers = [MockRPCServer(latency=latency, seed=index) for index, latency in enumerate(latencies)]
+        for server in servers:
+            server.start()
+            self.addCleanup(server.stop)
+        return servers
+
+    def test_routes_to_the_fastest_endpoint(self):
+        slow, fast, slower = self.servers(0.03, 0.0, 0.06)
+        router = EndpointRouter([slow.url, fast.url, slower.url])
+        for _ in range(30):
+            router.request('getSlot', ())
+        # Each endpoint is measured once, then the fastest serves everything
+        self.assertEqual((slow.requests, slower.requests), (1, 1))
+        self.assertEqual(fast.requests, 28)
+
+    def test_hedges_after_the_primary_p95_and_takes_the_first_answer(self):
+        primary, backup = self.servers(0.005, 0.05)
+        router = EndpointRouter([primary.url, backup.url])
+        for _ in range(EndpointRouter.MIN_SAMPLES_FOR_P95 + 1):
+            router.request('getSlot', ())
+        p95 = router.hedge_delay(router.endpoints[0])
+        self.assertLess(p95, EndpointRouter.DEFAULT_HEDGE_DELAY)
+
+        # The primary stalls; the backup's answer arrives first
+        primary.latency = 1.0
+        started = time.monotonic()
+        response = router.request('getBalance', ('11111111111111111111111111111111',))
+        elapsed = time.monotonic() - started
+        self.assertIn('result', response)
+        self.assertEqual((router.hedges, router.hedge_wins), (1, 1))
+        self.assertEqual(backup.by_method.get('getBalance'), 1)
+        self.assertGreaterEqual(elapsed, p95 + 0.05)
+        self.assertLess(elapsed, 0.5)
+
+    def test_cools_down_a_failing_endpoint(self):
+        failing, healthy = self.servers(0.0, 0.01)
+        failing.error_rate = 1.0
+        router = EndpointRouter([failing.url, healthy.url])
+        for _ in range(Endpoint.FAILURES_BEFORE_COOLDOWN):
+            self.assertIn('result', router.request('getSlot', ()))
+        self.assertFalse(router.endpoints[0].is_healthy())
+
+        served = failing.requests
+        for _ in range(10):
+            self.assertIn('result', router.request('getSlot', ()))
+        self.assertEqual(failing.requests, served)
+        self.assertEqual(router.ranked(), [router.endpoints[1]])
+
+
+class ColumnarTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+
+    def test_round_trip_across_groups(self):
+        path = os.path.join(self.directory, 'rows.zip')
+        moment = datetime(2026, 3, 1, 12, 30, 0, 123456, tzinfo=dt_timezone.utc)
+        rows = [[index, f'name-{index}', None if index == 2 else str(Decimal(index) / 4)] for index in range(5)]
+        with columnar.Writer(path, ['id', 'name', 'value'], meta={'table': 'test'}, group_size=2) as writer:
+            for row in rows:
+                writer.append(row)
+
+        with columnar.ColumnarFile(path) as archive:
+            self.assertEqual((archive.rows, len(archive.groups), archive.meta['table']), (5, 3, 'test'))
+            self.assertEqual([list(row.values()) for row in archive.iter_rows()], rows)
+            self.assertEqual(archive.column('name'), [row[1] for row in rows])
+            self.assertEqual(archive.range('id'), (0, 4))
+            self.assertEqual(archive.range('id', 1), (2, 3))
+            self.assertEqual(archive.groups_overlapping('id', 3, 4), [1, 2])
+        self.assertEqual(columnar.from_micros(columnar.to_micros(moment)), moment)
+
+    def test_failed_write_leaves_no_file(self):
+        path = os.path.join(self.directory, 'rows.zip')
+        with self.assertRaises(RuntimeError):
+            with columnar.Writer(path, ['id']) as writer:
+                writer.append([1])
+                raise RuntimeError('interrupted')
+        self.assertEqual(os.listdir(self.directory), [])
+        with self.assertRaises(ValueError):
+            columnar.write(path, {'id': [1, 2], 'name': ['a']})
+
+
+class TransactionArchiveTests(TestCase):
+    def setUp(self):
+        self.enterContext(self.settings(TRANSACTION_ARCHIVE_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        self.month = tx_history.add_months(tx_history.hot_cutoff(), -2)
+
+    def transaction(self, number, status='confirmed'):
+        row = BlockchainTransaction.objects.create(
+            tx_hash=f'tx-{number}', status=status, from_address='payer', to_address=f'recipient-{number}',
+            value=Decimal('1.5') * number,
+        )
+        BlockchainTransaction.objects.filter(pk=row.pk).update(created_at=self.month + timedelta(hours=number))
+        return row
+
+    def test_archives_a_month_and_serves_it_from_the_file(self):
+        rows = [self.transaction(number) for number in range(1, 4)]
+        report = tx_history.archive_old_months()
+        self.assertEqual(report['archived'], {f'{self.month:%Y-%m}': 3})
+        self.assertFalse(BlockchainTransaction.objects.exists())
+
+        found = tx_history.search({'from_address': 'payer'}, limit=10)
+        self.assertEqual([row['tx_hash'] for row in found], [row.tx_hash for row in reversed(rows)])
+        self.assertTrue(all(row['archived'] for row in found))
+        self.assertEqual(found[-1]['value'], '1.500000000000000000')
+
+    def test_month_with_pending_rows_waits(self):
+        self.transaction(1)
+        self.transaction(2, status='pending')
+        self.assertEqual(tx_history.archive_old_months()['skipped'], [f'{self.month:%Y-%m}'])
+        self.assertEqual(BlockchainTransaction.objects.count(), 2)
+        self.assertEqual(tx_history.archived_months(), [])
+
+    def test_file_that_does_not_match_keeps_the_rows(self):
+        self.transaction(1)
+        dropped = self.transaction(2)
+        append = columnar.Writer.append
+
+        def lossy_append(writer, row):
+            if row[0] != dropped.id:
+                append(writer, row)
+
+        with mock.patch.object(columnar.Writer, 'append', lossy_append):
+            with self.assertRaises(tx_history.ArchiveError):
+                tx_history.archive_old_months()
+        self.assertEqual(BlockchainTransaction.objects.count(), 2)
+        self.assertEqual(tx_history.archived_months(), [])
+
+
+@override_settings(ADMIN_COUNT_LIMIT=3)
+class AdminCountTests(TestCase):
+    def setUp(self):
+        for number in range(5):
+            User.objects.create(username=f'user{number}', wallet_address=f'wallet-{number}')
+        self.staff = User.objects.create(username='staff', is_staff=True, is_superuser=True)
+
+    def test_filtered_count_past_the_limit_is_marked(self):
+        count = EstimatedCountPaginator(User.objects.filter(username__startswith='user').order_by('id'), 2).count
+        self.assertEqual((count, str(count)), (3, '3+'))
+        count = EstimatedCountPaginator(User.objects.filter(username__in=['user0', 'user1', 'user2']).order_by('id'), 2).count
+        self.assertEqual(str(count), '3')
+
+    def test_prefix_search(self):
+        user_admin = type('UserAdmin', (LargeTableAdmin,), {'search_fields': ('username', '=id')})(User, admin.site)
+        last, past_last = User.objects.bulk_create([
+            User(username='user\U0010ffff', wallet_address='last'),
+            User(username='user\U0010ffffz', wallet_address='past-last'),
+        ])
+
+        def search(term):
+            queryset, _ = user_admin.get_search_results(None, User.objects.all(), term)
+            return set(queryset.values_list('username', flat=True))
+
+        self.assertEqual(search('user1'), {'user1'})
+        self.assertEqual(search('User'), set())
+        self.assertEqual(search('user\U0010ffff'), {last.username, past_last.username})
+        self.assertEqual(search('\U0010ffff'), set())
+        queryset, _ = user_admin.get_search_results(None, User.objects.all(), 'user1')
+        self.assertIn('LIKE', str(queryset.query))
+
+    def test_prefix_upper_bound(self):
+        self.assertEqual(_prefix_upper_bound('abc'), 'abd')
+        self.assertEqual(_prefix_upper_bound('ab\U0010ffff'), 'ac')
+        self.assertIsNone(_prefix_upper_bound('\U0010ffff\U0010ffff'))
+        self.assertEqual(_prefix_upper_bound('a\ud7ff'), 'a\ue000')
+
+    def test_changelist_shows_the_capped_count_and_search_help(self):
+        pool = LenderPool.objects.create(
+            name='Pool', pool_type='stablecoin', description='', token_address='pool',
+            apy=Decimal('5'), min_deposit=Decimal('0'), lock_period_days=0,
+        )
+        for user in User.objects.filter(username__startswith='user'):
+            LenderDeposit.objects.create(
+                user=user, pool=pool, amount=Decimal('1'), shares=Decimal('1'), deposit_tx_hash=f'tx-{user.id}',
+                unlocked_at=timezone.now(),
+            )
+        self.client.force_login(self.staff)
+        response = self.client.get('/cred-lend-admin/lenders/lenderdeposit/?q=user')
+        self.assertContains(response, '3+ results')
+        self.assertContains(
+            response, 'Matches the start of username or email (case-sensitive), or the whole deposit tx hash or '
+                      'withdraw tx hash',
+        )
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username='staff', wallet_address='staff-wallet', is_staff=True)
+        self.borrower = User.objects.create(username='borrower', wallet_address='borrower-wallet')
+
+    def get(self, user=None, **headers):
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(user)}'
+        return self.client.get('/repayments/upcoming/', **headers)
+
+    def test_staff_can_ask_for_a_profile(self):
+        response = self.get(self.staff, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile-Id'], str(profile.id))
+        # The JWT user resolved by the middleware, not the anonymous request.user
+        self.assertEqual((profile.user_id, profile.trigger, profile.path), (self.staff.id, 'header', '/repayments/upcoming/'))
+        self.assertEqual(profile.view_name, 'repayment-upcoming')
+        self.assertGreater(profile.sql_count, 0)
+
+    def test_other_users_cannot(self):
+        for user in (None, self.borrower):
+            with self.subTest(user=user):
+                response = self.get(user, HTTP_X_PROFILE='1')
+                self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_sampling_only_profiles_staff(self):
+        self.get()
+        self.get(self.borrower)
+        self.assertFalse(RequestProfile.objects.exists())
+        response = self.get(self.staff)
+        self.assertNotIn('X-Profile-Id', response)
+        profile = RequestProfile.objects.get()
+        self.assertEqual((profile.user_id, profile.trigger), (self.staff.id, 'sample'))
+
+
+class RequestProfilerTests(TestCase):
+    def test_collects_sql_cache_rpc_and_stacks(self):
+        profiling.instrument_cache_backend(type(cache))
+        with profiling.RequestProfiler(interval=0.001) as profiler:
+            self.assertIs(profiling.current_profiler(), profiler)
+            User.objects.count()
+            cache.get('profiling-test')
+            profiling.record_rpc('getBalance', 0.002)
+            profiling.record_rpc('getBalance', 0.003)
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+        self.assertIsNone(profiling.current_profiler())
+        # Nothing is recorded outside a profile
+        profiling.record_rpc('getBalance', 1.0)
+
+        summary = profiler.summary()
+        self.assertEqual((summary['sql_count'], summary['cache_calls'], summary['rpc_calls']), (1, 1, 2))
+        self.assertAlmostEqual(summary['rpc_ms'], 5.0)
+        self.assertEqual(summary['details']['rpc_methods'], {'getBalance': 2})
+        self.assertIn('COUNT', summary['details']['slow_queries'][0]['sql'])
+        self.assertGreater(summary['cpu_samples'], 0)
+
+        lines = profiler.folded_stacks().splitlines()
+        self.assertEqual(sum(int(line.rsplit(' ', 1)[1]) for line in lines), summary['cpu_samples'])
+        self.assertTrue(any(f'{__name__}.RequestProfilerTests.test_collects_sql_cache_rpc_and_stacks' in line
+                            for line in lines))
+
+    def test_keeps_only_the_slowest_queries(self):
+        with profiling.RequestProfiler() as profiler:
+            for _ in range(profiling.MAX_SLOW_QUERIES * 3):
+                User.objects.exists()
+        summary = profiler.summary()
+        self.assertEqual(summary['sql_count'], profiling.MAX_SLOW_QUERIES * 3)
+        timings = [query['ms'] for query in summary['details']['slow_queries']]
+        self.assertEqual(len(timings), profiling.MAX_SLOW_QUERIES)
+        self.assertEqual(timings, sorted(timings, reverse=True))
+
+
+class TracingTests(TransactionTestCase):
+    # Only outermost transactions are traced, so the tests must not run inside one
+    TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+    PARENT = f'00-{TRACE_ID}-00f067aa0ba902b7-01'
+
+    def setUp(self):
+        export_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.export_path = os.path.join(export_dir, 'traces.jsonl')
+        self.enterContext(self.settings(TRACING_ENABLED=True, TRACING_EXPORT_PATH=self.export_path))
+
+    def spans(self):
+        tracing.flush()
+        with open(self.export_path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_parse_traceparent(self):
+        self.assertEqual(tracing.parse_traceparent(self.PARENT), (self.TRACE_ID, '00f067aa0ba902b7', True))
+        self.assertEqual(
+            tracing.parse_traceparent(f' 00-{self.TRACE_ID}-00f067aa0ba902b7-00 '),
+            (self.TRACE_ID, '00f067aa0ba902b7', False),
+        )
+        for value in (
+            None, '', 'garbage', f'00-{self.TRACE_ID}-00f067aa0ba902b7', f'00-{self.TRACE_ID}-00f067aa0ba902b7-01-x',
+            f'00-{self.TRACE_ID[:-1]}-00f067aa0ba902b7-01', f'00-{self.TRACE_ID}-00f067aa0ba902-01',
+            f'00-{"0" * 32}-00f067aa0ba902b7-01', f'00-{"z" * 32}-00f067aa0ba902b7-01',
+            f'00-{self.TRACE_ID}-00f067aa0ba902b7-zz', f'00-{self.TRACE_ID}-00f067aa0ba902b7-001',
+        ):
+            with self.subTest(value=value):
+                self.assertIsNone(tracing.parse_traceparent(value))
+
+    def test_unsampled_or_malformed_parents_are_not_traced(self):
+        for parent in (f'00-{self.TRACE_ID}-00f067aa0ba902b7-00', 'garbage'):
+            with self.subTest(parent=parent):
+                self.assertIs(tracing.span('request', parent=parent, root=True), tracing.NOOP_SPAN)
+        with tracing.span('request', parent=self.PARENT) as request_span:
+            self.assertEqual(request_span.trace_id, self.TRACE_ID)
+        self.assertEqual(self.spans()[0]['parent_id'], '00f067aa0ba902b7')
+
+    def test_parent_propagates_to_tasks_and_intents(self):
+        from credlend.celery import _end_task_span, _inject_traceparent, _start_task_span
+
+        headers = {}
+        with tracing.span('request', parent=self.PARENT) as request_span:
+            _inject_traceparent(headers=headers)
+            intent = enqueue_intent('test_transfer', 1)
+        self.assertEqual(headers['traceparent'], request_span.traceparent)
+        self.assertEqual(ChainIntent.objects.get(pk=intent.pk).traceparent, request_span.traceparent)
+
+        # The worker continues the trace from the header
+        task = mock.Mock(request={'traceparent': headers['traceparent']})
+        task.name = 'kyc.tasks.sync_whitelist'
+        _start_task_span(task_id='task-1', task=task)
+        _end_task_span(task_id='task-1', state='SUCCESS')
+        request_record, task_record = self.spans()
+        self.assertEqual(task_record['name'], 'celery kyc.tasks.sync_whitelist')
+        self.assertEqual((task_record['trace_id'], task_record['parent_id']), (self.TRACE_ID, request_record['span_id']))
+
+        # Outside a trace nothing is propagated
+        headers = {}
+        _inject_traceparent(headers=headers)
+        self.assertEqual(headers, {})
+        self.assertIsNone(enqueue_intent('test_transfer', 1).traceparent)
+
+    def test_transactions_are_only_instrumented_when_enabled(self):
+        self.enterContext(mock.patch.object(transaction.Atomic, '__enter__', transaction.Atomic.__enter__))
+        self.enterContext(mock.patch.object(transaction.Atomic, '__exit__', transaction.Atomic.__exit__))
+        self.enterContext(mock.patch.object(transaction.Atomic, '_tracing_instrumented', False, create=True))
+        original_enter = transaction.Atomic.__enter__
+
+        with self.settings(TRACING_ENABLED=False):
+            tracing.instrument_transactions()
+        self.assertIs(transaction.Atomic.__enter__, original_enter)
+
+        tracing.instrument_transactions()
+        self.assertIsNot(transaction.Atomic.__enter__, original_enter)
+        with tracing.span('request', parent=self.PARENT):
+            with transaction.atomic():
+                User.objects.count()
+        self.assertEqual([record['name'] for record in self.spans()], ['db.transaction', 'request'])
+
+    def test_trace_report_follows_the_critical_path(self):
+        def record(span_id, parent_id, name, start, duration_ms):
+            return {
+                'trace_id': self.TRACE_ID, 'span_id': span_id, 'parent_id': parent_id, 'name': name,
+                'start': start, 'duration_ms': duration_ms, 'status': 'ok', 'attributes': {},
+            }
+
+        # The request ends at 100 ms, but the task it queued runs until 250 ms. The
+        # transaction overlaps the RPC call, which ends later, so it is off the path
+        with open(self.export_path, 'w') as f:
+            for span_record in (
+                record('a' * 16, None, 'GET /loans/', 1000.0, 100),
+                record('b' * 16, 'a' * 16, 'db.transaction', 1000.01, 50),
+                record('c' * 16, 'a' * 16, 'rpc getBalance', 1000.05, 40),
+                record('d' * 16, 'a' * 16, 'celery loans.tasks.check', 1000.15, 100),
+            ):
+                f.write(json.dumps(span_record) + '\n')
+
+        out = io.StringIO()
+        call_command('trace_report', '--trace', self.TRACE_ID, stdout=out)
+        lines = out.getvalue().split('critical path:')[1].split('\n')
+        path = [' '.join(line.split()[2:]) for line in lines if line.strip()]
+        self.assertEqual(path, ['GET /loans/', 'rpc getBalance', 'celery loans.tasks.check'])
+        self.assertIn(f'{self.TRACE_ID}      250.0 ms  GET /loans/', out.getvalue())
+
+
+class MetricsEndpointTests(TestCase):
+    REMOTE = {'REMOTE_ADDR': '203.0.113.5'}
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_without_a_token_only_staff_and_this_host_are_served(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='::1').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', **self.REMOTE).status_code, 403)
+        # Relayed by a proxy on this host
+        self.assertEqual(self.client.get('/metrics', HTTP_X_FORWARDED_FOR='203.0.113.5').status_code, 403)
+
+        self.client.force_login(User.objects.create(username='borrower', wallet_address='borrower-wallet'))
+        self.assertEqual(self.client.get('/metrics', **self.REMOTE).status_code, 403)
+        self.client.force_login(User.objects.create(username='staff', wallet_address='staff-wallet', is_staff=True))
+        response = self.client.get('/metrics', **self.REMOTE)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_token_is_required_once_configured(self):
+        response = self.client.get('/metrics', **self.REMOTE, HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                self.assertEqual(self.client.get('/metrics', **self.REMOTE, **headers).status_code, 401)
+                self.assertEqual(self.client.get('/metrics', **headers).status_code, 401)
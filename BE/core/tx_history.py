@@ -0,0 +1,394 @@
+"""Blockchain transaction history: monthly hot partitions and a columnar archive.
+
+Rows are inserted pending and changed once, to confirmed or failed; after
+that they are immutable. ``core.outbox.sign_and_send`` records each
+transaction it signs, and the outbox finalizes it with the intent's outcome.
+On PostgreSQL ``blockchain_transactions`` is partitioned by month of
+``created_at`` (migration ``core.0011_partition_blockchain_transactions``),
+so inserts and index maintenance only touch the current month's partition.
+A DEFAULT partition (``core.0013``) catches rows of a month without one;
+``ensure_partitions`` moves them into their month's partition.
+
+``archive_old_months`` keeps ``TRANSACTION_HOT_MONTHS`` months in the
+database. Each older month is written to a columnar file in
+``TRANSACTION_ARCHIVE_DIR`` (see ``core.utils.columnar``), read back
+against the database, and only if every row matches leaves the database:
+its partition is detached and dropped on PostgreSQL, and its rows are
+deleted elsewhere. A month that still has pending rows stays until
+they are final. The hot table's size therefore depends on the monthly
+volume, not on the system's age.
+
+``search`` answers the same filters over both tiers: the hot rows through
+the ORM and the archived months through their files, newest first with a
+``(created_at, id)`` cursor.
+"""
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from itertools import zip_longest
+import logging
+import os
+import re
+
+from .models import BlockchainTransaction
+from .utils import columnar
+from .utils.columnar import from_micros, to_micros
+
+logger = logging.getLogger(__name__)
+
+TABLE = BlockchainTransaction._meta.db_table
+COLUMNS = (
+    'id', 'tx_hash', 'status', 'block_number', 'from_address', 'to_address',
+    'value', 'gas_used', 'created_at', 'finalized_at',
+)
+TIMESTAMP_COLUMNS = ('created_at', 'finalized_at')
+EQUALITY_FILTERS = ('tx_hash', 'status', 'from_address', 'to_address')
+DEFAULT_HOT_MONTHS = 3
+DEFAULT_PARTITIONS_AHEAD = 2
+DELETE_CHUNK = 5000
+DEFAULT_PARTITION = f'{TABLE}_default'
+_PARTITION_SUFFIX = re.compile(r'_p(\d{4})(\d{2})$')
+_ARCHIVE_NAME = re.compile(rf'^{TABLE}-(\d{{4}})-(\d{{2}})\.zip$')
+
+
+class ArchiveError(Exception):
+    """An archive file does not match the month it was written from"""
+
+
+def record_pending(tx_hash, from_address, to_address=None, value=None):
+    """Store a sent transaction, or return the row already stored for ``tx_hash``"""
+    existing = BlockchainTransaction.objects.filter(tx_hash=tx_hash).first()
+    if existing is not None:
+        return existing
+    return BlockchainTransaction.objects.create(
+        tx_hash=tx_hash, status='pending', from_address=from_address, to_address=to_address, value=value,
+    )
+
+
+def finalize(tx_hash, status, block_number=None, gas_used=None):
+    """Move a pending transaction to its final status; returns False if it was not pending"""
+    if status not in BlockchainTransaction.FINAL_STATUSES:
+        raise ValueError(f"'{status}' is not a final status")
+    return bool(BlockchainTransaction.objects.filter(tx_hash=tx_hash, status='pending').update(
+        status=status, block_number=block_number, gas_used=gas_used, finalized_at=timezone.now(),
+    ))
+
+
+def month_start(moment):
+    moment = moment.astimezone(dt_timezone.utc)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def hot_cutoff():
+    """Start of the oldest month kept in the database"""
+    hot_months = getattr(settings, 'TRANSACTION_HOT_MONTHS', DEFAULT_HOT_MONTHS)
+    return add_months(month_start(timezone.now()), -(max(hot_months, 1) - 1))
+
+
+# Partitions (PostgreSQL)
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def partitions():
+    """``{month: name}`` of the attached monthly partitions"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = to_regclass(%s)', [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    attached = {}
+    for name in names:
+        match = _PARTITION_SUFFIX.search(name)
+        if match:
+            attached[datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)] = name
+    return attached
+
+
+def default_months():
+    """Months with rows in the DEFAULT partition, which had no partition of their own"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT DISTINCT date_trunc(%s, created_at AT TIME ZONE %s) FROM "{DEFAULT_PARTITION}"', ['month', 'UTC'],
+        )
+        return {row[0].replace(tzinfo=dt_timezone.utc) for row in cursor.fetchall()}
+
+
+def _create_partition(month):
+    name, bounds = partition_name(month), [month, add_months(month, 1)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE created_at >= %s AND created_at < %s)', bounds,
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(f'CREATE TABLE "{name}" PARTITION OF "{TABLE}" FOR VALUES FROM (%s) TO (%s)', bounds)
+            return name
+        # A partition cannot be created over rows the DEFAULT partition holds,
+        # so they move into a plain table that is attached once they are out
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE created_at >= %s AND created_at < %s '
+            f'RETURNING *) INSERT INTO "{name}" SELECT * FROM moved', bounds,
+        )
+        cursor.execute(f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)', bounds)
+    logger.warning(f"Moved transactions of {month:%Y-%m} out of {DEFAULT_PARTITION}")
+    return name
+
+
+def ensure_partitions(ahead=None):
+    """Create the partitions for this month, the next ``ahead`` and any month in the DEFAULT partition.
+
+    Returns the names created.
+    """
+    if not is_partitioned():
+        return []
+    if ahead is None:
+        ahead = getattr(settings, 'TRANSACTION_PARTITIONS_AHEAD', DEFAULT_PARTITIONS_AHEAD)
+    attached = partitions()
+    current = month_start(timezone.now())
+    months = {add_months(current, offset) for offset in range(ahead + 1)} | default_months()
+    return [_create_partition(month) for month in sorted(months) if month not in attached]
+
+
+# Archive
+
+def archive_dir():
+    return getattr(settings, 'TRANSACTION_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive'))
+
+
+def archive_path(month):
+    return os.path.join(archive_dir(), f'{TABLE}-{month:%Y-%m}.zip')
+
+
+def archived_months():
+    """Months with an archive file, newest first"""
+    try:
+        names = os.listdir(archive_dir())
+    except FileNotFoundError:
+        return []
+    months = []
+    for name in names:
+        match = _ARCHIVE_NAME.match(name)
+        if match:
+            months.append(datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc))
+    return sorted(months, reverse=True)
+
+
+def _encode(name, value):
+    if name in TIMESTAMP_COLUMNS:
+        return to_micros(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def archivable_months():
+    """Months older than the hot window that are still in the database, oldest first"""
+    cutoff = hot_cutoff()
+    if is_partitioned():
+        return sorted(month for month in set(partitions()) | default_months() if month < cutoff)
+    months = []
+    queryset = BlockchainTransaction.objects.filter(created_at__lt=cutoff)
+    while True:
+        oldest = queryset.order_by('created_at').values_list('created_at', flat=True).first()
+        if oldest is None:
+            return months
+        months.append(month_start(oldest))
+        queryset = queryset.filter(created_at__gte=add_months(months[-1], 1))
+
+
+def _month_rows(rows):
+    for values in rows.order_by('created_at', 'id').values_list(*COLUMNS).iterator(chunk_size=DELETE_CHUNK):
+        yield [_encode(name, value) for name, value in zip(COLUMNS, values)]
+
+
+def _verify(path, rows):
+    with columnar.ColumnarFile(path) as archive:
+        stored = ([row[name] for name in COLUMNS] for row in archive.iter_rows(COLUMNS))
+        for number, (expected, found) in enumerate(zip_longest(rows, stored)):
+            if expected != found:
+                raise ArchiveError(f"{os.path.basename(path)} differs from the database at row {number}")
+
+
+def archive_month(month):
+    """Write one month to its archive file and remove it from the database.
+
+    Returns the number of rows archived, or None if the month still has
+    pending rows. Raises ``ArchiveError``, leaving the month in the
+    database, if the file does not read back as written.
+    """
+    start, end = month, add_months(month, 1)
+    partitioned = is_partitioned()
+    # The month's rows must all sit in its partition before it is dropped
+    if partitioned and month not in partitions():
+        _create_partition(month)
+    rows = BlockchainTransaction.objects.filter(created_at__gte=start, created_at__lt=end)
+    if rows.filter(status='pending').exists():
+        logger.error(f"Not archiving transactions of {month:%Y-%m}: some are still pending")
+        return None
+
+    # A file left by a run that died before removing the rows is rewritten
+    path = archive_path(month)
+    count = 0
+    with columnar.Writer(path, COLUMNS, meta={'table': TABLE, 'month': f'{month:%Y-%m}'}) as writer:
+        for row in _month_rows(rows):
+            writer.append(row)
+            count += 1
+    # Without pending rows the month no longer changes, so a second pass
+    # must read exactly what was written
+    try:
+        _verify(path, _month_rows(rows))
+    except Exception:
+        os.remove(path)
+        raise
+    if not count:
+        os.remove(path)
+
+    if partitioned:
+        name = partitions().get(month)
+        if name is not None:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+                cursor.execute(f'DROP TABLE "{name}"')
+    else:
+        while True:
+            ids = list(rows.values_list('id', flat=True)[:DELETE_CHUNK])
+            if not ids:
+                break
+            BlockchainTransaction.objects.filter(pk__in=ids).delete()
+    return count
+
+
+def archive_old_months():
+    """Create upcoming partitions and archive every month past the hot window; returns a report"""
+    report = {'partitions_created': ensure_partitions(), 'archived': {}, 'skipped': []}
+    for month in archivable_months():
+        count = archive_month(month)
+        if count is None:
+            report['skipped'].append(f'{month:%Y-%m}')
+        else:
+            report['archived'][f'{month:%Y-%m}'] = count
+    return report
+
+
+# Queries over both tiers
+
+def _row(values, archived):
+    row = dict(values)
+    if isinstance(row['value'], Decimal):
+        row['value'] = str(row['value'])
+    row['archived'] = archived
+    return row
+
+
+def _hot_rows(filters, before, limit):
+    queryset = BlockchainTransaction.objects.all()
+    for name in EQUALITY_FILTERS:
+        if filters.get(name) is not None:
+            queryset = queryset.filter(**{name: filters[name]})
+    if filters.get('address') is not None:
+        queryset = queryset.filter(Q(from_address=filters['address']) | Q(to_address=filters['address']))
+    if filters.get('created_after') is not None:
+        queryset = queryset.filter(created_at__gte=filters['created_after'])
+    if filters.get('created_before') is not None:
+        queryset = queryset.filter(created_at__lt=filters['created_before'])
+    if before is not None:
+        created_at, pk = before
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    return [_row(values, False) for values in queryset.order_by('-created_at', '-id').values(*COLUMNS)[:limit]]
+
+
+def _archived_rows(path, filters, before, limit):
+    with columnar.ColumnarFile(path) as archive:
+        after = to_micros(filters.get('created_after'))
+        until = to_micros(filters.get('created_before'))
+        created_range = archive.range('created_at')
+        if created_range is None:
+            return []
+        if (after is not None and created_range[1] < after) or (until is not None and created_range[0] >= until):
+            return []
+
+        # Narrow the candidate rows one column at a time; later columns are
+        # only read while rows remain
+        indices = range(archive.rows)
+        for name in EQUALITY_FILTERS:
+            if filters.get(name) is not None:
+                column = archive.column(name)
+                indices = [index for index in indices if column[index] == filters[name]]
+        if filters.get('address') is not None:
+            senders, recipients = archive.column('from_address'), archive.column('to_address')
+            address = filters['address']
+            indices = [index for index in indices if senders[index] == address or recipients[index] == address]
+        if not indices:
+            return []
+
+        created, ids = archive.column('created_at'), archive.column('id')
+        cursor = None if before is None else (to_micros(before[0]), before[1])
+        matches = []
+        # Rows are stored in (created_at, id) order
+        for index in reversed(indices):
+            if after is not None and created[index] < after:
+                continue
+            if until is not None and created[index] >= until:
+                continue
+            if cursor is not None and (created[index], ids[index]) >= cursor:
+                continue
+            matches.append(index)
+            if len(matches) >= limit:
+                break
+
+        columns = {name: archive.column(name) for name in COLUMNS} if matches else {}
+    rows = []
+    for index in matches:
+        values = {name: columns[name][index] for name in COLUMNS}
+        for name in TIMESTAMP_COLUMNS:
+            values[name] = from_micros(values[name])
+        rows.append(_row(values, True))
+    return rows
+
+
+def search(filters, limit, before=None):
+    """Up to ``limit`` transactions matching ``filters``, newest first.
+
+    ``filters`` may hold ``tx_hash``, ``status``, ``from_address``,
+    ``to_address``, ``address`` (either side) and ``created_after`` /
+    ``created_before`` datetimes. ``before`` is the ``(created_at, id)`` of
+    the last row of the previous page.
+    """
+    rows = _hot_rows(filters, before, limit)
+    for month in archived_months():
+        month_end = add_months(month, 1)
+        if filters.get('created_before') is not None and month >= filters['created_before']:
+            continue
+        if filters.get('created_after') is not None and month_end <= filters['created_after']:
+            break
+        if before is not None and month >= before[0]:
+            continue
+        # Every later month is older than the rows already collected
+        if len(rows) >= limit and month_end <= rows[limit - 1]['created_at']:
+            break
+        # A month being archived can briefly be in both tiers
+        seen = {row['id'] for row in rows}
+        rows.extend(row for row in _archived_rows(archive_path(month), filters, before, limit) if row['id'] not in seen)
+        rows.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+        del rows[limit:]
+    return rows
@@ -0,0 +1,182 @@
+"""Admin changelists that stay fast on tables with millions of rows.
+
+The stock changelist runs an exact ``COUNT(*)`` for the paginator and
+another for the "N total" link. It also searches with ``icontains``, which
+no B-tree index can serve, and does so across joins. ``LargeTableAdmin``
+changes three things:
+
+* An unfiltered list is counted from the database's table statistics
+  (``pg_class.reltuples``, ``sqlite_stat1``) once the table is past
+  ``ADMIN_ESTIMATED_COUNT_THRESHOLD`` rows. A filtered list counts at most
+  ``ADMIN_COUNT_LIMIT`` rows and shows e.g. "10000+" when there are more.
+  The total-count query is skipped.
+* ``search_fields`` entries are prefix matches, or exact matches with a
+  leading ``=``. A prefix runs as ``field LIKE 'abc%' AND field >= 'abc'
+  AND field < 'abd'``. The range lets an index on the column bound the scan
+  where the planner will not use one for ``LIKE``, and the ``LIKE`` keeps the
+  result right under collations that do not sort by code point. SQLite
+  serves the range from a plain index. On PostgreSQL a plain index serves it
+  only under the "C" collation; otherwise index the column with
+  ``varchar_pattern_ops``, which serves the ``LIKE``. The match is
+  case-sensitive, which the search box's help text says, except under
+  MySQL's case-insensitive collations.
+* A field across relations is matched with one ``IN`` subquery per hop,
+  e.g. ``loan_id IN (SELECT id FROM loans WHERE application_id IN (...))``,
+  so each table is reached through its foreign key index instead of a join
+  being filtered row by row.
+
+Admins should also list their displayed foreign keys in
+``list_select_related``, and put them in ``raw_id_fields`` so change forms
+do not render every row of the related table as a ``<select>`` option.
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, models
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
+import sys
+
+DEFAULT_ESTIMATED_COUNT_THRESHOLD = 100000
+DEFAULT_COUNT_LIMIT = 10000
+
+
+def estimated_row_count(model, using='default'):
+    """Row count of the model's table from planner statistics, or None if there are none"""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            elif connection.vendor == 'sqlite':
+                # Written by ANALYZE; each row starts with the number of rows in
+                # the table or, for a partial index, in the index
+                cursor.execute(
+                    "SELECT MAX(CAST(substr(stat, 1, instr(stat || ' ', ' ') - 1) AS INTEGER)) "
+                    'FROM sqlite_stat1 WHERE tbl = %s', [table],
+                )
+            elif connection.vendor == 'mysql':
+                cursor.execute(
+                    'SELECT table_rows FROM information_schema.tables '
+                    'WHERE table_schema = DATABASE() AND table_name = %s', [table],
+                )
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(row[0])
+    # Postgres reports -1 for a table that was never analyzed
+    return estimate if estimate >= 0 else None
+
+
+class CappedCount(int):
+    """A count that stopped at a limit; renders as "10000+" but pages like the limit"""
+
+    def __str__(self):
+        return f'{int(self)}+'
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose ``count`` never scans a large table in full"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            threshold = getattr(settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', DEFAULT_ESTIMATED_COUNT_THRESHOLD)
+            if estimate is not None and estimate >= threshold:
+                return estimate
+        # COUNT(*) over a LIMIT subquery stops after the limit; one row past it
+        # tells a capped count from an exact one
+        limit = getattr(settings, 'ADMIN_COUNT_LIMIT', DEFAULT_COUNT_LIMIT)
+        count = queryset.order_by()[:limit + 1].count()
+        return CappedCount(limit) if count > limit else count
+
+
+def _prefix_upper_bound(prefix):
+    """The smallest string, in code point order, above every string starting with ``prefix``; None if unbounded"""
+    # Nothing follows U+10FFFF, so the last character below it is the one raised
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    following = ord(prefix[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        # Surrogates cannot be stored; the next character is U+E000
+        following = 0xE000
+    return prefix[:-1] + chr(following)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def search_help_text(self):
+        # Staff expect the stock admin's case-insensitive substring search
+        prefix, exact = [], []
+        for search_field in self.search_fields:
+            name = search_field.lstrip('=^').split('__')[-1].replace('_', ' ')
+            (exact if search_field.startswith('=') else prefix).append(name)
+        parts = []
+        if prefix:
+            parts.append(f"the start of {' or '.join(prefix)} (case-sensitive)")
+        if exact:
+            parts.append(f"the whole {' or '.join(exact)}")
+        return f"Matches {', or '.join(parts)}" if parts else None
+
+    def _search_condition(self, search_field, term):
+        exact = search_field.startswith('=')
+        path = search_field.lstrip('=^').split('__')
+        models_on_path = [self.model]
+        for name in path[:-1]:
+            models_on_path.append(models_on_path[-1]._meta.get_field(name).related_model)
+        model = models_on_path[-1]
+        field = model._meta.get_field(path[-1])
+        try:
+            value = field.to_python(term)
+        except ValidationError:
+            # e.g. a word typed into an id search
+            return None
+
+        if exact or not isinstance(field, (models.CharField, models.TextField)):
+            lookup = {path[-1]: value}
+        else:
+            lookup = {f'{path[-1]}__startswith': value, f'{path[-1]}__gte': value}
+            upper_bound = _prefix_upper_bound(value)
+            if upper_bound is not None:
+                lookup[f'{path[-1]}__lt'] = upper_bound
+        if len(path) == 1:
+            return Q(**lookup)
+        # One IN subquery per hop, innermost first, so each table is filtered
+        # on its own indexed foreign key column
+        subquery = model._default_manager.filter(**lookup).values('pk')
+        for hop_model, name in zip(reversed(models_on_path[1:-1]), reversed(path[1:-1])):
+            subquery = hop_model._default_manager.filter(**{f'{name}__in': subquery}).values('pk')
+        return Q(**{f'{path[0]}__in': subquery})
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        if not search_fields or not search_term:
+            return queryset, False
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            if not bit:
+                continue
+            conditions = [self._search_condition(field, bit) for field in search_fields]
+            conditions = [condition for condition in conditions if condition is not None]
+            if not conditions:
+                return queryset.none(), False
+            term_query = Q()
+            for condition in conditions:
+                term_query |= condition
+            queryset = queryset.filter(term_query)
+        # Every path follows foreign keys towards their targets, so no row is repeated
+        return queryset, False
@@ -0,0 +1,93 @@
+"""Encoding and decoding of the credlend program's Anchor events.
+
+``emit!`` writes each event to the transaction logs as
+``Program data: <base64>``. The payload is an 8-byte discriminator,
+``sha256("event:<Name>")[:8]``, followed by the Borsh-encoded fields.
+"""
+import base64
+import hashlib
+import struct
+import base58
+
+PROGRAM_DATA_PREFIX = 'Program data: '
+
+# Field layouts from SMC/programs/credlend-solana/src/lib.rs
+EVENT_LAYOUTS = {
+    'AdminAddedEvent': [('admin', 'pubkey'), ('new_admin_key', 'pubkey')],
+    'UserWhitelistedEvent': [('admin', 'pubkey'), ('user_key', 'pubkey')],
+    'UserWhitelistRemovedEvent': [('admin', 'pubkey'), ('user_key', 'pubkey')],
+    'TreasuryDepositEvent': [
+        ('admin', 'pubkey'), ('treasury_vault', 'pubkey'), ('token_mint', 'pubkey'), ('amount', 'u64'),
+    ],
+    'TreasuryWithdrawalEvent': [
+        ('admin', 'pubkey'), ('treasury_vault', 'pubkey'), ('token_mint', 'pubkey'), ('amount', 'u64'),
+    ],
+    'LoanRequestedEvent': [
+        ('borrower', 'pubkey'), ('loan', 'pubkey'), ('collateral_amount', 'u64'),
+        ('loan_amount', 'u64'), ('loan_mint', 'pubkey'), ('due_time', 'i64'),
+    ],
+    'LoanRepaidEvent': [
+        ('borrower', 'pubkey'), ('loan', 'pubkey'), ('repayment_amount', 'u64'),
+        ('collateral_released_amount', 'u64'),
+    ],
+    'LoanLiquidatedEvent': [
+        ('borrower', 'pubkey'), ('loan', 'pubkey'), ('collateral_liquidated_amount', 'u64'),
+    ],
+}
+
+_FORMATS = {'u16': '<H', 'u64': '<Q', 'i64': '<q'}
+
+
+def discriminator(name):
+    return hashlib.sha256(f'event:{name}'.encode()).digest()[:8]
+
+
+_BY_DISCRIMINATOR = {discriminator(name): name for name in EVENT_LAYOUTS}
+
+
+def encode_event(name, fields):
+    """Base64 payload of a ``Program data:`` log line for the event"""
+    data = bytearray(discriminator(name))
+    for field, kind in EVENT_LAYOUTS[name]:
+        value = fields[field]
+        if kind == 'pubkey':
+            data += base58.b58decode(str(value))
+        else:
+            data += struct.pack(_FORMATS[kind], value)
+    return base64.b64encode(bytes(data)).decode()
+
+
+def decode_event(payload):
+    """Return ``(name, fields)`` for a known event payload, or None"""
+    try:
+        data = base64.b64decode(payload)
+    except ValueError:
+        return None
+    name = _BY_DISCRIMINATOR.get(data[:8])
+    if name is None:
+        return None
+    fields, offset = {}, 8
+    for field, kind in EVENT_LAYOUTS[name]:
+        if kind == 'pubkey':
+            if len(data) < offset + 32:
+                return None
+            fields[field] = base58.b58encode(data[offset:offset + 32]).decode()
+            offset += 32
+        else:
+            try:
+                fields[field] = struct.unpack_from(_FORMATS[kind], data, offset)[0]
+            except struct.error:
+                return None
+            offset += struct.calcsize(_FORMATS[kind])
+    return name, fields
+
+
+def events_from_logs(logs):
+    """Decode every program event found in a transaction's log lines"""
+    events = []
+    for line in logs:
+        if line.startswith(PROGRAM_DATA_PREFIX):
+            event = decode_event(line[len(PROGRAM_DATA_PREFIX):])
+            if event is not None:
+                events.append(event)
+    return events
@@ -0,0 +1,106 @@
+"""Instructions and accounts of the credlend program, built without an IDL.
+
+Anchor prefixes instruction data with ``sha256("global:<name>")[:8]`` and
+account data with ``sha256("account:<Name>")[:8]``; the rest is Borsh.
+Account orders follow the ``#[derive(Accounts)]`` structs in
+SMC/programs/credlend-solana/src/lib.rs.
+"""
+import hashlib
+import struct
+import base58
+from solana.publickey import PublicKey
+from solana.system_program import SYS_PROGRAM_ID
+from solana.transaction import AccountMeta, TransactionInstruction
+
+WHITELIST_SEED = b'whitelist'
+# discriminator + user_key + is_whitelisted + bump
+WHITELIST_ENTRY_SIZE = 8 + 32 + 1 + 1
+# Loan after its discriminator: borrower, collateral_vault,
+# collateral_locked_usdt_amount, loan_amount_borrowed, loan_mint,
+# repayment_amount, loan_due_time, is_active; then bump
+LOAN_FIELDS = struct.Struct('<32s32sQQ32sQq?')
+LOAN_ACCOUNT_SIZE = 8 + LOAN_FIELDS.size + 1
+# discriminator + bump
+COLLATERAL_VAULT_SIZE = 8 + 1
+
+
+def instruction_discriminator(name):
+    return hashlib.sha256(f'global:{name}'.encode()).digest()[:8]
+
+
+def account_discriminator(name):
+    return hashlib.sha256(f'account:{name}'.encode()).digest()[:8]
+
+
+WHITELIST_ENTRY_DISCRIMINATOR = account_discriminator('WhitelistEntry')
+LOAN_DISCRIMINATOR = account_discriminator('Loan')
+COLLATERAL_VAULT_DISCRIMINATOR = account_discriminator('CollateralVault')
+
+
+def whitelist_pda(user_key, program_id):
+    address, _ = PublicKey.find_program_address([WHITELIST_SEED, bytes(PublicKey(user_key))], program_id)
+    return address
+
+
+def whitelist_user_instruction(program_id, admin, user_key):
+    return TransactionInstruction(
+        keys=[
+            AccountMeta(pubkey=whitelist_pda(user_key, program_id), is_signer=False, is_writable=True),
+            AccountMeta(pubkey=admin, is_signer=True, is_writable=True),
+            AccountMeta(pubkey=SYS_PROGRAM_ID, is_signer=False, is_writable=False),
+        ],
+        program_id=program_id,
+        data=instruction_discriminator('whitelist_user') + bytes(PublicKey(user_key)),
+    )
+
+
+def remove_whitelist_instruction(program_id, admin, user_key):
+    # The entry is closed and its rent returned to the admin
+    return TransactionInstruction(
+        keys=[
+            AccountMeta(pubkey=whitelist_pda(user_key, program_id), is_signer=False, is_writable=True),
+            AccountMeta(pubkey=admin, is_signer=True, is_writable=True),
+        ],
+        program_id=program_id,
+        data=instruction_discriminator('remove_whitelist'),
+    )
+
+
+def encode_whitelist_entry(user_key, is_whitelisted=True, bump=255):
+    return WHITELIST_ENTRY_DISCRIMINATOR + bytes(PublicKey(user_key)) + bytes([int(is_whitelisted), bump])
+
+
+def decode_whitelist_entry(data):
+    """Return ``(user_key, is_whitelisted)`` for a ``WhitelistEntry`` account, or None"""
+    if len(data) != WHITELIST_ENTRY_SIZE or data[:8] != WHITELIST_ENTRY_DISCRIMINATOR:
+        return None
+    return base58.b58encode(data[8:40]).decode(), bool(data[40])
+
+
+def encode_loan_account(borrower, collateral_vault, collateral_amount, loan_amount, loan_mint,
+                        repayment_amount, due_time, is_active=True, bump=255):
+    return LOAN_DISCRIMINATOR + LOAN_FIELDS.pack(
+        bytes(PublicKey(borrower)), bytes(PublicKey(collateral_vault)), collateral_amount, loan_amount,
+        bytes(PublicKey(loan_mint)), repayment_amount, due_time, is_active,
+    ) + bytes([bump])
+
+
+def decode_loan_fields(data):
+    """Decode the ``LOAN_FIELDS`` part of a ``Loan`` account, as fetched with a data slice from offset 8.
+
+    Keys are left as raw bytes; callers compare them against decoded
+    addresses instead of encoding every account's keys.
+    """
+    if len(data) != LOAN_FIELDS.size:
+        return None
+    borrower, vault, collateral, borrowed, mint, repayment, due_time, is_active = LOAN_FIELDS.unpack(data)
+    return {
+        'borrower': borrower,
+        'collateral_vault': vault,
+        'collateral_amount': collateral,
+        'loan_amount': borrowed,
+        'loan_mint': mint,
+        'repayment_amount': repayment,
+        'due_time': due_time,
+        'is_active': is_active,
+    }
@@ -0,0 +1,136 @@
+import collections
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Solana's target slot time
+SECONDS_PER_BLOCK = 0.4
+
+
+class BlockhashProvider:
+    """Process-wide cache of a recent blockhash, kept fresh by a background thread.
+
+    Transaction builders call ``get()`` and receive the cached blockhash
+    instead of paying a ``getLatestBlockhash`` round trip per transaction.
+    The refresher fetches a new blockhash and the current block height every
+    ``refresh_interval`` seconds, and ``get()`` refreshes inline once the
+    cached blockhash is within ``expiry_margin_blocks`` of expiring. Blocks
+    produced since the last fetch are counted at the target slot time, so a
+    refresher that is failing or not yet running cannot leave an expiring
+    blockhash in use. The margin covers the blocks produced between two
+    refreshes (about 40 at the default interval).
+
+    The height is read at ``height_commitment``, which trails the tip, so it
+    never overstates how many blocks have passed: ``block_height()`` is safe
+    for deciding that a transaction signed with a blockhash can no longer land.
+    """
+
+    def __init__(self, client, commitment='finalized', refresh_interval=15, expiry_margin_blocks=75,
+                 height_commitment='confirmed'):
+        self.client = client
+        self.commitment = commitment
+        self.height_commitment = height_commitment
+        self.refresh_interval = refresh_interval
+        self.expiry_margin_blocks = expiry_margin_blocks
+
+        self.blockhash = None
+        self.last_valid_block_height = None
+        self.current_block_height = None
+        self._fetched_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._hits = collections.deque(maxlen=100000)
+        self.rpc_fetches = 0
+
+    def _fetch(self):
+        response = self.client._provider.make_request(
+            'getLatestBlockhash', {'commitment': self.commitment}
+        )
+        value = response['result']['value']
+        height = self.client._provider.make_request('getBlockHeight', {'commitment': self.height_commitment})
+        self.blockhash = value['blockhash']
+        self.last_valid_block_height = value['lastValidBlockHeight']
+        self.current_block_height = height['result']
+        self._fetched_at = time.monotonic()
+        self.rpc_fetches += 1
+
+    def remaining_blocks(self):
+        """Blocks left before the cached blockhash expires, estimated from the last observed block height"""
+        if self.blockhash is None:
+            return 0
+        produced = (time.monotonic() - self._fetched_at) / SECONDS_PER_BLOCK
+        return self.last_valid_block_height - self.current_block_height - produced
+
+    def _is_fresh(self):
+        return self.remaining_blocks() > self.expiry_margin_blocks
+
+    def refresh(self):
+        with self._lock:
+            self._fetch()
+
+    def _run(self):
+        last_report = time.monotonic()
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing recent blockhash: {e}")
+            if time.monotonic() - last_report >= 60:
+                last_report = time.monotonic()
+                logger.info(f"Blockhash cache saved {self.saved_per_minute()} RPC calls in the last minute")
+
+    def start(self):
+        """Start the refresher thread (again, if this process was forked from its owner)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='blockhash-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def latest(self):
+        """Return ``(blockhash, last_valid_block_height)``, from memory whenever possible"""
+        self.start()
+        with self._lock:
+            if self._is_fresh():
+                self._hits.append(time.monotonic())
+            else:
+                self._fetch()
+            return self.blockhash, self.last_valid_block_height
+
+    def get(self):
+        """Return a recent blockhash, from memory whenever possible"""
+        return self.latest()[0]
+
+    def block_height(self):
+        """The block height observed at the last refresh; it trails the chain by at most one interval"""
+        self.start()
+        with self._lock:
+            if self.current_block_height is None:
+                self._fetch()
+            return self.current_block_height
+
+    def saved_per_minute(self):
+        """Number of blockhash RPC calls served from memory in the last minute"""
+        cutoff = time.monotonic() - 60
+        while self._hits and self._hits[0] < cutoff:
+            self._hits.popleft()
+        return len(self._hits)
+
+    def stats(self):
+        return {
+            'blockhash': self.blockhash,
+            'last_valid_block_height': self.last_valid_block_height,
+            'block_height': self.current_block_height,
+            'remaining_blocks': max(0, int(self.remaining_blocks())),
+            'rpc_fetches': self.rpc_fetches,
+            'saved_calls_last_minute': self.saved_per_minute(),
+        }
@@ -0,0 +1,202 @@
+"""Compressed, column-oriented files for cold data.
+
+A file is a zip archive holding ``meta.json`` and, for each row group, one
+deflate-compressed member per column, each a JSON array of that column's
+values in the group. Similar values sit together, which compresses well,
+and a reader decompresses only the columns it touches: a query filtering
+on ``status`` opens the status column and reads the rest only when some
+row matches. ``meta.json`` records each column's minimum and maximum for
+the file and for every group, so a range filter can skip a whole file or
+group without opening any column. Only the standard library is needed.
+
+``Writer`` streams rows in, holding one group in memory at a time, and
+``ColumnarFile`` memory-maps the file so only the members read are paged in.
+"""
+from datetime import datetime, timedelta, timezone
+import json
+import mmap
+import os
+import zipfile
+
+FORMAT_VERSION = 2
+DEFAULT_GROUP_SIZE = 10000
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_micros(moment):
+    """Timestamps are stored as microseconds since the epoch"""
+    return None if moment is None else (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value):
+    return None if value is None else EPOCH + timedelta(microseconds=value)
+
+
+def _ranges(columns):
+    ranges = {}
+    for name, values in columns.items():
+        present = [value for value in values if value is not None]
+        try:
+            if present:
+                ranges[name] = [min(present), max(present)]
+        except TypeError:
+            pass
+    return ranges
+
+
+class Writer:
+    """Write rows, given as sequences in ``columns`` order, ``group_size`` at a time.
+
+    The file appears at ``path`` atomically when the writer is closed; used
+    as a context manager, an exception discards it instead.
+    """
+
+    def __init__(self, path, columns, meta=None, group_size=DEFAULT_GROUP_SIZE):
+        self.path = path
+        self.columns = list(columns)
+        self.meta = meta or {}
+        self.group_size = group_size
+        self.groups = []
+        self._temporary = f'{path}.tmp'
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._archive = zipfile.ZipFile(self._temporary, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9)
+        self._buffer = {name: [] for name in self.columns}
+        self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def append(self, row):
+        for name, value in zip(self.columns, row):
+            self._buffer[name].append(value)
+        self._buffered += 1
+        if self._buffered >= self.group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        index = len(self.groups)
+        for name, values in self._buffer.items():
+            self._archive.writestr(f'{index}/{name}.json', json.dumps(values, separators=(',', ':')))
+        self.groups.append({'rows': self._buffered, 'ranges': _ranges(self._buffer)})
+        self._buffer = {name: [] for name in self.columns}
+        self._buffered = 0
+
+    def close(self):
+        self._flush()
+        ranges = {}
+        for name in self.columns:
+            bounds = [group['ranges'][name] for group in self.groups if name in group['ranges']]
+            try:
+                if bounds:
+                    ranges[name] = [min(low for low, _ in bounds), max(high for _, high in bounds)]
+            except TypeError:
+                pass
+        header = {
+            'format': FORMAT_VERSION,
+            'rows': sum(group['rows'] for group in self.groups),
+            'columns': self.columns,
+            'ranges': ranges,
+            'groups': self.groups,
+            **self.meta,
+        }
+        self._archive.writestr('meta.json', json.dumps(header))
+        self._archive.close()
+        os.replace(self._temporary, self.path)
+
+    def abort(self):
+        self._archive.close()
+        os.remove(self._temporary)
+
+
+def write(path, columns, meta=None):
+    """Write ``{name: [values]}`` to ``path`` as one row group, replacing any existing file atomically"""
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError('All columns must have the same number of values')
+    with Writer(path, columns, meta, group_size=max(lengths.pop() if lengths else 0, 1)) as writer:
+        for row in zip(*columns.values()):
+            writer.append(row)
+
+
+class _Mapping(mmap.mmap):
+    # zipfile asks for seekable(), which mmap only has from Python 3.13
+    def seekable(self):
+        return True
+
+
+class ColumnarFile:
+    """Read-side of ``Writer``; whole columns are decompressed on first access and kept"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._map = _Mapping(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._archive = zipfile.ZipFile(self._map)
+        self.meta = json.loads(self._archive.read('meta.json'))
+        # Version 1 files are a single group with the members at the top level
+        self.groups = self.meta['groups'] if 'groups' in self.meta else [
+            {'rows': self.meta['rows'], 'ranges': self.meta['ranges']}
+        ]
+        self._columns = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._archive.close()
+        self._map.close()
+
+    @property
+    def rows(self):
+        return self.meta['rows']
+
+    def range(self, name, group=None):
+        """``(min, max)`` of a column in the file or one group, or None if it has no comparable values"""
+        ranges = self.meta['ranges'] if group is None else self.groups[group]['ranges']
+        bounds = ranges.get(name)
+        return tuple(bounds) if bounds else None
+
+    def groups_overlapping(self, name, low, high):
+        """Indexes of the groups whose ``name`` values may fall within ``low``..``high``"""
+        indexes = []
+        for index in range(len(self.groups)):
+            bounds = self.range(name, index)
+            if bounds is not None and bounds[0] <= high and bounds[1] >= low:
+                indexes.append(index)
+        return indexes
+
+    def group_column(self, group, name):
+        """One group's values of a column; not cached, so a scan holds one group at a time"""
+        if 'groups' not in self.meta:
+            return self.column(name)
+        return json.loads(self._archive.read(f'{group}/{name}.json'))
+
+    def column(self, name):
+        if name not in self._columns:
+            if 'groups' not in self.meta:
+                self._columns[name] = json.loads(self._archive.read(f'{name}.json'))
+            else:
+                values = []
+                for group in range(len(self.groups)):
+                    values.extend(self.group_column(group, name))
+                self._columns[name] = values
+        return self._columns[name]
+
+    def iter_rows(self, names=None):
+        """Yield every row as a dict of ``names`` (all columns by default), one group at a time"""
+        names = list(names or self.meta['columns'])
+        for group in range(len(self.groups)):
+            values = [self.group_column(group, name) for name in names]
+            for row in zip(*values):
+                yield dict(zip(names, row))
@@ -0,0 +1,118 @@
+import base58
+import collections
+import logging
+import threading
+import time
+from django.conf import settings
+from solana.account import Account
+
+logger = logging.getLogger(__name__)
+
+# Code paths allowed to obtain a user's signing key
+SIGNING_PURPOSES = {'repayment'}
+
+
+class SigningKeyAccessDenied(Exception):
+    pass
+
+
+class _AccountCache:
+    """Short-lived in-process cache of decoded ``Account`` objects.
+
+    Entries expire after ``ttl`` seconds and the cache holds at most
+    ``max_size`` accounts. Evicted accounts have their secret dropped so a
+    stale reference elsewhere cannot keep signing. Python cannot zero
+    immutable ``bytes``, so this is a best-effort wipe.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _wipe(account):
+        account._secret = None
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            account, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                self._wipe(account)
+                return None
+            self._entries.move_to_end(user_id)
+            return account
+
+    def put(self, user_id, account):
+        with self._lock:
+            previous = self._entries.pop(user_id, None)
+            if previous is not None and previous[0] is not account:
+                self._wipe(previous[0])
+            self._entries[user_id] = (account, time.monotonic() + self.ttl)
+            while len(self._entries) > self.max_size:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._wipe(evicted)
+
+    def evict(self, user_id):
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self._wipe(entry[0])
+
+    def clear(self):
+        with self._lock:
+            for account, _ in self._entries.values():
+                self._wipe(account)
+            self._entries.clear()
+
+
+_cache = _AccountCache(
+    ttl=getattr(settings, 'SIGNING_KEY_CACHE_TTL', 0),
+    max_size=getattr(settings, 'SIGNING_KEY_CACHE_SIZE', 256),
+)
+
+
+def has_signing_key(user_id):
+    """Check that a user has a signing key without reading or decrypting it"""
+    from core.models import SigningKey
+    return SigningKey.objects.filter(user_id=user_id).exists()
+
+
+def store_signing_key(user_id, private_key):
+    """Store (or replace) a user's base58-encoded signing key"""
+    from core.models import SigningKey
+    SigningKey.objects.update_or_create(user_id=user_id, defaults={'encrypted_key': private_key})
+    _cache.evict(user_id)
+
+
+def get_signing_account(user_id, purpose):
+    """Decrypt a user's signing key and return it as an ``Account``.
+
+    Only the signing paths listed in ``SIGNING_PURPOSES`` may call this.
+    With ``SIGNING_KEY_CACHE_TTL`` set, decoded accounts are kept in memory
+    for that many seconds.
+    """
+    from core.models import SigningKey
+
+    if purpose not in SIGNING_PURPOSES:
+        raise SigningKeyAccessDenied(f"'{purpose}' may not use signing keys")
+
+    if _cache.ttl:
+        account = _cache.get(user_id)
+        if account is not None:
+            return account
+
+    encrypted_key = SigningKey.objects.filter(user_id=user_id).values_list('encrypted_key', flat=True).first()
+    if not encrypted_key:
+        raise SigningKeyAccessDenied(f"User {user_id} has no signing key")
+    logger.info(f"Signing key for user {user_id} loaded for {purpose}")
+    account = Account(base58.b58decode(encrypted_key))
+
+    if _cache.ttl:
+        _cache.put(user_id, account)
+    return account
@@ -0,0 +1,281 @@
+"""In-process metrics with a Prometheus text exposition.
+
+Counters, gauges and histograms are aggregated in memory under one lock, so
+recording a value is a dict lookup and an addition. When ``METRICS_DIR`` is
+set, each process writes its totals to ``metrics-<pid>.json`` in that
+directory, at most once per ``FLUSH_INTERVAL`` and again at exit.
+``/metrics`` merges every file, so gunicorn workers, Celery workers and the
+listener report as one target. Counters and histograms are summed across
+files. For each gauge the most recently written fresh value wins. Clear the
+directory when deploying, as with prometheus_client's multiprocess mode.
+
+Without ``METRICS_DIR`` the endpoint reports only the serving process.
+"""
+import atexit
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from django.conf import settings
+
+FLUSH_INTERVAL = 1.0
+GAUGE_STALE_SECONDS = 300
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = {}
+
+
+class _Store:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}  # (metric name, label values) -> float, or [bucket counts..., sum, count]
+        self.pid = os.getpid()
+        self.last_flush = 0.0
+
+    def check_fork(self):
+        # A forked worker must not report its parent's totals as its own
+        if self.pid != os.getpid():
+            with self.lock:
+                self.values = {}
+                self.pid = os.getpid()
+                self.last_flush = 0.0
+
+
+_store = _Store()
+
+
+def _metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _metrics[name] = self
+
+    def _key(self, labels):
+        return self.name, tuple(str(labels.get(label, '')) for label in self.labelnames)
+
+    def describe(self):
+        return {'kind': self.kind, 'help': self.documentation, 'labelnames': list(self.labelnames)}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        _store.check_fork()
+        key = self._key(labels)
+        with _store.lock:
+            _store.values[key] = _store.values.get(key, 0) + amount
+        _maybe_flush()
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        _store.check_fork()
+        key = self._key(labels)
+        with _store.lock:
+            _store.values[key] = value
+        _maybe_flush()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def describe(self):
+        return dict(super().describe(), buckets=list(self.buckets))
+
+    def observe(self, value, **labels):
+        _store.check_fork()
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with _store.lock:
+            counts = _store.values.get(key)
+            if counts is None:
+                # One slot per bucket plus +Inf, then sum and count
+                counts = _store.values[key] = [0] * (len(self.buckets) + 3)
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+        _maybe_flush()
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def _snapshot():
+    with _store.lock:
+        values = {key: list(value) if isinstance(value, list) else value for key, value in _store.values.items()}
+    samples = {}
+    for (name, label_values), value in values.items():
+        samples.setdefault(name, []).append([list(label_values), value])
+    return samples
+
+
+def flush():
+    """Write this process's totals to METRICS_DIR"""
+    directory = _metrics_dir()
+    if not directory:
+        return
+    _store.last_flush = time.monotonic()
+    data = {'pid': os.getpid(), 'written_at': time.time(), 'samples': _snapshot()}
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-metrics-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, os.path.join(directory, f'metrics-{os.getpid()}.json'))
+
+
+def _maybe_flush():
+    if _metrics_dir() and time.monotonic() - _store.last_flush >= FLUSH_INTERVAL:
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+atexit.register(lambda: _metrics_dir() and flush())
+
+
+def _collect():
+    """Merged samples: {name: {label values: value}}"""
+    directory = _metrics_dir()
+    if not directory:
+        return {name: {tuple(labels): value for labels, value in rows} for name, rows in _snapshot().items()}
+
+    flush()
+    merged, gauge_written = {}, {}
+    now = time.time()
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, rows in data['samples'].items():
+            metric = _metrics.get(name)
+            if metric is None:
+                continue
+            series = merged.setdefault(name, {})
+            for labels, value in rows:
+                labels = tuple(labels)
+                if metric.kind == 'gauge':
+                    if now - data['written_at'] > GAUGE_STALE_SECONDS:
+                        continue
+                    if data['written_at'] >= gauge_written.get((name, labels), 0):
+                        gauge_written[(name, labels)] = data['written_at']
+                        series[labels] = value
+                elif metric.kind == 'histogram':
+                    current = series.get(labels)
+                    series[labels] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    series[labels] = series.get(labels, 0) + value
+    return merged
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def render():
+    """Every metric in the Prometheus text format (version 0.0.4)"""
+    lines = []
+    collected = _collect()
+    for name, metric in sorted(_metrics.items()):
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for label_values, value in sorted(collected.get(name, {}).items()):
+            if metric.kind == 'histogram':
+                cumulative = 0
+                for bound, count in zip(list(metric.buckets) + ['+Inf'], value[:-2]):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == '+Inf' else f'le="{bound}"'
+                    lines.append(f'{name}_bucket{_labels(metric.labelnames, label_values, le)} {cumulative}')
+                lines.append(f'{name}_sum{_labels(metric.labelnames, label_values)} {_number(value[-2])}')
+                lines.append(f'{name}_count{_labels(metric.labelnames, label_values)} {_number(value[-1])}')
+            else:
+                lines.append(f'{name}{_labels(metric.labelnames, label_values)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# Metrics recorded across the project
+REQUEST_LATENCY = Histogram(
+    'credlend_http_request_duration_seconds', 'HTTP request latency by route (viewset action)',
+    ['route', 'method', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'credlend_http_request_db_queries', 'Database queries per HTTP request by route',
+    ['route'], buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+DB_QUERIES = Counter('credlend_db_queries_total', 'Database queries executed while serving HTTP requests', ['route'])
+TASK_LATENCY = Histogram(
+    'credlend_celery_task_duration_seconds', 'Celery task run time by task', ['task'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+TASK_FAILURES = Counter('credlend_celery_task_failures_total', 'Celery task failures by task', ['task'])
+TASK_RETRIES = Counter('credlend_celery_task_retries_total', 'Celery task retries by task', ['task'])
+RPC_LATENCY = Histogram(
+    'credlend_solana_rpc_duration_seconds', 'Solana RPC call latency by method and outcome', ['method', 'outcome'],
+)
+RPC_RATE_LIMIT_THROTTLED = Counter(
+    'credlend_solana_rpc_throttled_total', 'Solana RPC calls that waited for a rate-limit token, by class',
+    ['rpc_class'],
+)
+RPC_RATE_LIMIT_WAIT = Counter(
+    'credlend_solana_rpc_rate_limit_wait_seconds_total', 'Time Solana RPC calls spent waiting for a rate-limit token',
+    ['rpc_class'],
+)
+LISTENER_EVENTS = Counter('credlend_listener_events_total', 'Program events handled by solana_listener', ['event'])
+LISTENER_LAG_SLOTS = Gauge(
+    'credlend_listener_lag_slots', 'Slots between the chain head and the last notification solana_listener handled',
+)
+LISTENER_LAST_EVENT = Gauge(
+    'credlend_listener_last_notification_timestamp_seconds', 'Unix time of the last notification solana_listener handled',
+)
+KYC_IMAGES_NORMALIZED = Counter(
+    'credlend_kyc_images_normalized_total', 'KYC document images rendered by kyc.images, by outcome', ['outcome'],
+)
+KYC_NORMALIZE_THROUGHPUT = Gauge(
+    'credlend_kyc_normalize_images_per_second_per_core', 'Images per second per worker process in the last KYC normalization batch',
+)
@@ -0,0 +1,545 @@
+"""Local stand-in for a Solana JSON-RPC and websocket endpoint.
+
+Speaks the subset of the API this project uses, so the chain paths can be
+benchmarked offline: ``RepaymentViewSet.pay`` through the outbox,
+``liquidate_loan_collateral``, the blockhash provider and
+``solana_listener``. A profile sets latency, jitter, tail stalls, error rate
+and a requests-per-second ceiling. Every random choice comes from a seeded
+generator, so runs can be reproduced.
+
+The chain is simulated just enough to stay consistent. Slots advance with
+wall time. A sent transaction is processed at once and becomes confirmed
+and then finalized. Accounts can be seeded for ``getAccountInfo`` and
+``getProgramAccounts``.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import base58
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROGRAM_ID = 'EpqAoepRUWzcUNmdvTuWVeoXHTbmEKuZRhWobfAbornY'
+FINALIZED_CONFIRMATIONS = 32
+
+PROFILES = {
+    # No injected delay; measures our own overhead
+    'instant': {'latency': 0.0, 'jitter': 0.0, 'tail_rate': 0.0, 'tail_latency': 0.0,
+                'error_rate': 0.0, 'max_rps': None, 'slot_seconds': 0.01},
+    # A nearby validator or paid RPC
+    'local': {'latency': 0.003, 'jitter': 0.004, 'tail_rate': 0.001, 'tail_latency': 0.05,
+              'error_rate': 0.0, 'max_rps': None, 'slot_seconds': 0.4},
+    # Public devnet on a good day
+    'devnet': {'latency': 0.12, 'jitter': 0.08, 'tail_rate': 0.02, 'tail_latency': 1.0,
+               'error_rate': 0.005, 'max_rps': 40, 'slot_seconds': 0.4},
+    # Overloaded provider: slow, flaky and tightly rate limited
+    'degraded': {'latency': 0.4, 'jitter': 0.3, 'tail_rate': 0.1, 'tail_latency': 3.0,
+                 'error_rate': 0.05, 'max_rps': 10, 'slot_seconds': 0.6},
+}
+
+
+def _profile(name, overrides):
+    settings = dict(PROFILES[name])
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    return settings
+
+
+class MockChain:
+    """Slots, blockhashes, signatures and accounts shared by the HTTP and websocket servers"""
+
+    BASE_SLOT = 1000
+    SLOTS_PER_BLOCKHASH = 150
+
+    def __init__(self, slot_seconds=0.4, program_id=DEFAULT_PROGRAM_ID, default_balance=10 ** 9):
+        self.slot_seconds = slot_seconds
+        self.program_id = program_id
+        self.default_balance = default_balance
+        self.started = time.monotonic()
+        self.transactions = {}  # signature -> {'slot', 'logs', 'err'}
+        self.accounts = {}  # pubkey -> {'owner', 'lamports', 'data'}
+        self.balances = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def slot(self):
+        elapsed = time.monotonic() - self.started
+        return self.BASE_SLOT + int(elapsed / self.slot_seconds) if self.slot_seconds else self.BASE_SLOT
+
+    def blockhash(self, slot=None):
+        epoch = (slot or self.slot()) // self.SLOTS_PER_BLOCKHASH
+        return base58.b58encode(hashlib.sha256(f'mock-blockhash:{epoch}'.encode()).digest()).decode()
+
+    def last_valid_block_height(self):
+        return self.slot() + self.SLOTS_PER_BLOCKHASH
+
+    def add_listener(self, callback):
+        """Call ``callback(signature, slot, logs, err)`` for every transaction that lands"""
+        self._listeners.append(callback)
+
+    def land(self, signature, logs=None, err=None):
+        slot = self.slot()
+        with self._lock:
+            self.transactions[signature] = {'slot': slot, 'logs': logs or [], 'err': err}
+        for callback in self._listeners:
+            callback(signature, slot, logs or [], err)
+        return slot
+
+    def signature_status(self, signature):
+        with self._lock:
+            landed = self.transactions.get(signature)
+        if landed is None:
+            return None
+        confirmations = self.slot() - landed['slot']
+        if confirmations < 0:
+            return None
+        if confirmations >= FINALIZED_CONFIRMATIONS:
+            status, confirmations = 'finalized', None
+        else:
+            status = 'confirmed' if confirmations >= 1 else 'processed'
+        return {
+            'slot': landed['slot'],
+            'confirmations': confirmations,
+            'err': landed['err'],
+            'status': {'Ok': None} if landed['err'] is None else {'Err': landed['err']},
+            'confirmationStatus': status,
+        }
+
+    def set_account(self, pubkey, data=b'', owner=None, lamports=None):
+        with self._lock:
+            self.accounts[pubkey] = {
+                'owner': owner or self.program_id,
+                'lamports': lamports if lamports is not None else 2 * 10 ** 6,
+                'data': bytes(data),
+            }
+
+    def account(self, pubkey):
+        with self._lock:
+            return self.accounts.get(pubkey)
+
+    def program_accounts(self, program_id):
+        with self._lock:
+            return [(pubkey, account) for pubkey, account in self.accounts.items()
+                    if account['owner'] == program_id]
+
+    def balance(self, pubkey):
+        return self.balances.get(pubkey, self.default_balance)
+
+
+def _matches(data, filters):
+    for item in filters or []:
+        if 'dataSize' in item and len(data) != item['dataSize']:
+            return False
+        if 'memcmp' in item:
+            offset = item['memcmp']['offset']
+            expected = base58.b58decode(item['memcmp']['bytes'])
+            if data[offset:offset + len(expected)] != expected:
+                return False
+    return True
+
+
+def _encode_account(account, config):
+    data = account['data']
+    data_slice = (config or {}).get('dataSlice')
+    if data_slice:
+        data = data[data_slice['offset']:data_slice['offset'] + data_slice['length']]
+    if (config or {}).get('encoding') == 'base58':
+        encoded = [base58.b58encode(data).decode(), 'base58']
+    else:
+        encoded = [base64.b64encode(data).decode(), 'base64']
+    return {
+        'data': encoded,
+        'executable': False,
+        'lamports': account['lamports'],
+        'owner': account['owner'],
+        'rentEpoch': 0,
+    }
+
+
+def _first_signature(wire):
+    """Base58 signature of a serialized transaction (compact-u16 count, then 64-byte signatures)"""
+    count, offset, shift = 0, 0, 0
+    while True:
+        byte = wire[offset]
+        count |= (byte & 0x7f) << shift
+        offset += 1
+        if not byte & 0x80:
+            break
+        shift += 7
+    if count == 0:
+        raise ValueError('transaction has no signatures')
+    return base58.b58encode(wire[offset:offset + 64]).decode()
+
+
+class RPCError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class MockRPCServer:
+    """JSON-RPC over HTTP with injected latency, failures and a throughput ceiling"""
+
+    def __init__(self, host='127.0.0.1', port=0, profile='instant', chain=None, seed=None, **overrides):
+        settings = _profile(profile, overrides)
+        self.latency = settings['latency']
+        self.jitter = settings['jitter']
+        self.tail_rate = settings['tail_rate']
+        self.tail_latency = settings['tail_latency']
+        self.error_rate = settings['error_rate']
+        self.max_rps = settings['max_rps']
+        self.chain = chain or MockChain(slot_seconds=settings['slot_seconds'])
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.by_method = {}
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                try:
+                    request = json.loads(body or b'{}')
+                except ValueError:
+                    status, payload = 400, {'jsonrpc': '2.0', 'id': None,
+                                            'error': {'code': -32700, 'message': 'Parse error'}}
+                else:
+                    if isinstance(request, list):
+                        responses = [server.handle_rpc(item) for item in request]
+                        status, payload = max(code for code, _ in responses), [body for _, body in responses]
+                    else:
+                        status, payload = server.handle_rpc(request)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                # /health, as used by HTTPProvider.is_connected()
+                data = b'ok'
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _over_limit(self):
+        if not self.max_rps:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self.max_rps:
+                return True
+            self._recent.append(now)
+            return False
+
+    def _draw(self):
+        with self._lock:
+            delay = self.latency + self.random.random() * self.jitter
+            if self.tail_rate and self.random.random() < self.tail_rate:
+                delay += self.tail_latency
+            fail = bool(self.error_rate) and self.random.random() < self.error_rate
+        return delay, fail
+
+    def handle_rpc(self, request):
+        request_id = request.get('id')
+        method = request.get('method')
+        with self._lock:
+            self.requests += 1
+            self.by_method[method] = self.by_method.get(method, 0) + 1
+
+        if self._over_limit():
+            with self._lock:
+                self.throttled += 1
+            return 429, {'jsonrpc': '2.0', 'id': request_id,
+                         'error': {'code': 429, 'message': 'Too many requests for a specific RPC call'}}
+
+        delay, fail = self._draw()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            with self._lock:
+                self.errors += 1
+            return 503, {'jsonrpc': '2.0', 'id': request_id,
+                         'error': {'code': -32005, 'message': 'Node is unhealthy (injected failure)'}}
+
+        try:
+            result = self.result_for(method, request.get('params') or [])
+        except RPCError as e:
+            return 200, {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': e.code, 'message': e.message}}
+        return 200, {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+    def _context(self, value):
+        return {'context': {'slot': self.chain.slot()}, 'value': value}
+
+    def result_for(self, method, params):
+        chain = self.chain
+        config = params[1] if len(params) > 1 and isinstance(params[1], dict) else {}
+
+        if method == 'getHealth':
+            return 'ok'
+        if method == 'getVersion':
+            return {'solana-core': '1.18.0-mock', 'feature-set': 0}
+        if method in ('getSlot', 'getBlockHeight'):
+            return chain.slot()
+        if method == 'getBalance':
+            return self._context(chain.balance(params[0]))
+        if method == 'getLatestBlockhash':
+            return self._context({'blockhash': chain.blockhash(),
+                                  'lastValidBlockHeight': chain.last_valid_block_height()})
+        if method == 'getRecentBlockhash':
+            return self._context({'blockhash': chain.blockhash(),
+                                  'feeCalculator': {'lamportsPerSignature': 5000}})
+        if method == 'getMinimumBalanceForRentExemption':
+            return 890880 + 6960 * int(params[0])
+        if method == 'getSignatureStatuses':
+            return self._context([chain.signature_status(signature) for signature in params[0]])
+        if method == 'getTransaction' or method == 'getConfirmedTransaction':
+            landed = chain.transactions.get(params[0])
+            if landed is None:
+                return None
+            return {'slot': landed['slot'], 'blockTime': int(time.time()),
+                    'meta': {'err': landed['err'], 'fee': 5000, 'logMessages': landed['logs']},
+                    'transaction': {'signatures': [params[0]]}}
+        if method == 'sendTransaction':
+            if config.get('encoding') == 'base58':
+                wire = base58.b58decode(params[0])
+            else:
+                wire = base64.b64decode(params[0])
+            try:
+                signature = _first_signature(wire)
+            except (IndexError, ValueError):
+                raise RPCError(-32602, 'invalid transaction: failed to deserialize')
+            chain.land(signature)
+            return signature
+        if method == 'requestAirdrop':
+            signature = base58.b58encode(hashlib.sha256(f'airdrop:{params[0]}:{time.time()}'.encode()).digest() * 2).decode()
+            chain.balances[params[0]] = chain.balance(params[0]) + int(params[1])
+            chain.land(signature)
+            return signature
+        if method == 'getAccountInfo':
+            account = chain.account(params[0])
+            return self._context(_encode_account(account, config) if account else None)
+        if method == 'getMultipleAccounts':
+            accounts = [chain.account(pubkey) for pubkey in params[0]]
+            return self._context([_encode_account(account, config) if account else None for account in accounts])
+        if method == 'getProgramAccounts':
+            results = [
+                {'pubkey': pubkey, 'account': _encode_account(account, config)}
+                for pubkey, account in chain.program_accounts(params[0])
+                if _matches(account['data'], config.get('filters'))
+            ]
+            return self._context(results) if config.get('withContext') else results
+        raise RPCError(-32601, f'Method not found: {method}')
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors,
+                    'throttled': self.throttled, 'by_method': dict(self.by_method)}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+# Instruction logged by the program before it emits each event
+EVENT_INSTRUCTIONS = {
+    'LoanRequestedEvent': 'RequestLoan',
+    'LoanRepaidEvent': 'RepayLoan',
+    'LoanLiquidatedEvent': 'LiquidateLoan',
+    'UserWhitelistedEvent': 'WhitelistUser',
+    'UserWhitelistRemovedEvent': 'RemoveWhitelist',
+    'TreasuryDepositEvent': 'DepositToTreasury',
+    'TreasuryWithdrawalEvent': 'WithdrawFromTreasury',
+    'AdminAddedEvent': 'AddAdmin',
+}
+
+
+def program_logs(program_id, event_name, payload):
+    """Log lines of a successful program instruction that emitted one event"""
+    return [
+        f'Program {program_id} invoke [1]',
+        f'Program log: Instruction: {EVENT_INSTRUCTIONS.get(event_name, event_name)}',
+        f'Program data: {payload}',
+        f'Program {program_id} consumed 24811 of 200000 compute units',
+        f'Program {program_id} success',
+    ]
+
+
+def load_event_script(path):
+    """Read a scripted event sequence.
+
+    Either a JSON list or JSON lines of steps such as
+    ``{"event": "LoanRepaidEvent", "fields": {...}, "delay": 0.5, "repeat": 10}``.
+    ``delay`` is the pause before the step and ``repeat`` defaults to 1.
+    """
+    with open(path) as f:
+        text = f.read().strip()
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def synthetic_event_script(count, rate, seed=None):
+    """``count`` random loan lifecycle events at ``rate`` events per second"""
+    rng = random.Random(seed)
+
+    def pubkey():
+        return base58.b58encode(bytes(rng.getrandbits(8) for _ in range(32))).decode()
+
+    usdc_mint = pubkey()
+    steps = []
+    for _ in range(count):
+        borrower, loan = pubkey(), pubkey()
+        amount = rng.randrange(10, 10000) * 10 ** 6
+        name = rng.choices(['LoanRequestedEvent', 'LoanRepaidEvent', 'LoanLiquidatedEvent'],
+                           weights=[5, 4, 1])[0]
+        if name == 'LoanRequestedEvent':
+            fields = {'borrower': borrower, 'loan': loan, 'collateral_amount': amount * 2,
+                      'loan_amount': amount, 'loan_mint': usdc_mint,
+                      'due_time': int(time.time()) + rng.randrange(7, 90) * 86400}
+        elif name == 'LoanRepaidEvent':
+            fields = {'borrower': borrower, 'loan': loan, 'repayment_amount': amount,
+                      'collateral_released_amount': amount * 2}
+        else:
+            fields = {'borrower': borrower, 'loan': loan, 'collateral_liquidated_amount': amount * 2}
+        steps.append({'event': name, 'fields': fields, 'delay': 1.0 / rate if rate else 0})
+    return steps
+
+
+class MockWebsocketServer:
+    """Websocket pubsub for ``logsSubscribe`` and ``signatureSubscribe``.
+
+    Transactions landing on the chain, including those sent over HTTP, are
+    pushed to matching subscribers. ``emit_script`` replays Anchor events
+    as program logs.
+    """
+
+    def __init__(self, chain, host='127.0.0.1', port=0):
+        self.chain = chain
+        self.host = host
+        self.port = port
+        self.notifications = 0
+        self._subscriptions = {}  # id -> (websocket, kind, params)
+        self._next_id = 1
+        self._loop = None
+        self._server = None
+        chain.add_listener(self._on_landed)
+
+    @property
+    def url(self):
+        return f'ws://{self.host}:{self.port}'
+
+    async def start(self):
+        import websockets
+
+        self._loop = asyncio.get_running_loop()
+        self._server = await websockets.serve(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve(self, websocket, path=None):
+        try:
+            async for message in websocket:
+                request = json.loads(message)
+                result = self._handle(websocket, request.get('method'), request.get('params') or [])
+                await websocket.send(json.dumps({'jsonrpc': '2.0', 'id': request.get('id'), 'result': result}))
+        finally:
+            for sub_id in [key for key, sub in self._subscriptions.items() if sub[0] is websocket]:
+                self._subscriptions.pop(sub_id, None)
+
+    def _handle(self, websocket, method, params):
+        if method in ('logsSubscribe', 'signatureSubscribe'):
+            sub_id = self._next_id
+            self._next_id += 1
+            self._subscriptions[sub_id] = (websocket, method, params)
+            return sub_id
+        if method in ('logsUnsubscribe', 'signatureUnsubscribe'):
+            return self._subscriptions.pop(params[0], None) is not None
+        return None
+
+    def _on_landed(self, signature, slot, logs, err):
+        # Called from HTTP handler threads as well as from the loop
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._publish, signature, slot, logs, err)
+
+    def _publish(self, signature, slot, logs, err):
+        for sub_id, (websocket, kind, params) in list(self._subscriptions.items()):
+            if kind == 'logsSubscribe':
+                # Only program transactions carry logs here; plain transfers are not published
+                if not logs:
+                    continue
+                mentions = params[0].get('mentions') if params and isinstance(params[0], dict) else None
+                if mentions and not any(any(key in line for line in logs) for key in mentions):
+                    continue
+                value = {'signature': signature, 'err': err, 'logs': logs}
+                method = 'logsNotification'
+            elif params and params[0] == signature:
+                value = {'err': err}
+                method = 'signatureNotification'
+                self._subscriptions.pop(sub_id, None)
+            else:
+                continue
+            message = {'jsonrpc': '2.0', 'method': method, 'params': {
+                'result': {'context': {'slot': slot}, 'value': value}, 'subscription': sub_id,
+            }}
+            self.notifications += 1
+            asyncio.ensure_future(websocket.send(json.dumps(message)))
+
+    async def wait_for_subscriber(self):
+        while not any(kind == 'logsSubscribe' for _, kind, _ in self._subscriptions.values()):
+            await asyncio.sleep(0.05)
+
+    async def emit_script(self, steps):
+        """Land one transaction per scripted event; returns the number emitted"""
+        from .anchor_events import encode_event
+
+        emitted = 0
+        for step in steps:
+            for _ in range(step.get('repeat', 1)):
+                if step.get('delay'):
+                    await asyncio.sleep(step['delay'])
+                payload = encode_event(step['event'], step['fields'])
+                signature = base58.b58encode(hashlib.sha256(
+                    f"{step['event']}:{emitted}:{payload}".encode()
+                ).digest() * 2).decode()
+                self.chain.land(signature, logs=program_logs(self.chain.program_id, step['event'], payload))
+                emitted += 1
+        return emitted
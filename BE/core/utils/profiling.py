@@ -0,0 +1,176 @@
+"""Per-request profiling: stack sampling plus SQL, cache and RPC timings.
+
+A ``RequestProfiler`` is active only for requests that ``ProfilingMiddleware``
+chose to profile. It samples the request thread's stack on a background
+thread and folds the samples into ``a;b;c count`` lines, which flamegraph.pl
+and speedscope read directly. Instrumented code reports through
+``record_cache`` and ``record_rpc``. With no active profile, each of those
+costs one context-variable lookup.
+"""
+import contextvars
+import functools
+import sys
+import threading
+import time
+from collections import Counter
+
+_current = contextvars.ContextVar('request_profiler', default=None)
+
+MAX_SLOW_QUERIES = 10
+MAX_SQL_LENGTH = 500
+
+
+def current_profiler():
+    return _current.get()
+
+
+def record_rpc(method, elapsed):
+    profiler = _current.get()
+    if profiler is not None:
+        profiler.rpc_calls += 1
+        profiler.rpc_time += elapsed
+        profiler.rpc_methods[method] += 1
+
+
+def record_cache(elapsed):
+    profiler = _current.get()
+    if profiler is not None:
+        profiler.cache_calls += 1
+        profiler.cache_time += elapsed
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class _StackSampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True, name='request-profiler')
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfiler:
+    """Collects one request's profile; use as a context manager around the view"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.slow_queries = []
+        self.cache_calls = 0
+        self.cache_time = 0.0
+        self.rpc_calls = 0
+        self.rpc_time = 0.0
+        self.rpc_methods = Counter()
+        self.duration = 0.0
+        self._sampler = None
+        self._token = None
+        self._wrappers = []
+
+    def __enter__(self):
+        from django.db import connections
+
+        self._token = _current.set(self)
+        for connection in connections.all():
+            wrapper = connection.execute_wrapper(self._time_query)
+            wrapper.__enter__()
+            self._wrappers.append(wrapper)
+        self._sampler = _StackSampler(threading.get_ident(), self.interval)
+        self._started = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self._started
+        self._sampler.stop()
+        for wrapper in reversed(self._wrappers):
+            wrapper.__exit__(*exc_info)
+        _current.reset(self._token)
+        return False
+
+    def _time_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql_count += 1
+            self.sql_time += elapsed
+            self.slow_queries.append((elapsed, sql[:MAX_SQL_LENGTH]))
+            if len(self.slow_queries) > MAX_SLOW_QUERIES * 2:
+                self.slow_queries = sorted(self.slow_queries, reverse=True)[:MAX_SLOW_QUERIES]
+
+    def folded_stacks(self):
+        """Samples in folded format, one ``frame;frame;frame count`` line per distinct stack"""
+        return '\n'.join(f'{stack} {count}' for stack, count in self._sampler.stacks.most_common())
+
+    def summary(self):
+        return {
+            'duration_ms': self.duration * 1000,
+            'cpu_samples': self._sampler.samples,
+            'sql_count': self.sql_count,
+            'sql_ms': self.sql_time * 1000,
+            'cache_calls': self.cache_calls,
+            'cache_ms': self.cache_time * 1000,
+            'rpc_calls': self.rpc_calls,
+            'rpc_ms': self.rpc_time * 1000,
+            'details': {
+                'slow_queries': [
+                    {'ms': round(elapsed * 1000, 3), 'sql': sql}
+                    for elapsed, sql in sorted(self.slow_queries, reverse=True)[:MAX_SLOW_QUERIES]
+                ],
+                'rpc_methods': dict(self.rpc_methods),
+                'sample_interval_ms': self.interval * 1000,
+            },
+        }
+
+
+CACHE_METHODS = (
+    'get', 'set', 'add', 'delete', 'get_many', 'set_many', 'delete_many',
+    'incr', 'decr', 'get_or_set', 'has_key', 'touch',
+)
+
+
+def instrument_cache_backend(backend_class):
+    """Time cache calls made while a profile is active; safe to call more than once"""
+    if getattr(backend_class, '_profiling_instrumented', False):
+        return
+
+    def timed(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return method(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record_cache(time.perf_counter() - started)
+        return wrapper
+
+    for name in CACHE_METHODS:
+        if name in backend_class.__dict__:
+            setattr(backend_class, name, timed(backend_class.__dict__[name]))
+    backend_class._profiling_instrumented = True
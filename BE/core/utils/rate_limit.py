@@ -0,0 +1,132 @@
+import logging
+import random
+import time
+from django.core.cache import cache
+from .metrics import RPC_RATE_LIMIT_THROTTLED, RPC_RATE_LIMIT_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Atomic token bucket in Redis: refills by elapsed time, takes one token if
+# available and otherwise returns how long to wait for the next one.
+_REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    """Token bucket whose state lives in the Django cache.
+
+    With the Redis cache backend the refill-and-take step is a Lua script, so
+    every process sharing the cache draws from the same bucket. Other
+    backends count tokens in fixed windows of ``capacity`` tokens, each
+    ``capacity / rate`` seconds long, with the backend's atomic ``add`` and
+    ``incr``. The average rate is the same; a burst straddling two windows
+    can reach twice the capacity. Either way the budget is only shared by
+    the processes that share the cache, which ``LocMemCache`` does not
+    (see ``core.checks``).
+    """
+
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.key = f'ratelimit:{name}'
+        self._script = None
+
+    def _redis_client(self):
+        backend = getattr(cache, '_cache', None)
+        if backend is None or not hasattr(backend, 'get_client'):
+            return None
+        return backend.get_client(self.key, write=True)
+
+    def _try_take_redis(self, client):
+        if self._script is None:
+            self._script = client.register_script(_REDIS_TOKEN_BUCKET)
+        key = cache.make_and_validate_key(self.key)
+        return float(self._script(keys=[key], args=[self.rate, self.capacity], client=client))
+
+    def _try_take_counter(self):
+        window = self.capacity / self.rate
+        now = time.time()
+        index = int(now // window)
+        key = f'{self.key}:{index}'
+        cache.add(key, 0, int(window) + 2)
+        try:
+            taken = cache.incr(key)
+        except ValueError:
+            # The window expired between add() and incr()
+            cache.add(key, 1, int(window) + 2)
+            taken = 1
+        if taken <= self.capacity:
+            return 0.0
+        return (index + 1) * window - now
+
+    def try_take(self):
+        """Take a token if one is available; return seconds to wait otherwise (0 on success)"""
+        client = self._redis_client()
+        if client is not None:
+            return self._try_take_redis(client)
+        return self._try_take_counter()
+
+    def acquire(self):
+        """Block until a token is available and return the total time spent waiting"""
+        waited = 0.0
+        while True:
+            wait = self.try_take()
+            if wait <= 0:
+                return waited
+            # Jitter so waiters across processes do not retry in lockstep
+            delay = wait * (1 + random.random() * 0.2)
+            time.sleep(delay)
+            waited += delay
+
+
+def _incr(key, amount):
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, None):
+            cache.incr(key, amount)
+
+
+class RateLimiterStats:
+    """Throttling counters, recorded in the cache so all workers add to the same totals.
+
+    They are also exported on ``/metrics`` (``core.utils.metrics``).
+    """
+
+    def record(self, method_class, waited):
+        if waited <= 0:
+            return
+        RPC_RATE_LIMIT_THROTTLED.inc(rpc_class=method_class)
+        RPC_RATE_LIMIT_WAIT.inc(waited, rpc_class=method_class)
+        _incr(f'ratelimit:stats:{method_class}:throttled', 1)
+        _incr(f'ratelimit:stats:{method_class}:wait_ms', int(waited * 1000))
+
+    def snapshot(self, method_classes):
+        stats = {}
+        for method_class in method_classes:
+            throttled = cache.get(f'ratelimit:stats:{method_class}:throttled', 0)
+            wait_ms = cache.get(f'ratelimit:stats:{method_class}:wait_ms', 0)
+            stats[method_class] = {
+                'throttled_calls': throttled,
+                'total_wait_seconds': wait_ms / 1000,
+                'avg_wait_seconds': wait_ms / 1000 / throttled if throttled else 0,
+            }
+        return stats
@@ -0,0 +1,98 @@
+import logging
+import time
+from django.conf import settings
+from solana.rpc.providers.http import HTTPProvider
+from .rate_limit import TokenBucket, RateLimiterStats
+from .rpc_router import EndpointRouter
+from .metrics import RPC_LATENCY
+from .profiling import record_rpc
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+SEND_METHODS = {'sendTransaction', 'requestAirdrop'}
+HEAVY_METHODS = {
+    'getProgramAccounts',
+    'getSignaturesForAddress',
+    'getConfirmedSignaturesForAddress2',
+    'getBlock',
+    'getConfirmedBlock',
+    'getLargestAccounts',
+    'getTokenLargestAccounts',
+}
+
+# (tokens per second, burst capacity) per method class
+DEFAULT_RATE_LIMITS = {
+    'read': (40, 80),
+    'send': (10, 20),
+    'heavy': (1, 2),
+}
+
+
+def method_class(method):
+    """Rate-limit class of an RPC method: 'send', 'heavy' or 'read'"""
+    if method in SEND_METHODS:
+        return 'send'
+    if method in HEAVY_METHODS:
+        return 'heavy'
+    return 'read'
+
+
+class SolanaRPCProvider(HTTPProvider):
+    """HTTP provider that takes a token from a shared bucket before each call.
+
+    Buckets are per method class and live in the cache backend, so Celery
+    workers, web workers and the listener all draw from the same budget.
+    Calls wait for a token rather than failing.
+
+    With several endpoints configured, each call is routed by an
+    ``EndpointRouter`` to the fastest healthy one, and idempotent reads are
+    hedged. ``endpoint_uri`` stays the first endpoint.
+    """
+
+    def __init__(self, endpoint=None, timeout=10, rate_limits=None, endpoints=None):
+        endpoints = list(endpoints or getattr(settings, 'SOLANA_RPC_URLS', None) or [endpoint])
+        super().__init__(endpoints[0], timeout=timeout)
+        self.router = EndpointRouter(endpoints, timeout=timeout)
+        limits = rate_limits or getattr(settings, 'SOLANA_RPC_RATE_LIMITS', DEFAULT_RATE_LIMITS)
+        self.buckets = {
+            name: TokenBucket(f'solana-rpc:{name}', rate, capacity)
+            for name, (rate, capacity) in limits.items()
+        }
+        self.stats = RateLimiterStats()
+
+    def make_request(self, method, *params):
+        name = method_class(method)
+        with span(f'rpc {method}', method=method, rpc_class=name) as rpc_span:
+            bucket = self.buckets.get(name)
+            if bucket is not None:
+                waited = bucket.acquire()
+                if waited:
+                    logger.debug(f"Waited {waited:.3f}s for a '{name}' RPC token ({method})")
+                    self.stats.record(name, waited)
+                    rpc_span.set('rate_limit_wait_ms', round(waited * 1000, 3))
+
+            def take_hedge_token():
+                # A hedge is only worth sending if it fits in the budget right now
+                return bucket is None or bucket.try_take() <= 0
+
+            started = time.perf_counter()
+            outcome = 'error'
+            try:
+                # Never resend a transaction to another node on failure
+                response = self.router.request(
+                    method, params, failover=name != 'send', on_hedge=take_hedge_token
+                )
+                outcome = 'rpc_error' if isinstance(response, dict) and 'error' in response else 'ok'
+                return response
+            finally:
+                elapsed = time.perf_counter() - started
+                record_rpc(method, elapsed)
+                RPC_LATENCY.observe(elapsed, method=method, outcome=outcome)
+                rpc_span.set('outcome', outcome)
+
+    def rate_limit_stats(self):
+        return self.stats.snapshot(self.buckets)
+
+    def endpoint_stats(self):
+        return self.router.stats()
@@ -0,0 +1,200 @@
+"""Latency-aware selection across several Solana RPC endpoints.
+
+Each endpoint keeps an EWMA of its latency, a window of recent samples for
+percentiles and a failure streak. The fastest healthy endpoint serves each
+call. An endpoint that fails repeatedly is cooled down for a while, and
+the cooldown doubles each time it fails again after coming back.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from solana.rpc.providers.http import HTTPProvider
+
+# Reads that return the same answer wherever they are served, so a second
+# copy of the request is safe to send
+HEDGED_METHODS = {
+    'getSignatureStatuses',
+    'getBalance',
+    'getAccountInfo',
+    'getMultipleAccounts',
+    'getTransaction',
+    'getConfirmedTransaction',
+    'getTokenAccountBalance',
+    'getMinimumBalanceForRentExemption',
+}
+
+
+class Endpoint:
+    WINDOW = 200
+    EWMA_ALPHA = 0.2
+    FAILURES_BEFORE_COOLDOWN = 3
+    BASE_COOLDOWN = 5.0
+    MAX_COOLDOWN = 300.0
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.provider = HTTPProvider(url, timeout=timeout)
+        self.samples = deque(maxlen=self.WINDOW)
+        self.ewma = None
+        self.requests = 0
+        self.errors = 0
+        self.failure_streak = 0
+        self.cooldown = self.BASE_COOLDOWN
+        self.unhealthy_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_success(self, elapsed):
+        with self._lock:
+            self.requests += 1
+            self.samples.append(elapsed)
+            self.ewma = elapsed if self.ewma is None else (
+                self.EWMA_ALPHA * elapsed + (1 - self.EWMA_ALPHA) * self.ewma
+            )
+            self.failure_streak = 0
+            self.cooldown = self.BASE_COOLDOWN
+
+    def record_failure(self, elapsed):
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+            self.failure_streak += 1
+            # Count the time lost so a slow, failing endpoint also ranks lower
+            self.ewma = elapsed if self.ewma is None else max(self.ewma, elapsed)
+            if self.failure_streak >= self.FAILURES_BEFORE_COOLDOWN:
+                self.unhealthy_until = time.monotonic() + self.cooldown
+                self.cooldown = min(self.cooldown * 2, self.MAX_COOLDOWN)
+                self.failure_streak = 0
+
+    def is_healthy(self):
+        return time.monotonic() >= self.unhealthy_until
+
+    def percentile(self, fraction):
+        with self._lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+    def score(self):
+        # Unmeasured endpoints score 0 so each one gets tried early on
+        return self.ewma or 0.0
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'healthy': self.is_healthy(),
+            'requests': self.requests,
+            'errors': self.errors,
+            'ewma_ms': round(self.ewma * 1000, 1) if self.ewma is not None else None,
+            'p50_ms': _ms(self.percentile(0.50)),
+            'p95_ms': _ms(self.percentile(0.95)),
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class EndpointRouter:
+    """Routes calls to the fastest healthy endpoint and hedges idempotent reads.
+
+    A hedged read goes to the best endpoint first. If no answer has arrived
+    once that endpoint's p95 latency has passed, the same request goes to
+    the runner-up and whichever answers first wins. Non-idempotent calls
+    such as ``sendTransaction`` are never duplicated.
+    """
+
+    MIN_HEDGE_DELAY = 0.02
+    DEFAULT_HEDGE_DELAY = 0.25
+    MIN_SAMPLES_FOR_P95 = 20
+
+    def __init__(self, urls, timeout=10, max_workers=16):
+        self.endpoints = [Endpoint(url, timeout=timeout) for url in urls]
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='rpc-hedge')
+
+    def ranked(self):
+        """Healthy endpoints fastest first; every endpoint if none is healthy"""
+        healthy = [endpoint for endpoint in self.endpoints if endpoint.is_healthy()]
+        return sorted(healthy or self.endpoints, key=lambda endpoint: endpoint.score())
+
+    def hedge_delay(self, endpoint):
+        if len(endpoint.samples) < self.MIN_SAMPLES_FOR_P95:
+            return self.DEFAULT_HEDGE_DELAY
+        return max(self.MIN_HEDGE_DELAY, endpoint.percentile(0.95))
+
+    def _call(self, endpoint, method, params):
+        started = time.monotonic()
+        try:
+            response = endpoint.provider.make_request(method, *params)
+        except Exception:
+            endpoint.record_failure(time.monotonic() - started)
+            raise
+        endpoint.record_success(time.monotonic() - started)
+        return response
+
+    def request(self, method, params, failover=True, on_hedge=None):
+        """Send one RPC call.
+
+        With ``failover`` a call that fails is retried on the next endpoint.
+        ``on_hedge`` is called before a duplicate request goes out and may
+        return False to skip the hedge (e.g. when the rate limit is spent).
+        """
+        ranked = self.ranked()
+        if method in HEDGED_METHODS and len(ranked) > 1:
+            return self._hedged(ranked, method, params, on_hedge)
+        if failover:
+            return self._with_failover(ranked, method, params)
+        return self._call(ranked[0], method, params)
+
+    def _with_failover(self, ranked, method, params):
+        last_error = None
+        for endpoint in ranked:
+            try:
+                return self._call(endpoint, method, params)
+            except Exception as e:
+                last_error = e
+        raise last_error
+
+    def _hedged(self, ranked, method, params, on_hedge):
+        primary, backups = ranked[0], ranked[1:]
+        pending = {self._executor.submit(self._call, primary, method, params): primary}
+        done, _ = wait(pending, timeout=self.hedge_delay(primary))
+        hedged = False
+        last_error = None
+
+        while True:
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if hedged and endpoint is not primary:
+                    self.hedge_wins += 1
+                return result
+
+            if backups and not pending:
+                # Every request so far failed: fail over to the next endpoint
+                backup = backups.pop(0)
+                pending[self._executor.submit(self._call, backup, method, params)] = backup
+            elif backups and not hedged:
+                # The primary is slower than its p95: race it against the runner-up
+                hedged = True
+                if on_hedge is None or on_hedge() is not False:
+                    self.hedges += 1
+                    backup = backups.pop(0)
+                    pending[self._executor.submit(self._call, backup, method, params)] = backup
+            if not pending:
+                raise last_error
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+    def stats(self):
+        return {
+            'endpoints': [endpoint.stats() for endpoint in self.endpoints],
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+        }
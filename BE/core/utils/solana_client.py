@@ -8,17 +8,24 @@ from solana.publickey import PublicKey
 from solana.transaction import Transaction
 from solana.system_program import TransferParams, transfer
 from django.conf import settings
+from .blockhash import BlockhashProvider
+from .rpc_provider import SolanaRPCProvider
 
 logger = logging.getLogger(__name__)
 
 class SolanaClient:
     def __init__(self):
         self.client = Client(settings.SOLANA_RPC_URL)
+        # Every call goes through the shared, rate-limited provider
+        self.client._provider = SolanaRPCProvider(settings.SOLANA_RPC_URL)
         # CHANGED: Use Account instead of Keypair in v0.20.0
         if settings.SOLANA_WALLET_PRIVATE_KEY:
             self.account = Account(base58.b58decode(settings.SOLANA_WALLET_PRIVATE_KEY))
         else:
             self.account = None
+        self.program_id = PublicKey(settings.SOLANA_PROGRAM_ID) if settings.SOLANA_PROGRAM_ID else None
+        # Shared by every transaction builder in this process
+        self.blockhash_provider = BlockhashProvider(self.client)
 
     def get_balance(self, public_key_str):
         """Get balance of a wallet"""
@@ -35,7 +42,9 @@ class SolanaClient:
         """Send a transaction - CHANGED SIGNATURE"""
         try:
             # CHANGED: Different API in v0.20.0
-            result = self.client.send_transaction(transaction, self.account)
+            result = self.client.send_transaction(
+                transaction, self.account, recent_blockhash=self.blockhash_provider.get()
+            )
             return result
         except Exception as e:
             logger.error(f"Error sending transaction: {e}")
@@ -55,7 +64,7 @@ class SolanaClient:
         """Create a transfer transaction - CHANGED API"""
         try:
             # CHANGED: Different transaction building in v0.20.0
-            txn = Transaction()
+            txn = Transaction(recent_blockhash=self.blockhash_provider.get())
             txn.add(transfer(
                 TransferParams(
                     from_pubkey=self.account.public_key(),
@@ -86,21 +95,15 @@ class SolanaClient:
             logger.error(f"Error creating loan contract: {e}")
             return None
 
-    def liquidate_collateral(self, loan_address):
-        """Liquidate collateral for a defaulted loan - NEEDS CUSTOM IMPLEMENTATION"""
+    def liquidation_transaction(self, loan_address):
+        """Build the liquidation transaction for a defaulted loan - NEEDS CUSTOM IMPLEMENTATION"""
         # This will depend on your specific Solana program
-        try:
-            # Create liquidation instruction
-            txn = Transaction()
-            
-            # Add your program-specific liquidation instruction
-            # based on your program's IDL/interface
-            
-            result = self.client.send_transaction(txn, self.account)
-            return result['result'] if 'result' in result else None
-        except Exception as e:
-            logger.error(f"Error liquidating collateral: {e}")
-            return None
+        txn = Transaction()
+
+        # Add your program-specific liquidation instruction
+        # based on your program's IDL/interface
+
+        return txn
 
 # Singleton instance
 solana_client = SolanaClient()
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""Lightweight span tracing with W3C ``traceparent`` propagation.
+
+A trace starts at the HTTP request (``TracingMiddleware``) and continues into
+the Celery tasks it queues, through a ``traceparent`` task header, and into
+the outbox dispatcher, through ``ChainIntent.traceparent``. Solana RPC calls
+and outermost database transactions open child spans. Finished spans are
+appended as JSON lines to ``TRACING_EXPORT_PATH``.
+``manage.py trace_report`` rebuilds the span trees from that file and
+prints their critical paths.
+
+With ``TRACING_ENABLED`` off, ``span()`` returns a shared no-op object,
+nothing is recorded or propagated, and ``transaction.Atomic`` is left
+unpatched.
+"""
+import atexit
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from django.conf import settings
+
+_current = contextvars.ContextVar('trace_span', default=None)
+
+FLUSH_EVERY = 50
+FLUSH_INTERVAL = 1.0
+
+
+def enabled():
+    return getattr(settings, 'TRACING_ENABLED', False)
+
+
+def _new_id(nbytes):
+    return '%0*x' % (nbytes * 2, random.getrandbits(nbytes * 8))
+
+
+def parse_traceparent(value):
+    """Return ``(trace_id, span_id, sampled)`` from a traceparent header, or None"""
+    try:
+        version, trace_id, span_id, flags = value.strip().split('-')
+        int(trace_id, 16), int(span_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except (AttributeError, ValueError):
+        return None
+    if len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2 or trace_id == '0' * 32:
+        return None
+    return trace_id, span_id, sampled
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.status = 'ok'
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = None
+
+    @property
+    def traceparent(self):
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.status = 'error'
+            self.attributes.setdefault('error', f'{exc_type.__name__}: {exc}'[:500])
+        self.end()
+        return False
+
+    def end(self):
+        duration = time.perf_counter() - self._started
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        _exporter.export({
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': round(duration * 1000, 3),
+            'status': self.status,
+            'attributes': self.attributes,
+            'pid': os.getpid(),
+            'thread': threading.current_thread().name,
+        })
+        # The outermost span in this context is done; write the whole subtree out now
+        if _current.get() is None:
+            _exporter.flush()
+
+
+class _NoopSpan:
+    traceparent = None
+    trace_id = None
+
+    def set(self, key, value):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span():
+    return _current.get()
+
+
+def current_traceparent():
+    span = _current.get()
+    return span.traceparent if span is not None else None
+
+
+def span(name, parent=None, root=False, **attributes):
+    """Start a span; use as a context manager.
+
+    The parent is ``parent`` (a traceparent string) if given, else the
+    current span. With no parent, a new trace only starts when ``root`` is
+    set and the trace is sampled. Otherwise a no-op span is returned, so
+    background work that does not belong to a trace costs nothing.
+    """
+    if not enabled():
+        return NOOP_SPAN
+    if parent:
+        parsed = parse_traceparent(parent)
+        if parsed is None or not parsed[2]:
+            return NOOP_SPAN
+        return Span(name, parsed[0], parsed[1], attributes)
+    current = _current.get()
+    if current is not None:
+        return Span(name, current.trace_id, current.span_id, attributes)
+    if root and random.random() < getattr(settings, 'TRACING_SAMPLE_RATE', 1.0):
+        return Span(name, _new_id(16), None, attributes)
+    return NOOP_SPAN
+
+
+class _FileExporter:
+    """Buffers spans and appends them to a JSON-lines file"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def export(self, record):
+        with self.lock:
+            self.buffer.append(json.dumps(record, default=str))
+            due = len(self.buffer) >= FLUSH_EVERY or time.monotonic() - self.last_flush >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            lines, self.buffer = self.buffer, []
+            self.last_flush = time.monotonic()
+        if not lines:
+            return
+        path = getattr(settings, 'TRACING_EXPORT_PATH', 'traces.jsonl')
+        # One write per batch in append mode, so processes sharing the file do not interleave lines
+        with open(path, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+_exporter = _FileExporter()
+atexit.register(_exporter.flush)
+
+
+def flush():
+    _exporter.flush()
+
+
+def instrument_transactions():
+    """Open a span around every outermost ``transaction.atomic`` block inside a trace.
+
+    Patches ``transaction.Atomic``, so it does nothing unless tracing is enabled.
+    """
+    from django.db import transaction
+
+    if not enabled():
+        return
+    atomic_class = transaction.Atomic
+    if getattr(atomic_class, '_tracing_instrumented', False):
+        return
+    original_enter, original_exit = atomic_class.__enter__, atomic_class.__exit__
+    open_spans = contextvars.ContextVar('trace_transaction_spans', default=None)
+
+    def __enter__(self):
+        connection = transaction.get_connection(self.using)
+        outermost = not connection.in_atomic_block
+        original_enter(self)
+        if outermost and _current.get() is not None:
+            tx_span = span('db.transaction', db=connection.alias)
+            tx_span.__enter__()
+            spans = dict(open_spans.get() or {})
+            spans[connection.alias] = tx_span
+            open_spans.set(spans)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        connection = transaction.get_connection(self.using)
+        try:
+            return original_exit(self, exc_type, exc_value, traceback)
+        finally:
+            spans = open_spans.get()
+            if spans and connection.alias in spans and not connection.in_atomic_block:
+                spans = dict(spans)
+                tx_span = spans.pop(connection.alias)
+                open_spans.set(spans)
+                tx_span.set('outcome', 'rollback' if exc_type is not None else 'commit')
+                tx_span.__exit__(exc_type, exc_value, traceback)
+
+    atomic_class.__enter__ = __enter__
+    atomic_class.__exit__ = __exit__
+    atomic_class._tracing_instrumented = True
@@ -4,14 +4,19 @@ from solana.system_program import transfer, TransferParams
 from solana.account import Account
 import base58
 
-def create_transfer_transaction(from_private_key, to_address, amount_lamports):
+def create_transfer_transaction(from_private_key, to_address, amount_lamports, recent_blockhash=None):
     """Helper to create transfer transactions in v0.20.0 style"""
     try:
         # Create account from private key
         account = Account(base58.b58decode(from_private_key))
         
+        # Take the blockhash from the shared provider instead of fetching it at send time
+        if recent_blockhash is None:
+            from .solana_client import solana_client
+            recent_blockhash = solana_client.blockhash_provider.get()
+        
         # Create transaction
-        txn = Transaction()
+        txn = Transaction(recent_blockhash=recent_blockhash)
         txn.add(transfer(
             TransferParams(
                 from_pubkey=account.public_key(),
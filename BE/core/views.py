@@ -1,3 +1,91 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+from rest_framework import status, viewsets
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from . import tx_history
+from .models import ChainIntent
+from .serializers import ChainIntentSerializer
+from .utils import metrics as metrics_registry
+from .utils.columnar import from_micros, to_micros
 
-# Create your views here.
+class ChainIntentViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status of queued on-chain submissions; clients poll this after a 202"""
+    serializer_class = ChainIntentSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        # Users can only see their own intents
+        return ChainIntent.objects.filter(user=self.request.user).order_by('-created_at')
+
+
+class BlockchainTransactionViewSet(viewsets.ViewSet):
+    """Transaction history across the database and the archive files (see core.tx_history).
+
+    Filters: ``tx_hash``, ``status``, ``from_address``, ``to_address``,
+    ``address`` (either side) and ``created_after`` / ``created_before``.
+    Pages are newest first and follow ``next``. Users other than staff only
+    see transactions of their own wallet.
+    """
+    permission_classes = [IsAuthenticated]
+    max_limit = 100
+
+    def list(self, request):
+        params = request.query_params
+        filters = {name: params.get(name) for name in tx_history.EQUALITY_FILTERS}
+        filters['address'] = params.get('address')
+        if not request.user.is_staff:
+            filters['address'] = request.user.wallet_address or ''
+        for name in ('created_after', 'created_before'):
+            filters[name] = None
+            if params.get(name):
+                moment = parse_datetime(params[name])
+                if moment is None:
+                    return Response({name: ['Enter a valid date/time.']}, status=status.HTTP_400_BAD_REQUEST)
+                filters[name] = make_aware(moment) if is_naive(moment) else moment
+
+        try:
+            limit = min(int(params.get('limit', settings.REST_FRAMEWORK['PAGE_SIZE'])), self.max_limit)
+            before = None
+            if params.get('cursor'):
+                micros, pk = params['cursor'].split(':')
+                before = (from_micros(int(micros)), int(pk))
+        except ValueError:
+            return Response({'detail': 'Invalid limit or cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'detail': 'Invalid limit or cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = tx_history.search(filters, limit, before)
+        next_url = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'cursor', f"{to_micros(last['created_at'])}:{last['id']}"
+            )
+        return Response({'next': next_url, 'results': rows})
+
+
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+
+def metrics(request):
+    """Prometheus scrape endpoint.
+
+    With ``METRICS_TOKEN`` set, scrapers must send it as a bearer token.
+    Without one, only staff and direct requests from this host are served.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        if not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+            return HttpResponse(status=401)
+    else:
+        # A request relayed by a proxy on this host arrives from loopback too
+        local = request.META.get('REMOTE_ADDR') in LOOPBACK_ADDRESSES and 'HTTP_X_FORWARDED_FOR' not in request.META
+        user = getattr(request, 'user', None)
+        if not local and not (user is not None and user.is_staff):
+            return HttpResponse(status=403)
+    return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
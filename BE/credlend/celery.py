@@ -0,0 +1,82 @@
+import os
+import time
+
+from celery import Celery
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun, task_retry
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'credlend.settings')
+
+app = Celery('credlend')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
+
+
+# Task metrics for /metrics (see core.utils.metrics)
+_task_started = {}
+
+
+@task_prerun.connect
+def _record_task_start(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _record_task_duration(task_id=None, task=None, **kwargs):
+    from core.utils.metrics import TASK_LATENCY
+
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        TASK_LATENCY.observe(time.perf_counter() - started, task=task.name)
+
+
+@task_failure.connect
+def _record_task_failure(sender=None, **kwargs):
+    from core.utils.metrics import TASK_FAILURES
+
+    TASK_FAILURES.inc(task=getattr(sender, 'name', 'unknown'))
+
+
+@task_retry.connect
+def _record_task_retry(sender=None, **kwargs):
+    from core.utils.metrics import TASK_RETRIES
+
+    TASK_RETRIES.inc(task=getattr(sender, 'name', 'unknown'))
+
+
+# Trace propagation (see core.utils.tracing): the publishing span's traceparent
+# travels in the message headers and parents the task's span in the worker
+_task_spans = {}
+
+
+@before_task_publish.connect
+def _inject_traceparent(headers=None, **kwargs):
+    from core.utils.tracing import current_traceparent
+
+    traceparent = current_traceparent()
+    if traceparent and headers is not None:
+        headers['traceparent'] = traceparent
+
+
+@task_prerun.connect
+def _start_task_span(task_id=None, task=None, **kwargs):
+    from core.utils import tracing
+
+    if not tracing.enabled() or task is None:
+        return
+    # Eager tasks run inside the caller's span and have no header; beat tasks start their own trace
+    task_span = tracing.span(
+        f'celery {task.name}', parent=task.request.get('traceparent'), root=True, task=task.name, task_id=task_id,
+    )
+    if task_span is not tracing.NOOP_SPAN:
+        task_span.__enter__()
+        _task_spans[task_id] = task_span
+
+
+@task_postrun.connect
+def _end_task_span(task_id=None, state=None, **kwargs):
+    task_span = _task_spans.pop(task_id, None)
+    if task_span is not None:
+        task_span.set('state', state)
+        if state == 'FAILURE':
+            task_span.status = 'error'
+        task_span.__exit__(None, None, None)
@@ -70,6 +70,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.TracingMiddleware',
     'axes.middleware.AxesMiddleware',  
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -77,6 +79,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -102,7 +105,7 @@ TEMPLATES = [
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -124,6 +127,65 @@ SIMPLE_JWT = {
 }
 
 
+# Metrics: set METRICS_DIR to a directory shared by every web and Celery process
+# on the host (cleared on deploy) so /metrics aggregates all of them
+METRICS_DIR = os.environ.get('METRICS_DIR')
+# Bearer token required to scrape /metrics. Without one, only staff and direct
+# requests from this host are served; set it when a proxy on this host does not
+# add X-Forwarded-For, or every request through it counts as local
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Request profiling: staff can send "X-Profile: 1"; this also profiles a fraction of staff requests
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_INTERVAL_MS = 5
+
+# Chunked KYC uploads: chunk size is fixed per upload when it is opened
+KYC_UPLOAD_CHUNK_SIZE = 512 * 1024
+KYC_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+KYC_UPLOAD_EXPIRY_HOURS = 24
+# Seconds a reviewer holds a claimed KYC case before it returns to the queue
+KYC_REVIEW_LEASE_SECONDS = 900
+# Approved KYC verifications are anchored on chain as one Merkle root per window
+KYC_ATTESTATION_WINDOW_SECONDS = int(os.environ.get('KYC_ATTESTATION_WINDOW_SECONDS', 3600))
+KYC_ATTESTATION_MEMO_PREFIX = 'credlend-kyc'
+# Worker processes for KYC image renditions (defaults to the CPU count)
+KYC_NORMALIZE_WORKERS = int(os.environ.get('KYC_NORMALIZE_WORKERS', 0)) or None
+# whitelist_user/remove_whitelist instructions packed into one transaction
+KYC_WHITELIST_INSTRUCTIONS_PER_TX = int(os.environ.get('KYC_WHITELIST_INSTRUCTIONS_PER_TX', 10))
+
+# Tracing: spans from requests, Celery tasks, RPC calls and DB transactions are
+# appended to TRACING_EXPORT_PATH as JSON lines (read with manage.py trace_report)
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'False') == 'True'
+TRACING_SAMPLE_RATE = float(os.environ.get('TRACING_SAMPLE_RATE', 1.0))
+TRACING_EXPORT_PATH = os.environ.get('TRACING_EXPORT_PATH', str(BASE_DIR / 'traces.jsonl'))
+
+# Async views for the polled read endpoints; credlend/asgi.py turns this on
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'False') == 'True'
+
+
+# Seconds an authenticated user may be served from the cache
+AUTH_USER_CACHE_TTL = 300
+
+
+# Cache
+# Use Redis when configured so every worker shares (and invalidates) the same entries.
+# The LocMemCache fallback is per process, so JWT users are then not cached
+# (core.authentication)
+if os.environ.get('REDIS_CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_CACHE_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -140,9 +202,26 @@ CORS_ALLOW_CREDENTIALS = True
 
 # Solana Settings
 SOLANA_RPC_URL = os.environ.get('SOLANA_RPC_URL', 'https://api.devnet.solana.com')
+# Comma-separated list of RPC endpoints to route between; defaults to SOLANA_RPC_URL
+SOLANA_RPC_URLS = [
+    url.strip() for url in os.environ.get('SOLANA_RPC_URLS', SOLANA_RPC_URL).split(',') if url.strip()
+]
+# Websocket endpoint for solana_listener; derived from SOLANA_RPC_URL when unset
+SOLANA_WS_URL = os.environ.get('SOLANA_WS_URL')
 SOLANA_WALLET_PRIVATE_KEY = os.environ.get('SOLANA_WALLET_PRIVATE_KEY')
 SOLANA_PROGRAM_ID = os.environ.get('SOLANA_PROGRAM_ID')
 
+# Shared RPC budget per method class: (tokens per second, burst capacity)
+SOLANA_RPC_RATE_LIMITS = {
+    'read': (40, 80),
+    'send': (10, 20),
+    'heavy': (1, 2),  # getProgramAccounts and similar
+}
+
+# Seconds to keep decoded signing accounts in memory (0 disables the cache)
+SIGNING_KEY_CACHE_TTL = int(os.environ.get('SIGNING_KEY_CACHE_TTL', 0))
+SIGNING_KEY_CACHE_SIZE = 256
+
 # Celery Configuration
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
@@ -152,17 +231,78 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
 
-# Add to settings.py for periodic tasks
-# CELERY_BEAT_SCHEDULE = {
-#     'check-loan-repayments-every-hour': {
-#         'task': 'core.tasks.check_loan_repayments',
-#         'schedule': 3600.0,  # Every hour
-#     },
-#     'sync-transactions-every-30-min': {
-#         'task': 'core.tasks.sync_blockchain_transactions',
-#         'schedule': 1800.0,  # Every 30 minutes
-#     },
-# }
+# Periodic tasks
+CELERY_BEAT_SCHEDULE = {
+    'check-loan-repayments-every-5-min': {
+        'task': 'core.tasks.check_loan_repayments',
+        'schedule': 300.0,  # One repayment time-wheel bucket
+    },
+    'sync-transactions-every-30-min': {
+        'task': 'core.tasks.sync_blockchain_transactions',
+        'schedule': 1800.0,  # Every 30 minutes
+    },
+    'compact-pool-liquidity-every-minute': {
+        'task': 'lenders.tasks.compact_pool_liquidity',
+        'schedule': 60.0,  # Every minute
+    },
+    'normalize-kyc-images-every-minute': {
+        'task': 'kyc.tasks.normalize_kyc_images',
+        'schedule': 60.0,  # Every minute; run manage.py normalize_kyc_images for a process pool
+    },
+    'anchor-kyc-attestations': {
+        'task': 'kyc.tasks.anchor_kyc_attestations',
+        'schedule': float(KYC_ATTESTATION_WINDOW_SECONDS),  # One Merkle batch per window
+    },
+    'sync-whitelist-every-minute': {
+        'task': 'kyc.tasks.sync_whitelist',
+        'schedule': 60.0,  # Every minute; the outbox sends the packed transactions
+    },
+    'reconcile-whitelist-every-day': {
+        'task': 'kyc.tasks.reconcile_whitelist',
+        'schedule': 86400.0,  # Once a day; one getProgramAccounts scan
+    },
+    'archive-blockchain-transactions-every-day': {
+        'task': 'core.tasks.archive_blockchain_transactions',
+        'schedule': 86400.0,  # Once a day; also creates the coming months' partitions
+    },
+    'reconcile-loans-every-day': {
+        'task': 'loans.tasks.reconcile_loans',
+        'schedule': 86400.0,  # Once a day; two getProgramAccounts scans
+    },
+    'cleanup-kyc-uploads-every-hour': {
+        'task': 'kyc.tasks.cleanup_stale_kyc_uploads',
+        'schedule': 3600.0,  # Every hour
+    },
+}
+
+# Admin changelists (core.utils.admin.LargeTableAdmin): unfiltered lists of
+# bigger tables are counted from planner statistics, filtered lists up to a limit
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+ADMIN_COUNT_LIMIT = 10000
+
+# Transaction history (core.tx_history): months kept in the database, monthly
+# partitions created ahead on PostgreSQL, and where older months are archived
+TRANSACTION_HOT_MONTHS = 3
+TRANSACTION_PARTITIONS_AHEAD = 2
+TRANSACTION_ARCHIVE_DIR = os.environ.get('TRANSACTION_ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+
+# Closed-loan archive (loans.archive): repaid and liquidated loans unchanged
+# for this many days move to columnar files in LOAN_ARCHIVE_DIR
+LOAN_ARCHIVE_AFTER_DAYS = 365
+LOAN_ARCHIVE_DIR = os.environ.get('LOAN_ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+
+# Decimals of the tokens the program lends and locks (USDC, USDT); used by
+# loans.reconcile to compare amounts with the program's Loan accounts
+LOAN_TOKEN_DECIMALS = 6
+
+# Repayment scheduling
+REPAYMENT_GRACE_PERIOD_DAYS = 7
+REPAYMENT_WHEEL_BUCKET_SECONDS = 300
+BATCH_PAY_MAX_REPAYMENTS = 50  # repayments accepted per batch-pay request
+
+# Bulk loan-application intake
+LOAN_BULK_INTAKE_CHUNK_SIZE = 500  # rows validated and inserted per transaction
+LOAN_BULK_INTAKE_MAX_ROWS = 50000  # rows accepted per request
 
 # KYC Provider Settings
 KYC_PROVIDER_API_KEY = os.environ.get('KYC_PROVIDER_API_KEY')
@@ -178,6 +318,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than shared-cache memory, so tests running threads
+        # wait for SQLite's lock instead of failing with "table is locked"
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -14,25 +14,50 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from kyc.views import KYCDocumentViewSet, KYCVerificationViewSet, KYCAdminViewSet
+from kyc.views import KYCDocumentViewSet, KYCUploadViewSet, KYCVerificationViewSet, KYCAdminViewSet
 from lenders.views import LenderPoolViewSet, LenderDepositViewSet, PoolAllocationViewSet
+from loans.views import LoanApplicationViewSet, LoanViewSet, RepaymentViewSet
+from core.views import BlockchainTransactionViewSet, ChainIntentViewSet, metrics
+from lenders import async_views as lender_async_views
+from loans import async_views as loan_async_views
 
 router = DefaultRouter()
 router.register(r'kyc/documents', KYCDocumentViewSet, basename='kycdocument')
+router.register(r'kyc/uploads', KYCUploadViewSet, basename='kycupload')
 router.register(r'kyc/verifications', KYCVerificationViewSet, basename='kycverification')
 router.register(r'admin/kyc', KYCAdminViewSet, basename='kycadmin')
 router.register(r'lender-pools', LenderPoolViewSet, basename='lenderpool')
 router.register(r'lender-deposits', LenderDepositViewSet, basename='lenderdeposit')
 router.register(r'pool-allocations', PoolAllocationViewSet, basename='poolallocation')
+router.register(r'loan-applications', LoanApplicationViewSet, basename='loanapplication')
+router.register(r'loans', LoanViewSet, basename='loan')
+router.register(r'repayments', RepaymentViewSet, basename='repayment')
+router.register(r'chain-intents', ChainIntentViewSet, basename='chainintent')
+router.register(r'blockchain-transactions', BlockchainTransactionViewSet, basename='blockchaintransaction')
 
 urlpatterns = [
     # path('admin/', include('admin_honeypot.urls', namespace='admin_honeypot')),
     path('cred-lend-admin/', admin.site.urls),
     path('auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', metrics, name='metrics'),
+]
+
+if settings.ASYNC_READ_VIEWS:
+    # Async versions of the polled read endpoints take their URLs ahead of the router (see core.async_api)
+    urlpatterns += [
+        path('loans/', loan_async_views.loan_list, name='loan-list-async'),
+        path('repayments/upcoming/', loan_async_views.upcoming, name='repayment-upcoming-async'),
+        path('repayments/overdue/', loan_async_views.overdue, name='repayment-overdue-async'),
+        path('lender-pools/<int:pk>/stats/', lender_async_views.pool_stats_view, name='lenderpool-stats-async'),
+        path('lender-deposits/', lender_async_views.deposit_list, name='lenderdeposit-list-async'),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
 ]
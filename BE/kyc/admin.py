@@ -1,33 +1,57 @@
 from django.contrib import admin
-from .models import KYCDocument, KYCVerification
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+from core.utils.admin import LargeTableAdmin
+from .models import KYCDocument, KYCVerification, KYCUpload, KYCAttestationBatch
 
 
 @admin.register(KYCDocument)
-class KYCDocumentAdmin(admin.ModelAdmin):
+class KYCDocumentAdmin(LargeTableAdmin):
     list_display = (
-        "user", "document_type", "document_number",
+        "thumbnail", "user", "document_type", "document_number",
         "verified", "verified_by", "verified_at", "created_at"
     )
-    list_filter = ("document_type", "verified", "created_at")
-    search_fields = ("document_number", "user__username", "user__email")
+    list_select_related = ("user", "verified_by")
+    list_filter = ("document_type", "verified", "normalization_status", "created_at")
+    search_fields = ("=document_number", "user__username", "user__email")
+    raw_id_fields = ("user", "verified_by")
 
-    readonly_fields = ("created_at", "updated_at")
+    readonly_fields = ("previews", "normalization_status", "normalized_at", "created_at", "updated_at")
 
     fieldsets = (
         ("User & Document Info", {
             "fields": ("user", "document_type", "document_number")
         }),
         ("Images", {
-            "fields": ("front_image", "back_image", "selfie_image")
+            # Reviewers see the renditions; the originals stay linked below for audit
+            "fields": ("previews", "front_image", "back_image", "selfie_image", "normalization_status", "normalized_at")
         }),
         ("Verification", {
-            "fields": ("verified", "verified_by", "verified_at", "rejection_reason")
+            "fields": ("verified", "verified_by", "verified_at", "rejection_reason", "file_hashes")
         }),
         ("Timestamps", {
             "fields": ("created_at", "updated_at")
         }),
     )
 
+    @admin.display(description="Thumbnail")
+    def thumbnail(self, obj):
+        rendition = (obj.renditions or {}).get("front_image", {}).get("thumbnail")
+        if not rendition:
+            return "-"
+        return format_html('<img src="{}" style="max-height: 48px">', default_storage.url(rendition["name"]))
+
+    @admin.display(description="Review images")
+    def previews(self, obj):
+        images = [
+            (default_storage.url(renditions["review"]["name"]), default_storage.url(renditions["thumbnail"]["name"]))
+            for field, renditions in (obj.renditions or {}).items()
+            if "review" in renditions and "thumbnail" in renditions
+        ]
+        if not images:
+            return "Not normalized yet"
+        return format_html_join(" ", '<a href="{}"><img src="{}"></a>', images)
+
 
 @admin.register(KYCVerification)
 class KYCVerificationAdmin(admin.ModelAdmin):
@@ -35,19 +59,41 @@ class KYCVerificationAdmin(admin.ModelAdmin):
         "user", "status", "provider_reference",
         "attested_hash", "tx_hash", "completed_at", "created_at"
     )
+    list_select_related = ("user",)
     list_filter = ("status", "created_at")
     search_fields = ("user__username", "user__email", "provider_reference", "tx_hash")
 
-    readonly_fields = ("created_at", "updated_at")
+    readonly_fields = ("attestation_batch", "leaf_index", "merkle_proof", "created_at", "updated_at")
 
     fieldsets = (
         ("User & Status", {
             "fields": ("user", "status", "provider_reference")
         }),
         ("Verification Data", {
-            "fields": ("data", "attested_hash", "tx_hash")
+            "fields": ("data", "attested_hash", "tx_hash", "attestation_batch", "leaf_index", "merkle_proof")
         }),
         ("Timestamps", {
             "fields": ("completed_at", "created_at", "updated_at")
         }),
     )
+
+
+@admin.register(KYCUpload)
+class KYCUploadAdmin(admin.ModelAdmin):
+    list_display = (
+        "user", "field", "filename", "total_size", "received_bytes",
+        "status", "document", "created_at"
+    )
+    list_select_related = ("user", "document")
+    list_filter = ("status", "field", "created_at")
+    search_fields = ("user__username", "filename", "sha256")
+    raw_id_fields = ("user", "document")
+    readonly_fields = ("chunk_hashes", "sha256", "storage_name", "completed_at", "created_at", "updated_at")
+
+
+@admin.register(KYCAttestationBatch)
+class KYCAttestationBatchAdmin(admin.ModelAdmin):
+    list_display = ("id", "merkle_root", "leaf_count", "status", "tx_hash", "anchored_at", "created_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("merkle_root", "tx_hash")
+    readonly_fields = ("merkle_root", "leaf_count", "tx_hash", "anchored_at", "created_at", "updated_at")
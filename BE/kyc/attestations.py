@@ -0,0 +1,114 @@
+"""Merkle-batched on-chain KYC attestations.
+
+Approvals are not written on chain one by one. A periodic task
+(``kyc.tasks.anchor_kyc_attestations``, every
+``KYC_ATTESTATION_WINDOW_SECONDS``) collects the approved verifications that
+have no batch yet, and builds a Merkle tree (``kyc.merkle``) over one leaf
+per verification. Each verification stores its leaf in ``attested_hash``,
+with its ``leaf_index`` and ``merkle_proof``, and one outbox intent anchors
+the root in a memo transaction. Proofs are checked locally against the
+batch's root, without any RPC call.
+"""
+from django.conf import settings
+from django.db import transaction
+import json
+
+from core.outbox import enqueue_intent
+from .merkle import build_levels, inclusion_proof, leaf_hash, verify_proof
+from .models import KYCAttestationBatch, KYCDocument, KYCVerification
+
+MAX_BATCH_SIZE = 10000
+
+
+def leaf_payload(verification, document_hashes):
+    """Canonical bytes attested for one verification"""
+    return json.dumps({
+        'verification': verification.id,
+        'user': verification.user_id,
+        'wallet': verification.user.wallet_address,
+        'status': verification.status,
+        'completed_at': verification.completed_at.isoformat() if verification.completed_at else None,
+        'documents': sorted(document_hashes),
+    }, sort_keys=True, separators=(',', ':')).encode()
+
+
+def _document_hashes(user_ids):
+    hashes = {}
+    for user_id, file_hashes in KYCDocument.objects.filter(user_id__in=user_ids).values_list('user_id', 'file_hashes'):
+        hashes.setdefault(user_id, []).extend((file_hashes or {}).values())
+    return hashes
+
+
+def compute_leaf(verification):
+    """Leaf hash for the verification as it stands now"""
+    hashes = _document_hashes([verification.user_id]).get(verification.user_id, [])
+    return leaf_hash(leaf_payload(verification, hashes))
+
+
+def create_batch(max_size=MAX_BATCH_SIZE):
+    """Batch every unattested approval into one tree and queue its root for anchoring.
+
+    Returns the new ``KYCAttestationBatch``, or None if nothing was waiting.
+    """
+    with transaction.atomic():
+        verifications = list(
+            KYCVerification.objects.select_for_update(skip_locked=True)
+            .filter(status='approved', attestation_batch__isnull=True)
+            .select_related('user')
+            .order_by('id')[:max_size]
+        )
+        if not verifications:
+            return None
+
+        hashes = _document_hashes({verification.user_id for verification in verifications})
+        leaves = [
+            leaf_hash(leaf_payload(verification, hashes.get(verification.user_id, [])))
+            for verification in verifications
+        ]
+        levels = build_levels(leaves)
+        batch = KYCAttestationBatch.objects.create(merkle_root=levels[-1][0], leaf_count=len(leaves))
+        for index, verification in enumerate(verifications):
+            verification.attestation_batch = batch
+            verification.attested_hash = leaves[index]
+            verification.leaf_index = index
+            verification.merkle_proof = inclusion_proof(levels, index)
+        KYCVerification.objects.bulk_update(
+            verifications, ['attestation_batch', 'attested_hash', 'leaf_index', 'merkle_proof'], batch_size=500
+        )
+        enqueue_intent('kyc_attestation', batch.id, payload={'merkle_root': batch.merkle_root})
+    return batch
+
+
+def clear_attestation(verification):
+    """Detach a verification from its batch so its next approval is attested afresh; the caller saves"""
+    verification.attestation_batch = None
+    verification.attested_hash = None
+    verification.leaf_index = None
+    verification.merkle_proof = []
+    verification.tx_hash = None
+
+
+def memo_text(batch):
+    prefix = getattr(settings, 'KYC_ATTESTATION_MEMO_PREFIX', 'credlend-kyc')
+    return f'{prefix}:{batch.id}:{batch.merkle_root}'
+
+
+def attestation_status(verification):
+    """Everything needed to check a verification's attestation, checked locally"""
+    batch = verification.attestation_batch
+    if batch is None:
+        return {'attested': False}
+    return {
+        'attested': True,
+        'leaf_hash': verification.attested_hash,
+        'leaf_index': verification.leaf_index,
+        'merkle_proof': verification.merkle_proof,
+        'merkle_root': batch.merkle_root,
+        'batch_id': batch.id,
+        'batch_status': batch.status,
+        'tx_hash': batch.tx_hash,
+        'memo': memo_text(batch),
+        'proof_valid': verify_proof(verification.attested_hash, verification.merkle_proof, batch.merkle_root),
+        # False if the record or its documents changed after the leaf was built
+        'leaf_matches_record': compute_leaf(verification) == verification.attested_hash,
+    }
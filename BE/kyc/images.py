@@ -0,0 +1,175 @@
+"""Normalise KYC document images into small, metadata-free renditions.
+
+Phone photos arrive as multi-megabyte JPEGs carrying EXIF data (GPS
+position, device, timestamps). For each image of a document this module
+writes two JPEGs: a review-size rendition for reviewers and a thumbnail for
+lists. Both are rotated upright from the EXIF orientation, then saved
+without EXIF or ICC data. The originals are never modified, and stay
+available for audit.
+
+Decoding and resizing are CPU-bound, so ``normalize_batch`` renders on a
+process pool. ``render_renditions`` only touches files, so it runs in
+worker processes without Django. Inside daemonic processes, such as Celery
+prefork children, which may not start a pool, the same work runs in-process.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+import logging
+import multiprocessing
+import os
+import time
+
+from core.utils.metrics import KYC_IMAGES_NORMALIZED, KYC_NORMALIZE_THROUGHPUT
+from .models import KYCDocument
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FIELDS = ('front_image', 'back_image', 'selfie_image')
+# (name, longest edge in pixels, JPEG quality), largest first: each rendition is resized from the previous one
+RENDITIONS = (
+    ('review', 1600, 82),
+    ('thumbnail', 320, 75),
+)
+LEASE_SECONDS = 600
+
+
+def rendition_name(document_id, field, kind):
+    return f'kyc/renditions/{document_id}/{field}-{kind}.jpg'
+
+
+def render_renditions(source_path, targets):
+    """Write every rendition of one image; ``targets`` maps rendition name to output path.
+
+    Runs in a worker process. Returns ``{rendition: {width, height, bytes}}``.
+    """
+    from PIL import Image, ImageOps
+
+    results = {}
+    with Image.open(source_path) as image:
+        # JPEG decoders can scale by 1/2, 1/4 or 1/8 while decoding, which is
+        # far cheaper than decoding at full size and resizing afterwards
+        largest = RENDITIONS[0][1]
+        image.draft('RGB', (largest, largest))
+        # Apply the EXIF orientation to the pixels, because the tag is not kept
+        current = ImageOps.exif_transpose(image).convert('RGB')
+
+    for kind, edge, quality in RENDITIONS:
+        current.thumbnail((edge, edge), Image.LANCZOS)
+        path = targets[kind]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        # No exif= or icc_profile= argument, so no metadata is written
+        current.save(tmp_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+        os.replace(tmp_path, path)
+        results[kind] = {'width': current.width, 'height': current.height, 'bytes': os.path.getsize(path)}
+    return results
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        documents = list(
+            KYCDocument.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(normalization_status='pending') |
+                Q(normalization_status='processing', updated_at__lt=now - timedelta(seconds=LEASE_SECONDS))
+            )
+            .order_by('id')
+            .only('id', *IMAGE_FIELDS)[:batch_size]
+        )
+        if documents:
+            KYCDocument.objects.filter(pk__in=[document.pk for document in documents]).update(
+                normalization_status='processing', updated_at=now,
+            )
+    return documents
+
+
+def _jobs(documents):
+    for document in documents:
+        for field in IMAGE_FIELDS:
+            image = getattr(document, field)
+            if not image:
+                continue
+            targets = {
+                kind: default_storage.path(rendition_name(document.id, field, kind))
+                for kind, _, _ in RENDITIONS
+            }
+            yield document, field, default_storage.path(image.name), targets
+
+
+def _record(document, renditions, failed):
+    fields = {
+        field: {kind: dict(info, name=rendition_name(document.id, field, kind)) for kind, info in results.items()}
+        for field, results in renditions.items()
+    }
+    # A document whose images changed while it was being rendered went back to
+    # pending, and keeps that status so the next batch renders the new images
+    KYCDocument.objects.filter(pk=document.pk, normalization_status='processing').update(
+        renditions=fields,
+        normalization_status='failed' if failed else 'done',
+        normalized_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+
+
+def normalize_batch(batch_size=20, executor=None):
+    """Render the renditions of up to ``batch_size`` pending documents.
+
+    ``executor`` is a process pool to render on. Without one, a pool of
+    ``KYC_NORMALIZE_WORKERS`` processes is used for this batch, or the work
+    runs in-process inside a daemonic process. Returns throughput figures.
+    """
+    documents = _claim_batch(batch_size)
+    jobs = list(_jobs(documents))
+    own_executor = None
+    if executor is None and jobs and not multiprocessing.current_process().daemon:
+        workers = getattr(settings, 'KYC_NORMALIZE_WORKERS', None) or os.cpu_count()
+        executor = own_executor = ProcessPoolExecutor(max_workers=min(workers, len(jobs)))
+    workers = executor._max_workers if executor is not None else 1
+
+    started = time.perf_counter()
+    try:
+        if executor is not None:
+            futures = [executor.submit(render_renditions, source, targets) for _, _, source, targets in jobs]
+        renditions, failed = {}, set()
+        for index, (document, field, source, targets) in enumerate(jobs):
+            try:
+                if executor is not None:
+                    result = futures[index].result()
+                else:
+                    result = render_renditions(source, targets)
+            except Exception as e:
+                logger.error(f"Error normalizing {field} of KYC document {document.id}: {e}")
+                failed.add(document.id)
+                KYC_IMAGES_NORMALIZED.inc(outcome='error')
+                continue
+            renditions.setdefault(document.id, {})[field] = result
+            KYC_IMAGES_NORMALIZED.inc(outcome='ok')
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown()
+    elapsed = time.perf_counter() - started
+
+    for document in documents:
+        _record(document, renditions.get(document.id, {}), document.id in failed)
+
+    images = len(jobs)
+    # More workers than cores do not add throughput; divide by the cores actually used
+    cores = min(workers, os.cpu_count() or 1)
+    per_core = images / elapsed / cores if images and elapsed else 0.0
+    if images:
+        KYC_NORMALIZE_THROUGHPUT.set(per_core)
+    return {
+        'documents': len(documents),
+        'images': images,
+        'failed': len(failed),
+        'seconds': elapsed,
+        'workers': workers,
+        'cores': cores,
+        'images_per_second_per_core': per_core,
+    }
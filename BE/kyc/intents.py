@@ -0,0 +1,80 @@
+from django.utils import timezone
+import logging
+from solana.publickey import PublicKey
+from solana.transaction import AccountMeta, Transaction, TransactionInstruction
+from core.outbox import IntentHandler, register_handler, sign_and_send
+from core.utils.anchor_instructions import remove_whitelist_instruction, whitelist_user_instruction
+from core.utils.solana_client import solana_client
+from .attestations import memo_text
+from .models import KYCAttestationBatch, KYCVerification
+from . import whitelist
+
+logger = logging.getLogger(__name__)
+
+MEMO_PROGRAM_ID = PublicKey('MemoSq4gqABAXKb96qnH8TysNcWxMyWCqXgDLGmfcHr')
+
+
+@register_handler
+class AttestationIntentHandler(IntentHandler):
+    """Anchors a batch's Merkle root in one memo transaction signed by the platform wallet"""
+    kind = 'kyc_attestation'
+
+    def submit(self, intent):
+        batch = KYCAttestationBatch.objects.get(pk=intent.target_id)
+        if solana_client.account is None:
+            raise RuntimeError('SOLANA_WALLET_PRIVATE_KEY is not configured')
+
+        txn = Transaction()
+        txn.add(TransactionInstruction(
+            keys=[AccountMeta(pubkey=solana_client.account.public_key(), is_signer=True, is_writable=False)],
+            program_id=MEMO_PROGRAM_ID,
+            data=memo_text(batch).encode(),
+        ))
+        return sign_and_send(intent, solana_client.client, txn, solana_client.account)
+
+    def complete(self, intent):
+        now = timezone.now()
+        KYCAttestationBatch.objects.filter(pk=intent.target_id).update(
+            status='anchored', tx_hash=intent.tx_hash, anchored_at=now, updated_at=now,
+        )
+        KYCVerification.objects.filter(attestation_batch_id=intent.target_id).update(
+            tx_hash=intent.tx_hash, updated_at=now,
+        )
+
+    def fail(self, intent):
+        # Hand the verifications back so the next window batches them again
+        logger.error(f"Failed to anchor KYC attestation batch {intent.target_id}: {intent.error}")
+        KYCAttestationBatch.objects.filter(pk=intent.target_id).update(status='failed', updated_at=timezone.now())
+        KYCVerification.objects.filter(attestation_batch_id=intent.target_id).update(
+            attestation_batch=None, attested_hash=None, leaf_index=None, merkle_proof=[], updated_at=timezone.now(),
+        )
+
+
+@register_handler
+class WhitelistSyncIntentHandler(IntentHandler):
+    """Sends one packed transaction of whitelist_user/remove_whitelist instructions (see kyc.whitelist)"""
+    kind = whitelist.INTENT_KIND
+
+    def submit(self, intent):
+        if solana_client.account is None:
+            raise RuntimeError('SOLANA_WALLET_PRIVATE_KEY is not configured')
+        if solana_client.program_id is None:
+            raise RuntimeError('SOLANA_PROGRAM_ID is not configured')
+        admin = solana_client.account.public_key()
+
+        txn = Transaction()
+        for _, wallet in intent.payload.get('add', []):
+            txn.add(whitelist_user_instruction(solana_client.program_id, admin, wallet))
+        for _, wallet in intent.payload.get('remove', []):
+            txn.add(remove_whitelist_instruction(solana_client.program_id, admin, wallet))
+        return sign_and_send(intent, solana_client.client, txn, solana_client.account)
+
+    def complete(self, intent):
+        for key, whitelisted in (('add', True), ('remove', False)):
+            user_ids = [user_id for user_id, _ in intent.payload.get(key, []) if user_id is not None]
+            if user_ids:
+                whitelist.record(user_ids, whitelisted)
+
+    def fail(self, intent):
+        # The users are still drifted, so the next sync checks their entries and queues them again
+        logger.error(f"Failed to sync whitelist intent {intent.id}: {intent.error}")
@@ -0,0 +1,50 @@
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+import logging
+import os
+import time
+from ...images import normalize_batch
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Render review-size and thumbnail renditions of KYC images on a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20, help='Documents claimed per batch')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default KYC_NORMALIZE_WORKERS or the CPU count)')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when nothing is pending')
+        parser.add_argument('--once', action='store_true', help='Drain the pending documents once and exit')
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or getattr(settings, 'KYC_NORMALIZE_WORKERS', None) or os.cpu_count()
+        images, seconds = 0, 0.0
+        # One pool for the life of the command, so worker start-up is paid once
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while True:
+                try:
+                    stats = normalize_batch(options['batch_size'], executor=executor)
+                except Exception as e:
+                    logger.error(f"Error normalizing KYC images: {e}")
+                    stats = {'documents': 0, 'images': 0}
+
+                if stats['images']:
+                    images += stats['images']
+                    seconds += stats['seconds']
+                    self.stdout.write(
+                        f"{stats['documents']} documents, {stats['images']} images ({stats['failed']} failed) "
+                        f"in {stats['seconds']:.2f}s: {stats['images_per_second_per_core']:.2f} images/s/core"
+                    )
+                if stats['documents'] < options['batch_size']:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+
+        if images:
+            cores = min(workers, os.cpu_count() or 1)
+            self.stdout.write(self.style.SUCCESS(
+                f"{images} images in {seconds:.2f}s on {workers} workers ({cores} cores): "
+                f"{images / seconds:.2f} images/s, {images / seconds / cores:.2f} images/s/core"
+            ))
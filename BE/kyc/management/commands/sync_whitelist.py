@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+import logging
+from ... import whitelist
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Queue packed whitelist transactions for users whose KYC status changed, or reconcile against the chain'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500, help='Drifted users collected per run')
+        parser.add_argument('--reconcile', action='store_true',
+                            help="Diff the program's WhitelistEntry accounts against the users table")
+        parser.add_argument('--dry-run', action='store_true', help='With --reconcile, report without correcting')
+        parser.add_argument('--remove-orphans', action='store_true',
+                            help='With --reconcile, queue removal of entries whose wallet belongs to no user')
+
+    def handle(self, *args, **options):
+        if options['reconcile']:
+            report = whitelist.reconcile(apply=not options['dry_run'], remove_orphans=options['remove_orphans'])
+            self.stdout.write(
+                f"{report['onchain']} entries on chain ({report['disabled']} disabled): "
+                f"{report['recorded_missing']} recorded but missing, {report['unrecorded']} present but unrecorded, "
+                f"{len(report['orphans'])} orphans"
+            )
+            for wallet in report['orphans'][:20]:
+                self.stdout.write(f"  orphan {wallet}")
+            if report['orphan_transactions']:
+                self.stdout.write(f"Queued {report['orphan_transactions']} transactions removing orphans")
+            if not report['applied']:
+                self.stdout.write('Dry run; nothing was corrected')
+            return
+
+        stats = whitelist.sync(options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['candidates']} drifted users: {stats['already_synced']} already synced on chain, "
+            f"{stats['instructions']} instructions queued in {stats['transactions']} transactions"
+        ))
@@ -0,0 +1,58 @@
+"""Binary SHA-256 Merkle trees with domain-separated leaves and nodes.
+
+Leaves are hashed as ``sha256(0x00 || data)`` and internal nodes as
+``sha256(0x01 || left || right)``, as in RFC 6962, so a node hash can never
+be passed off as a leaf. An unpaired node at the end of a level is promoted
+to the next level unchanged instead of being paired with itself. Hashes are
+hex strings throughout.
+"""
+import hashlib
+
+
+def leaf_hash(data):
+    return hashlib.sha256(b'\x00' + data).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def build_levels(leaves):
+    """Every level of the tree, leaves first; the last level holds only the root"""
+    if not leaves:
+        raise ValueError('A Merkle tree needs at least one leaf')
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        current = levels[-1]
+        parents = [node_hash(current[i], current[i + 1]) for i in range(0, len(current) - 1, 2)]
+        if len(current) % 2:
+            parents.append(current[-1])
+        levels.append(parents)
+    return levels
+
+
+def inclusion_proof(levels, index):
+    """Sibling hashes from leaf ``index`` up to the root, as ``{'side', 'hash'}`` steps"""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({'side': 'left' if sibling < index else 'right', 'hash': level[sibling]})
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf, proof, root):
+    """Fold ``proof`` into ``leaf`` and compare with ``root``; no I/O"""
+    current = leaf
+    try:
+        for step in proof:
+            if step['side'] == 'left':
+                current = node_hash(step['hash'], current)
+            elif step['side'] == 'right':
+                current = node_hash(current, step['hash'])
+            else:
+                return False
+    except (KeyError, TypeError, ValueError):
+        return False
+    return current == root
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kyc', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kycdocument',
+            name='file_hashes',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='KYCUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('front_image', 'Front Image'), ('back_image', 'Back Image'), ('selfie_image', 'Selfie Image')], max_length=20)),
+                ('filename', models.CharField(max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('total_size', models.BigIntegerField()),
+                ('chunk_size', models.IntegerField()),
+                ('received_bytes', models.BigIntegerField(default=0)),
+                ('chunk_hashes', models.JSONField(default=list)),
+                ('sha256', models.CharField(blank=True, max_length=64, null=True)),
+                ('storage_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('complete', 'Complete')], default='uploading', max_length=20)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploads', to='kyc.kycdocument')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kyc_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'kyc_uploads',
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='kyc_uploads_status_7a7c60_idx')],
+            },
+        ),
+    ]
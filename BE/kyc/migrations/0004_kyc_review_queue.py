@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kyc', '0003_kyc_document_renditions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kycverification',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='kycverification',
+            name='priority',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='kycverification',
+            name='reviewer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='kyc_reviews', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='kycverification',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['-priority', 'created_at'], name='kyc_verif_review_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kycverification',
+            index=models.Index(condition=models.Q(('status', 'in_review')), fields=['lease_expires_at'], name='kyc_verif_review_lease_idx'),
+        ),
+    ]
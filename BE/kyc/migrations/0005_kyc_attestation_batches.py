@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kyc', '0004_kyc_review_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KYCAttestationBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('merkle_root', models.CharField(max_length=64)),
+                ('leaf_count', models.IntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('anchored', 'Anchored'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('tx_hash', models.CharField(blank=True, max_length=255, null=True)),
+                ('anchored_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'kyc_attestation_batches',
+            },
+        ),
+        migrations.AddField(
+            model_name='kycverification',
+            name='leaf_index',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='kycverification',
+            name='merkle_proof',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='kycverification',
+            name='attestation_batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='verifications', to='kyc.kycattestationbatch'),
+        ),
+        migrations.AddIndex(
+            model_name='kycverification',
+            index=models.Index(condition=models.Q(('attestation_batch__isnull', True), ('status', 'approved')), fields=['id'], name='kyc_verif_unattested_idx'),
+        ),
+    ]
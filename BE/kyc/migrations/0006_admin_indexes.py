@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kyc', '0005_kyc_attestation_batches'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='kycdocument',
+            index=models.Index(fields=['created_at'], name='kyc_documen_created_4f4505_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kycdocument',
+            index=models.Index(fields=['document_number'], name='kyc_documen_documen_3e72ad_idx'),
+        ),
+    ]
@@ -7,6 +7,12 @@ class KYCDocument(models.Model):
         ('id_card', 'National ID Card'),
         ('drivers_license', 'Driver\'s License'),
     )
+    NORMALIZATION_STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
     
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='kyc_documents')
     document_type = models.CharField(max_length=50, choices=DOCUMENT_TYPES)
@@ -19,11 +25,21 @@ class KYCDocument(models.Model):
                                   null=True, blank=True, related_name='verified_documents')
     verified_at = models.DateTimeField(null=True, blank=True)
     rejection_reason = models.TextField(null=True, blank=True)
+    file_hashes = models.JSONField(default=dict, blank=True)  # image field -> hash from its chunked upload
+    # Review-size and thumbnail JPEGs per image field, made by kyc.images; originals are kept as uploaded
+    renditions = models.JSONField(default=dict, blank=True)
+    normalization_status = models.CharField(max_length=20, choices=NORMALIZATION_STATUS_CHOICES, default='pending')
+    normalized_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'kyc_documents'
+        indexes = [
+            models.Index(fields=['normalization_status', 'updated_at']),
+            models.Index(fields=['created_at']),
+            models.Index(fields=['document_number']),
+        ]
 
 class KYCVerification(models.Model):
     STATUS_CHOICES = (
@@ -37,11 +53,82 @@ class KYCVerification(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     provider_reference = models.CharField(max_length=255, null=True, blank=True)
     data = models.JSONField(default=dict)  # Store verification data from provider
-    attested_hash = models.CharField(max_length=255, null=True, blank=True)
+    attested_hash = models.CharField(max_length=255, null=True, blank=True)  # Merkle leaf hash (see kyc.attestations)
     tx_hash = models.CharField(max_length=255, null=True, blank=True)  # Blockchain transaction hash
+    attestation_batch = models.ForeignKey('KYCAttestationBatch', on_delete=models.SET_NULL,
+                                          null=True, blank=True, related_name='verifications')
+    leaf_index = models.IntegerField(null=True, blank=True)
+    merkle_proof = models.JSONField(default=list, blank=True)  # sibling hashes from the leaf up to the batch root
+    # Review queue (see kyc.review): higher priority is claimed first, then oldest first
+    priority = models.IntegerField(default=0)
+    reviewer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+                                 null=True, blank=True, related_name='kyc_reviews')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'kyc_verifications'
+        indexes = [
+            # Only pending rows are indexed, so the queue stays small however many cases are closed
+            models.Index(fields=['-priority', 'created_at'], condition=models.Q(status='pending'),
+                         name='kyc_verif_review_queue_idx'),
+            models.Index(fields=['lease_expires_at'], condition=models.Q(status='in_review'),
+                         name='kyc_verif_review_lease_idx'),
+            models.Index(fields=['id'], condition=models.Q(status='approved', attestation_batch__isnull=True),
+                         name='kyc_verif_unattested_idx'),
+        ]
+
+class KYCUpload(models.Model):
+    """A resumable, chunked upload of one KYC document image (see kyc.uploads)"""
+    FIELD_CHOICES = (
+        ('front_image', 'Front Image'),
+        ('back_image', 'Back Image'),
+        ('selfie_image', 'Selfie Image'),
+    )
+    STATUS_CHOICES = (
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='kyc_uploads')
+    document = models.ForeignKey(KYCDocument, on_delete=models.SET_NULL, null=True, blank=True, related_name='uploads')
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    total_size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    received_bytes = models.BigIntegerField(default=0)
+    chunk_hashes = models.JSONField(default=list)  # SHA-256 hex digest of each chunk received so far
+    sha256 = models.CharField(max_length=64, null=True, blank=True)
+    storage_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
     completed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        db_table = 'kyc_verifications'
\ No newline at end of file
+        db_table = 'kyc_uploads'
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+class KYCAttestationBatch(models.Model):
+    """Approved verifications attested together: only the Merkle root goes on chain"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('anchored', 'Anchored'),
+        ('failed', 'Failed'),
+    )
+
+    merkle_root = models.CharField(max_length=64)
+    leaf_count = models.IntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    tx_hash = models.CharField(max_length=255, null=True, blank=True)
+    anchored_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'kyc_attestation_batches'
@@ -0,0 +1,125 @@
+"""KYC review work queue.
+
+Reviewers claim pending verifications instead of browsing for them. A claim
+moves a case to ``in_review`` under a lease that names the reviewer. It is
+taken with ``select_for_update(skip_locked=True)``, so reviewers claiming at
+the same moment get different cases. A lease that runs out without an
+approve, reject or release returns its case to ``pending``.
+
+The queue is ordered by ``priority`` and then by age, and is served from a
+partial index that covers only pending rows.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import KYCVerification
+
+DEFAULT_LEASE_SECONDS = 900
+MAX_CLAIM = 20
+
+# Users who are waiting on a loan decision are reviewed first
+PRIORITY_DEFAULT = 0
+PRIORITY_LOAN_APPLICANT = 10
+OPEN_APPLICATION_STATUSES = ('submitted', 'under_review')
+
+
+class LeaseError(Exception):
+    """The verification is leased to another reviewer, or not leased at all"""
+
+
+def lease_seconds():
+    return getattr(settings, 'KYC_REVIEW_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+
+
+def queue():
+    """Pending verifications in claim order; matches the partial index"""
+    return KYCVerification.objects.filter(status='pending').order_by('-priority', 'created_at')
+
+
+def priority_for(user):
+    from loans.models import LoanApplication
+
+    if LoanApplication.objects.filter(user=user, status__in=OPEN_APPLICATION_STATUSES).exists():
+        return PRIORITY_LOAN_APPLICANT
+    return PRIORITY_DEFAULT
+
+
+def prioritize(user, priority=PRIORITY_LOAN_APPLICANT):
+    """Raise the priority of the user's open verification, e.g. when they submit a loan application"""
+    return prioritize_users([user], priority)
+
+
+def prioritize_users(users, priority=PRIORITY_LOAN_APPLICANT):
+    """``prioritize`` for many users, or user ids, in one update"""
+    return KYCVerification.objects.filter(
+        user__in=users, status__in=('pending', 'in_review'), priority__lt=priority
+    ).update(priority=priority, updated_at=timezone.now())
+
+
+def release_expired():
+    """Return cases whose lease ran out to the queue"""
+    return KYCVerification.objects.filter(status='in_review', lease_expires_at__lt=timezone.now()).update(
+        status='pending', reviewer=None, lease_expires_at=None, updated_at=timezone.now(),
+    )
+
+
+def claim(reviewer, count=1):
+    """Lease up to ``count`` of the highest-priority pending verifications to ``reviewer``"""
+    count = max(1, min(count, MAX_CLAIM))
+    release_expired()
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            queue().select_for_update(skip_locked=True).values_list('id', flat=True)[:count]
+        )
+        # The status condition keeps this safe on databases without row locks
+        KYCVerification.objects.filter(pk__in=ids, status='pending').update(
+            status='in_review',
+            reviewer=reviewer,
+            lease_expires_at=now + timedelta(seconds=lease_seconds()),
+            updated_at=now,
+        )
+    return list(
+        KYCVerification.objects.filter(pk__in=ids, status='in_review', reviewer=reviewer)
+        .select_related('user')
+        .order_by('-priority', 'created_at')
+    )
+
+
+def check_lease(verification, reviewer):
+    """Raise ``LeaseError`` unless ``reviewer`` may act on the verification now.
+
+    Cases that nobody holds, or whose lease has expired, may be acted on by
+    any reviewer. A live lease belongs to its reviewer alone.
+    """
+    if (
+        verification.status == 'in_review'
+        and verification.reviewer_id not in (None, reviewer.id)
+        and verification.lease_expires_at
+        and verification.lease_expires_at > timezone.now()
+    ):
+        raise LeaseError(f"Verification is claimed by another reviewer until {verification.lease_expires_at}")
+
+
+def renew(verification, reviewer):
+    """Extend the reviewer's lease; fails if the case was released or reclaimed meanwhile"""
+    updated = KYCVerification.objects.filter(pk=verification.pk, status='in_review', reviewer=reviewer).update(
+        lease_expires_at=timezone.now() + timedelta(seconds=lease_seconds()), updated_at=timezone.now(),
+    )
+    if not updated:
+        raise LeaseError('Verification is not claimed by you')
+    verification.refresh_from_db()
+    return verification
+
+
+def release(verification, reviewer):
+    """Hand a claimed case back to the queue"""
+    updated = KYCVerification.objects.filter(pk=verification.pk, status='in_review', reviewer=reviewer).update(
+        status='pending', reviewer=None, lease_expires_at=None, updated_at=timezone.now(),
+    )
+    if not updated:
+        raise LeaseError('Verification is not claimed by you')
+    verification.refresh_from_db()
+    return verification
@@ -1,15 +1,120 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
 from rest_framework import serializers
-from .models import KYCDocument, KYCVerification
+from .models import KYCDocument, KYCVerification, KYCUpload
+from .uploads import attach
+
+UPLOAD_FIELDS = {
+    'front_upload': 'front_image',
+    'back_upload': 'back_image',
+    'selfie_upload': 'selfie_image',
+}
 
 class KYCDocumentSerializer(serializers.ModelSerializer):
+    # Finished chunked uploads (see KYCUploadViewSet) can stand in for the multipart images
+    front_upload = serializers.PrimaryKeyRelatedField(
+        queryset=KYCUpload.objects.filter(status='complete'), write_only=True, required=False
+    )
+    back_upload = serializers.PrimaryKeyRelatedField(
+        queryset=KYCUpload.objects.filter(status='complete'), write_only=True, required=False
+    )
+    selfie_upload = serializers.PrimaryKeyRelatedField(
+        queryset=KYCUpload.objects.filter(status='complete'), write_only=True, required=False
+    )
+
     class Meta:
         model = KYCDocument
         fields = [
             'id', 'document_type', 'document_number', 'front_image', 
-            'back_image', 'selfie_image', 'verified', 'verified_at',
+            'back_image', 'selfie_image', 'front_upload', 'back_upload',
+            'selfie_upload', 'file_hashes', 'normalization_status', 'verified', 'verified_at',
             'rejection_reason', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'verified', 'verified_at', 'created_at', 'updated_at']
+        read_only_fields = [
+            'id', 'file_hashes', 'normalization_status', 'verified', 'verified_at',
+            'created_at', 'updated_at'
+        ]
+        extra_kwargs = {
+            'front_image': {'required': False},
+            'selfie_image': {'required': False},
+        }
+
+    def validate(self, data):
+        user = self.context['request'].user
+        for upload_field, image_field in UPLOAD_FIELDS.items():
+            upload = data.get(upload_field)
+            if upload is None:
+                continue
+            if upload.user_id != user.id or upload.field != image_field:
+                raise serializers.ValidationError({upload_field: 'Not a finished upload of this image for this user'})
+            if upload.document_id and (self.instance is None or upload.document_id != self.instance.id):
+                raise serializers.ValidationError({upload_field: 'Upload is already attached to another document'})
+        if self.instance is None:
+            for image_field in ('front_image', 'selfie_image'):
+                upload_field = image_field.replace('_image', '_upload')
+                if not data.get(image_field) and not data.get(upload_field):
+                    raise serializers.ValidationError({image_field: f'Provide {image_field} or {upload_field}'})
+        return data
+
+    def create(self, validated_data):
+        uploads = {field: validated_data.pop(field) for field in UPLOAD_FIELDS if field in validated_data}
+        document = KYCDocument(**validated_data)
+        return self._save_with_uploads(document, uploads)
+
+    def update(self, instance, validated_data):
+        uploads = {field: validated_data.pop(field) for field in UPLOAD_FIELDS if field in validated_data}
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        return self._save_with_uploads(instance, uploads)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Serve the review-size renditions in place of the originals unless ?original=1 asks for them
+        request = self.context.get('request')
+        originals = request is not None and request.query_params.get('original')
+        data['thumbnails'] = {}
+        for field, renditions in (instance.renditions or {}).items():
+            if not data.get(field):
+                continue
+            if 'review' in renditions and not originals:
+                data[field] = self._url(renditions['review']['name'])
+            if 'thumbnail' in renditions:
+                data['thumbnails'][field] = self._url(renditions['thumbnail']['name'])
+        return data
+
+    def _url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def _save_with_uploads(self, document, uploads):
+        # New images need new renditions
+        if uploads or any(field in self.validated_data for field in UPLOAD_FIELDS.values()):
+            document.normalization_status = 'pending'
+        with transaction.atomic():
+            for upload_field, upload in uploads.items():
+                attach(document, UPLOAD_FIELDS[upload_field], upload.storage_name, upload.sha256)
+            document.save()
+            if uploads:
+                KYCUpload.objects.filter(pk__in=[upload.pk for upload in uploads.values()]).update(document=document)
+        return document
+
+
+class KYCUploadSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received_bytes', read_only=True)
+
+    class Meta:
+        model = KYCUpload
+        fields = [
+            'id', 'document', 'field', 'filename', 'content_type', 'total_size',
+            'chunk_size', 'offset', 'sha256', 'status', 'completed_at', 'created_at'
+        ]
+        read_only_fields = ['id', 'chunk_size', 'offset', 'sha256', 'status', 'completed_at', 'created_at']
+
+    def validate_document(self, document):
+        if document is not None and document.user_id != self.context['request'].user.id:
+            raise serializers.ValidationError('Document not found')
+        return document
 
 class KYCVerificationSerializer(serializers.ModelSerializer):
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -19,12 +124,12 @@ class KYCVerificationSerializer(serializers.ModelSerializer):
         model = KYCVerification
         fields = [
             'id', 'user', 'user_details', 'status', 'status_display',
-            'provider_reference', 'attested_hash', 'tx_hash',
-            'completed_at', 'created_at', 'updated_at'
+            'provider_reference', 'attested_hash', 'tx_hash', 'priority',
+            'reviewer', 'lease_expires_at', 'completed_at', 'created_at', 'updated_at'
         ]
         read_only_fields = [
             'id', 'user', 'status', 'provider_reference', 'attested_hash',
-            'tx_hash', 'completed_at', 'created_at', 'updated_at'
+            'tx_hash', 'reviewer', 'lease_expires_at', 'completed_at', 'created_at', 'updated_at'
         ]
 
     def get_user_details(self, obj):
@@ -0,0 +1,38 @@
+from celery import shared_task
+from .attestations import create_batch
+from .images import normalize_batch
+from .uploads import delete_stale_uploads
+from . import whitelist
+
+
+@shared_task
+def cleanup_stale_kyc_uploads():
+    """Delete abandoned chunked uploads and their files"""
+    return delete_stale_uploads()
+
+
+@shared_task
+def normalize_kyc_images(batch_size=20):
+    """Render renditions for a batch of pending KYC documents"""
+    return normalize_batch(batch_size)
+
+
+@shared_task
+def anchor_kyc_attestations():
+    """Batch the approvals of the last window into one Merkle root and queue it for anchoring"""
+    batch = create_batch()
+    return batch.id if batch else None
+
+
+@shared_task
+def sync_whitelist(limit=500):
+    """Queue packed whitelist transactions for users whose KYC status changed"""
+    return whitelist.sync(limit)
+
+
+@shared_task
+def reconcile_whitelist():
+    """Correct the recorded whitelist state from the program's WhitelistEntry accounts"""
+    report = whitelist.reconcile()
+    report['orphans'] = len(report['orphans'])
+    return report
@@ -1,3 +1,470 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+import hashlib
+import io
+import tempfile
 
-# Create your tests here.
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from solana.publickey import PublicKey
+from solana.rpc.api import Client
+
+from core.models import ChainIntent, User
+from core.outbox import get_handler
+from core.utils.anchor_instructions import encode_whitelist_entry, whitelist_pda
+from core.utils.mock_rpc import DEFAULT_PROGRAM_ID, MockChain, MockRPCServer
+from core.utils.rpc_provider import SolanaRPCProvider
+from core.utils.solana_client import solana_client
+from . import review, whitelist
+from .attestations import create_batch
+from .images import RENDITIONS, normalize_batch, rendition_name
+from .merkle import build_levels, inclusion_proof, leaf_hash, node_hash, verify_proof
+from .models import KYCAttestationBatch, KYCDocument, KYCUpload, KYCVerification
+from .uploads import UploadError, hash_list, start_upload, write_chunk
+
+
+def key(seed):
+    return str(PublicKey(hashlib.sha256(seed.encode()).digest()))
+
+
+class MerkleTests(SimpleTestCase):
+    def leaves(self, count):
+        return [leaf_hash(f'attestation-{i}'.encode()) for i in range(count)]
+
+    def test_every_leaf_proves_against_the_root(self):
+        for count in range(1, 10):
+            leaves = self.leaves(count)
+            levels = build_levels(leaves)
+            root = levels[-1][0]
+            self.assertEqual(len(levels[-1]), 1)
+            for index, leaf in enumerate(leaves):
+                with self.subTest(count=count, index=index):
+                    self.assertTrue(verify_proof(leaf, inclusion_proof(levels, index), root))
+
+    def test_unpaired_node_is_promoted(self):
+        a, b, c = self.leaves(3)
+        self.assertEqual(build_levels([a, b, c])[-1], [node_hash(node_hash(a, b), c)])
+
+    def test_tampered_proofs_fail(self):
+        leaves = self.leaves(5)
+        levels = build_levels(leaves)
+        root = levels[-1][0]
+        proof = inclusion_proof(levels, 2)
+        self.assertFalse(verify_proof(leaves[3], proof, root))
+        flipped = [{**proof[0], 'side': 'left' if proof[0]['side'] == 'right' else 'right'}, *proof[1:]]
+        self.assertFalse(verify_proof(leaves[2], flipped, root))
+        self.assertFalse(verify_proof(leaves[2], [{'side': 'up', 'hash': proof[0]['hash']}], root))
+        self.assertFalse(verify_proof(leaves[2], [{'side': 'left', 'hash': 'not hex'}], root))
+        self.assertFalse(verify_proof(leaves[2], [{'side': 'left'}], root))
+
+    def test_node_cannot_pass_as_a_leaf(self):
+        a, b = self.leaves(2)
+        parent = node_hash(a, b)
+        # The node's preimage hashed as a leaf gives a different hash
+        self.assertNotEqual(leaf_hash(bytes.fromhex(a) + bytes.fromhex(b)), parent)
+        self.assertTrue(verify_proof(parent, [], build_levels([a, b])[-1][0]))
+        self.assertFalse(verify_proof(leaf_hash(bytes.fromhex(a) + bytes.fromhex(b)), [], parent))
+
+    def test_empty_tree_is_rejected(self):
+        with self.assertRaises(ValueError):
+            build_levels([])
+
+
+@override_settings(KYC_UPLOAD_CHUNK_SIZE=4)
+class KYCUploadTests(TestCase):
+    DATA = b'0123456789'
+
+    def setUp(self):
+        self.enterContext(self.settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.user = User.objects.create(username='borrower', wallet_address='wallet')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start(self, field='front_image'):
+        response = self.client.post(
+            '/kyc/uploads/', {'field': field, 'filename': 'ID.JPG', 'total_size': len(self.DATA)}, format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def put(self, upload_id, offset, body, **extra):
+        return self.client.generic(
+            'PUT', f'/kyc/uploads/{upload_id}/chunk/', body, content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset), **extra,
+        )
+
+    def upload(self, field='front_image'):
+        upload_id = self.start(field)
+        for offset in range(0, len(self.DATA), 4):
+            self.assertEqual(self.put(upload_id, offset, self.DATA[offset:offset + 4]).status_code, 200)
+        return KYCUpload.objects.get(pk=upload_id)
+
+    def test_chunk_at_the_wrong_offset_conflicts(self):
+        upload_id = self.start()
+        response = self.put(upload_id, 4, self.DATA[4:8])
+        self.assertEqual((response.status_code, response.data['offset']), (409, 0))
+        self.assertEqual(self.put(upload_id, 0, self.DATA[:4]).status_code, 200)
+        response = self.put(upload_id, 0, self.DATA[:4])
+        self.assertEqual((response.status_code, response.data['offset']), (409, 4))
+
+    def test_resumes_after_a_dropped_chunk(self):
+        upload_id = self.start()
+        self.put(upload_id, 0, self.DATA[:4])
+        # The connection drops two bytes into a four-byte chunk
+        with self.assertRaises(UploadError) as raised:
+            write_chunk(KYCUpload.objects.get(pk=upload_id), 4, 4, io.BytesIO(b'XX'))
+        self.assertEqual(raised.exception.offset, 4)
+        self.assertEqual(self.client.get(f'/kyc/uploads/{upload_id}/').data['offset'], 4)
+
+        for offset in (4, 8):
+            response = self.put(upload_id, offset, self.DATA[offset:offset + 4])
+        self.assertEqual((response.data['status'], response.data['offset']), ('complete', len(self.DATA)))
+        upload = KYCUpload.objects.get(pk=upload_id)
+        with default_storage.open(upload.storage_name) as file:
+            self.assertEqual(file.read(), self.DATA)
+
+    def test_completion_stores_the_streamed_hash_without_reading_the_file(self):
+        with mock.patch.object(FileSystemStorage, 'open', side_effect=AssertionError('file re-read')):
+            upload = self.upload()
+        chunks = [self.DATA[offset:offset + 4] for offset in range(0, len(self.DATA), 4)]
+        self.assertEqual(upload.sha256, hash_list([hashlib.sha256(chunk).hexdigest() for chunk in chunks]))
+        self.assertTrue(upload.storage_name.startswith('kyc/documents/'))
+        self.assertTrue(upload.storage_name.endswith('.jpg'))
+
+    def test_finished_uploads_attach_to_a_new_document(self):
+        front, selfie = self.upload('front_image'), self.upload('selfie_image')
+        response = self.client.post('/kyc/documents/', {
+            'document_type': 'passport', 'document_number': 'P1', 'front_upload': front.id,
+            'selfie_upload': selfie.id,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        document = KYCDocument.objects.get()
+        self.assertEqual(
+            (document.front_image.name, document.selfie_image.name), (front.storage_name, selfie.storage_name),
+        )
+        self.assertEqual(document.file_hashes, {'front_image': front.sha256, 'selfie_image': selfie.sha256})
+        self.assertEqual(set(document.uploads.all()), {front, selfie})
+
+        # An attached upload cannot be reused, nor one for another image
+        response = self.client.post('/kyc/documents/', {
+            'document_type': 'passport', 'document_number': 'P2', 'front_upload': front.id,
+            'selfie_upload': selfie.id,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_storage_without_local_paths_is_refused(self):
+        with override_settings(STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        }):
+            with self.assertRaises(ImproperlyConfigured):
+                start_upload(self.user, 'front_image', 'id.jpg', 10)
+        self.assertFalse(KYCUpload.objects.exists())
+
+
+class ReviewQueueTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', wallet_address='alice-wallet', is_staff=True)
+        self.bob = User.objects.create(username='bob', wallet_address='bob-wallet', is_staff=True)
+        self.cases = [
+            KYCVerification.objects.create(
+                user=User.objects.create(username=f'borrower-{i}', wallet_address=f'wallet-{i}'),
+            )
+            for i in range(4)
+        ]
+
+    def test_claims_get_disjoint_cases(self):
+        first = review.claim(self.alice, 2)
+        second = review.claim(self.bob, 3)
+        self.assertEqual([case.id for case in first], [case.id for case in self.cases[:2]])
+        self.assertEqual([case.id for case in second], [case.id for case in self.cases[2:]])
+        self.assertEqual(review.claim(self.bob), [])
+        for case in first:
+            self.assertEqual((case.status, case.reviewer_id), ('in_review', self.alice.id))
+            self.assertGreater(case.lease_expires_at, timezone.now())
+
+    def test_expired_lease_returns_the_case_to_the_queue(self):
+        case, = review.claim(self.alice)
+        KYCVerification.objects.filter(pk=case.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(review.release_expired(), 1)
+        case.refresh_from_db()
+        self.assertEqual((case.status, case.reviewer, case.lease_expires_at), ('pending', None, None))
+        with self.assertRaises(review.LeaseError):
+            review.renew(case, self.alice)
+        # The oldest case is first in line again
+        self.assertEqual(review.claim(self.bob)[0].id, case.id)
+
+    def test_live_lease_belongs_to_its_reviewer(self):
+        case, = review.claim(self.alice)
+        review.check_lease(case, self.alice)
+        with self.assertRaises(review.LeaseError):
+            review.check_lease(case, self.bob)
+        with self.assertRaises(review.LeaseError):
+            review.release(case, self.bob)
+
+        client = APIClient()
+        client.force_authenticate(self.bob)
+        self.assertEqual(client.post(f'/admin/kyc/{case.id}/approve/').status_code, 409)
+        case.refresh_from_db()
+        self.assertEqual(case.status, 'in_review')
+
+        # Once the lease runs out anyone may act on the case
+        case.lease_expires_at = timezone.now() - timedelta(seconds=1)
+        review.check_lease(case, self.bob)
+
+    def test_release_and_renew(self):
+        case, = review.claim(self.alice)
+        expires = case.lease_expires_at
+        self.assertGreaterEqual(review.renew(case, self.alice).lease_expires_at, expires)
+        review.release(case, self.alice)
+        self.assertEqual((case.status, case.reviewer), ('pending', None))
+        self.assertEqual(review.claim(self.bob)[0].id, case.id)
+
+    def test_prioritized_users_are_claimed_first(self):
+        urgent = self.cases[3]
+        self.assertEqual(review.prioritize_users([urgent.user_id]), 1)
+        self.assertEqual(
+            list(review.queue().values_list('id', flat=True)),
+            [urgent.id] + [case.id for case in self.cases[:3]],
+        )
+        self.assertEqual([case.id for case in review.claim(self.alice, 2)], [urgent.id, self.cases[0].id])
+        # A lower priority never demotes a case
+        self.assertEqual(review.prioritize_users([urgent.user_id], review.PRIORITY_DEFAULT), 0)
+
+
+@override_settings(KYC_WHITELIST_INSTRUCTIONS_PER_TX=4)
+class WhitelistSyncTests(TestCase):
+    def setUp(self):
+        self.chain = MockChain(slot_seconds=0)
+        self.server = MockRPCServer(chain=self.chain)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        client = Client(self.server.url)
+        client._provider = SolanaRPCProvider(self.server.url, endpoints=[self.server.url])
+        patcher = mock.patch.multiple(solana_client, client=client, program_id=PublicKey(DEFAULT_PROGRAM_ID))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def user(self, number, verified, whitelisted, on_chain):
+        wallet = key(f'wallet:{number}')
+        if on_chain:
+            self.chain.set_account(
+                str(whitelist_pda(wallet, PublicKey(DEFAULT_PROGRAM_ID))), encode_whitelist_entry(wallet),
+            )
+        return User.objects.create(
+            username=f'borrower{number}', wallet_address=wallet, kyc_verified=verified,
+            whitelisted_on_chain=whitelisted,
+        )
+
+    def test_sync_packs_changes_by_instructions_per_tx(self):
+        adds = [self.user(i, True, False, on_chain=i < 2) for i in range(10)]
+        removed = self.user(10, False, True, on_chain=True)
+        gone = self.user(11, False, True, on_chain=False)
+
+        report = whitelist.sync()
+        self.assertEqual(report, {'candidates': 12, 'already_synced': 3, 'instructions': 9, 'transactions': 3})
+        # Users whose entry was already right are recorded without a transaction
+        self.assertEqual(
+            set(User.objects.filter(whitelist_synced_at__isnull=False).values_list('id', flat=True)),
+            {adds[0].id, adds[1].id, gone.id},
+        )
+        intents = list(ChainIntent.objects.filter(kind=whitelist.INTENT_KIND).order_by('id'))
+        self.assertEqual(
+            [intent.payload for intent in intents],
+            [
+                {'add': [[user.id, user.wallet_address] for user in adds[2:6]], 'remove': []},
+                {'add': [[user.id, user.wallet_address] for user in adds[6:]], 'remove': []},
+                {'add': [], 'remove': [[removed.id, removed.wallet_address]]},
+            ],
+        )
+        # Users in an open intent are left to it
+        self.assertEqual(whitelist.sync()['transactions'], 0)
+
+        handler = get_handler(whitelist.INTENT_KIND)
+        for intent in intents:
+            handler.complete(intent)
+        self.assertFalse(whitelist.drifted().exists())
+        removed.refresh_from_db()
+        self.assertFalse(removed.whitelisted_on_chain)
+        self.assertIsNotNone(removed.whitelist_synced_at)
+
+    def test_reconcile_corrects_the_recorded_state(self):
+        listed = self.user(0, True, True, on_chain=False)
+        missing = self.user(1, True, True, on_chain=False)
+        unrecorded = self.user(2, False, False, on_chain=False)
+        orphan = key('wallet:orphan')
+        entries = {listed.wallet_address: True, unrecorded.wallet_address: False, orphan: True}
+
+        with mock.patch.object(whitelist, 'onchain_entries', return_value=entries):
+            report = whitelist.reconcile(apply=False)
+            self.assertEqual(
+                (report['onchain'], report['disabled'], report['recorded_missing'], report['unrecorded']),
+                (3, 1, 1, 1),
+            )
+            self.assertEqual(report['orphans'], [orphan])
+            self.assertFalse(User.objects.filter(whitelist_synced_at__isnull=False).exists())
+
+            report = whitelist.reconcile(remove_orphans=True)
+            self.assertEqual(report['orphan_transactions'], 1)
+            intent = ChainIntent.objects.get(kind=whitelist.INTENT_KIND)
+            self.assertEqual((intent.target_id, intent.payload), (0, {'add': [], 'remove': [[None, orphan]]}))
+            # An orphan already queued for removal is not queued again
+            self.assertEqual(whitelist.reconcile(remove_orphans=True)['orphan_transactions'], 0)
+
+        self.assertEqual(
+            {user.id: user.whitelisted_on_chain for user in User.objects.all()},
+            {listed.id: True, missing.id: False, unrecorded.id: True},
+        )
+        # The corrected rows are now drifted, so the next sync fixes them on chain
+        self.assertEqual(set(whitelist.drifted()), {missing, unrecorded})
+
+
+class AttestationBatchTests(TestCase):
+    def setUp(self):
+        self.verifications = []
+        for i in range(5):
+            user = User.objects.create(username=f'borrower{i}', wallet_address=key(f'wallet:{i}'), kyc_verified=True)
+            KYCDocument.objects.create(
+                user=user, document_type='passport', document_number=f'P{i}', front_image='front.jpg',
+                selfie_image='selfie.jpg', file_hashes={'front_image': f'{i:064x}'},
+            )
+            self.verifications.append(KYCVerification.objects.create(
+                user=user, status='approved', completed_at=timezone.now(),
+            ))
+        self.pending = KYCVerification.objects.create(
+            user=User.objects.create(username='applicant', wallet_address=key('wallet:applicant')),
+        )
+
+    def test_window_batch_stores_proofs_against_the_anchored_root(self):
+        batch = create_batch()
+        self.assertEqual(batch.leaf_count, 5)
+        intent = ChainIntent.objects.get(kind='kyc_attestation')
+        self.assertEqual((intent.target_id, intent.payload), (batch.id, {'merkle_root': batch.merkle_root}))
+        for index, verification in enumerate(self.verifications):
+            verification.refresh_from_db()
+            with self.subTest(index=index):
+                self.assertEqual((verification.attestation_batch_id, verification.leaf_index), (batch.id, index))
+                self.assertTrue(verify_proof(verification.attested_hash, verification.merkle_proof, batch.merkle_root))
+        self.pending.refresh_from_db()
+        self.assertIsNone(self.pending.attestation_batch)
+        # Nothing is left for the next window
+        self.assertIsNone(create_batch())
+
+        intent.tx_hash = 'anchor-signature'
+        get_handler('kyc_attestation').complete(intent)
+        batch.refresh_from_db()
+        self.assertEqual((batch.status, batch.tx_hash), ('anchored', 'anchor-signature'))
+
+    def test_failed_anchor_returns_the_approvals_to_the_next_window(self):
+        batch = create_batch()
+        with self.assertLogs('kyc.intents', 'ERROR'):
+            get_handler('kyc_attestation').fail(ChainIntent.objects.get(kind='kyc_attestation'))
+        self.assertEqual(KYCAttestationBatch.objects.get(pk=batch.pk).status, 'failed')
+        self.assertEqual(create_batch().leaf_count, 5)
+
+    def test_verify_endpoint(self):
+        create_batch()
+        verification = KYCVerification.objects.select_related('attestation_batch').get(pk=self.verifications[2].pk)
+        client = APIClient()
+        client.force_authenticate(verification.user)
+
+        attestation = client.get(f'/kyc/verifications/{verification.id}/attestation/').data
+        self.assertTrue(attestation['proof_valid'])
+        self.assertTrue(attestation['leaf_matches_record'])
+
+        body = {
+            'leaf_hash': verification.attested_hash,
+            'merkle_proof': verification.merkle_proof,
+            'merkle_root': verification.attestation_batch.merkle_root,
+        }
+        response = client.post('/kyc/verifications/verify/', body, format='json')
+        self.assertEqual((response.status_code, response.data), (200, {'valid': True}))
+        other = KYCVerification.objects.get(pk=self.verifications[3].pk)
+        response = client.post(
+            '/kyc/verifications/verify/', {**body, 'leaf_hash': other.attested_hash}, format='json',
+        )
+        self.assertEqual((response.status_code, response.data), (200, {'valid': False}))
+        response = client.post('/kyc/verifications/verify/', {**body, 'merkle_proof': 'proof'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ImageNormalizationTests(TestCase):
+    def setUp(self):
+        self.enterContext(self.settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.user = User.objects.create(username='borrower', wallet_address='wallet')
+        self.document = KYCDocument.objects.create(
+            user=self.user, document_type='passport', document_number='P1',
+            front_image=self.photo('kyc/documents/front.jpg'), selfie_image=self.photo('kyc/selfies/selfie.jpg'),
+        )
+
+    def photo(self, name):
+        """A 2400x1200 phone photo taken on its side, with a GPS position in its EXIF"""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise to view
+        exif[0x8825] = {2: (51.0, 30.0, 0.0)}  # GPSInfo: latitude
+        buffer = io.BytesIO()
+        Image.new('RGB', (2400, 1200), 'navy').save(buffer, 'JPEG', exif=exif)
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def digest(self, name):
+        with default_storage.open(name) as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    def test_renditions_are_upright_and_carry_no_metadata(self):
+        originals = {name: self.digest(name) for name in ('kyc/documents/front.jpg', 'kyc/selfies/selfie.jpg')}
+        call_command('normalize_kyc_images', '--once', '--workers', '1', stdout=io.StringIO())
+
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.normalization_status, 'done')
+        self.assertEqual(set(self.document.renditions), {'front_image', 'selfie_image'})
+        for field in ('front_image', 'selfie_image'):
+            for kind, edge, _ in RENDITIONS:
+                with self.subTest(field=field, kind=kind):
+                    name = rendition_name(self.document.id, field, kind)
+                    self.assertEqual(self.document.renditions[field][kind]['name'], name)
+                    with Image.open(default_storage.path(name)) as image:
+                        self.assertEqual(image.size, (edge // 2, edge))
+                        self.assertEqual(dict(image.getexif()), {})
+                        self.assertNotIn('exif', image.info)
+                        self.assertNotIn('icc_profile', image.info)
+        # The originals are kept as uploaded, EXIF and all
+        self.assertEqual({name: self.digest(name) for name in originals}, originals)
+        with Image.open(default_storage.path('kyc/documents/front.jpg')) as image:
+            self.assertEqual(image.getexif()[0x0112], 6)
+
+    def test_a_broken_image_fails_its_document(self):
+        default_storage.delete('kyc/selfies/selfie.jpg')
+        default_storage.save('kyc/selfies/selfie.jpg', ContentFile(b'not a jpeg'))
+        with self.assertLogs('kyc.images', 'ERROR'):
+            stats = normalize_batch(executor=None)
+        self.assertEqual((stats['documents'], stats['images'], stats['failed']), (1, 2, 1))
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.normalization_status, 'failed')
+        self.assertEqual(set(self.document.renditions), {'front_image'})
+
+    def test_api_and_admin_serve_the_renditions(self):
+        with mock.patch('multiprocessing.current_process', return_value=mock.Mock(daemon=True)):
+            normalize_batch()
+        review_name = rendition_name(self.document.id, 'front_image', 'review')
+        thumbnail_name = rendition_name(self.document.id, 'front_image', 'thumbnail')
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        data = client.get(f'/kyc/documents/{self.document.id}/').data
+        self.assertTrue(data['front_image'].endswith(review_name))
+        self.assertTrue(data['thumbnails']['front_image'].endswith(thumbnail_name))
+        data = client.get(f'/kyc/documents/{self.document.id}/', {'original': 1}).data
+        self.assertTrue(data['front_image'].endswith('kyc/documents/front.jpg'))
+
+        admin = User.objects.create(username='admin', wallet_address='admin-wallet', is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        response = self.client.get('/cred-lend-admin/kyc/kycdocument/')
+        self.assertContains(response, default_storage.url(thumbnail_name))
+        response = self.client.get(f'/cred-lend-admin/kyc/kycdocument/{self.document.id}/change/')
+        self.assertContains(response, default_storage.url(review_name))
@@ -0,0 +1,184 @@
+"""Resumable, chunked KYC image uploads that hash the bytes as they stream.
+
+A client opens an upload with the image's size, then PUTs it in order,
+``chunk_size`` bytes at a time, with each chunk's offset in an
+``Upload-Offset`` header. Each chunk is read from the request in small
+pieces. Every piece is written straight into the upload's file at its offset
+and fed to a SHA-256 of that chunk, so nothing is buffered and nothing is
+read back. If a connection drops, the client asks the upload for its
+``offset`` and resends from there.
+
+Python's ``hashlib`` cannot save a running SHA-256 between requests, and
+consecutive chunks may reach different worker processes. The file hash is
+therefore a hash list: SHA-256 over the concatenated SHA-256 digests of the
+file's ``chunk_size`` pieces. Anyone holding the file and the chunk size can
+recompute it, and it is final once the last chunk lands.
+
+Chunks are written with ``os.pwrite`` into local files, so the default
+storage must be a ``FileSystemStorage`` (or a subclass); remote storages
+have no local path to write to. Opening an upload on any other storage
+raises ``ImproperlyConfigured``.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+import hashlib
+import logging
+import os
+import uuid
+
+from .models import KYCDocument, KYCUpload
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+DEFAULT_CHUNK_SIZE = 512 * 1024
+DEFAULT_MAX_SIZE = 20 * 1024 * 1024
+
+
+class UploadError(Exception):
+    """A chunk was rejected; ``offset`` is where the client should resume"""
+
+    def __init__(self, message, offset=None, conflict=False):
+        super().__init__(message)
+        self.offset = offset
+        self.conflict = conflict
+
+
+def hash_list(chunk_hashes):
+    return hashlib.sha256(b''.join(bytes.fromhex(digest) for digest in chunk_hashes)).hexdigest()
+
+
+def _path(name):
+    if not isinstance(default_storage, FileSystemStorage):
+        raise ImproperlyConfigured('Chunked KYC uploads write local files; the default storage must be a FileSystemStorage')
+    return default_storage.path(name)
+
+
+def start_upload(user, field, filename, total_size, content_type='', document=None):
+    max_size = getattr(settings, 'KYC_UPLOAD_MAX_SIZE', DEFAULT_MAX_SIZE)
+    if total_size <= 0 or total_size > max_size:
+        raise UploadError(f"total_size must be between 1 and {max_size} bytes")
+    extension = os.path.splitext(filename)[1][:10].lower()
+    storage_name = f'kyc/uploads/{uuid.uuid4().hex}{extension}'
+    # Fail before the client sends anything
+    _path(storage_name)
+    return KYCUpload.objects.create(
+        user=user,
+        document=document,
+        field=field,
+        filename=filename[:255],
+        content_type=content_type[:100],
+        total_size=total_size,
+        chunk_size=getattr(settings, 'KYC_UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE),
+        storage_name=storage_name,
+    )
+
+
+def write_chunk(upload, offset, length, stream):
+    """Stream one chunk from ``stream`` into the upload's file; returns the refreshed upload.
+
+    No database transaction is held while the body streams in. The chunk is
+    committed afterwards by a conditional update on ``received_bytes``, so of
+    two requests racing for the same chunk (a retry while the original is
+    still arriving), only one counts. Both write the same bytes at the same
+    offset.
+    """
+    if upload.status != 'uploading':
+        raise UploadError('Upload is already complete', offset=upload.received_bytes, conflict=True)
+    if offset != upload.received_bytes:
+        raise UploadError('Chunk does not start at the upload offset', offset=upload.received_bytes, conflict=True)
+    expected = min(upload.chunk_size, upload.total_size - offset)
+    if length != expected:
+        raise UploadError(f"Chunk at offset {offset} must be {expected} bytes", offset=offset)
+
+    path = _path(upload.storage_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    received = 0
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        while received < length:
+            piece = stream.read(min(READ_SIZE, length - received))
+            if not piece:
+                break
+            os.pwrite(fd, piece, offset + received)
+            digest.update(piece)
+            received += len(piece)
+    finally:
+        os.close(fd)
+    if received != length:
+        # The connection dropped mid-chunk; the partial bytes get overwritten on retry
+        raise UploadError(f"Chunk ended after {received} of {length} bytes", offset=offset)
+
+    chunk_hashes = upload.chunk_hashes + [digest.hexdigest()]
+    new_offset = offset + length
+    if new_offset < upload.total_size:
+        updated = KYCUpload.objects.filter(pk=upload.pk, received_bytes=offset, status='uploading').update(
+            received_bytes=new_offset, chunk_hashes=chunk_hashes, updated_at=timezone.now(),
+        )
+    else:
+        updated = _complete(upload, offset, chunk_hashes)
+    if not updated:
+        upload.refresh_from_db()
+        raise UploadError('Chunk was already received', offset=upload.received_bytes, conflict=True)
+    upload.refresh_from_db()
+    return upload
+
+
+def _complete(upload, offset, chunk_hashes):
+    """Record the last chunk, move the file to its image folder and attach it to the document"""
+    upload_to = KYCDocument._meta.get_field(upload.field).upload_to
+    final_name = default_storage.get_available_name(upload_to + os.path.basename(upload.storage_name))
+    sha256 = hash_list(chunk_hashes)
+    now = timezone.now()
+    with transaction.atomic():
+        updated = KYCUpload.objects.filter(pk=upload.pk, received_bytes=offset, status='uploading').update(
+            received_bytes=upload.total_size,
+            chunk_hashes=chunk_hashes,
+            sha256=sha256,
+            storage_name=final_name,
+            status='complete',
+            completed_at=now,
+            updated_at=now,
+        )
+        if not updated:
+            return 0
+        if upload.document_id:
+            document = KYCDocument.objects.select_for_update().get(pk=upload.document_id)
+            attach(document, upload.field, final_name, sha256)
+            document.save()
+        # A rename on the same filesystem; if it fails the transaction rolls back
+        final_path = _path(final_name)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(_path(upload.storage_name), final_path)
+    return updated
+
+
+def attach(document, field, name, sha256):
+    """Point one of the document's image fields at an uploaded file; the caller saves"""
+    getattr(document, field).name = name
+    document.file_hashes = dict(document.file_hashes or {}, **{field: sha256})
+    document.verified = False
+    document.normalization_status = 'pending'
+
+
+def delete_stale_uploads(max_age_hours=None):
+    """Delete unfinished uploads, and finished ones never attached to a document, once they go stale"""
+    max_age_hours = max_age_hours or getattr(settings, 'KYC_UPLOAD_EXPIRY_HOURS', 24)
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    stale = KYCUpload.objects.filter(Q(status='uploading') | Q(document__isnull=True), updated_at__lt=cutoff)
+    deleted = 0
+    for upload in stale.iterator():
+        try:
+            default_storage.delete(upload.storage_name)
+        except OSError as e:
+            logger.error(f"Error deleting file for KYC upload {upload.id}: {e}")
+            continue
+        upload.delete()
+        deleted += 1
+    return deleted
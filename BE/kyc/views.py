@@ -1,11 +1,16 @@
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from .models import KYCDocument, KYCVerification
-from .serializers import KYCDocumentSerializer, KYCVerificationSerializer
+from .models import KYCDocument, KYCVerification, KYCUpload
+from .serializers import KYCDocumentSerializer, KYCVerificationSerializer, KYCUploadSerializer
+from .uploads import UploadError, start_upload, write_chunk
+from . import review
+from .attestations import attestation_status, clear_attestation
+from .merkle import verify_proof
 
 class KYCDocumentViewSet(viewsets.ModelViewSet):
     serializer_class = KYCDocumentSerializer
@@ -31,13 +36,17 @@ class KYCDocumentViewSet(viewsets.ModelViewSet):
             )
         
         # Create or update KYC verification record
+        priority = review.priority_for(request.user)
         verification, created = KYCVerification.objects.get_or_create(
             user=request.user,
-            defaults={'status': 'pending'}
+            defaults={'status': 'pending', 'priority': priority}
         )
         
         if not created:
             verification.status = 'pending'
+            verification.priority = priority
+            verification.reviewer = None
+            verification.lease_expires_at = None
             verification.save()
         
         return Response({
@@ -46,6 +55,55 @@ class KYCDocumentViewSet(viewsets.ModelViewSet):
             'message': 'KYC documents submitted for verification'
         })
 
+class KYCUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                       mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Resumable chunked uploads of KYC images (see kyc.uploads).
+
+    POST field, filename and total_size to open an upload, then PUT each
+    chunk to ``chunk/`` as the raw request body with an ``Upload-Offset``
+    header. After a dropped connection, GET the upload and resume from its
+    ``offset``. Pass a finished upload's id as ``front_upload``,
+    ``back_upload`` or ``selfie_upload`` when creating a document.
+    """
+    serializer_class = KYCUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return KYCUpload.objects.filter(user=self.request.user).order_by('-created_at')
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        try:
+            serializer.instance = start_upload(
+                self.request.user, data['field'], data['filename'], data['total_size'],
+                content_type=data.get('content_type', ''), document=data.get('document'),
+            )
+        except UploadError as e:
+            raise ValidationError({'total_size': str(e)})
+
+    @action(detail=True, methods=['put'])
+    def chunk(self, request, pk=None):
+        """Append one chunk, streamed from the request body"""
+        upload = self.get_object()
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or '')
+        except ValueError:
+            return Response(
+                {'error': 'Upload-Offset and Content-Length headers are required', 'offset': upload.received_bytes},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            # request.stream is the unparsed body; it is never loaded into memory whole
+            upload = write_chunk(upload, offset, length, request.stream)
+        except UploadError as e:
+            return Response(
+                {'error': str(e), 'offset': e.offset},
+                status=status.HTTP_409_CONFLICT if e.conflict else status.HTTP_400_BAD_REQUEST
+            )
+        return Response(self.get_serializer(upload).data)
+
 class KYCVerificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = KYCVerificationSerializer
     permission_classes = [IsAuthenticated]
@@ -61,12 +119,82 @@ class KYCVerificationViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = self.get_serializer(verification)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def attestation(self, request, pk=None):
+        """Leaf, inclusion proof and batch root of this verification, with the proof checked locally"""
+        verification = get_object_or_404(
+            self.get_queryset().select_related('user', 'attestation_batch'), pk=pk
+        )
+        return Response(attestation_status(verification))
+
+    @action(detail=False, methods=['post'])
+    def verify(self, request):
+        """Check a leaf hash and inclusion proof against a Merkle root; no RPC call is made"""
+        leaf = request.data.get('leaf_hash')
+        proof = request.data.get('merkle_proof')
+        root = request.data.get('merkle_root')
+        if not isinstance(leaf, str) or not isinstance(root, str) or not isinstance(proof, list):
+            return Response(
+                {'error': 'leaf_hash, merkle_proof (a list) and merkle_root are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'valid': verify_proof(leaf, proof, root)})
+
 # Admin views for KYC management
 class KYCAdminViewSet(viewsets.ModelViewSet):
-    """Admin viewset for managing KYC verifications"""
+    """Admin viewset for managing KYC verifications.
+
+    Reviewers work from the queue (see kyc.review): ``claim`` leases the next
+    cases to the caller, ``renew`` and ``release`` manage a lease, and
+    ``approve``/``reject`` refuse cases leased to someone else.
+    """
     serializer_class = KYCVerificationSerializer
     permission_classes = [IsAdminUser]
-    queryset = KYCVerification.objects.all()
+    queryset = KYCVerification.objects.select_related('user').order_by('-created_at')
+
+    @action(detail=False, methods=['get'])
+    def queue(self, request):
+        """Pending verifications in the order they will be claimed"""
+        review.release_expired()
+        page = self.paginate_queryset(review.queue().select_related('user'))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def claim(self, request):
+        """Lease the next ``count`` pending verifications to the caller"""
+        try:
+            count = int(request.data.get('count', 1))
+        except (TypeError, ValueError):
+            return Response({'error': 'count must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        verifications = review.claim(request.user, count)
+        serializer = self.get_serializer(verifications, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def claimed(self, request):
+        """Verifications currently leased to the caller"""
+        verifications = self.get_queryset().filter(status='in_review', reviewer=request.user)
+        serializer = self.get_serializer(verifications, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def renew(self, request, pk=None):
+        """Extend the caller's lease on a verification"""
+        try:
+            verification = review.renew(self.get_object(), request.user)
+        except review.LeaseError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(verification).data)
+
+    @action(detail=True, methods=['post'])
+    def release(self, request, pk=None):
+        """Return a claimed verification to the queue"""
+        try:
+            verification = review.release(self.get_object(), request.user)
+        except review.LeaseError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(verification).data)
 
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
@@ -78,13 +206,20 @@ class KYCAdminViewSet(viewsets.ModelViewSet):
                 {'error': 'KYC already approved'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        try:
+            review.check_lease(verification, request.user)
+        except review.LeaseError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
         
         verification.status = 'approved'
-        verification.verified_by = request.user
+        verification.reviewer = request.user
+        verification.lease_expires_at = None
         verification.completed_at = timezone.now()
+        # Attested on chain with the next batch (see kyc.attestations)
+        clear_attestation(verification)
         verification.save()
         
-        # Update user KYC status
+        # Update user KYC status; the next whitelist sync adds the wallet on chain (see kyc.whitelist)
         user = verification.user
         user.kyc_verified = True
         user.kyc_verified_at = timezone.now()
@@ -103,13 +238,29 @@ class KYCAdminViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        try:
+            review.check_lease(verification, request.user)
+        except review.LeaseError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
         rejection_reason = request.data.get('rejection_reason', '')
+        was_approved = verification.status == 'approved'
         
         verification.status = 'rejected'
-        verification.verified_by = request.user
+        verification.reviewer = request.user
+        verification.lease_expires_at = None
         verification.completed_at = timezone.now()
         verification.data['rejection_reason'] = rejection_reason
         verification.save()
+
+        # Revoking the only approval revokes the user's KYC status, and the
+        # next whitelist sync removes the wallet on chain
+        user = verification.user
+        if was_approved and user.kyc_verified and not KYCVerification.objects.filter(
+            user=user, status='approved'
+        ).exists():
+            user.kyc_verified = False
+            user.save()
         
         return Response({'status': 'rejected', 'reason': rejection_reason})
 
@@ -118,5 +269,5 @@ class KYCAdminViewSet(viewsets.ModelViewSet):
         """Get documents for a specific verification"""
         verification = self.get_object()
         documents = KYCDocument.objects.filter(user=verification.user)
-        serializer = KYCDocumentSerializer(documents, many=True)
+        serializer = KYCDocumentSerializer(documents, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
\ No newline at end of file
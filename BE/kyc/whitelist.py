@@ -0,0 +1,214 @@
+"""Keep the program's whitelist in step with ``User.kyc_verified``.
+
+Borrowing on chain requires a ``WhitelistEntry`` PDA for the borrower's
+wallet. ``User.whitelisted_on_chain`` records whether that entry was last
+known to exist. Users where it differs from ``kyc_verified`` have drifted,
+and are served from a partial index.
+
+``sync`` collects drifted users and checks their entries with one
+``getMultipleAccounts`` call per hundred wallets. Users whose entry is
+already right are recorded without a transaction. The rest are packed
+``KYC_WHITELIST_INSTRUCTIONS_PER_TX`` ``whitelist_user``/``remove_whitelist``
+instructions to a transaction. Each transaction is queued as one
+``whitelist_sync`` intent, and the outbox submits them concurrently and
+records the results.
+
+``reconcile`` reads every ``WhitelistEntry`` of the program in one
+``getProgramAccounts`` call and diffs them against the users table. The
+outbox records a transaction once it is sent, so a transaction that later
+fails on chain is corrected here.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+import base64
+import logging
+import base58
+from solana.publickey import PublicKey
+from solana.rpc.types import MemcmpOpts
+
+from core.authentication import invalidate_cached_user
+from core.models import ChainIntent, User
+from core.outbox import enqueue_intent
+from core.utils.anchor_instructions import (
+    WHITELIST_ENTRY_DISCRIMINATOR, WHITELIST_ENTRY_SIZE, decode_whitelist_entry, whitelist_pda,
+)
+from core.utils.solana_client import solana_client
+
+logger = logging.getLogger(__name__)
+
+INTENT_KIND = 'whitelist_sync'
+# 13 whitelist_user instructions fill a transaction's 1232 bytes (10 take
+# 978); 10 also keeps the entry creations well inside 200k compute units
+DEFAULT_INSTRUCTIONS_PER_TX = 10
+MULTIPLE_ACCOUNTS_LIMIT = 100
+UPDATE_CHUNK = 500
+
+
+def instructions_per_tx():
+    return getattr(settings, 'KYC_WHITELIST_INSTRUCTIONS_PER_TX', DEFAULT_INSTRUCTIONS_PER_TX)
+
+
+def drifted():
+    """Users whose on-chain whitelist state does not match their KYC status; matches the partial index"""
+    return User.objects.filter(
+        Q(kyc_verified=True, whitelisted_on_chain=False) | Q(kyc_verified=False, whitelisted_on_chain=True)
+    )
+
+
+def _open_entries():
+    """``(user_id, wallet)`` pairs already in a queued or in-flight whitelist transaction"""
+    entries = set()
+    for payload in ChainIntent.objects.filter(
+        kind=INTENT_KIND, status__in=ChainIntent.OPEN_STATUSES
+    ).values_list('payload', flat=True):
+        for user_id, wallet in payload.get('add', []) + payload.get('remove', []):
+            entries.add((user_id, wallet))
+    return entries
+
+
+def _program_id():
+    if solana_client.program_id is None:
+        raise RuntimeError('SOLANA_PROGRAM_ID is not configured')
+    return solana_client.program_id
+
+
+def _entries_exist(wallets):
+    """Map each wallet to whether its ``WhitelistEntry`` account exists, in batched reads"""
+    program_id = _program_id()
+    exists = {}
+    for start in range(0, len(wallets), MULTIPLE_ACCOUNTS_LIMIT):
+        chunk = wallets[start:start + MULTIPLE_ACCOUNTS_LIMIT]
+        result = solana_client.client.get_multiple_accounts(
+            [whitelist_pda(wallet, program_id) for wallet in chunk], encoding='base64',
+        )
+        accounts = result['result']['value']
+        for wallet, account in zip(chunk, accounts):
+            exists[wallet] = account is not None
+    return exists
+
+
+def record(user_ids, whitelisted):
+    """Store the on-chain whitelist state of the given users"""
+    user_ids = list(user_ids)
+    now = timezone.now()
+    for start in range(0, len(user_ids), UPDATE_CHUNK):
+        User.objects.filter(pk__in=user_ids[start:start + UPDATE_CHUNK]).update(
+            whitelisted_on_chain=whitelisted, whitelist_synced_at=now, updated_at=now,
+        )
+    # Bulk updates skip User.save, which drops cached copies
+    for user_id in user_ids:
+        invalidate_cached_user(user_id)
+
+
+def sync(limit=500):
+    """Queue whitelist transactions for up to ``limit`` drifted users; returns counts"""
+    open_user_ids = {user_id for user_id, _ in _open_entries() if user_id is not None}
+    candidates = []
+    for user_id, wallet, verified in (
+        drifted().exclude(pk__in=open_user_ids).exclude(wallet_address='')
+        .order_by('id').values_list('id', 'wallet_address', 'kyc_verified')[:limit]
+    ):
+        try:
+            PublicKey(wallet)
+        except ValueError as e:
+            logger.error(f"Skipping whitelist sync for user {user_id}, invalid wallet address: {e}")
+            continue
+        candidates.append((user_id, wallet, verified))
+
+    # whitelist_user fails on an entry that exists and remove_whitelist on one
+    # that does not, and one failing instruction fails its whole transaction
+    exists = _entries_exist([wallet for _, wallet, _ in candidates])
+    already = {True: [], False: []}
+    changes = []
+    for user_id, wallet, verified in candidates:
+        if exists[wallet] == verified:
+            already[verified].append(user_id)
+        else:
+            changes.append((user_id, wallet, verified))
+    for whitelisted, user_ids in already.items():
+        if user_ids:
+            record(user_ids, whitelisted)
+
+    size = instructions_per_tx()
+    transactions = 0
+    with transaction.atomic():
+        for start in range(0, len(changes), size):
+            group = changes[start:start + size]
+            enqueue_intent(INTENT_KIND, group[0][0], payload={
+                'add': [[user_id, wallet] for user_id, wallet, verified in group if verified],
+                'remove': [[user_id, wallet] for user_id, wallet, verified in group if not verified],
+            })
+            transactions += 1
+    return {
+        'candidates': len(candidates),
+        'already_synced': len(already[True]) + len(already[False]),
+        'instructions': len(changes),
+        'transactions': transactions,
+    }
+
+
+def onchain_entries():
+    """Every ``WhitelistEntry`` of the program as ``{user_key: is_whitelisted}``"""
+    result = solana_client.client.get_program_accounts(
+        _program_id(),
+        encoding='base64',
+        data_size=WHITELIST_ENTRY_SIZE,
+        memcmp_opts=[MemcmpOpts(offset=0, bytes=base58.b58encode(WHITELIST_ENTRY_DISCRIMINATOR).decode())],
+    )
+    entries = {}
+    for item in result['result']:
+        entry = decode_whitelist_entry(base64.b64decode(item['account']['data'][0]))
+        if entry is not None:
+            entries[entry[0]] = entry[1]
+    return entries
+
+
+def reconcile(apply=True, remove_orphans=False):
+    """Diff the on-chain entries against ``whitelisted_on_chain`` for every user.
+
+    With ``apply`` the recorded state is corrected, after which ``sync``
+    adds or removes whatever still disagrees with ``kyc_verified``. Entries
+    for wallets no user has are orphans; ``remove_orphans`` queues their
+    removal.
+    """
+    entries = onchain_entries()
+    recorded_missing, unrecorded = [], []
+    known = set()
+    for user_id, wallet, whitelisted in User.objects.values_list(
+        'id', 'wallet_address', 'whitelisted_on_chain'
+    ).iterator(chunk_size=2000):
+        present = wallet in entries
+        if present:
+            known.add(wallet)
+        if whitelisted and not present:
+            recorded_missing.append(user_id)
+        elif present and not whitelisted:
+            unrecorded.append(user_id)
+    orphans = sorted(set(entries) - known)
+
+    if apply:
+        record(recorded_missing, False)
+        record(unrecorded, True)
+    orphan_transactions = 0
+    if remove_orphans:
+        open_wallets = {wallet for _, wallet in _open_entries()}
+        removals = [wallet for wallet in orphans if wallet not in open_wallets]
+        size = instructions_per_tx()
+        with transaction.atomic():
+            for start in range(0, len(removals), size):
+                # Orphans belong to no user; target_id 0 marks that
+                enqueue_intent(INTENT_KIND, 0, payload={
+                    'add': [], 'remove': [[None, wallet] for wallet in removals[start:start + size]],
+                })
+                orphan_transactions += 1
+    return {
+        'onchain': len(entries),
+        'disabled': sum(1 for whitelisted in entries.values() if not whitelisted),
+        'recorded_missing': len(recorded_missing),
+        'unrecorded': len(unrecorded),
+        'orphans': orphans,
+        'orphan_transactions': orphan_transactions,
+        'applied': apply,
+    }
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import LenderPool, LenderDeposit, PoolAllocation
+from core.utils.admin import LargeTableAdmin
+from .models import LenderPool, LenderDeposit, PoolAllocation, LiquidityEntry
 
 
 @admin.register(LenderPool)
@@ -29,13 +30,15 @@ class LenderPoolAdmin(admin.ModelAdmin):
 
 
 @admin.register(LenderDeposit)
-class LenderDepositAdmin(admin.ModelAdmin):
+class LenderDepositAdmin(LargeTableAdmin):
     list_display = (
         "user", "pool", "amount", "shares",
         "deposit_tx_hash", "unlocked_at", "withdrawn", "withdraw_tx_hash"
     )
+    list_select_related = ("user", "pool")
     list_filter = ("withdrawn", "created_at")
-    search_fields = ("user__username", "user__email", "deposit_tx_hash", "withdraw_tx_hash")
+    search_fields = ("user__username", "user__email", "=deposit_tx_hash", "=withdraw_tx_hash")
+    raw_id_fields = ("user",)
     readonly_fields = ("created_at", "updated_at")
 
     fieldsets = (
@@ -52,10 +55,12 @@ class LenderDepositAdmin(admin.ModelAdmin):
 
 
 @admin.register(PoolAllocation)
-class PoolAllocationAdmin(admin.ModelAdmin):
-    list_display = ("pool", "loan", "amount", "allocation_tx_hash", "created_at")
+class PoolAllocationAdmin(LargeTableAdmin):
+    list_display = ("pool", "loan_id", "amount", "allocation_tx_hash", "created_at")
+    list_select_related = ("pool",)
     list_filter = ("created_at",)
-    search_fields = ("pool__name", "loan__id", "allocation_tx_hash")
+    search_fields = ("pool__name", "=loan_id", "=allocation_tx_hash")
+    raw_id_fields = ("loan",)
     readonly_fields = ("created_at",)
 
     fieldsets = (
@@ -66,3 +71,12 @@ class PoolAllocationAdmin(admin.ModelAdmin):
             "fields": ("created_at",)
         }),
     )
+
+
+@admin.register(LiquidityEntry)
+class LiquidityEntryAdmin(admin.ModelAdmin):
+    list_display = ("pool", "total_delta", "available_delta", "reason", "reference", "created_at")
+    list_select_related = ("pool",)
+    list_filter = ("reason", "created_at")
+    search_fields = ("pool__name", "reference")
+    readonly_fields = ("pool", "total_delta", "available_delta", "reason", "reference", "created_at")
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LendersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lenders'
+
+    def ready(self):
+        # Register outbox handlers
+        from . import intents  # noqa: F401
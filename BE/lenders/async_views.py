@@ -0,0 +1,25 @@
+from django.http import Http404
+from core.async_api import async_read_view, json_response, paginated_response
+from .models import LenderPool
+from .serializers import LenderDepositSerializer
+from .views import (
+    ALLOCATED_TOTAL, DEPOSIT_COUNTS, LenderDepositViewSet, active_pools, pool_stats, user_deposits,
+)
+
+
+@async_read_view()
+async def pool_stats_view(request, pk):
+    """``LenderPoolViewSet.stats``"""
+    try:
+        pool = await active_pools().aget(pk=pk)
+    except LenderPool.DoesNotExist:
+        raise Http404('No LenderPool matches the given query.')
+    deposits = await pool.deposits.aaggregate(**DEPOSIT_COUNTS)
+    allocations = await pool.allocations.aaggregate(**ALLOCATED_TOTAL)
+    return json_response(pool_stats(pool, deposits, allocations))
+
+
+@async_read_view(fallback=LenderDepositViewSet.as_view({'get': 'list', 'post': 'create'}))
+async def deposit_list(request):
+    """``LenderDepositViewSet.list``; creating a deposit stays with DRF"""
+    return await paginated_response(user_deposits(request.user), LenderDepositSerializer, request)
@@ -0,0 +1,95 @@
+from django.utils import timezone
+from solana.publickey import PublicKey
+from solana.transaction import Transaction
+from solana.system_program import transfer, TransferParams
+from core.outbox import IntentHandler, register_handler
+from .liquidity import record_liquidity_change
+from .models import LenderDeposit
+
+
+@register_handler
+class DepositIntentHandler(IntentHandler):
+    """Moves a lender's deposit into the pool"""
+    kind = 'deposit'
+    # Simulated: there is no signature to confirm yet
+    confirm = False
+
+    def submit(self, intent):
+        deposit = LenderDeposit.objects.select_related('pool', 'user').get(pk=intent.target_id)
+
+        # Create transfer transaction
+        txn = Transaction()
+        txn.add(transfer(
+            TransferParams(
+                from_pubkey=PublicKey(deposit.user.wallet_address),
+                to_pubkey=PublicKey(deposit.pool.token_address),
+                lamports=int(deposit.amount * 10**9)  # Convert to lamports
+            )
+        ))
+
+        # Send transaction (user needs to sign this)
+        # In a real implementation, this would be handled by the frontend
+        # or through a signing service
+
+        # For now, simulate transaction success
+        return f"simulated_tx_{deposit.id}"
+
+    def complete(self, intent):
+        deposit = LenderDeposit.objects.get(pk=intent.target_id)
+        deposit.deposit_tx_hash = intent.tx_hash
+        deposit.save(update_fields=['deposit_tx_hash', 'updated_at'])
+
+        # Credit the pool through the liquidity journal
+        record_liquidity_change(
+            deposit.pool_id,
+            total_delta=deposit.amount,
+            available_delta=deposit.amount,
+            reason='deposit',
+            reference=intent.tx_hash,
+        )
+
+    def fail(self, intent):
+        # Remove the deposit record if transaction fails
+        LenderDeposit.objects.filter(pk=intent.target_id).delete()
+
+
+@register_handler
+class WithdrawalIntentHandler(IntentHandler):
+    """Returns a deposit from the pool to the lender's wallet"""
+    kind = 'withdrawal'
+    # Simulated: there is no signature to confirm yet
+    confirm = False
+
+    def submit(self, intent):
+        deposit = LenderDeposit.objects.select_related('pool', 'user').get(pk=intent.target_id)
+
+        # Create withdrawal transaction
+        txn = Transaction()
+        txn.add(transfer(
+            TransferParams(
+                from_pubkey=PublicKey(deposit.pool.token_address),
+                to_pubkey=PublicKey(deposit.user.wallet_address),
+                lamports=int(deposit.amount * 10**9)  # Convert to lamports
+            )
+        ))
+
+        # Send transaction (simulated for now)
+        return f"simulated_withdraw_tx_{deposit.id}"
+
+    def complete(self, intent):
+        deposit = LenderDeposit.objects.get(pk=intent.target_id)
+        deposit.withdraw_tx_hash = intent.tx_hash
+        deposit.save(update_fields=['withdraw_tx_hash', 'updated_at'])
+
+        # Debit the pool through the liquidity journal
+        record_liquidity_change(
+            deposit.pool_id,
+            total_delta=-deposit.amount,
+            available_delta=-deposit.amount,
+            reason='withdrawal',
+            reference=intent.tx_hash,
+        )
+
+    def fail(self, intent):
+        # Release the deposit so the lender can try again
+        LenderDeposit.objects.filter(pk=intent.target_id).update(withdrawn=False, updated_at=timezone.now())
@@ -0,0 +1,71 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+import logging
+
+from .models import LenderPool, LiquidityEntry
+
+logger = logging.getLogger(__name__)
+
+COMPACTION_BATCH_SIZE = 5000
+
+
+def record_liquidity_change(pool, total_delta=0, available_delta=0, reason='adjustment', reference=None):
+    """Append a liquidity change for a pool.
+
+    This is a plain INSERT, so it never reads or locks the pool row and
+    concurrent callers cannot lose each other's updates.
+    """
+    pool_id = pool.pk if isinstance(pool, LenderPool) else pool
+    return LiquidityEntry.objects.create(
+        pool_id=pool_id,
+        total_delta=Decimal(total_delta),
+        available_delta=Decimal(available_delta),
+        reason=reason,
+        reference=reference,
+    )
+
+
+def compact_liquidity_journal(batch_size=COMPACTION_BATCH_SIZE):
+    """Fold journal entries into their pools and delete them.
+
+    Entries are claimed with ``SKIP LOCKED`` so several compactors can run at
+    once, and only the claimed ids are summed and deleted, so rows committed
+    while a batch is in flight are left for the next run. Pool rows are
+    updated with ``F()`` expressions, once per pool per batch.
+    Returns the number of entries compacted.
+    """
+    compacted = 0
+    while True:
+        with transaction.atomic():
+            entries = list(
+                LiquidityEntry.objects.select_for_update(skip_locked=True)
+                .order_by('id')
+                .values_list('id', 'pool_id', 'total_delta', 'available_delta')[:batch_size]
+            )
+            if not entries:
+                break
+
+            totals = defaultdict(lambda: [Decimal('0'), Decimal('0')])
+            for _, pool_id, total_delta, available_delta in entries:
+                totals[pool_id][0] += total_delta
+                totals[pool_id][1] += available_delta
+
+            now = timezone.now()
+            for pool_id, (total_delta, available_delta) in totals.items():
+                LenderPool.objects.filter(pk=pool_id).update(
+                    total_liquidity=F('total_liquidity') + total_delta,
+                    available_liquidity=F('available_liquidity') + available_delta,
+                    updated_at=now,
+                )
+            LiquidityEntry.objects.filter(id__in=[entry[0] for entry in entries]).delete()
+
+        compacted += len(entries)
+        if len(entries) < batch_size:
+            break
+
+    if compacted:
+        logger.info(f"Compacted {compacted} liquidity journal entries")
+    return compacted
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiquidityEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_delta', models.DecimalField(decimal_places=18, default=0, max_digits=36)),
+                ('available_delta', models.DecimalField(decimal_places=18, default=0, max_digits=36)),
+                ('reason', models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('allocation', 'Allocation'), ('repayment', 'Repayment'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('pool', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='liquidity_entries', to='lenders.lenderpool')),
+            ],
+            options={
+                'db_table': 'lender_pool_liquidity_entries',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0002_liquidity_journal'),
+        ('loans', '0003_admin_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lenderdeposit',
+            index=models.Index(fields=['created_at'], name='lender_depo_created_a4b668_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lenderdeposit',
+            index=models.Index(fields=['deposit_tx_hash'], name='lender_depo_deposit_5050dd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lenderdeposit',
+            index=models.Index(fields=['withdraw_tx_hash'], name='lender_depo_withdra_e61fd2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poolallocation',
+            index=models.Index(fields=['created_at'], name='pool_alloca_created_77bb53_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poolallocation',
+            index=models.Index(fields=['allocation_tx_hash'], name='pool_alloca_allocat_6f409c_idx'),
+        ),
+    ]
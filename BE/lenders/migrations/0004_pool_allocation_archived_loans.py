@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lenders', '0003_admin_indexes'),
+        ('loans', '0003_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='poolallocation',
+            name='loan',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='pool_allocations', to='loans.loan'),
+        ),
+    ]
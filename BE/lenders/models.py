@@ -1,5 +1,22 @@
 from django.db import models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from decimal import Decimal
+
+class LenderPoolQuerySet(models.QuerySet):
+    def with_pending_liquidity(self):
+        """Annotate each pool with the journal deltas not yet compacted into its row"""
+        pending = LiquidityEntry.objects.filter(pool=OuterRef('pk')).values('pool')
+        zero = Value(Decimal('0'), output_field=models.DecimalField(max_digits=36, decimal_places=18))
+        return self.annotate(
+            pending_total_delta=Coalesce(
+                Subquery(pending.annotate(s=Sum('total_delta')).values('s')[:1]), zero
+            ),
+            pending_available_delta=Coalesce(
+                Subquery(pending.annotate(s=Sum('available_delta')).values('s')[:1]), zero
+            ),
+        )
 
 class LenderPool(models.Model):
     POOL_TYPES = (
@@ -20,9 +37,54 @@ class LenderPool(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = LenderPoolQuerySet.as_manager()
+
     class Meta:
         db_table = 'lender_pools'
 
+    def _pending_deltas(self):
+        if hasattr(self, 'pending_total_delta'):
+            return self.pending_total_delta, self.pending_available_delta
+        totals = self.liquidity_entries.aggregate(
+            total=Sum('total_delta'), available=Sum('available_delta')
+        )
+        return totals['total'] or Decimal('0'), totals['available'] or Decimal('0')
+
+    @property
+    def current_total_liquidity(self):
+        """Total liquidity including journal entries not yet compacted"""
+        return self.total_liquidity + self._pending_deltas()[0]
+
+    @property
+    def current_available_liquidity(self):
+        """Available liquidity including journal entries not yet compacted"""
+        return self.available_liquidity + self._pending_deltas()[1]
+
+class LiquidityEntry(models.Model):
+    """Append-only journal of pool liquidity changes.
+
+    Writers insert a row instead of updating the pool, so concurrent deposits
+    and withdrawals never contend on the pool's row lock. Entries are folded
+    into ``LenderPool`` and deleted by ``lenders.liquidity.compact_liquidity_journal``.
+    """
+    REASONS = (
+        ('deposit', 'Deposit'),
+        ('withdrawal', 'Withdrawal'),
+        ('allocation', 'Allocation'),
+        ('repayment', 'Repayment'),
+        ('adjustment', 'Adjustment'),
+    )
+
+    pool = models.ForeignKey(LenderPool, on_delete=models.CASCADE, related_name='liquidity_entries')
+    total_delta = models.DecimalField(max_digits=36, decimal_places=18, default=0)
+    available_delta = models.DecimalField(max_digits=36, decimal_places=18, default=0)
+    reason = models.CharField(max_length=20, choices=REASONS)
+    reference = models.CharField(max_length=255, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'lender_pool_liquidity_entries'
+
 class LenderDeposit(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='deposits')
     pool = models.ForeignKey(LenderPool, on_delete=models.CASCADE, related_name='deposits')
@@ -37,13 +99,25 @@ class LenderDeposit(models.Model):
 
     class Meta:
         db_table = 'lender_deposits'
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['deposit_tx_hash']),
+            models.Index(fields=['withdraw_tx_hash']),
+        ]
 
 class PoolAllocation(models.Model):
     pool = models.ForeignKey(LenderPool, on_delete=models.CASCADE, related_name='allocations')
-    loan = models.ForeignKey('loans.Loan', on_delete=models.CASCADE, related_name='pool_allocations')
+    # Allocations outlive their loan when loans.archive moves it to the archive
+    loan = models.ForeignKey(
+        'loans.Loan', on_delete=models.DO_NOTHING, db_constraint=False, related_name='pool_allocations'
+    )
     amount = models.DecimalField(max_digits=36, decimal_places=18)
     allocation_tx_hash = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        db_table = 'pool_allocations'
\ No newline at end of file
+        db_table = 'pool_allocations'
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['allocation_tx_hash']),
+        ]
\ No newline at end of file
@@ -1,8 +1,16 @@
+from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import serializers
+from loans import archive as loan_archive
 from .models import LenderPool, LenderDeposit, PoolAllocation
 
 class LenderPoolSerializer(serializers.ModelSerializer):
     pool_type_display = serializers.CharField(source='get_pool_type_display', read_only=True)
+    total_liquidity = serializers.DecimalField(
+        source='current_total_liquidity', max_digits=36, decimal_places=18, read_only=True
+    )
+    available_liquidity = serializers.DecimalField(
+        source='current_available_liquidity', max_digits=36, decimal_places=18, read_only=True
+    )
 
     class Meta:
         model = LenderPool
@@ -62,8 +70,25 @@ class PoolAllocationSerializer(serializers.ModelSerializer):
         }
 
     def get_loan_details(self, obj):
+        try:
+            loan = obj.loan
+        except ObjectDoesNotExist:
+            # A list view resolves its page's archived loans up front (see archived_loans)
+            archived = self.context.get('archived_loans')
+            loan = archived.get(obj.loan_id) if archived is not None else loan_archive.get_loan(obj.loan_id)
+            if loan is None:
+                return {'id': obj.loan_id}
         return {
-            'id': obj.loan.id,
-            'principal': obj.loan.principal,
-            'borrower_wallet': obj.loan.application.user.wallet_address
-        }
\ No newline at end of file
+            'id': loan.id,
+            'principal': loan.principal,
+            'borrower_wallet': loan.application.user.wallet_address
+        }
+def archived_loans(allocations):
+    """``{loan_id: loan}`` for the allocations whose loan was archived, read from the archive together"""
+    missing = set()
+    for allocation in allocations:
+        try:
+            allocation.loan
+        except ObjectDoesNotExist:
+            missing.add(allocation.loan_id)
+    return loan_archive.get_loans(missing) if missing else {}
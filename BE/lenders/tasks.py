@@ -0,0 +1,8 @@
+from celery import shared_task
+from .liquidity import compact_liquidity_journal
+
+
+@shared_task
+def compact_pool_liquidity():
+    """Fold pending liquidity journal entries into the pool rows"""
+    return compact_liquidity_journal()
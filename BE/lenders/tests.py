@@ -1,3 +1,245 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+import json
+import sys
+import tempfile
+import threading
+import time
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.db import OperationalError, connection
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import User
+from loans import archive as loan_archive
+from loans.models import Loan, LoanApplication, LoanProduct
+from . import async_views
+from .liquidity import compact_liquidity_journal, record_liquidity_change
+from .models import LenderDeposit, LenderPool, LiquidityEntry, PoolAllocation
+
+
+class LiquidityJournalTests(TransactionTestCase):
+    THREADS = 8
+    OPS = 100
+
+    def setUp(self):
+        self.pool = LenderPool.objects.create(
+            name='Stress pool', pool_type='stablecoin', description='', token_address='stress',
+            apy=Decimal('0'), min_deposit=Decimal('0'), lock_period_days=0,
+        )
+
+    def test_concurrent_changes_are_not_lost(self):
+        errors, recorded = [], []
+        lock = threading.Lock()
+        start = threading.Barrier(self.THREADS + 1)
+        stop_compactor = threading.Event()
+
+        def worker(index):
+            try:
+                start.wait()
+                for i in range(self.OPS):
+                    # Every third change is a withdrawal, so the total is not monotonic
+                    delta = Decimal('-1.5') if i % 3 == 2 else Decimal('1.5')
+                    record_liquidity_change(self.pool.pk, delta, delta, reference=f'stress-{index}-{i}')
+                    with lock:
+                        recorded.append(delta)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        def compactor():
+            try:
+                while not stop_compactor.is_set():
+                    try:
+                        compact_liquidity_journal(batch_size=50)
+                    except OperationalError:
+                        # SQLite refuses lock upgrades under write contention; the batch
+                        # rolled back untouched, so try again
+                        if connection.vendor != 'sqlite':
+                            raise
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(self.THREADS)]
+        threads.append(threading.Thread(target=compactor))
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in threads[:-1]:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop_compactor.set()
+        threads[-1].join()
+
+        self.assertEqual(errors, [])
+        expected = sum(recorded)
+        self.assertEqual(len(recorded), self.THREADS * self.OPS)
+        sys.stderr.write(
+            f"\n{self.id()}: {connection.vendor} threads={self.THREADS} ops={len(recorded)} "
+            f"elapsed={elapsed:.3f}s throughput={len(recorded) / elapsed:.1f} ops/s\n"
+        )
+        self.pool.refresh_from_db()
+        pending = sum(LiquidityEntry.objects.values_list('available_delta', flat=True), Decimal('0'))
+        self.assertEqual(self.pool.available_liquidity + pending, expected)
+
+        compact_liquidity_journal()
+        self.pool.refresh_from_db()
+        self.assertFalse(LiquidityEntry.objects.exists())
+        self.assertEqual(self.pool.available_liquidity, expected)
+        self.assertEqual(self.pool.total_liquidity, expected)
+
+    def test_compaction_folds_every_entry_into_its_pool(self):
+        other = LenderPool.objects.create(
+            name='Other pool', pool_type='stablecoin', description='', token_address='other',
+            apy=Decimal('0'), min_deposit=Decimal('0'), lock_period_days=0,
+        )
+        for delta in ('10', '-2.5', '4'):
+            record_liquidity_change(self.pool, delta, delta, reason='deposit')
+        record_liquidity_change(other, '7', '3', reason='deposit')
+        self.assertEqual(compact_liquidity_journal(batch_size=2), 4)
+        self.pool.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.pool.available_liquidity, Decimal('11.5'))
+        self.assertEqual((other.total_liquidity, other.available_liquidity), (Decimal('7'), Decimal('3')))
+
+
+class PoolAllocationArchiveTests(TestCase):
+    def setUp(self):
+        self.enterContext(self.settings(LOAN_ARCHIVE_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        self.lender = User.objects.create(username='lender', wallet_address='lender-wallet')
+        self.pool = LenderPool.objects.create(
+            name='Pool', pool_type='stablecoin', description='', token_address='pool',
+            apy=Decimal('5'), min_deposit=Decimal('0'), lock_period_days=0,
+        )
+        LenderDeposit.objects.create(
+            user=self.lender, pool=self.pool, amount=Decimal('1000'), shares=Decimal('1000'),
+            deposit_tx_hash='deposit', unlocked_at=timezone.now(),
+        )
+        self.product = LoanProduct.objects.create(
+            name='Personal', loan_type='personal', description='', min_amount=10, max_amount=10000,
+            min_duration=30, max_duration=365, interest_rate=Decimal('10.00'),
+        )
+
+    def allocate(self, number, status):
+        user = User.objects.create(username=f'borrower{number}', wallet_address=f'wallet-{number}')
+        application = LoanApplication.objects.create(
+            user=user, loan_product=self.product, amount=100, duration_days=30, purpose='test', status='approved',
+        )
+        now = timezone.now()
+        loan = Loan.objects.create(
+            application=application, principal=Decimal(100 * number), interest_rate=Decimal('10.00'),
+            total_due=Decimal(110 * number), start_date=now, due_date=now + timedelta(days=30), status=status,
+        )
+        PoolAllocation.objects.create(pool=self.pool, loan=loan, amount=Decimal(100 * number), allocation_tx_hash='a')
+        return loan
+
+    def test_page_reads_the_archive_once(self):
+        active = self.allocate(1, 'active')
+        archived = [self.allocate(number, 'repaid') for number in range(2, 5)]
+        report = loan_archive.archive_closed(before=timezone.now() + timedelta(days=1))
+        self.assertEqual(report['deleted'], 3)
+
+        client = APIClient()
+        client.force_authenticate(self.lender)
+        with mock.patch.object(loan_archive, 'get_loan') as get_loan, \
+                mock.patch.object(loan_archive, 'get_loans', wraps=loan_archive.get_loans) as get_loans:
+            response = client.get('/pool-allocations/')
+        self.assertEqual(response.status_code, 200)
+        get_loan.assert_not_called()
+        self.assertEqual(get_loans.call_count, 1)
+
+        details = {row['loan']: row['loan_details'] for row in response.data['results']}
+        self.assertEqual(details[active.id]['borrower_wallet'], 'wallet-1')
+        for loan in archived:
+            self.assertEqual(details[loan.id], {
+                'id': loan.id, 'principal': loan.principal, 'borrower_wallet': loan.application.user.wallet_address,
+            })
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.lender = User.objects.create(username='lender', wallet_address='lender-wallet')
+        self.other = User.objects.create(username='other', wallet_address='other-wallet')
+        self.pool = LenderPool.objects.create(
+            name='Pool', pool_type='stablecoin', description='', token_address='pool',
+            apy=Decimal('5'), min_deposit=Decimal('0'), lock_period_days=0,
+        )
+        for number in range(30):
+            LenderDeposit.objects.create(
+                user=self.other if number % 5 == 0 else self.lender, pool=self.pool, amount=Decimal(number + 1),
+                shares=Decimal(number + 1), deposit_tx_hash=f'deposit-{number}', unlocked_at=timezone.now(),
+                withdrawn=number % 4 == 0,
+            )
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.lender)}'}
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+
+    def call(self, view, path, method='get', data=None, headers=None, **kwargs):
+        factory = AsyncRequestFactory()
+        if method == 'get':
+            request = factory.get(path, data, headers=self.headers if headers is None else headers)
+        else:
+            request = factory.generic(
+                method.upper(), path, json.dumps(data or {}), content_type='application/json',
+                headers=self.headers if headers is None else headers,
+            )
+        response = async_to_sync(view)(request, **kwargs)
+        # The DRF fallback's response is rendered by the handler in a real request
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def test_deposit_pages_match_the_drf_view(self):
+        for page in ({}, {'page': 2}):
+            with self.subTest(page=page):
+                response = self.call(async_views.deposit_list, '/lender-deposits/', data=page)
+                self.assertEqual(response.status_code, 200)
+                drf = self.client.get('/lender-deposits/', page)
+                self.assertEqual(json.loads(response.content), json.loads(drf.content))
+        # The other user's deposits are left out
+        data = json.loads(self.call(async_views.deposit_list, '/lender-deposits/', data={'page': 2}).content)
+        self.assertEqual(
+            (data['count'], len(data['results']), data['next'], data['previous']),
+            (24, 4, None, 'http://testserver/lender-deposits/'),
+        )
+
+    def test_pool_stats_match_the_drf_view(self):
+        response = self.call(async_views.pool_stats_view, f'/lender-pools/{self.pool.id}/stats/', pk=self.pool.id)
+        drf = self.client.get(f'/lender-pools/{self.pool.id}/stats/')
+        self.assertEqual(json.loads(response.content), json.loads(drf.content))
+        response = self.call(async_views.pool_stats_view, '/lender-pools/0/stats/', pk=0)
+        self.assertEqual(response.status_code, 404)
+
+    def test_bad_page_is_not_found(self):
+        for page in ('3', '0', 'last'):
+            with self.subTest(page=page):
+                response = self.call(async_views.deposit_list, '/lender-deposits/', data={'page': page})
+                self.assertEqual(
+                    (response.status_code, json.loads(response.content)), (404, {'detail': 'Invalid page.'}),
+                )
+
+    def test_requires_a_token(self):
+        for headers in ({}, {'Authorization': 'Bearer not-a-token'}):
+            with self.subTest(headers=headers):
+                response = self.call(async_views.deposit_list, '/lender-deposits/', headers=headers)
+                drf = APIClient().get('/lender-deposits/', HTTP_AUTHORIZATION=headers.get('Authorization', ''))
+                self.assertEqual((response.status_code, drf.status_code), (401, 401))
+                self.assertEqual(json.loads(response.content), json.loads(drf.content))
+                self.assertEqual(response['WWW-Authenticate'], drf['WWW-Authenticate'])
+
+    def test_other_methods_fall_back_to_drf(self):
+        response = self.call(async_views.deposit_list, '/lender-deposits/', method='post', data={'pool': self.pool.id})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount', json.loads(response.content))
+        response = self.call(
+            async_views.pool_stats_view, f'/lender-pools/{self.pool.id}/stats/', method='post', pk=self.pool.id,
+        )
+        self.assertEqual(response.status_code, 405)
@@ -2,46 +2,64 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework import serializers
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from decimal import Decimal
-from django.db import models
-import base58
-from solana.publickey import PublicKey
-from solana.account import Account
-from solana.transaction import Transaction
-from solana.system_program import transfer, TransferParams
-from core.utils.solana_client import solana_client
+from django.db import models, transaction
+from core.outbox import enqueue_intent
 from .models import LenderPool, LenderDeposit, PoolAllocation
-from .serializers import LenderPoolSerializer, LenderDepositSerializer, PoolAllocationSerializer
+from .serializers import LenderPoolSerializer, LenderDepositSerializer, PoolAllocationSerializer, archived_loans
+
+def active_pools():
+    # Only show active pools
+    return LenderPool.objects.filter(is_active=True).with_pending_liquidity()
+
+
+def user_deposits(user):
+    # Ordered so every page of the DRF and async lists holds the same rows
+    return LenderDeposit.objects.filter(user=user).select_related('pool', 'user').order_by('id')
+
+
+def allocations_with_loans(queryset):
+    # A prefetch rather than a join, which would drop allocations of archived loans
+    return queryset.select_related('pool').prefetch_related('loan__application__user')
+
+
+# Aggregates behind pool stats: one query for both deposit counts, one for the allocated sum
+DEPOSIT_COUNTS = {'total': models.Count('id'), 'active': models.Count('id', filter=models.Q(withdrawn=False))}
+ALLOCATED_TOTAL = {'total': models.Sum('amount')}
+
+
+def pool_stats(pool, deposits, allocations):
+    total_liquidity = pool.current_total_liquidity
+    available_liquidity = pool.current_available_liquidity
+    return {
+        'pool_id': pool.id,
+        'pool_name': pool.name,
+        'total_liquidity': total_liquidity,
+        'available_liquidity': available_liquidity,
+        'utilization_rate': (total_liquidity - available_liquidity) / total_liquidity * 100 if total_liquidity > 0 else 0,
+        'current_apy': pool.apy,
+        'total_deposits': deposits['total'],
+        'active_deposits': deposits['active'],
+        'total_allocated': allocations['total'] or Decimal('0')
+    }
+
 
 class LenderPoolViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = LenderPoolSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        # Only show active pools
-        return LenderPool.objects.filter(is_active=True)
+        return active_pools()
 
     @action(detail=True, methods=['get'])
     def stats(self, request, pk=None):
         """Get detailed statistics for a pool"""
         pool = self.get_object()
-        
-        stats = {
-            'pool_id': pool.id,
-            'pool_name': pool.name,
-            'total_liquidity': pool.total_liquidity,
-            'available_liquidity': pool.available_liquidity,
-            'utilization_rate': (pool.total_liquidity - pool.available_liquidity) / pool.total_liquidity * 100 if pool.total_liquidity > 0 else 0,
-            'current_apy': pool.apy,
-            'total_deposits': pool.deposits.count(),
-            'active_deposits': pool.deposits.filter(withdrawn=False).count(),
-            'total_allocated': pool.allocations.aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-        }
-        
-        return Response(stats)
+        return Response(pool_stats(
+            pool, pool.deposits.aggregate(**DEPOSIT_COUNTS), pool.allocations.aggregate(**ALLOCATED_TOTAL)
+        ))
 
 class LenderDepositViewSet(viewsets.ModelViewSet):
     serializer_class = LenderDepositSerializer
@@ -49,43 +67,21 @@ class LenderDepositViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Users can only see their own deposits
-        return LenderDeposit.objects.filter(user=self.request.user)
+        return user_deposits(self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        # Clients poll the intent to learn when the deposit lands on chain
+        response.data['intent_id'] = self._intent.id
+        return response
 
     def perform_create(self, serializer):
-        # Automatically set the user to the current user
-        deposit = serializer.save(user=self.request.user)
-        
-        # Process the deposit transaction on Solana
-        self._process_deposit_transaction(deposit)
-
-    def _process_deposit_transaction(self, deposit):
-        """Process deposit transaction on Solana blockchain"""
-        try:
-            # Get pool information
-            pool = deposit.pool
+        with transaction.atomic():
+            # Automatically set the user to the current user
+            deposit = serializer.save(user=self.request.user)
             
-            # Create transfer transaction
-            txn = Transaction()
-            txn.add(transfer(
-                TransferParams(
-                    from_pubkey=PublicKey(self.request.user.wallet_address),
-                    to_pubkey=PublicKey(pool.token_address),
-                    lamports=int(deposit.amount * 10**9)  # Convert to lamports
-                )
-            ))
-            
-            # Send transaction (user needs to sign this)
-            # In a real implementation, this would be handled by the frontend
-            # or through a signing service
-            
-            # For now, simulate transaction success
-            deposit.deposit_tx_hash = f"simulated_tx_{deposit.id}"
-            deposit.save()
-            
-        except Exception as e:
-            # Handle transaction failure
-            deposit.delete()  # Remove the deposit record if transaction fails
-            raise serializers.ValidationError(f"Transaction failed: {str(e)}")
+            # Queue the deposit transaction; the pool is credited once it is submitted
+            self._intent = enqueue_intent('deposit', deposit.id, user=self.request.user)
 
     @action(detail=True, methods=['post'])
     def withdraw(self, request, pk=None):
@@ -104,39 +100,26 @@ class LenderDepositViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Process withdrawal transaction on Solana
-        try:
-            # Create withdrawal transaction
-            txn = Transaction()
-            txn.add(transfer(
-                TransferParams(
-                    from_pubkey=PublicKey(deposit.pool.token_address),
-                    to_pubkey=PublicKey(self.request.user.wallet_address),
-                    lamports=int(deposit.amount * 10**9)  # Convert to lamports
+        with transaction.atomic():
+            # Conditional update so two concurrent withdrawals cannot both succeed
+            updated = LenderDeposit.objects.filter(pk=deposit.pk, withdrawn=False).update(
+                withdrawn=True,
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                return Response(
+                    {'error': 'Deposit already withdrawn'}, 
+                    status=status.HTTP_400_BAD_REQUEST
                 )
-            ))
-            
-            # Send transaction (simulated for now)
-            deposit.withdrawn = True
-            deposit.withdraw_tx_hash = f"simulated_withdraw_tx_{deposit.id}"
-            deposit.save()
-            
-            # Update pool liquidity
-            pool = deposit.pool
-            pool.available_liquidity += deposit.amount
-            pool.save()
             
-            return Response({
-                'status': 'withdrawn',
-                'tx_hash': deposit.withdraw_tx_hash,
-                'amount': deposit.amount
-            })
-            
-        except Exception as e:
-            return Response(
-                {'error': f'Withdrawal failed: {str(e)}'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            # Queue the withdrawal transaction; the pool is debited once it is submitted
+            intent = enqueue_intent('withdrawal', deposit.id, user=request.user)
+        
+        return Response({
+            'status': 'pending',
+            'intent_id': intent.id,
+            'amount': deposit.amount
+        }, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=False, methods=['get'])
     def active(self, request):
@@ -158,11 +141,20 @@ class PoolAllocationViewSet(viewsets.ReadOnlyModelViewSet):
             user=self.request.user
         ).values_list('pool_id', flat=True)
         
-        return PoolAllocation.objects.filter(pool_id__in=user_pool_ids)
+        return allocations_with_loans(PoolAllocation.objects.filter(pool_id__in=user_pool_ids))
+
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args:
+            # One pass over the archive per page instead of one per archived loan
+            allocations = list(args[0])
+            context = kwargs.setdefault('context', self.get_serializer_context())
+            context['archived_loans'] = archived_loans(allocations)
+            args = (allocations, *args[1:])
+        return super().get_serializer(*args, **kwargs)
 
     @action(detail=False, methods=['get'])
     def by_loan(self, request, loan_id=None):
         """Get allocations for a specific loan"""
-        allocations = PoolAllocation.objects.filter(loan_id=loan_id)
+        allocations = allocations_with_loans(PoolAllocation.objects.filter(loan_id=loan_id))
         serializer = self.get_serializer(allocations, many=True)
         return Response(serializer.data)
\ No newline at end of file
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from core.utils.admin import LargeTableAdmin
 from .models import LoanProduct, LoanApplication, Loan, Repayment
 
 
@@ -15,13 +16,15 @@ class LoanProductAdmin(admin.ModelAdmin):
 
 
 @admin.register(LoanApplication)
-class LoanApplicationAdmin(admin.ModelAdmin):
+class LoanApplicationAdmin(LargeTableAdmin):
     list_display = (
         "user", "loan_product", "amount", "duration_days",
         "status", "approved_by", "approved_at"
     )
+    list_select_related = ("user", "loan_product", "approved_by")
     list_filter = ("status", "created_at", "updated_at")
-    search_fields = ("user__username", "user__email", "purpose")
+    search_fields = ("user__username", "user__email")
+    raw_id_fields = ("user", "approved_by")
     readonly_fields = ("created_at", "updated_at")
 
     fieldsets = (
@@ -38,13 +41,15 @@ class LoanApplicationAdmin(admin.ModelAdmin):
 
 
 @admin.register(Loan)
-class LoanAdmin(admin.ModelAdmin):
+class LoanAdmin(LargeTableAdmin):
     list_display = (
         "application", "principal", "interest_rate", "total_due",
         "amount_repaid", "start_date", "due_date", "status"
     )
+    list_select_related = ("application",)
     list_filter = ("status", "start_date", "due_date")
     search_fields = ("application__user__username", "application__user__email")
+    raw_id_fields = ("application",)
     readonly_fields = ("created_at", "updated_at")
 
     fieldsets = (
@@ -64,12 +69,14 @@ class LoanAdmin(admin.ModelAdmin):
 
 
 @admin.register(Repayment)
-class RepaymentAdmin(admin.ModelAdmin):
+class RepaymentAdmin(LargeTableAdmin):
     list_display = (
         "loan", "amount", "due_date", "paid_at", "tx_hash", "is_late"
     )
+    list_select_related = ("loan",)
     list_filter = ("is_late", "due_date", "paid_at")
-    search_fields = ("loan__application__user__username", "loan__application__user__email", "tx_hash")
+    search_fields = ("loan__application__user__username", "loan__application__user__email", "=tx_hash")
+    raw_id_fields = ("loan",)
     readonly_fields = ("created_at", "updated_at")
 
     fieldsets = (
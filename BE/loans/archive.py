@@ -0,0 +1,278 @@
+"""Move closed loans out of the hot tables into columnar archive files.
+
+``archive_closed`` (``manage.py archive_loans``) takes the loans that are
+repaid or liquidated and unchanged for ``LOAN_ARCHIVE_AFTER_DAYS``. It
+streams them and their repayments into a pair of files in
+``LOAN_ARCHIVE_DIR`` (see ``core.utils.columnar``), ordered by borrower so
+one borrower's rows share a row group. The files are then read back
+against a second pass over the same rows, and only if every row matches
+are the loans deleted, one chunk at a time. Their repayments and schedule
+events go with them; pool allocations keep the loan id and the
+applications stay.
+
+The read side memory-maps the files and rebuilds unsaved ``Loan`` and
+``Repayment`` instances, so the usual serializers render them.
+``user_loans`` opens only the groups whose borrower range covers the user.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Max
+from django.utils import timezone
+from decimal import Decimal
+from itertools import zip_longest
+import logging
+import os
+import re
+
+from core.models import User
+from core.utils import columnar
+from core.utils.columnar import from_micros, to_micros
+from .models import Loan, LoanApplication, Repayment
+
+logger = logging.getLogger(__name__)
+
+CLOSED_STATUSES = ('repaid', 'liquidated')
+DEFAULT_AFTER_DAYS = 365
+GROUP_SIZE = 5000
+DELETE_CHUNK = 1000
+
+LOAN_COLUMNS = [field.attname for field in Loan._meta.concrete_fields]
+# The application fields LoanSerializer shows, kept with the loan
+LOAN_EXTRAS = {
+    'user_id': 'application__user_id',
+    'user_wallet': 'application__user__wallet_address',
+    'purpose': 'application__purpose',
+    # For loans.reconcile, which matches loans to their program account
+    'contract_address': 'application__contract_address',
+}
+REPAYMENT_COLUMNS = [field.attname for field in Repayment._meta.concrete_fields]
+REPAYMENT_EXTRAS = {'user_id': 'loan__application__user_id'}
+_FILE_NAME = re.compile(r'^loans-(\d{8}T\d{12})\.zip$')
+
+
+class ArchiveError(Exception):
+    """The files written do not match the rows they were written from"""
+
+
+def archive_dir():
+    return getattr(settings, 'LOAN_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive'))
+
+
+def archive_path(table, run):
+    return os.path.join(archive_dir(), f'{table}-{run}.zip')
+
+
+def runs():
+    """Archive runs, newest first"""
+    try:
+        names = os.listdir(archive_dir())
+    except FileNotFoundError:
+        return []
+    return sorted((match[1] for match in map(_FILE_NAME.match, names) if match), reverse=True)
+
+
+def closed_loans(before):
+    return Loan.objects.filter(status__in=CLOSED_STATUSES, updated_at__lt=before)
+
+
+def _encode(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return to_micros(value)
+    return value
+
+
+def _rows(queryset, columns, extras, ordering):
+    values = queryset.order_by(*ordering).values_list(*columns, *extras.values())
+    for row in values.iterator(chunk_size=GROUP_SIZE):
+        yield [_encode(value) for value in row]
+
+
+def _loan_rows(loans):
+    return _rows(loans, LOAN_COLUMNS, LOAN_EXTRAS, ('application__user_id', 'id'))
+
+
+def _repayment_rows(loans):
+    repayments = Repayment.objects.filter(loan__in=loans)
+    return _rows(repayments, REPAYMENT_COLUMNS, REPAYMENT_EXTRAS, ('loan__application__user_id', 'loan_id', 'id'))
+
+
+def _write(path, columns, rows, meta):
+    count = 0
+    with columnar.Writer(path, columns, meta=meta, group_size=GROUP_SIZE) as writer:
+        for row in rows:
+            writer.append(row)
+            count += 1
+    return count
+
+
+def _verify(path, rows):
+    with columnar.ColumnarFile(path) as archive:
+        columns = archive.meta['columns']
+        stored = (
+            [row[name] for name in columns] for row in archive.iter_rows(columns)
+        )
+        for number, (expected, found) in enumerate(zip_longest(rows, stored)):
+            if expected != found:
+                raise ArchiveError(f"{os.path.basename(path)} differs from the database at row {number}")
+
+
+def _delete(path, before):
+    """Delete the loans archived in ``path`` that are still closed and unchanged"""
+    deleted = 0
+    with columnar.ColumnarFile(path) as archive:
+        for group in range(len(archive.groups)):
+            ids = archive.group_column(group, 'id')
+            for start in range(0, len(ids), DELETE_CHUNK):
+                with transaction.atomic():
+                    _, counts = closed_loans(before).filter(pk__in=ids[start:start + DELETE_CHUNK]).delete()
+                deleted += counts.get(Loan._meta.label, 0)
+    return deleted
+
+
+def archive_closed(before=None, dry_run=False):
+    """Archive the loans closed before ``before``; returns a report"""
+    if before is None:
+        before = timezone.now() - timedelta(days=getattr(settings, 'LOAN_ARCHIVE_AFTER_DAYS', DEFAULT_AFTER_DAYS))
+    loans = closed_loans(before)
+    report = {'before': before, 'loans': 0, 'repayments': 0, 'deleted': 0, 'files': []}
+    # Loans closing while the run is under way wait for the next one
+    last_id = loans.aggregate(last=Max('id'))['last']
+    if last_id is None:
+        return report
+    loans = loans.filter(id__lte=last_id)
+    if dry_run:
+        report['loans'] = loans.count()
+        report['repayments'] = Repayment.objects.filter(loan__in=loans).count()
+        return report
+
+    run = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+    paths = {'loans': archive_path('loans', run), 'repayments': archive_path('repayments', run)}
+    meta = {'run': run, 'before': before.isoformat()}
+    # The repayments file goes first: a run without its loans file is not listed
+    report['repayments'] = _write(
+        paths['repayments'], REPAYMENT_COLUMNS + list(REPAYMENT_EXTRAS), _repayment_rows(loans), meta,
+    )
+    report['loans'] = _write(paths['loans'], LOAN_COLUMNS + list(LOAN_EXTRAS), _loan_rows(loans), meta)
+    try:
+        _verify(paths['repayments'], _repayment_rows(loans))
+        _verify(paths['loans'], _loan_rows(loans))
+    except Exception:
+        for path in paths.values():
+            os.remove(path)
+        raise
+
+    report['files'] = list(paths.values())
+    report['deleted'] = _delete(paths['loans'], before)
+    if report['deleted'] != report['loans']:
+        logger.error(
+            f"Archive {run}: {report['loans'] - report['deleted']} loans changed after archiving and stay in the "
+            f"database; the database copy takes precedence"
+        )
+    return report
+
+
+# Reading
+
+def _decode(model, name, value):
+    field = model._meta.get_field(name)
+    if value is None:
+        return None
+    if isinstance(field, models.DateTimeField):
+        return from_micros(value)
+    if isinstance(field, models.DecimalField):
+        return Decimal(value)
+    return value
+
+
+def _matching(path, name, value):
+    """Rows of ``path`` whose ``name`` is ``value``, reading only the groups whose range covers it"""
+    with columnar.ColumnarFile(path) as archive:
+        rows = []
+        for group in archive.groups_overlapping(name, value, value):
+            indexes = [index for index, key in enumerate(archive.group_column(group, name)) if key == value]
+            if not indexes:
+                continue
+            columns = {column: archive.group_column(group, column) for column in archive.meta['columns']}
+            rows.extend({column: values[index] for column, values in columns.items()} for index in indexes)
+        return rows
+
+
+def _loan(row, repayment_rows=None):
+    loan = Loan(**{name: _decode(Loan, name, row[name]) for name in LOAN_COLUMNS})
+    loan.application = LoanApplication(
+        id=row['application_id'], purpose=row['purpose'],
+        user=User(id=row['user_id'], wallet_address=row['user_wallet']),
+    )
+    if repayment_rows is None:
+        return loan
+    loan.archived_repayments = []
+    for repayment_row in sorted(repayment_rows, key=lambda repayment_row: repayment_row['due_date']):
+        repayment = Repayment(**{name: _decode(Repayment, name, repayment_row[name]) for name in REPAYMENT_COLUMNS})
+        repayment.loan = loan
+        loan.archived_repayments.append(repayment)
+    return loan
+
+
+def _run_loans(run, user_id):
+    repayments = defaultdict(list)
+    for row in _matching(archive_path('repayments', run), 'user_id', user_id):
+        repayments[row['loan_id']].append(row)
+    return [_loan(row, repayments[row['id']]) for row in _matching(archive_path('loans', run), 'user_id', user_id)]
+
+
+def user_loans(user_id):
+    """A borrower's archived loans, newest first, each with ``archived_repayments``"""
+    loans = {}
+    for run in runs():
+        for loan in _run_loans(run, user_id):
+            loans.setdefault(loan.id, loan)
+    # A loan that changed while being archived is still served from the database
+    for loan_id in Loan.objects.filter(pk__in=list(loans)).values_list('id', flat=True):
+        del loans[loan_id]
+    return sorted(loans.values(), key=lambda loan: (loan.created_at, loan.id), reverse=True)
+
+
+def get_loan(loan_id, user_id=None):
+    """One archived loan, or None; ``user_id`` limits the search to that borrower's rows"""
+    for run in runs():
+        if user_id is not None:
+            rows = [row for row in _matching(archive_path('loans', run), 'user_id', user_id) if row['id'] == loan_id]
+        else:
+            rows = _matching(archive_path('loans', run), 'id', loan_id)
+        if rows:
+            repayments = [
+                row for row in _matching(archive_path('repayments', run), 'user_id', rows[0]['user_id'])
+                if row['loan_id'] == loan_id
+            ]
+            return _loan(rows[0], repayments)
+    return None
+
+
+def get_loans(loan_ids):
+    """``{id: loan}`` of the archived loans among ``loan_ids``, without their repayments.
+
+    Each run's loans file is opened once, and only the groups whose id
+    range covers a wanted id are read.
+    """
+    wanted, loans = set(loan_ids), {}
+    for run in runs():
+        if not wanted:
+            break
+        with columnar.ColumnarFile(archive_path('loans', run)) as archive:
+            groups = sorted({
+                group for loan_id in wanted for group in archive.groups_overlapping('id', loan_id, loan_id)
+            })
+            for group in groups:
+                indexes = [index for index, key in enumerate(archive.group_column(group, 'id')) if key in wanted]
+                if not indexes:
+                    continue
+                columns = {column: archive.group_column(group, column) for column in archive.meta['columns']}
+                for index in indexes:
+                    loan = _loan({column: values[index] for column, values in columns.items()})
+                    loans[loan.id] = loan
+        wanted -= set(loans)
+    return loans
@@ -0,0 +1,21 @@
+from core.async_api import async_read_view, json_response, paginated_response, serialize_list
+from .serializers import LoanSerializer, RepaymentSerializer
+from .views import overdue_repayments, upcoming_repayments, user_loans
+
+
+@async_read_view()
+async def loan_list(request):
+    """``LoanViewSet.list``"""
+    return await paginated_response(user_loans(request.user), LoanSerializer, request)
+
+
+@async_read_view()
+async def upcoming(request):
+    """``RepaymentViewSet.upcoming``"""
+    return json_response(await serialize_list(upcoming_repayments(request.user), RepaymentSerializer, request))
+
+
+@async_read_view()
+async def overdue(request):
+    """``RepaymentViewSet.overdue``"""
+    return json_response(await serialize_list(overdue_repayments(request.user), RepaymentSerializer, request))
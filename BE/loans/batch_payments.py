@@ -0,0 +1,124 @@
+"""Pay several installments of a borrower in as few transactions as fit.
+
+``RepaymentViewSet.batch_pay`` locks and validates the requested
+repayments in one query and hands them to ``enqueue``. Installments paid to
+the same loan contract are merged into one system transfer for their
+summed lamports. Transfers are packed into transactions until the next one
+would take the serialized transaction past ``PACKET_DATA_SIZE``; 21
+contracts fit in one. Each transaction is queued as one ``repayment_batch``
+intent. Only once the outbox sees its signature confirmed does
+``record_paid`` mark all of its repayments paid and add them to their loans,
+in a single DB transaction; a batch that is dropped or fails on chain
+leaves them unpaid.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import F
+from django.utils import timezone
+from solana.publickey import PublicKey
+from solana.system_program import transfer, TransferParams
+from solana.transaction import PACKET_DATA_SIZE, SIG_LENGTH, Transaction
+
+from core.models import ChainIntent
+from core.outbox import enqueue_intent
+from .models import Loan, Repayment
+
+INTENT_KIND = 'repayment_batch'
+DEFAULT_MAX_REPAYMENTS = 50
+# Stand-ins while sizing a transaction; only the number of distinct keys matters
+_SIZING_PAYER = PublicKey(1)
+_SIZING_BLOCKHASH = str(PublicKey(2))
+
+
+def lamports(amount):
+    return int(amount * 10**9)
+
+
+def payment_transaction(payer, repayments):
+    """One transfer from ``payer`` per loan contract, for the sum of its installments"""
+    totals = {}
+    for repayment in repayments:
+        contract = repayment.loan.application.contract_address
+        totals[contract] = totals.get(contract, 0) + lamports(repayment.amount)
+    txn = Transaction(fee_payer=payer)
+    for contract, total in totals.items():
+        txn.add(transfer(TransferParams(from_pubkey=payer, to_pubkey=PublicKey(contract), lamports=total)))
+    return txn
+
+
+def _transaction_size(repayments):
+    txn = payment_transaction(_SIZING_PAYER, repayments)
+    txn.recent_blockhash = _SIZING_BLOCKHASH
+    # The borrower's signature is the only one
+    return 1 + SIG_LENGTH + len(txn.serialize_message())
+
+
+def pack(repayments):
+    """Split ``repayments`` into groups that each fit in one transaction.
+
+    A loan's installments share a transfer, so they are never split across
+    transactions.
+    """
+    by_contract = defaultdict(list)
+    for repayment in repayments:
+        by_contract[repayment.loan.application.contract_address].append(repayment)
+
+    groups, current = [], []
+    for contract_repayments in by_contract.values():
+        if current and _transaction_size(current + contract_repayments) > PACKET_DATA_SIZE:
+            groups.append(current)
+            current = []
+        current = current + contract_repayments
+    if current:
+        groups.append(current)
+    return groups
+
+
+def in_progress(user, repayment_ids):
+    """Ids among ``repayment_ids`` already in a queued or in-flight payment"""
+    repayment_ids = set(repayment_ids)
+    busy = set(ChainIntent.objects.filter(
+        kind='repayment', target_id__in=repayment_ids, status__in=ChainIntent.OPEN_STATUSES
+    ).values_list('target_id', flat=True))
+    for payload in ChainIntent.objects.filter(
+        kind=INTENT_KIND, user=user, status__in=ChainIntent.OPEN_STATUSES
+    ).values_list('payload', flat=True):
+        busy.update(repayment_ids.intersection(payload.get('repayment_ids', [])))
+    return busy
+
+
+def enqueue(user, repayments):
+    """Queue one intent per packed transaction; call inside the transaction holding the row locks"""
+    return [
+        enqueue_intent(INTENT_KIND, group[0].id, user=user, payload={
+            'repayment_ids': [repayment.id for repayment in group],
+        })
+        for group in pack(repayments)
+    ]
+
+
+def record_paid(repayment_ids, tx_hash):
+    """Mark the unpaid ones of ``repayment_ids`` paid by ``tx_hash`` and credit their loans.
+
+    Only for a confirmed ``tx_hash``: the outbox calls it from ``complete``.
+    """
+    now = timezone.now()
+    unpaid = list(
+        Repayment.objects.select_for_update()
+        .filter(pk__in=repayment_ids, paid_at__isnull=True)
+        .values_list('id', 'loan_id', 'amount')
+    )
+    if not unpaid:
+        return
+    Repayment.objects.filter(pk__in=[repayment_id for repayment_id, _, _ in unpaid]).update(
+        paid_at=now, tx_hash=tx_hash, updated_at=now,
+    )
+
+    totals = defaultdict(Decimal)
+    for _, loan_id, amount in unpaid:
+        totals[loan_id] += amount
+    for loan_id, total in totals.items():
+        Loan.objects.filter(pk=loan_id).update(amount_repaid=F('amount_repaid') + total, updated_at=now)
+    Loan.objects.filter(
+        pk__in=list(totals), status='active', amount_repaid__gte=F('total_due')
+    ).update(status='repaid')
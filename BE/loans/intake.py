@@ -0,0 +1,113 @@
+"""Bulk loan-application intake for partner integrations.
+
+A partner posts one JSON object per line (NDJSON) to
+``/loan-applications/bulk/``: the borrower's ``wallet_address``,
+``loan_product``, ``amount``, ``duration_days``, ``purpose``, an optional
+``reference`` echoed back, and ``submit`` to file the application straight
+away instead of leaving it a draft.
+
+The body is read line by line and handled in chunks of
+``LOAN_BULK_INTAKE_CHUNK_SIZE``. Products are loaded once per batch and
+the chunk's borrowers in one query. Valid rows are inserted with
+``bulk_create`` and the results are streamed back as NDJSON after each
+chunk commits, so a large batch makes steady progress instead of holding
+the connection silent until a timeout. The last line is a summary.
+"""
+from django.conf import settings
+from django.db import transaction
+import json
+
+from core.models import User
+from kyc.review import prioritize_users
+from .models import LoanApplication, LoanProduct
+from .serializers import BulkLoanApplicationSerializer
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_MAX_ROWS = 50000
+
+
+def _parse(line_number, line):
+    """``(line_number, row, error)`` for one NDJSON line"""
+    try:
+        row = json.loads(line)
+    except ValueError as e:
+        return line_number, None, {'non_field_errors': [f'Invalid JSON: {e}']}
+    if not isinstance(row, dict):
+        return line_number, None, {'non_field_errors': ['Each line must be a JSON object']}
+    return line_number, row, None
+
+
+def _process_chunk(chunk, products):
+    wallets = {row['wallet_address'] for _, row, _ in chunk if row and isinstance(row.get('wallet_address'), str)}
+    users = {
+        user.wallet_address: user
+        for user in User.objects.filter(wallet_address__in=wallets).only('id', 'wallet_address', 'kyc_verified')
+    }
+    context = {'products': products, 'users': users}
+
+    results, applications = [], []
+    for line_number, row, error in chunk:
+        reference = row.get('reference') if row else None
+        if error is None:
+            serializer = BulkLoanApplicationSerializer(data=row, context=context)
+            if serializer.is_valid():
+                data = serializer.validated_data
+                application = LoanApplication(
+                    user=data['user'],
+                    loan_product=data['loan_product'],
+                    amount=data['amount'],
+                    duration_days=data['duration_days'],
+                    purpose=data['purpose'],
+                    status='submitted' if data['submit'] else 'draft',
+                )
+                applications.append(application)
+                results.append({'line': line_number, 'reference': reference, 'application': application})
+                continue
+            error = serializer.errors
+        results.append({'line': line_number, 'reference': reference, 'status': 'rejected', 'errors': error})
+
+    with transaction.atomic():
+        LoanApplication.objects.bulk_create(applications, batch_size=len(applications) or None)
+        # As LoanApplicationViewSet.submit does, move unverified applicants up the KYC queue
+        unverified = {
+            application.user_id for application in applications
+            if application.status == 'submitted' and not application.user.kyc_verified
+        }
+        if unverified:
+            prioritize_users(unverified)
+
+    for result in results:
+        application = result.pop('application', None)
+        if application is not None:
+            result.update({'status': 'created', 'id': application.pk, 'application_status': application.status})
+    return results
+
+
+def process(lines, chunk_size=None, max_rows=None):
+    """Validate and insert the applications in ``lines``; yields one result dict per row, then a summary"""
+    chunk_size = chunk_size or getattr(settings, 'LOAN_BULK_INTAKE_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    max_rows = max_rows or getattr(settings, 'LOAN_BULK_INTAKE_MAX_ROWS', DEFAULT_MAX_ROWS)
+    products = {product.id: product for product in LoanProduct.objects.all()}
+
+    summary = {'rows': 0, 'created': 0, 'rejected': 0, 'truncated': False}
+    chunk = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        if summary['rows'] + len(chunk) >= max_rows:
+            summary['truncated'] = True
+            break
+        chunk.append(_parse(line_number, line))
+        if len(chunk) >= chunk_size:
+            yield from _count(_process_chunk(chunk, products), summary)
+            chunk = []
+    if chunk:
+        yield from _count(_process_chunk(chunk, products), summary)
+    yield {'summary': summary}
+
+
+def _count(results, summary):
+    for result in results:
+        summary['rows'] += 1
+        summary[result['status']] += 1
+        yield result
@@ -0,0 +1,96 @@
+from django.db.models import F
+from django.utils import timezone
+import logging
+from solana.publickey import PublicKey
+from solana.transaction import Transaction
+from solana.system_program import transfer, TransferParams
+from core.outbox import IntentHandler, register_handler, sign_and_send
+from core.utils.key_store import get_signing_account
+from core.utils.solana_client import solana_client
+from . import batch_payments
+from .models import Loan, Repayment
+
+logger = logging.getLogger(__name__)
+
+
+@register_handler
+class RepaymentIntentHandler(IntentHandler):
+    """Transfers a repayment from the borrower's wallet to the loan contract"""
+    kind = 'repayment'
+
+    def submit(self, intent):
+        repayment = Repayment.objects.select_related('loan__application').get(pk=intent.target_id)
+
+        # The signing key is only decrypted here, on the signing path
+        user_account = get_signing_account(repayment.loan.application.user_id, purpose='repayment')
+
+        txn = Transaction()
+        txn.add(transfer(
+            TransferParams(
+                from_pubkey=user_account.public_key(),
+                to_pubkey=PublicKey(repayment.loan.application.contract_address),
+                lamports=int(repayment.amount * 10**9)  # Convert to lamports
+            )
+        ))
+        return sign_and_send(intent, solana_client.client, txn, user_account)
+
+    def complete(self, intent):
+        repayment = Repayment.objects.select_for_update().get(pk=intent.target_id)
+        if repayment.paid_at is not None:
+            return
+        repayment.paid_at = timezone.now()
+        repayment.tx_hash = intent.tx_hash
+        repayment.save()
+
+        # Update loan status
+        Loan.objects.filter(pk=repayment.loan_id).update(
+            amount_repaid=F('amount_repaid') + repayment.amount,
+            updated_at=timezone.now(),
+        )
+        Loan.objects.filter(
+            pk=repayment.loan_id, status='active', amount_repaid__gte=F('total_due')
+        ).update(status='repaid')
+
+
+@register_handler
+class RepaymentBatchIntentHandler(IntentHandler):
+    """Pays several installments of one borrower in one packed transaction (see loans.batch_payments)"""
+    kind = batch_payments.INTENT_KIND
+
+    def submit(self, intent):
+        repayments = list(
+            Repayment.objects.select_related('loan__application')
+            .filter(pk__in=intent.payload['repayment_ids'])
+        )
+        user_account = get_signing_account(repayments[0].loan.application.user_id, purpose='repayment')
+        txn = batch_payments.payment_transaction(user_account.public_key(), repayments)
+        return sign_and_send(intent, solana_client.client, txn, user_account)
+
+    def complete(self, intent):
+        # Runs once the batch's signature is confirmed
+        batch_payments.record_paid(intent.payload['repayment_ids'], intent.tx_hash)
+
+    def fail(self, intent):
+        logger.error(f"Failed to pay repayments {intent.payload['repayment_ids']}: {intent.error}")
+
+
+@register_handler
+class LiquidationIntentHandler(IntentHandler):
+    """Liquidates the collateral of a defaulted loan"""
+    kind = 'liquidation'
+
+    def submit(self, intent):
+        loan = Loan.objects.select_related('application').get(pk=intent.target_id)
+        txn = solana_client.liquidation_transaction(loan.application.contract_address)
+        return sign_and_send(intent, solana_client.client, txn, solana_client.account)
+
+    def complete(self, intent):
+        Loan.objects.filter(pk=intent.target_id, status='defaulted').update(
+            status='liquidated',
+            liquidated_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        logger.info(f"Collateral liquidated for loan {intent.target_id}: {intent.tx_hash}")
+
+    def fail(self, intent):
+        logger.error(f"Failed to liquidate collateral for loan {intent.target_id}: {intent.error}")
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from datetime import datetime, time
+from ... import archive
+
+class Command(BaseCommand):
+    help = 'Move repaid and liquidated loans, with their repayments, to columnar archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Archive loans unchanged since before this date (YYYY-MM-DD); '
+                                             'defaults to LOAN_ARCHIVE_AFTER_DAYS ago')
+        parser.add_argument('--dry-run', action='store_true', help='Count the loans that would be archived')
+
+    def handle(self, *args, **options):
+        before = None
+        if options['before']:
+            try:
+                before = timezone.make_aware(datetime.combine(datetime.strptime(options['before'], '%Y-%m-%d'), time()))
+            except ValueError:
+                raise CommandError('--before must be a date as YYYY-MM-DD')
+
+        try:
+            report = archive.archive_closed(before, dry_run=options['dry_run'])
+        except archive.ArchiveError as e:
+            raise CommandError(f"Verification failed, nothing was deleted: {e}")
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"{report['loans']} loans and {report['repayments']} repayments closed before "
+                f"{report['before']:%Y-%m-%d} would be archived"
+            )
+            return
+        for path in report['files']:
+            self.stdout.write(f"Wrote {path}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {report['loans']} loans and {report['repayments']} repayments; "
+            f"{report['deleted']} loans removed from the database"
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+import json
+import time
+from ... import reconcile
+
+class Command(BaseCommand):
+    help = "Diff every loan against the program's Loan and CollateralVault accounts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--show', type=int, default=20, help='Differences listed per kind')
+        parser.add_argument('--output', help='Write the full report to this JSON file')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        report = reconcile.reconcile()
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(
+            f"{report['compared']} loans ({report['archived']} archived) against {report['onchain_loans']} "
+            f"Loan and {report['onchain_vaults']} CollateralVault accounts in {elapsed:.1f}s; "
+            f"{report['unlinked']} loans have no contract address"
+        )
+        for kind in reconcile.KINDS:
+            entries = report[kind]
+            style = self.style.WARNING if entries else self.style.SUCCESS
+            self.stdout.write(style(f"{kind}: {len(entries)}"))
+            for entry in entries[:options['show']]:
+                self.stdout.write(f"  {json.dumps(entry, cls=DjangoJSONEncoder)}")
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, cls=DjangoJSONEncoder, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:47
+
+import django.db.models.deletion
+from datetime import datetime, timedelta, timezone
+from django.db import migrations, models
+
+BUCKET_SECONDS = 300
+GRACE_PERIOD = timedelta(days=7)
+
+
+def _bucket(moment):
+    epoch = int(moment.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % BUCKET_SECONDS, tz=timezone.utc)
+
+
+def schedule_unpaid_repayments(apps, schema_editor):
+    Repayment = apps.get_model('loans', 'Repayment')
+    RepaymentEvent = apps.get_model('loans', 'RepaymentEvent')
+    events = []
+    for repayment_id, due_date in Repayment.objects.filter(paid_at__isnull=True).values_list('id', 'due_date').iterator():
+        grace_end = due_date + GRACE_PERIOD
+        events.append(RepaymentEvent(repayment_id=repayment_id, kind='due', fire_at=due_date, bucket=_bucket(due_date)))
+        events.append(RepaymentEvent(repayment_id=repayment_id, kind='grace_expiry', fire_at=grace_end, bucket=_bucket(grace_end)))
+        if len(events) >= 2000:
+            RepaymentEvent.objects.bulk_create(events)
+            events = []
+    RepaymentEvent.objects.bulk_create(events)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('due', 'Due'), ('grace_expiry', 'Grace Period Expiry')], max_length=20)),
+                ('fire_at', models.DateTimeField()),
+                ('bucket', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('repayment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_events', to='loans.repayment')),
+            ],
+            options={
+                'db_table': 'repayment_events',
+                'indexes': [models.Index(fields=['bucket', 'fire_at'], name='repayment_e_bucket_05e5aa_idx')],
+                'unique_together': {('repayment', 'kind')},
+            },
+        ),
+        migrations.RunPython(schedule_unpaid_repayments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0002_repayment_time_wheel'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['start_date'], name='loans_start_d_5ed714_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['due_date'], name='loans_due_dat_3e4b70_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['created_at'], name='loan_applic_created_15dc53_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['updated_at'], name='loan_applic_updated_e5ae5b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repayment',
+            index=models.Index(fields=['due_date'], name='repayments_due_dat_d71017_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repayment',
+            index=models.Index(fields=['paid_at'], name='repayments_paid_at_96bac0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repayment',
+            index=models.Index(fields=['tx_hash'], name='repayments_tx_hash_273e83_idx'),
+        ),
+    ]
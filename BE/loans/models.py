@@ -61,6 +61,11 @@ class LoanApplication(models.Model):
 
     class Meta:
         db_table = 'loan_applications'
+        # Back the admin's date filters
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['updated_at']),
+        ]
 
 class Loan(models.Model):
     STATUS_CHOICES = (
@@ -86,6 +91,10 @@ class Loan(models.Model):
 
     class Meta:
         db_table = 'loans'
+        indexes = [
+            models.Index(fields=['start_date']),
+            models.Index(fields=['due_date']),
+        ]
 
 class Repayment(models.Model):
     loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='repayments')
@@ -98,4 +107,52 @@ class Repayment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        db_table = 'repayments'
\ No newline at end of file
+        db_table = 'repayments'
+        indexes = [
+            models.Index(fields=['due_date']),
+            models.Index(fields=['paid_at']),
+            models.Index(fields=['tx_hash']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_due_date = instance.__dict__.get('due_date')
+        return instance
+
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        moved = not is_new and self.due_date != getattr(self, '_loaded_due_date', self.due_date)
+        super().save(*args, **kwargs)
+        self._loaded_due_date = self.due_date
+        if self.paid_at is None and (is_new or moved):
+            # Put the installment on the due-date time wheel; a moved due date
+            # replaces its events, which may already have fired or sit too late
+            from .scheduler import schedule_repayments
+            if moved:
+                self.schedule_events.all().delete()
+            schedule_repayments([self])
+
+class RepaymentEvent(models.Model):
+    """A pending due-date or grace-expiry event on the repayment time wheel.
+
+    Events are grouped into fixed-width ``bucket`` slots so each scheduler tick
+    only reads the slots that have expired. Rows are deleted once processed.
+    """
+    KIND_CHOICES = (
+        ('due', 'Due'),
+        ('grace_expiry', 'Grace Period Expiry'),
+    )
+
+    repayment = models.ForeignKey(Repayment, on_delete=models.CASCADE, related_name='schedule_events')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    fire_at = models.DateTimeField()
+    bucket = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'repayment_events'
+        unique_together = ('repayment', 'kind')
+        indexes = [
+            models.Index(fields=['bucket', 'fire_at']),
+        ]
\ No newline at end of file
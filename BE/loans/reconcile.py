@@ -0,0 +1,239 @@
+"""Reconcile ``Loan`` rows with the program's ``Loan`` accounts.
+
+The program keeps one ``Loan`` account per borrower, the PDA
+``["loan", borrower]``, reused by each of their loans.
+``LoanApplication.contract_address`` holds its address and
+``Loan.collateral_address`` the borrower's ``CollateralVault``.
+
+``reconcile`` reads the program's side in two ``getProgramAccounts``
+calls filtered on discriminator and size: the ``Loan`` accounts, sliced to
+the fields compared, and the ``CollateralVault`` accounts, sliced to
+nothing since only their addresses matter. The database side is one
+streamed query, plus the archived loans (see ``loans.archive``). Each
+account is joined with the newest loan recorded for its address through
+dicts keyed by address, so the cost is linear in the number of loans and
+no account is fetched on its own. Differences are reported by kind:
+
+- ``missing_onchain``: an active or defaulted loan whose contract address
+  has no account. ``RepayLoan`` closes the account, so a closed loan
+  without one matches
+- ``missing_offchain``: an account no loan points to
+- ``status_mismatch``: an active or defaulted loan whose account is not
+  active, or the reverse; also a loan left open after a newer loan reused
+  its account
+- ``amount_mismatch``: principal, total due or collateral differing from
+  the account, one entry per field
+- ``collateral_mismatch``: the collateral vault recorded differs from the
+  account's, or the vault does not exist
+- ``borrower_mismatch``: the account's borrower is not the applicant's wallet
+"""
+from collections import namedtuple
+from decimal import Decimal
+from django.conf import settings
+from django.db.models import Q
+import base58
+import base64
+import logging
+from solana.rpc.types import DataSliceOpts, MemcmpOpts
+
+from core.utils.anchor_instructions import (
+    COLLATERAL_VAULT_DISCRIMINATOR, COLLATERAL_VAULT_SIZE, LOAN_ACCOUNT_SIZE, LOAN_DISCRIMINATOR, LOAN_FIELDS,
+    decode_loan_fields,
+)
+from core.utils import columnar
+from core.utils.columnar import from_micros
+from core.utils.solana_client import solana_client
+from . import archive
+from .models import Loan
+
+logger = logging.getLogger(__name__)
+
+KINDS = (
+    'missing_onchain', 'missing_offchain', 'status_mismatch', 'amount_mismatch', 'collateral_mismatch',
+    'borrower_mismatch',
+)
+OPEN_STATUSES = ('active', 'defaulted')
+# The program lends USDC or USDT and locks USDT as collateral
+DEFAULT_TOKEN_DECIMALS = 6
+# (Loan field, account field)
+AMOUNT_FIELDS = (
+    ('principal', 'loan_amount'),
+    ('total_due', 'repayment_amount'),
+    ('collateral_value', 'collateral_amount'),
+)
+# A loan as recorded in the database or the archive
+RecordedLoan = namedtuple('RecordedLoan', (
+    'id', 'address', 'wallet', 'status', 'principal', 'total_due', 'collateral_address', 'collateral_value',
+    'start_date', 'archived',
+))
+LOAN_VALUES = (
+    'id', 'application__contract_address', 'application__user__wallet_address', 'status', 'principal',
+    'total_due', 'collateral_address', 'collateral_value', 'start_date',
+)
+# loans.archive columns in RecordedLoan order
+ARCHIVE_COLUMNS = (
+    'id', 'contract_address', 'user_wallet', 'status', 'principal',
+    'total_due', 'collateral_address', 'collateral_value', 'start_date',
+)
+
+
+def _program_id():
+    if solana_client.program_id is None:
+        raise RuntimeError('SOLANA_PROGRAM_ID is not configured')
+    return solana_client.program_id
+
+
+def _discriminator_filter(discriminator):
+    return MemcmpOpts(offset=0, bytes=base58.b58encode(discriminator).decode())
+
+
+def onchain_loans():
+    """Every ``Loan`` account of the program as ``{address: fields}``"""
+    result = solana_client.client.get_program_accounts(
+        _program_id(),
+        encoding='base64',
+        data_size=LOAN_ACCOUNT_SIZE,
+        memcmp_opts=[_discriminator_filter(LOAN_DISCRIMINATOR)],
+        # Skip the discriminator, which the filter already matched, and the bump
+        data_slice=DataSliceOpts(offset=8, length=LOAN_FIELDS.size),
+    )
+    accounts = {}
+    for item in result['result']:
+        fields = decode_loan_fields(base64.b64decode(item['account']['data'][0]))
+        if fields is not None:
+            accounts[item['pubkey']] = fields
+    return accounts
+
+
+def onchain_vaults():
+    """Addresses of every ``CollateralVault`` account of the program"""
+    result = solana_client.client.get_program_accounts(
+        _program_id(),
+        encoding='base64',
+        data_size=COLLATERAL_VAULT_SIZE,
+        memcmp_opts=[_discriminator_filter(COLLATERAL_VAULT_DISCRIMINATOR)],
+        data_slice=DataSliceOpts(offset=0, length=0),
+    )
+    return {item['pubkey'] for item in result['result']}
+
+
+def _decimal(value):
+    return None if value is None else Decimal(value)
+
+
+def _archived_loans(in_database):
+    for run in archive.runs():
+        with columnar.ColumnarFile(archive.archive_path('loans', run)) as loans:
+            # Files written before the contract address was archived cannot be matched
+            if 'contract_address' not in loans.meta['columns']:
+                continue
+            for values in loans.iter_rows(ARCHIVE_COLUMNS):
+                if not values['contract_address'] or values['id'] in in_database:
+                    continue
+                yield RecordedLoan(
+                    values['id'], values['contract_address'], values['user_wallet'], values['status'],
+                    _decimal(values['principal']), _decimal(values['total_due']), values['collateral_address'],
+                    _decimal(values['collateral_value']), from_micros(values['start_date']), True,
+                )
+
+
+def _recorded_loans(report):
+    """The newest loan recorded for each contract address, from the database and the archive"""
+    newest = {}
+
+    def superseded(loan):
+        # The account now belongs to a newer loan, so an older one must be closed
+        if loan.status in OPEN_STATUSES:
+            report['status_mismatch'].append({
+                'loan_id': loan.id, 'address': loan.address, 'status': loan.status, 'is_active': None,
+                'superseded': True,
+            })
+
+    def consider(loan):
+        current = newest.get(loan.address)
+        if current is None or (loan.start_date, loan.id) > (current.start_date, current.id):
+            if current is not None:
+                superseded(current)
+            newest[loan.address] = loan
+        else:
+            superseded(loan)
+
+    unlinked = Q(application__contract_address__isnull=True) | Q(application__contract_address='')
+    report['unlinked'] = Loan.objects.filter(unlinked).count()
+    in_database = set()
+    for row in Loan.objects.exclude(unlinked).values_list(*LOAN_VALUES).iterator(chunk_size=5000):
+        in_database.add(row[0])
+        consider(RecordedLoan(*row, False))
+    for loan in _archived_loans(in_database):
+        consider(loan)
+    return newest
+
+
+def _decode_address(address):
+    try:
+        return base58.b58decode(address)
+    except ValueError:
+        return None
+
+
+def _compare(report, loan, account, vaults, scale):
+    entry = {'loan_id': loan.id, 'address': loan.address}
+    if (loan.status in OPEN_STATUSES) != account['is_active']:
+        report['status_mismatch'].append({**entry, 'status': loan.status, 'is_active': account['is_active']})
+
+    for field, account_field in AMOUNT_FIELDS:
+        value = getattr(loan, field)
+        # Collateral is not always valued in the database
+        if value is None and field == 'collateral_value':
+            continue
+        units = account[account_field]
+        if value is None or int(value * scale) != units:
+            report['amount_mismatch'].append({
+                **entry, 'field': field, 'db': value, 'chain': Decimal(units) / scale,
+            })
+
+    vault = base58.b58encode(account['collateral_vault']).decode()
+    if loan.collateral_address != vault or vault not in vaults:
+        report['collateral_mismatch'].append({
+            **entry, 'db': loan.collateral_address, 'chain': vault, 'vault_exists': vault in vaults,
+        })
+
+    if _decode_address(loan.wallet or '') != account['borrower']:
+        report['borrower_mismatch'].append({
+            **entry, 'db': loan.wallet, 'chain': base58.b58encode(account['borrower']).decode(),
+        })
+
+
+def reconcile():
+    """Diff every loan against the program's accounts; returns the report"""
+    report = {kind: [] for kind in KINDS}
+    accounts = onchain_loans()
+    vaults = onchain_vaults()
+    recorded = _recorded_loans(report)
+    scale = Decimal(10) ** getattr(settings, 'LOAN_TOKEN_DECIMALS', DEFAULT_TOKEN_DECIMALS)
+
+    onchain = len(accounts)
+    for address, loan in recorded.items():
+        account = accounts.pop(address, None)
+        if account is None:
+            if loan.status in OPEN_STATUSES:
+                report['missing_onchain'].append({'loan_id': loan.id, 'address': address, 'status': loan.status})
+        else:
+            _compare(report, loan, account, vaults, scale)
+    for address, account in accounts.items():
+        report['missing_offchain'].append({
+            'address': address,
+            'borrower': base58.b58encode(account['borrower']).decode(),
+            'is_active': account['is_active'],
+        })
+
+    report.update({
+        'onchain_loans': onchain,
+        'onchain_vaults': len(vaults),
+        'compared': len(recorded),
+        'archived': sum(1 for loan in recorded.values() if loan.archived),
+    })
+    for kind in KINDS:
+        if report[kind]:
+            logger.error(f"Loan reconciliation: {len(report[kind])} {kind.replace('_', ' ')}")
+    return report
@@ -0,0 +1,113 @@
+"""Due-date time wheel for repayments.
+
+Every unpaid ``Repayment`` owns two ``RepaymentEvent`` rows: one when it
+falls due and one when its grace period runs out. Events sit in fixed-width
+time buckets, and ``process_due_events`` only reads buckets that have
+expired, so a tick costs work proportional to the events due in that window
+rather than to the number of open repayments.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+import logging
+
+from .models import Loan, Repayment, RepaymentEvent
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = getattr(settings, 'REPAYMENT_WHEEL_BUCKET_SECONDS', 300)
+
+
+def grace_period():
+    return timedelta(days=getattr(settings, 'REPAYMENT_GRACE_PERIOD_DAYS', 7))
+
+
+def bucket_for(moment):
+    """Start of the wheel slot containing ``moment``"""
+    epoch = int(moment.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % BUCKET_SECONDS, tz=dt_timezone.utc)
+
+
+def _events_for(repayment):
+    grace_end = repayment.due_date + grace_period()
+    return [
+        RepaymentEvent(repayment_id=repayment.id, kind='due',
+                       fire_at=repayment.due_date, bucket=bucket_for(repayment.due_date)),
+        RepaymentEvent(repayment_id=repayment.id, kind='grace_expiry',
+                       fire_at=grace_end, bucket=bucket_for(grace_end)),
+    ]
+
+
+def schedule_repayments(repayments):
+    """Place repayments in their due-date and grace-expiry buckets.
+
+    Works for rows created with ``bulk_create`` too, as long as they have ids.
+    """
+    events = [event for repayment in repayments for event in _events_for(repayment)]
+    RepaymentEvent.objects.bulk_create(events, batch_size=1000, ignore_conflicts=True)
+
+
+def process_due_events(now=None, batch_size=1000):
+    """Process every event in an expired bucket whose time has come.
+
+    Returns a dict with the number of repayments marked late and loans
+    defaulted during this tick.
+    """
+    from core.tasks import liquidate_loan_collateral
+
+    now = now or timezone.now()
+    current_bucket = bucket_for(now)
+    late, defaulted = 0, 0
+
+    while True:
+        with transaction.atomic():
+            events = list(
+                RepaymentEvent.objects.select_for_update(skip_locked=True)
+                .filter(bucket__lte=current_bucket, fire_at__lte=now)
+                .select_related('repayment__loan')
+                .order_by('fire_at')[:batch_size]
+            )
+            if not events:
+                break
+
+            late_ids, default_ids, rescheduled = set(), set(), []
+            for event in events:
+                repayment = event.repayment
+                if repayment.paid_at is not None:
+                    continue
+                # The due date was moved after the event was scheduled
+                expected = repayment.due_date if event.kind == 'due' else repayment.due_date + grace_period()
+                if expected > now:
+                    rescheduled.append(RepaymentEvent(
+                        repayment_id=repayment.id, kind=event.kind,
+                        fire_at=expected, bucket=bucket_for(expected),
+                    ))
+                    continue
+                late_ids.add(repayment.id)
+                if event.kind == 'grace_expiry' and repayment.loan.status == 'active':
+                    default_ids.add(repayment.loan_id)
+
+            if late_ids:
+                late += Repayment.objects.filter(id__in=late_ids, is_late=False).update(
+                    is_late=True, updated_at=now
+                )
+            if default_ids:
+                default_ids = set(
+                    Loan.objects.filter(id__in=default_ids, status='active').values_list('id', flat=True)
+                )
+                Loan.objects.filter(id__in=default_ids).update(status='defaulted', updated_at=now)
+                defaulted += len(default_ids)
+                for loan_id in default_ids:
+                    # Trigger collateral liquidation once the default is committed
+                    transaction.on_commit(lambda loan_id=loan_id: liquidate_loan_collateral.delay(loan_id))
+
+            RepaymentEvent.objects.filter(id__in=[event.id for event in events]).delete()
+            RepaymentEvent.objects.bulk_create(rescheduled, ignore_conflicts=True)
+
+        if len(events) < batch_size:
+            break
+
+    if late or defaulted:
+        logger.info(f"Repayment time wheel: {late} repayments late, {defaulted} loans defaulted")
+    return {'late': late, 'defaulted': defaulted}
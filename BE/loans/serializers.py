@@ -8,6 +8,29 @@ class LoanProductSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('id', 'created_at', 'updated_at')
 
+def validate_product_limits(loan_product, amount, duration_days):
+    # Validate loan amount against product limits
+    if loan_product and amount:
+        if amount < loan_product.min_amount:
+            raise serializers.ValidationError(
+                f"Amount must be at least {loan_product.min_amount}"
+            )
+        if amount > loan_product.max_amount:
+            raise serializers.ValidationError(
+                f"Amount cannot exceed {loan_product.max_amount}"
+            )
+
+    # Validate duration against product limits
+    if loan_product and duration_days:
+        if duration_days < loan_product.min_duration:
+            raise serializers.ValidationError(
+                f"Duration must be at least {loan_product.min_duration} days"
+            )
+        if duration_days > loan_product.max_duration:
+            raise serializers.ValidationError(
+                f"Duration cannot exceed {loan_product.max_duration} days"
+            )
+
 class LoanApplicationSerializer(serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     user_details = serializers.SerializerMethodField()
@@ -48,32 +71,39 @@ class LoanApplicationSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
     def validate(self, data):
-        # Validate loan amount against product limits
-        loan_product = data.get('loan_product')
-        amount = data.get('amount')
-        
-        if loan_product and amount:
-            if amount < loan_product.min_amount:
-                raise serializers.ValidationError(
-                    f"Amount must be at least {loan_product.min_amount}"
-                )
-            if amount > loan_product.max_amount:
-                raise serializers.ValidationError(
-                    f"Amount cannot exceed {loan_product.max_amount}"
-                )
-        
-        # Validate duration against product limits
-        duration_days = data.get('duration_days')
-        if loan_product and duration_days:
-            if duration_days < loan_product.min_duration:
-                raise serializers.ValidationError(
-                    f"Duration must be at least {loan_product.min_duration} days"
-                )
-            if duration_days > loan_product.max_duration:
-                raise serializers.ValidationError(
-                    f"Duration cannot exceed {loan_product.max_duration} days"
-                )
-        
+        validate_product_limits(data.get('loan_product'), data.get('amount'), data.get('duration_days'))
+        return data
+
+class BulkLoanApplicationSerializer(serializers.Serializer):
+    """One row of a bulk intake batch (see loans.intake).
+
+    Products and borrowers come from ``context['products']`` and
+    ``context['users']`` (keyed by wallet address), loaded once per batch
+    and per chunk instead of once per row.
+    """
+    reference = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    wallet_address = serializers.CharField(max_length=255)
+    loan_product = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=18, decimal_places=2)
+    duration_days = serializers.IntegerField()
+    purpose = serializers.CharField()
+    submit = serializers.BooleanField(default=False)
+
+    def validate_loan_product(self, value):
+        loan_product = self.context['products'].get(value)
+        if loan_product is None:
+            raise serializers.ValidationError(f'Invalid pk "{value}" - object does not exist.')
+        return loan_product
+
+    def validate_wallet_address(self, value):
+        user = self.context['users'].get(value)
+        if user is None:
+            raise serializers.ValidationError('No user with this wallet address')
+        return user
+
+    def validate(self, data):
+        validate_product_limits(data['loan_product'], data['amount'], data['duration_days'])
+        data['user'] = data.pop('wallet_address')
         return data
 
 class LoanSerializer(serializers.ModelSerializer):
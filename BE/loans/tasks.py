@@ -0,0 +1,11 @@
+from celery import shared_task
+from . import reconcile
+
+
+@shared_task
+def reconcile_loans():
+    """Diff the loans against the program's Loan accounts; returns the count of each kind of difference"""
+    report = reconcile.reconcile()
+    for kind in reconcile.KINDS:
+        report[kind] = len(report[kind])
+    return report
@@ -1,3 +1,356 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+import hashlib
+import json
+import tempfile
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from solana.publickey import PublicKey
+from solana.rpc.api import Client
+from solana.transaction import PACKET_DATA_SIZE
+
+from core.models import ChainIntent, User
+from core.outbox import enqueue_intent
+from core.utils.anchor_instructions import COLLATERAL_VAULT_DISCRIMINATOR, encode_loan_account
+from core.utils.mock_rpc import DEFAULT_PROGRAM_ID, MockChain, MockRPCServer
+from core.utils.key_store import store_signing_key
+from core.utils.rpc_provider import SolanaRPCProvider
+from core.utils.solana_client import solana_client
+from . import async_views, batch_payments, intake, reconcile
+from .models import Loan, LoanApplication, LoanProduct, Repayment
+from .scheduler import grace_period, process_due_events
+
+
+def key(seed):
+    return str(PublicKey(hashlib.sha256(seed.encode()).digest()))
+
+
+class ReconcileTests(TestCase):
+    def setUp(self):
+        self.chain = MockChain(slot_seconds=0)
+        self.server = MockRPCServer(chain=self.chain)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        client = Client(self.server.url)
+        client._provider = SolanaRPCProvider(self.server.url, endpoints=[self.server.url])
+        patcher = mock.patch.multiple(solana_client, client=client, program_id=PublicKey(DEFAULT_PROGRAM_ID))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.product = LoanProduct.objects.create(
+            name='Personal', loan_type='personal', description='', min_amount=10, max_amount=10000,
+            min_duration=30, max_duration=365, interest_rate=Decimal('10.00'),
+        )
+        # Archived loans join the comparison; keep any on this machine out of it
+        self.enterContext(self.settings(LOAN_ARCHIVE_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+
+    def loan(self, number, status, account=None):
+        """A loan of borrower ``number``; ``account`` puts its Loan account on chain with that ``is_active``"""
+        wallet, address, vault = (key(f'{role}:{number}') for role in ('wallet', 'loan', 'vault'))
+        user = User.objects.create(username=f'borrower{number}', wallet_address=wallet)
+        application = LoanApplication.objects.create(
+            user=user, loan_product=self.product, amount=100, duration_days=30, purpose='test',
+            status='approved', contract_address=address,
+        )
+        now = timezone.now()
+        loan = Loan.objects.create(
+            application=application, principal=Decimal('100.00'), interest_rate=Decimal('10.00'),
+            total_due=Decimal('110.00'), start_date=now, due_date=now + timedelta(days=30), status=status,
+            collateral_address=vault, collateral_value=Decimal('150.00'),
+        )
+        self.chain.set_account(vault, COLLATERAL_VAULT_DISCRIMINATOR + bytes([255]))
+        if account is not None:
+            self.chain.set_account(address, encode_loan_account(
+                wallet, vault, 150 * 10**6, 100 * 10**6, key('mint'), 110 * 10**6, 0, is_active=account,
+            ))
+        return loan
+
+    def test_closed_account_of_a_repaid_loan_matches(self):
+        repaid = self.loan(1, 'repaid')
+        self.loan(2, 'active', account=True)
+        report = reconcile.reconcile()
+        self.assertEqual(report['compared'], 2)
+        for kind in reconcile.KINDS:
+            self.assertEqual(report[kind], [], kind)
+        self.assertEqual(report['onchain_loans'], 1)
+        self.assertNotIn(repaid.id, [entry['loan_id'] for entry in report['missing_onchain']])
+
+    def test_open_loan_without_account_is_missing(self):
+        active = self.loan(1, 'active')
+        defaulted = self.loan(2, 'defaulted')
+        report = reconcile.reconcile()
+        self.assertEqual(
+            sorted(entry['loan_id'] for entry in report['missing_onchain']), sorted([active.id, defaulted.id])
+        )
+
+    def test_repaid_loan_with_active_account_is_a_status_mismatch(self):
+        repaid = self.loan(1, 'repaid', account=True)
+        report = reconcile.reconcile()
+        self.assertEqual(report['missing_onchain'], [])
+        self.assertEqual([entry['loan_id'] for entry in report['status_mismatch']], [repaid.id])
+
+
+class BulkIntakeTests(TestCase):
+    def setUp(self):
+        self.product = LoanProduct.objects.create(
+            name='Personal', loan_type='personal', description='', min_amount=10, max_amount=10000,
+            min_duration=30, max_duration=365, interest_rate=Decimal('10.00'),
+        )
+        self.user = User.objects.create(username='borrower', wallet_address='wallet-1', kyc_verified=True)
+
+    def row(self, **overrides):
+        row = {
+            'wallet_address': 'wallet-1', 'loan_product': self.product.id, 'amount': '500.00',
+            'duration_days': 90, 'purpose': 'Inventory',
+        }
+        row.update(overrides)
+        return json.dumps(row)
+
+    def test_creates_valid_rows_and_rejects_the_rest(self):
+        lines = [
+            self.row(reference='a'),
+            self.row(reference='b', submit=True),
+            '',
+            '{not json',
+            '[1, 2]',
+            self.row(reference='c', wallet_address='unknown'),
+            self.row(reference='d', amount='5.00'),
+        ]
+        results = list(intake.process(lines, chunk_size=2))
+        summary = results.pop()['summary']
+
+        self.assertEqual(summary, {'rows': 6, 'created': 2, 'rejected': 4, 'truncated': False})
+        self.assertEqual([result['line'] for result in results], [1, 2, 4, 5, 6, 7])
+        self.assertEqual([result['status'] for result in results], ['created'] * 2 + ['rejected'] * 4)
+        self.assertEqual([result['application_status'] for result in results[:2]], ['draft', 'submitted'])
+        self.assertEqual(results[4]['reference'], 'c')
+        self.assertIn('wallet_address', results[4]['errors'])
+        created = LoanApplication.objects.order_by('id')
+        self.assertEqual([application.id for application in created], [result['id'] for result in results[:2]])
+        self.assertEqual({application.user_id for application in created}, {self.user.id})
+
+    def test_stops_at_the_row_limit(self):
+        results = list(intake.process([self.row()] * 5, chunk_size=2, max_rows=3))
+        self.assertEqual(results[-1]['summary'], {'rows': 3, 'created': 3, 'rejected': 0, 'truncated': True})
+        self.assertEqual(LoanApplication.objects.count(), 3)
+
+
+class RepaymentScheduleTests(TestCase):
+    def setUp(self):
+        product = LoanProduct.objects.create(
+            name='Personal', loan_type='personal', description='', min_amount=10, max_amount=10000,
+            min_duration=30, max_duration=365, interest_rate=Decimal('10.00'),
+        )
+        user = User.objects.create(username='borrower', wallet_address='wallet-1')
+        application = LoanApplication.objects.create(
+            user=user, loan_product=product, amount=100, duration_days=30, purpose='test', status='approved',
+        )
+        self.now = timezone.now()
+        loan = Loan.objects.create(
+            application=application, principal=Decimal('100.00'), interest_rate=Decimal('10.00'),
+            total_due=Decimal('110.00'), start_date=self.now, due_date=self.now + timedelta(days=30),
+        )
+        self.repayment = Repayment.objects.create(loan=loan, amount=Decimal('110.00'), due_date=loan.due_date)
+
+    def fire_times(self):
+        return dict(self.repayment.schedule_events.values_list('kind', 'fire_at'))
+
+    def test_moving_the_due_date_reschedules(self):
+        repayment = Repayment.objects.get(pk=self.repayment.pk)
+        repayment.due_date = self.now - timedelta(days=1)
+        repayment.save()
+        self.assertEqual(self.fire_times(), {
+            'due': repayment.due_date, 'grace_expiry': repayment.due_date + grace_period(),
+        })
+        self.assertEqual(process_due_events(now=self.now), {'late': 1, 'defaulted': 0})
+
+    def test_other_changes_and_paid_rows_keep_the_schedule(self):
+        scheduled = self.fire_times()
+        repayment = Repayment.objects.get(pk=self.repayment.pk)
+        repayment.amount = Decimal('100.00')
+        repayment.save()
+        self.assertEqual(self.fire_times(), scheduled)
+
+        repayment.paid_at = self.now
+        repayment.due_date = self.now + timedelta(days=60)
+        repayment.save()
+        self.assertEqual(self.fire_times(), scheduled)
+
+
+class BatchPaymentTests(TestCase):
+    def setUp(self):
+        self.product = LoanProduct.objects.create(
+            name='Personal', loan_type='personal', description='', min_amount=10, max_amount=10000,
+            min_duration=30, max_duration=365, interest_rate=Decimal('10.00'),
+        )
+        self.user = User.objects.create(username='borrower', wallet_address=key('wallet:borrower'))
+        store_signing_key(self.user.id, key('signing:borrower'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def loan(self, number, user=None, installments=2, contract=True):
+        application = LoanApplication.objects.create(
+            user=user or self.user, loan_product=self.product, amount=100, duration_days=30, purpose='test',
+            status='approved', contract_address=key(f'loan:{number}') if contract else None,
+        )
+        now = timezone.now()
+        loan = Loan.objects.create(
+            application=application, principal=Decimal('100.00'), interest_rate=Decimal('10.00'),
+            total_due=Decimal('110.00'), start_date=now, due_date=now + timedelta(days=30),
+        )
+        for index in range(installments):
+            Repayment.objects.create(
+                loan=loan, amount=Decimal('110.00') / installments, due_date=now + timedelta(days=10 * (index + 1)),
+            )
+        return loan
+
+    def repayments(self):
+        return list(Repayment.objects.select_related('loan__application').order_by('loan_id', 'due_date'))
+
+    def batch_pay(self, repayment_ids):
+        return self.client.post('/repayments/batch-pay/', {'repayment_ids': repayment_ids}, format='json')
+
+    def test_pack_fills_transactions_and_keeps_loans_whole(self):
+        for number in range(30):
+            self.loan(number)
+        groups = batch_payments.pack(self.repayments())
+
+        self.assertEqual([len({repayment.loan_id for repayment in group}) for group in groups], [21, 9])
+        self.assertEqual(sum(len(group) for group in groups), 60)
+        for group in groups:
+            self.assertLessEqual(batch_payments._transaction_size(group), PACKET_DATA_SIZE)
+        # The next loan would not have fitted into the first transaction
+        next_loan = [repayment for repayment in groups[1] if repayment.loan_id == groups[1][0].loan_id]
+        self.assertGreater(batch_payments._transaction_size(groups[0] + next_loan), PACKET_DATA_SIZE)
+        loan_groups = {}
+        for index, group in enumerate(groups):
+            for repayment in group:
+                loan_groups.setdefault(repayment.loan_id, set()).add(index)
+        self.assertTrue(all(len(indexes) == 1 for indexes in loan_groups.values()))
+
+    def test_batch_pay_queues_one_intent_per_transaction(self):
+        for number in range(22):
+            self.loan(number)
+        ids = [repayment.id for repayment in self.repayments()]
+        response = self.batch_pay(ids)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['transactions'], 2)
+        payloads = ChainIntent.objects.filter(kind=batch_payments.INTENT_KIND).values_list('payload', flat=True)
+        self.assertEqual(sorted(repayment_id for payload in payloads for repayment_id in payload['repayment_ids']), sorted(ids))
+
+    def test_batch_pay_rejects_invalid_requests(self):
+        loan = self.loan(1)
+        ids = list(loan.repayments.values_list('id', flat=True))
+        for repayment_ids in (None, [], 'x', [str(ids[0])], [True], [ids[0], False]):
+            with self.subTest(repayment_ids=repayment_ids):
+                self.assertEqual(self.batch_pay(repayment_ids).status_code, 400)
+        with override_settings(BATCH_PAY_MAX_REPAYMENTS=1):
+            self.assertEqual(self.batch_pay(ids).status_code, 400)
+
+        no_contract = self.loan(2, contract=False).repayments.first()
+        response = self.batch_pay([ids[0], no_contract.id])
+        self.assertEqual((response.status_code, response.data['repayment_ids']), (400, [no_contract.id]))
+
+        Repayment.objects.filter(pk=ids[1]).update(paid_at=timezone.now())
+        response = self.batch_pay(ids)
+        self.assertEqual((response.status_code, response.data['repayment_ids']), (400, [ids[1]]))
+
+        other = User.objects.create(username='other', wallet_address=key('wallet:other'))
+        foreign = self.loan(3, user=other).repayments.first()
+        response = self.batch_pay([ids[0], foreign.id, 999999])
+        self.assertEqual((response.status_code, response.data['repayment_ids']), (404, [foreign.id, 999999]))
+
+        self.client.force_authenticate(other)
+        self.assertEqual(self.batch_pay([foreign.id]).status_code, 400)
+        self.assertFalse(ChainIntent.objects.exists())
+
+    def test_batch_pay_refuses_repayments_already_in_flight(self):
+        ids = list(self.loan(1).repayments.values_list('id', flat=True))
+        enqueue_intent('repayment', ids[0], user=self.user)
+        response = self.batch_pay(ids)
+        self.assertEqual((response.status_code, response.data['repayment_ids']), (409, [ids[0]]))
+
+        ChainIntent.objects.all().delete()
+        self.assertEqual(self.batch_pay(ids[1:]).status_code, 202)
+        self.assertEqual(self.batch_pay(ids).status_code, 409)
+
+    def test_record_paid_credits_each_repayment_once(self):
+        loan, other = self.loan(1), self.loan(2, installments=1)
+        first, second = loan.repayments.order_by('due_date')
+        single = other.repayments.get()
+        batch_payments.record_paid([first.id], 'first')
+        loan.refresh_from_db()
+        self.assertEqual((loan.amount_repaid, loan.status), (Decimal('55.00'), 'active'))
+
+        batch_payments.record_paid([first.id, second.id, single.id], 'second')
+        batch_payments.record_paid([first.id, second.id, single.id], 'third')
+        loan.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((loan.amount_repaid, loan.status), (Decimal('110.00'), 'repaid'))
+        self.assertEqual((other.amount_repaid, other.status), (Decimal('110.00'), 'repaid'))
+        self.assertEqual(dict(Repayment.objects.values_list('id', 'tx_hash')), {
+            first.id: 'first', second.id: 'second', single.id: 'second',
+        })
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        product = LoanProduct.objects.create(
+            name='Personal', loan_type='personal', description='', min_amount=10, max_amount=10000,
+            min_duration=30, max_duration=365, interest_rate=Decimal('10.00'),
+        )
+        self.borrower = User.objects.create(username='borrower', wallet_address='wallet-1')
+        other = User.objects.create(username='other', wallet_address='wallet-2')
+        now = timezone.now()
+        for number in range(23):
+            application = LoanApplication.objects.create(
+                user=other if number == 0 else self.borrower, loan_product=product, amount=100, duration_days=30,
+                purpose='test', status='approved',
+            )
+            loan = Loan.objects.create(
+                application=application, principal=Decimal('100.00'), interest_rate=Decimal('10.00'),
+                total_due=Decimal('110.00'), start_date=now, due_date=now + timedelta(days=30),
+            )
+            Repayment.objects.create(loan=loan, amount=Decimal('55.00'), due_date=now + timedelta(days=number - 10, hours=12))
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.borrower)}'}
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+
+    def get(self, view, path, data=None, headers=None):
+        request = AsyncRequestFactory().get(path, data, headers=self.headers if headers is None else headers)
+        return async_to_sync(view)(request)
+
+    def test_responses_match_the_drf_views(self):
+        for view, path, data in (
+            (async_views.loan_list, '/loans/', {}),
+            (async_views.loan_list, '/loans/', {'page': 2}),
+            (async_views.upcoming, '/repayments/upcoming/', {}),
+            (async_views.overdue, '/repayments/overdue/', {}),
+        ):
+            with self.subTest(path=path, data=data):
+                response = self.get(view, path, data)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content), json.loads(self.client.get(path, data).content))
+        page = json.loads(self.get(async_views.loan_list, '/loans/', {'page': 2}).content)
+        self.assertEqual((page['count'], len(page['results'])), (22, 2))
+        self.assertEqual(len(json.loads(self.get(async_views.overdue, '/repayments/overdue/').content)), 9)
+
+    def test_bad_page_is_not_found(self):
+        response = self.get(async_views.loan_list, '/loans/', {'page': 3})
+        self.assertEqual((response.status_code, json.loads(response.content)), (404, {'detail': 'Invalid page.'}))
+        self.assertEqual(self.client.get('/loans/', {'page': 3}).status_code, 404)
+
+    def test_requires_a_token(self):
+        response = self.get(async_views.upcoming, '/repayments/upcoming/', headers={})
+        drf = APIClient().get('/repayments/upcoming/')
+        self.assertEqual((response.status_code, json.loads(response.content)), (401, json.loads(drf.content)))
+
+    def test_other_methods_are_not_allowed(self):
+        request = AsyncRequestFactory().post('/loans/', {}, headers=self.headers)
+        self.assertEqual(async_to_sync(async_views.loan_list)(request).status_code, 405)
+        self.assertEqual(self.client.post('/loans/', {}).status_code, 405)
@@ -1,12 +1,19 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-import base58
+from django.db import transaction
 from solana.publickey import PublicKey
-from solana.account import Account
+import json
+from core.outbox import enqueue_intent
+from core.utils.key_store import has_signing_key
+from kyc.review import prioritize
+from . import archive as loan_archive, batch_payments, intake
 from .models import LoanApplication, Loan, Repayment
 from .serializers import (
     LoanApplicationSerializer, 
@@ -14,6 +21,35 @@ from .serializers import (
     RepaymentSerializer
 )
 
+def user_loans(user):
+    # Ordered so every page of the DRF and async lists holds the same rows
+    return Loan.objects.filter(application__user=user).select_related('application__user').order_by('id')
+
+
+def archived_loan_data(loan):
+    return {
+        **LoanSerializer(loan).data,
+        'archived': True,
+        'repayments': RepaymentSerializer(loan.archived_repayments, many=True).data,
+    }
+
+
+def upcoming_repayments(user):
+    return Repayment.objects.filter(
+        loan__application__user=user,
+        paid_at__isnull=True,
+        due_date__gte=timezone.now()
+    ).select_related('loan').order_by('due_date')
+
+
+def overdue_repayments(user):
+    return Repayment.objects.filter(
+        loan__application__user=user,
+        paid_at__isnull=True,
+        due_date__lt=timezone.now()
+    ).select_related('loan').order_by('due_date')
+
+
 class LoanApplicationViewSet(viewsets.ModelViewSet):
     serializer_class = LoanApplicationSerializer
     permission_classes = [IsAuthenticated]
@@ -38,17 +74,45 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
         
         # Trigger KYC verification if not already done
         if not request.user.kyc_verified:
-            # Start KYC process
-            pass
+            # Move the applicant's KYC case up the review queue
+            prioritize(request.user)
             
         return Response({'status': 'submitted'})
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        """Create applications for many borrowers from an NDJSON body; streams NDJSON results"""
+        # Read line by line rather than through request.data, so the batch is
+        # never held in memory whole
+        stream = request.stream
+        if stream is None:
+            return Response({'error': 'Request body is empty'}, status=status.HTTP_400_BAD_REQUEST)
+        results = (json.dumps(result, cls=DjangoJSONEncoder) + '\n' for result in intake.process(stream))
+        return StreamingHttpResponse(results, content_type='application/x-ndjson')
+
 class LoanViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = LoanSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Loan.objects.filter(application__user=self.request.user)
+        return user_loans(self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # Closed loans move to the archive files after a while
+            loan_id = kwargs['pk']
+            loan = loan_archive.get_loan(int(loan_id), user_id=request.user.id) if loan_id.isdigit() else None
+            if loan is None:
+                raise
+            return Response(archived_loan_data(loan))
+
+    @action(detail=False)
+    def archived(self, request):
+        """The user's archived loans with their repayments, newest first"""
+        page = self.paginate_queryset(loan_archive.user_loans(request.user.id))
+        return self.get_paginated_response([archived_loan_data(loan) for loan in page])
 
 class RepaymentViewSet(viewsets.ModelViewSet):
     serializer_class = RepaymentSerializer
@@ -61,101 +125,126 @@ class RepaymentViewSet(viewsets.ModelViewSet):
     def pay(self, request, pk=None):
         repayment = self.get_object()
         
-        if repayment.paid_at is not None:
+        # Validate that user has provided private key for signing
+        if not has_signing_key(request.user.id):
             return Response(
-                {'error': 'Repayment already paid'}, 
+                {'error': 'User private key required for transaction signing'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Process payment on Solana using v0.20.0 API
-        from core.utils.solana_client import solana_client
+        # Validate contract address exists
+        if not repayment.loan.application.contract_address:
+            return Response(
+                {'error': 'Loan contract address not found'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        try:
-            # Validate that user has provided private key for signing
-            if not hasattr(request.user, 'private_key') or not request.user.private_key:
+        # Queue the transfer; the outbox dispatcher signs and sends it and
+        # marks the repayment paid once it is submitted
+        with transaction.atomic():
+            repayment = Repayment.objects.select_for_update().get(pk=repayment.pk)
+            if repayment.paid_at is not None:
                 return Response(
-                    {'error': 'User private key required for transaction signing'}, 
+                    {'error': 'Repayment already paid'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            
-            # Validate contract address exists
-            if not repayment.loan.application.contract_address:
+            if batch_payments.in_progress(request.user, [repayment.id]):
                 return Response(
-                    {'error': 'Loan contract address not found'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Create user account from private key for signing
-            user_account = Account(base58.b58decode(request.user.private_key))
-            
-            # Create transfer transaction (v0.20.0 style)
-            from solana.transaction import Transaction
-            from solana.system_program import transfer, TransferParams
-            
-            txn = Transaction()
-            txn.add(transfer(
-                TransferParams(
-                    from_pubkey=user_account.public_key(),
-                    to_pubkey=PublicKey(repayment.loan.application.contract_address),
-                    lamports=int(repayment.amount * 10**9)  # Convert to lamports
+                    {'error': 'Payment already in progress'}, 
+                    status=status.HTTP_409_CONFLICT
                 )
-            ))
-            
-            # Send transaction
-            result = solana_client.client.send_transaction(txn, user_account)
-            
-            if result and 'result' in result:
-                repayment.paid_at = timezone.now()
-                repayment.tx_hash = result['result']
-                repayment.save()
-                
-                # Update loan status
-                loan = repayment.loan
-                loan.amount_repaid += repayment.amount
-                if loan.amount_repaid >= loan.total_due:
-                    loan.status = 'repaid'
-                loan.save()
-                
-                return Response({'status': 'paid', 'tx_hash': repayment.tx_hash})
-            else:
-                error_msg = result.get('error', {}).get('message', 'Transaction failed') if result else 'Transaction failed'
-                return Response(
-                    {'error': f'Transaction failed: {error_msg}'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
-        except ValueError as e:
-            # Handle invalid public key or base58 decoding errors
+            intent = enqueue_intent('repayment', repayment.id, user=request.user)
+        
+        return Response(
+            {'status': 'pending', 'intent_id': intent.id}, 
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=False, methods=['post'], url_path='batch-pay')
+    def batch_pay(self, request):
+        """Pay several repayments in as few transactions as fit"""
+        repayment_ids = request.data.get('repayment_ids')
+        max_repayments = getattr(settings, 'BATCH_PAY_MAX_REPAYMENTS', batch_payments.DEFAULT_MAX_REPAYMENTS)
+        if (
+            not isinstance(repayment_ids, list) or not repayment_ids
+            # JSON true and false are ints to Python
+            or not all(
+                isinstance(repayment_id, int) and not isinstance(repayment_id, bool) for repayment_id in repayment_ids
+            )
+        ):
+            return Response(
+                {'error': 'repayment_ids must be a non-empty list of ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        repayment_ids = list(dict.fromkeys(repayment_ids))
+        if len(repayment_ids) > max_repayments:
             return Response(
-                {'error': f'Invalid address format: {str(e)}'}, 
+                {'error': f'At most {max_repayments} repayments can be paid at once'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        except Exception as e:
+
+        if not has_signing_key(request.user.id):
             return Response(
-                {'error': f'Payment error: {str(e)}'}, 
+                {'error': 'User private key required for transaction signing'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        with transaction.atomic():
+            # One query locks and loads every repayment with its loan and application
+            repayments = list(
+                self.get_queryset().select_for_update(of=('self',))
+                .select_related('loan__application')
+                .filter(pk__in=repayment_ids)
+                .order_by('loan_id', 'due_date')
+            )
+            missing = set(repayment_ids) - {repayment.id for repayment in repayments}
+            if missing:
+                return Response(
+                    {'error': 'Repayments not found', 'repayment_ids': sorted(missing)},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            paid = [repayment.id for repayment in repayments if repayment.paid_at is not None]
+            if paid:
+                return Response(
+                    {'error': 'Repayments already paid', 'repayment_ids': paid},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            no_contract = []
+            for repayment in repayments:
+                try:
+                    PublicKey(repayment.loan.application.contract_address)
+                except (TypeError, ValueError):
+                    no_contract.append(repayment.id)
+            if no_contract:
+                return Response(
+                    {'error': 'Loan contract address not found', 'repayment_ids': no_contract},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            busy = batch_payments.in_progress(request.user, repayment_ids)
+            if busy:
+                return Response(
+                    {'error': 'Payment already in progress', 'repayment_ids': sorted(busy)},
+                    status=status.HTTP_409_CONFLICT
+                )
+            intents = batch_payments.enqueue(request.user, repayments)
+
+        return Response(
+            {
+                'status': 'pending',
+                'intent_ids': [intent.id for intent in intents],
+                'transactions': len(intents),
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
         """Get upcoming repayments for the user"""
-        upcoming_repayments = Repayment.objects.filter(
-            loan__application__user=request.user,
-            paid_at__isnull=True,
-            due_date__gte=timezone.now()
-        ).order_by('due_date')
-        
-        serializer = self.get_serializer(upcoming_repayments, many=True)
+        serializer = self.get_serializer(upcoming_repayments(request.user), many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def overdue(self, request):
         """Get overdue repayments for the user"""
-        overdue_repayments = Repayment.objects.filter(
-            loan__application__user=request.user,
-            paid_at__isnull=True,
-            due_date__lt=timezone.now()
-        ).order_by('due_date') 
-        
-        serializer = self.get_serializer(overdue_repayments, many=True)
+        serializer = self.get_serializer(overdue_repayments(request.user), many=True)
         return Response(serializer.data)
\ No newline at end of file